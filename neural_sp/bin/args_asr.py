@@ -100,7 +100,17 @@ def build_parser():
     parser.add_argument('--model_save_dir', type=str, default=False,
                         help='directory to save a model')
     parser.add_argument('--resume', type=str, default=False, nargs='?',
-                        help='model path to resume training')
+                        help='model path (or training_state.pt) to resume training')
+    parser.add_argument('--save_state_n_steps', type=int, default=0,
+                        help='save the training state every N steps to resume in the middle of an epoch (0: disabled)')
+    parser.add_argument('--distributed', type=strtobool, default=False, nargs='?',
+                        help='multi-process data parallel training (launched by torchrun)')
+    parser.add_argument('--dist_backend', type=str, default='gloo', choices=['gloo', 'nccl'],
+                        help='backend of torch.distributed')
+    parser.add_argument('--dist_timeout', type=int, default=120,
+                        help='timeout of collective operations in minutes (including evaluation on rank 0)')
+    parser.add_argument('--local_rank', type=int, default=int(os.environ.get('LOCAL_RANK', 0)),
+                        help='local rank (set by the launcher)')
     parser.add_argument('--job_name', type=str, default=False,
                         help='job name')
     parser.add_argument('--stdout', type=strtobool, default=False,
@@ -212,6 +222,10 @@ def build_parser():
                         help='epoch to converto to SGD fine-tuning')
     parser.add_argument('--print_step', type=int, default=200,
                         help='print log per this value')
+    parser.add_argument('--profile', type=strtobool, default=False,
+                        help='measure elapsed time per module (reported per print_step)')
+    parser.add_argument('--profile_trace_n_steps', type=int, default=0,
+                        help='save events in the Chrome trace format per this value (0 means disabled)')
     parser.add_argument('--metric', type=str, default='edit_distance',
                         choices=['edit_distance', 'loss', 'accuracy', 'ppl', 'bleu', 'mse'],
                         help='metric for evaluation during training')
@@ -240,6 +254,14 @@ def build_parser():
                         help='gather the similar length of utterances and shuffle them')
     parser.add_argument('--eval_start_epoch', type=int, default=1,
                         help='first epoch to start evalaution')
+    parser.add_argument('--async_checkpoint', type=strtobool, default=False, nargs='?',
+                        help='write checkpoints in a background thread')
+    parser.add_argument('--eval_n_workers', type=int, default=0,
+                        help='number of background processes for decoding dev/eval sets during training (0: decode in the training process)')
+    parser.add_argument('--eval_gpu_id', type=int, default=-1,
+                        help='GPU index for background decoding (-1: CPU)')
+    parser.add_argument('--eval_checkpoint_timeout', type=int, default=3600,
+                        help='time in seconds for background decoding to wait for a checkpoint being written')
     parser.add_argument('--warmup_start_lr', type=float, default=0,
                         help='initial learning rate for learning rate warm up')
     parser.add_argument('--warmup_n_steps', type=int, default=0,
@@ -309,6 +331,10 @@ def build_parser():
                         help='total loss weight for the 2nd auxiliary task')
     parser.add_argument('--mtl_per_batch', type=strtobool, default=False, nargs='?',
                         help='change mini-batch per task')
+    parser.add_argument('--mtl_shared_encoder', type=strtobool, default=False, nargs='?',
+                        help='encode each mini-batch once and share encoder outputs among tasks (for mtl_per_batch). '
+                        'Gradients of all tasks from the same mini-batch are applied in the same optimizer step, '
+                        'instead of later tasks spilling over into the step of the next mini-batch')
     parser.add_argument('--task_specific_layer', type=strtobool, default=False, nargs='?',
                         help='insert a task-specific encoder layer per task')
     # foroward-backward
@@ -344,6 +370,10 @@ def build_parser():
                         help='Teacher ASR model for knowledge distillation')
     parser.add_argument('--teacher_lm', default=False, nargs='?',
                         help='Teacher LM for knowledge distillation')
+    parser.add_argument('--teacher_posterior', default=False, nargs='?',
+                        help='prefix of precomputed top-k teacher posteriors for knowledge distillation')
+    parser.add_argument('--teacher_topk', type=int, default=8,
+                        help='number of tokens to keep per output position in precomputed teacher posteriors')
     parser.add_argument('--distillation_weight', type=float, default=0.1,
                         help='soft label weight for knowledge distillation')
     # special label
@@ -362,6 +392,8 @@ def build_parser():
                         help='model path')
     parser.add_argument('--recog_model_bwd', type=str, default=False, nargs='?',
                         help='model path in the reverse direction')
+    parser.add_argument('--recog_ensemble_n_workers', type=int, default=1,
+                        help='number of threads to run ensemble members concurrently')
     parser.add_argument('--recog_dir', type=str, default=False,
                         help='directory to save decoding results')
     parser.add_argument('--recog_unit', type=str, default=False, nargs='?',
@@ -425,6 +457,8 @@ def build_parser():
                         help='')
     parser.add_argument('--recog_n_average', type=int, default=1,
                         help='number of models for the model averaging of Transformer')
+    parser.add_argument('--recog_average_topk', type=strtobool, default=False,
+                        help='average the top-k checkpoints on the dev set instead of the last ones')
     parser.add_argument('--recog_streaming', type=strtobool, default=False,
                         help='streaming decoding')
     parser.add_argument('--recog_chunk_sync', type=strtobool, default=False,
@@ -443,4 +477,47 @@ def build_parser():
                         help='delay threshold for MMA decoder')
     parser.add_argument('--recog_mem_len', type=int, default=0,
                         help='number of tokens for memory in TransformerXL decoder during evaluation')
+    parser.add_argument('--recog_quantize', type=strtobool, default=False,
+                        help='int8 dynamic quantization of LSTM/Linear layers for CPU inference')
+    parser.add_argument('--recog_quantize_conv', type=strtobool, default=False,
+                        help='int8 static quantization of CNN encoders (calibrated on the first evaluation set)')
+    parser.add_argument('--recog_quantize_n_calib', type=int, default=10,
+                        help='number of mini-batches for calibration of static quantization')
+    parser.add_argument('--recog_quantize_skip', type=str, default=[], nargs='*',
+                        help='names of modules kept in fp32 (e.g., dec_fwd.output)')
+    parser.add_argument('--recog_quantize_compare', type=strtobool, default=False,
+                        help='evaluate the fp32 model as well and report differences in accuracy and speed')
+    parser.add_argument('--recog_profile', type=strtobool, default=False,
+                        help='measure elapsed time per module during decoding')
+    parser.add_argument('--recog_server_host', type=str, default='127.0.0.1',
+                        help='host name of the streaming server')
+    parser.add_argument('--recog_server_port', type=int, default=8765,
+                        help='TCP port of the streaming server')
+    parser.add_argument('--recog_server_socket', type=str, default=False, nargs='?',
+                        help='path to a Unix socket of the streaming server (overrides host/port)')
+    parser.add_argument('--recog_server_max_sessions', type=int, default=64,
+                        help='maximum number of concurrent sessions in the streaming server')
+    parser.add_argument('--recog_server_max_batch_size', type=int, default=16,
+                        help='maximum number of sessions whose chunks are encoded in a mini-batch')
+    parser.add_argument('--recog_server_max_wait', type=float, default=0.0,
+                        help='time in seconds to wait for chunks of other sessions before encoding a mini-batch')
+    parser.add_argument('--recog_longform_scp', type=str, default=False, nargs='?',
+                        help='Kaldi scp file of long-form recordings (recording-id and feature path)')
+    parser.add_argument('--recog_vad_type', type=str, default='energy', choices=['energy', 'ctc'],
+                        help='voice activity detection to segment long-form recordings')
+    parser.add_argument('--recog_vad_min_silence', type=int, default=30,
+                        help='minimum number of non-speech frames between segments')
+    parser.add_argument('--recog_vad_min_speech', type=int, default=20,
+                        help='minimum number of frames in a segment')
+    parser.add_argument('--recog_vad_max_len', type=int, default=2000,
+                        help='maximum number of frames in a segment')
+    parser.add_argument('--recog_vad_margin', type=int, default=10,
+                        help='number of frames added to both ends of each segment')
+    parser.add_argument('--recog_vad_energy_offset', type=float, default=0.5,
+                        help='threshold above the noise floor of feature energies for energy-based VAD')
+    parser.add_argument('--recog_vad_window', type=int, default=2000,
+                        help='number of frames per window to compute CTC posteriors for CTC-based VAD')
+    parser.add_argument('--export_format', type=str, default='torchscript',
+                        choices=['torchscript', 'onnx'],
+                        help='format of exported encoder/decoder graphs')
     return parser
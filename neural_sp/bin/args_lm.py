@@ -77,7 +77,17 @@ def build_parser():
     parser.add_argument('--model_save_dir', type=str, default=False,
                         help='directory to save a model')
     parser.add_argument('--resume', type=str, default=False, nargs='?',
-                        help='model path to resume training')
+                        help='model path (or training_state.pt) to resume training')
+    parser.add_argument('--save_state_n_steps', type=int, default=0,
+                        help='save the training state every N steps to resume in the middle of an epoch (0: disabled)')
+    parser.add_argument('--distributed', type=strtobool, default=False, nargs='?',
+                        help='multi-process data parallel training (launched by torchrun)')
+    parser.add_argument('--dist_backend', type=str, default='gloo', choices=['gloo', 'nccl'],
+                        help='backend of torch.distributed')
+    parser.add_argument('--dist_timeout', type=int, default=120,
+                        help='timeout of collective operations in minutes (including evaluation on rank 0)')
+    parser.add_argument('--local_rank', type=int, default=int(os.environ.get('LOCAL_RANK', 0)),
+                        help='local rank (set by the launcher)')
     parser.add_argument('--job_name', type=str, default=False,
                         help='job name')
     parser.add_argument('--stdout', type=strtobool, default=False,
@@ -134,6 +144,10 @@ def build_parser():
                         help='epoch to converto to SGD fine-tuning')
     parser.add_argument('--print_step', type=int, default=100,
                         help='print log per this value')
+    parser.add_argument('--profile', type=strtobool, default=False,
+                        help='measure elapsed time per module (reported per print_step)')
+    parser.add_argument('--profile_trace_n_steps', type=int, default=0,
+                        help='save events in the Chrome trace format per this value (0 means disabled)')
     parser.add_argument('--lr', type=float, default=1e-3,
                         help='initial learning rate')
     parser.add_argument('--lr_factor', type=float, default=10.0,
@@ -155,6 +169,8 @@ def build_parser():
                         help='epoch to stop soring utterances by length')
     parser.add_argument('--eval_start_epoch', type=int, default=1,
                         help='first epoch to start evalaution')
+    parser.add_argument('--async_checkpoint', type=strtobool, default=False, nargs='?',
+                        help='write checkpoints in a background thread')
     parser.add_argument('--warmup_start_lr', type=float, default=0,
                         help='initial learning rate for learning rate warm up')
     parser.add_argument('--warmup_n_steps', type=int, default=0,
@@ -211,4 +227,10 @@ def build_parser():
                         help='lambda paramter for cache')
     parser.add_argument('--recog_mem_len', type=int, default=0,
                         help='number of tokens for memory in TransformerXL during evaluation')
+    parser.add_argument('--recog_quantize', type=strtobool, default=False,
+                        help='int8 dynamic quantization of LSTM/Linear layers for CPU inference')
+    parser.add_argument('--recog_quantize_skip', type=str, default=[], nargs='*',
+                        help='names of modules kept in fp32 (e.g., output)')
+    parser.add_argument('--recog_quantize_compare', type=strtobool, default=False,
+                        help='evaluate the fp32 model as well and report differences in perplexity and speed')
     return parser
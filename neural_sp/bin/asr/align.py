@@ -0,0 +1,156 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Align references with the CTC posteriors of the ASR model and write ctm files."""
+
+import codecs
+import logging
+import os
+import sys
+import time
+from tqdm import tqdm
+
+from neural_sp.bin.args_asr import parse_args_eval
+from neural_sp.bin.train_utils import (
+    load_checkpoint,
+    set_logger
+)
+from neural_sp.datasets.asr import Dataset
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.utils import mkdir_join
+
+logger = logging.getLogger(__name__)
+
+FRAME_SHIFT = 0.01  # [sec]
+
+
+def utterance_offset(utt_id):
+    """Start time of an utterance in the recording (the same convention as utils/trn2ctm.py).
+
+    Args:
+        utt_id (str): utterance ID ending with `_[start frame]_[end frame]`
+    Returns:
+        offset (float): start time in seconds (0 if not found)
+
+    """
+    fields = utt_id.replace('-', '_').split('_')
+    if len(fields) >= 2 and fields[-2].isdigit() and fields[-1].isdigit():
+        return int(fields[-2]) * FRAME_SHIFT
+    return 0.
+
+
+def group_words(tokens, segments, unit):
+    """Merge token-level segments into words.
+
+    Args:
+        tokens (list): token strings
+        segments (list): tuples of (token_id, start, end, confidence)
+        unit (str): word/word_char/wp/char/phone
+    Returns:
+        words (list): tuples of (word, start, end, confidence)
+
+    """
+    words = []
+    chunk = []  # (token, start, end, confidence)
+    for token, (_, start, end, confidence) in zip(tokens, segments):
+        if unit == 'wp':
+            if token.startswith('▁') and len(chunk) > 0:
+                words.append(chunk)
+                chunk = []
+            chunk.append((token.replace('▁', ''), start, end, confidence))
+        elif unit == 'char':
+            if token == '<space>':
+                if len(chunk) > 0:
+                    words.append(chunk)
+                chunk = []
+                continue
+            chunk.append((token, start, end, confidence))
+        else:
+            words.append([(token, start, end, confidence)])
+    if len(chunk) > 0:
+        words.append(chunk)
+    return [(''.join([c[0] for c in w]), w[0][1], w[-1][2], sum([c[3] for c in w]) / len(w))
+            for w in words if len(''.join([c[0] for c in w])) > 0]
+
+
+def main():
+
+    # Load configuration
+    args, _, dir_name = parse_args_eval(sys.argv[1:])
+
+    # Setting for logging
+    if os.path.isfile(os.path.join(args.recog_dir, 'align.log')):
+        os.remove(os.path.join(args.recog_dir, 'align.log'))
+    set_logger(os.path.join(args.recog_dir, 'align.log'), stdout=args.recog_stdout)
+
+    for i, s in enumerate(args.recog_sets):
+        # Load dataset (sorted by input length)
+        dataset = Dataset(corpus=args.corpus,
+                          tsv_path=s,
+                          dict_path=os.path.join(dir_name, 'dict.txt'),
+                          nlsyms=os.path.join(dir_name, 'nlsyms.txt'),
+                          wp_model=os.path.join(dir_name, 'wp.model'),
+                          unit=args.unit,
+                          batch_size=args.recog_batch_size,
+                          n_epochs=1,
+                          min_n_frames=0,
+                          max_n_frames=sys.maxsize,
+                          sort_by='input',
+                          first_n_utterances=args.recog_first_n_utt)
+
+        if i == 0:
+            # Load the ASR model
+            model = Speech2Text(args, dir_name)
+            load_checkpoint(args.recog_model[0], model)
+            if args.recog_n_gpus >= 1:
+                model.cudnn_setting(deterministic=True, benchmark=False)
+                model.cuda()
+            factor = model.enc.subsampling_factor * (model.n_skips if model.n_stacks > 1 else 1)
+            frame_shift = FRAME_SHIFT * factor  # of encoder outputs
+
+        save_path = mkdir_join(args.recog_dir, 'align', dataset.set)
+        n_utts, n_failed, n_frames = 0, 0, 0
+        start_time = time.time()
+        pbar = tqdm(total=len(dataset))
+        with codecs.open(os.path.join(save_path, 'word.ctm'), 'w', encoding='utf-8') as f_word, \
+                codecs.open(os.path.join(save_path, 'token.ctm'), 'w', encoding='utf-8') as f_token:
+            while True:
+                batch, is_new_epoch = dataset.next()
+                alignments = model.ctc_forced_align(batch['xs'], batch['ys'])
+
+                for b, utt_id in enumerate(batch['utt_ids']):
+                    n_utts += 1
+                    n_frames += batch['xlens'][b]
+                    if alignments[b] is None:
+                        logger.warning('Failed to align %s' % utt_id)
+                        n_failed += 1
+                        continue
+                    speaker = str(batch['speakers'][b]).replace('-', '_')
+                    offset = utterance_offset(utt_id)
+                    tokens = dataset.idx2token[0](batch['ys'][b], return_list=True)
+                    for token, (_, start, end, confidence) in zip(tokens, alignments[b]):
+                        f_token.write('%s 1 %.2f %.2f %s %.3f\n' %
+                                      (speaker, offset + start * frame_shift,
+                                       (end - start) * frame_shift, token, confidence))
+                    for word, start, end, confidence in group_words(tokens, alignments[b], args.unit):
+                        f_word.write('%s 1 %.2f %.2f %s %.3f\n' %
+                                     (speaker, offset + start * frame_shift,
+                                      (end - start) * frame_shift, word, confidence))
+                pbar.update(len(batch['utt_ids']))
+
+                if is_new_epoch:
+                    break
+        pbar.close()
+
+        elapsed = time.time() - start_time
+        logger.info('%s: aligned %d/%d utterances in %.2f [sec] (RTF: %.4f)' %
+                    (dataset.set, n_utts - n_failed, n_utts, elapsed,
+                     elapsed / max(n_frames * FRAME_SHIFT, 1e-9)))
+        logger.info('Saved to %s' % save_path)
+
+
+if __name__ == '__main__':
+    main()
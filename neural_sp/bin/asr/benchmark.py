@@ -0,0 +1,232 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Benchmark inference speed of ASR models on CPU.
+
+Models are built from the same configuration files as training with random
+weights, and decoded with synthetic features. Each utterance is decoded
+separately (batch size 1). RNN-T models are benchmarked with the greedy/beam
+modes by setting `--dec_type lstm_transducer`.
+
+"""
+
+import copy
+import logging
+import numpy as np
+import sys
+import time
+import torch
+
+from neural_sp.bin.args_asr import build_parser
+from neural_sp.bin.args_asr import register_args_decoder
+from neural_sp.bin.args_asr import register_args_encoder
+from neural_sp.bin.benchmark_utils import compare_results
+from neural_sp.bin.benchmark_utils import load_results
+from neural_sp.bin.benchmark_utils import peak_rss_mb
+from neural_sp.bin.benchmark_utils import percentiles
+from neural_sp.bin.benchmark_utils import sample_lengths
+from neural_sp.bin.benchmark_utils import save_results
+from neural_sp.bin.train_utils import set_logger
+from neural_sp.models.lm.build import build_lm
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+
+logger = logging.getLogger(__name__)
+
+MODES = ['greedy', 'beam', 'ctc_greedy', 'ctc_prefix', 'streaming']
+
+
+def add_args_benchmark(parser):
+    parser.add_argument('--bench_modes', type=str, default=MODES, nargs='+', choices=MODES,
+                        help='decoding modes to benchmark')
+    parser.add_argument('--bench_input_dim', type=int, default=80,
+                        help='dimension of synthetic input features')
+    parser.add_argument('--bench_vocab', type=int, default=1000,
+                        help='vocabulary size')
+    parser.add_argument('--bench_n_utts', type=int, default=20,
+                        help='number of utterances per mode')
+    parser.add_argument('--bench_n_warmup', type=int, default=2,
+                        help='number of utterances decoded before measurement in each mode')
+    parser.add_argument('--bench_min_len', type=int, default=200,
+                        help='minimum number of input frames')
+    parser.add_argument('--bench_max_len', type=int, default=1000,
+                        help='maximum number of input frames')
+    parser.add_argument('--bench_len_dist', type=str, default='uniform', choices=['uniform', 'normal'],
+                        help='distribution of utterance lengths')
+    parser.add_argument('--bench_frame_shift', type=float, default=10,
+                        help='frame shift of input features in milliseconds (to compute RTF)')
+    parser.add_argument('--bench_beam_width', type=int, default=4,
+                        help='beam width for beam/ctc_prefix/streaming modes')
+    parser.add_argument('--bench_lm_type', type=str, default=False, nargs='?',
+                        help='type of the LM for shallow fusion (with --recog_lm_weight)')
+    parser.add_argument('--bench_n_threads', type=int, default=1,
+                        help='number of threads for intra-op parallelism')
+    parser.add_argument('--bench_seed', type=int, default=1,
+                        help='random seed for weights and features')
+    parser.add_argument('--bench_output', type=str, default=False, nargs='?',
+                        help='path to save results in JSON')
+    parser.add_argument('--bench_baseline', type=str, default=False, nargs='?',
+                        help='path to baseline results in JSON to compare with')
+    parser.add_argument('--bench_tolerance', type=float, default=0.1,
+                        help='relative degradation from the baseline regarded as a regression')
+    return parser
+
+
+def parse_args_benchmark(input_args):
+    parser = add_args_benchmark(build_parser())
+    user_args, _ = parser.parse_known_args(input_args)
+
+    # register module specific arguments
+    parser = register_args_encoder(parser, user_args)
+    user_args, _ = parser.parse_known_args(input_args)  # to avoid args conflict
+    parser = register_args_decoder(parser, user_args)
+    user_args, _ = parser.parse_known_args(input_args)
+
+    user_args.input_dim = user_args.bench_input_dim
+    user_args.vocab = user_args.bench_vocab
+    user_args.vocab_sub1 = -1
+    user_args.vocab_sub2 = -1
+    return user_args
+
+
+def build_random_lm(lm_type, vocab):
+    from neural_sp.bin.args_lm import build_parser as build_parser_lm
+    from neural_sp.bin.args_lm import register_args_lm
+
+    input_args = ['--lm_type', lm_type]
+    parser = build_parser_lm()
+    args_lm, _ = parser.parse_known_args(input_args)
+    parser = register_args_lm(parser, args_lm)
+    args_lm, _ = parser.parse_known_args(input_args)
+    args_lm.vocab = vocab
+    return build_lm(args_lm)
+
+
+def idx2token(token_ids):
+    return ' '.join([str(i) for i in token_ids])
+
+
+def mode_params(recog_params, mode, beam_width):
+    params = copy.deepcopy(recog_params)
+    params['recog_batch_size'] = 1
+    params['recog_beam_width'] = 1 if mode in ['greedy', 'ctc_greedy'] else beam_width
+    if 'ctc' in mode:
+        params['recog_ctc_weight'] = 1.0
+    return params
+
+
+def is_supported(model, mode):
+    if 'ctc' in mode:
+        return model.ctc_weight > 0
+    if mode == 'streaming':
+        return model.ctc_weight > 0 and model.fwd_weight > 0
+    return model.fwd_weight > 0
+
+
+def run(model, xs, params, mode, frame_shift):
+    """Decode utterances one by one.
+
+    Args:
+        model (Speech2Text):
+        xs (list): A list of length `[N]`, which contains arrays of size `[T, input_dim]`
+        params (dict): hyper-parameters for decoding
+        mode (str): decoding mode
+        frame_shift (float): frame shift in milliseconds
+    Returns:
+        result (dict): metrics
+
+    """
+    latencies, chunk_latencies = [], []
+    n_tokens = 0
+    for x in xs:
+        tic = time.perf_counter()
+        if mode == 'streaming':
+            best_hyps_id, _ = model.decode_streaming([x], params, idx2token, exclude_eos=True)
+            chunk_latencies += model.chunk_latencies
+        else:
+            best_hyps_id, _ = model.decode([x], params, None, exclude_eos=True)
+        latencies.append(time.perf_counter() - tic)
+        n_tokens += len(best_hyps_id[0])
+
+    elapsed = sum(latencies)
+    audio_sec = sum([len(x) for x in xs]) * frame_shift / 1000
+    result = {'n_utts': len(xs),
+              'audio_sec': audio_sec,
+              'elapsed_sec': elapsed,
+              'rtf': elapsed / audio_sec,
+              'n_tokens': n_tokens,
+              'tokens_per_sec': n_tokens / elapsed,
+              'latency_ms': percentiles(latencies),
+              'peak_rss_mb': peak_rss_mb()}  # NOTE: including preceding modes
+    if len(chunk_latencies) > 0:
+        result['chunk_latency_ms'] = percentiles(chunk_latencies)
+    return result
+
+
+def main():
+
+    args = parse_args_benchmark(sys.argv[1:])
+    set_logger(None, stdout=False)
+
+    torch.set_num_threads(args.bench_n_threads)
+    torch.manual_seed(args.bench_seed)
+    np.random.seed(args.bench_seed)
+
+    # Build the model with random weights
+    model = Speech2Text(args)
+    if args.bench_lm_type:
+        lm = build_random_lm(args.bench_lm_type, args.vocab)
+        if args.recog_lm_weight == 0:
+            logger.warning('LM is not used because --recog_lm_weight is 0.')
+        model.lm_fwd = lm
+    model.eval()
+    n_params = model.total_parameters
+    logger.info('enc: %s, dec: %s, vocab: %d, #params: %.2fM' %
+                (args.enc_type, args.dec_type, args.vocab, n_params / 1e6))
+
+    # Synthetic features
+    rng = np.random.RandomState(args.bench_seed)
+    lengths = sample_lengths(args.bench_n_warmup + args.bench_n_utts,
+                             args.bench_min_len, args.bench_max_len,
+                             args.bench_len_dist, args.bench_seed)
+    xs = [rng.randn(xlen, args.input_dim).astype(np.float32) for xlen in lengths]
+
+    recog_params = vars(args)
+    results = {}
+    for mode in args.bench_modes:
+        if not is_supported(model, mode):
+            logger.warning('Skip %s decoding (not supported by the model).' % mode)
+            continue
+        params = mode_params(recog_params, mode, args.bench_beam_width)
+        run(model, xs[:args.bench_n_warmup], params, mode, args.bench_frame_shift)
+        results[mode] = run(model, xs[args.bench_n_warmup:], params, mode, args.bench_frame_shift)
+        r = results[mode]
+        logger.info('%s: RTF %.3f, latency p50/p90/p99 %.1f/%.1f/%.1f ms, %.1f tokens/sec, peak RSS %.1f MB' %
+                    (mode, r['rtf'], r['latency_ms']['p50'], r['latency_ms']['p90'], r['latency_ms']['p99'],
+                     r['tokens_per_sec'], r['peak_rss_mb']))
+
+    config = {k: v for k, v in vars(args).items()
+              if k.startswith('bench_') or k in ['enc_type', 'dec_type', 'enc_n_units', 'enc_n_layers',
+                                                 'dec_n_units', 'dec_n_layers', 'transformer_d_model',
+                                                 'ctc_weight', 'recog_lm_weight', 'input_dim', 'vocab']}
+    config['n_params'] = n_params
+    if args.bench_output:
+        save_results(args.bench_output, config, results)
+        logger.info('Saved results to %s' % args.bench_output)
+
+    if args.bench_baseline:
+        diffs = compare_results(results, load_results(args.bench_baseline), args.bench_tolerance)
+        n_regressions = 0
+        for mode, name, ref, cur, change, is_regression in diffs:
+            logger.info('%s %s: %.3f -> %.3f (%+.1f%%)%s' %
+                        (mode, name, ref, cur, change * 100, ' REGRESSION' if is_regression else ''))
+            n_regressions += int(is_regression)
+        if n_regressions > 0:
+            logger.warning('%d regressions (tolerance: %.1f%%)' % (n_regressions, args.bench_tolerance * 100))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@ import time
 
 from neural_sp.bin.args_asr import parse_args_eval
 from neural_sp.bin.eval_utils import average_checkpoints
+from neural_sp.bin.eval_utils import load_topk_list
 from neural_sp.bin.train_utils import load_checkpoint
 from neural_sp.bin.train_utils import load_config
 from neural_sp.bin.train_utils import set_logger
@@ -27,7 +28,11 @@ from neural_sp.evaluators.word import eval_word
 from neural_sp.evaluators.wordpiece import eval_wordpiece
 from neural_sp.evaluators.wordpiece_bleu import eval_wordpiece_bleu
 from neural_sp.models.lm.build import build_lm
+from neural_sp.models.quantization import quantize_model
+from neural_sp.models.seq2seq.ensemble import EnsembleExecutor
 from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.profiler import profiler
+from neural_sp.utils import mkdir_join
 
 logger = logging.getLogger(__name__)
 
@@ -42,10 +47,14 @@ def main():
         os.remove(os.path.join(args.recog_dir, 'decode.log'))
     set_logger(os.path.join(args.recog_dir, 'decode.log'), stdout=args.recog_stdout)
 
-    wer_avg, cer_avg, per_avg = 0, 0, 0
-    ppl_avg, loss_avg = 0, 0
-    acc_avg = 0
-    bleu_avg = 0
+    if args.recog_profile:
+        profiler.enable(trace=True, sync_cuda=args.recog_n_gpus > 0)
+
+    if args.recog_quantize:
+        assert args.recog_n_gpus == 0, 'Quantized models run on CPU only.'
+
+    variants = []  # (name, models, recog_dir)
+    results = {}
     for i, s in enumerate(args.recog_sets):
         # Load dataset
         dataset = Dataset(corpus=args.corpus,
@@ -72,9 +81,9 @@ def main():
             epoch = int(args.recog_model[0].split('-')[-1])
             if args.recog_n_average > 1:
                 # Model averaging for Transformer
-                # topk_list = load_checkpoint(args.recog_model[0], model)
+                topk_list = load_topk_list(args.recog_model[0]) if args.recog_average_topk else []
                 model = average_checkpoints(model, args.recog_model[0],
-                                            # topk_list=topk_list,
+                                            topk_list=topk_list,
                                             n_average=args.recog_n_average)
             else:
                 load_checkpoint(args.recog_model[0], model)
@@ -160,88 +169,177 @@ def main():
             logger.info('forward-backward attention: %s' % args.recog_fwd_bwd_attention)
             logger.info('resolving UNK: %s' % args.recog_resolving_unk)
             logger.info('ensemble: %d' % (len(ensemble_models)))
+            logger.info('ensemble workers: %d' % (args.recog_ensemble_n_workers))
             logger.info('ASR decoder state carry over: %s' % (args.recog_asr_state_carry_over))
             logger.info('LM state carry over: %s' % (args.recog_lm_state_carry_over))
             logger.info('model average (Transformer): %d' % (args.recog_n_average))
+            logger.info('int8 quantization: %s' % (args.recog_quantize))
+            logger.info('profile: %s' % (args.recog_profile))
 
             # GPU setting
             if args.recog_n_gpus >= 1:
                 model.cudnn_setting(deterministic=True, benchmark=False)
                 model.cuda()
 
-        start_time = time.time()
-
-        if args.recog_metric == 'edit_distance':
-            if args.recog_unit in ['word', 'word_char']:
-                wer, cer, _ = eval_word(ensemble_models, dataset, recog_params,
-                                        epoch=epoch - 1,
-                                        recog_dir=args.recog_dir,
-                                        progressbar=True)
-                wer_avg += wer
-                cer_avg += cer
-            elif args.recog_unit == 'wp':
-                wer, cer = eval_wordpiece(ensemble_models, dataset, recog_params,
-                                          epoch=epoch - 1,
-                                          recog_dir=args.recog_dir,
-                                          streaming=args.recog_streaming,
-                                          progressbar=True,
-                                          fine_grained=True)
-                wer_avg += wer
-                cer_avg += cer
-            elif 'char' in args.recog_unit:
-                wer, cer = eval_char(ensemble_models, dataset, recog_params,
-                                     epoch=epoch - 1,
-                                     recog_dir=args.recog_dir,
-                                     progressbar=True,
-                                     task_idx=0)
-                #  task_idx=1 if args.recog_unit and 'char' in args.recog_unit else 0)
-                wer_avg += wer
-                cer_avg += cer
-            elif 'phone' in args.recog_unit:
-                per = eval_phone(ensemble_models, dataset, recog_params,
-                                 epoch=epoch - 1,
-                                 recog_dir=args.recog_dir,
-                                 progressbar=True)
-                per_avg += per
+            # Quantization for CPU inference
+            if args.recog_quantize:
+                if args.recog_quantize_compare:
+                    variants.append(('fp32', [copy.deepcopy(m) for m in ensemble_models],
+                                     mkdir_join(args.recog_dir, 'fp32')))
+                for model_e in ensemble_models:
+                    quantize_model(model_e, skip_modules=args.recog_quantize_skip,
+                                   conv_calibrate_fn=(lambda m: calibrate(m, dataset, args.recog_quantize_n_calib))
+                                   if args.recog_quantize_conv else None)
+                variants.append(('int8', ensemble_models, args.recog_dir))
             else:
-                raise ValueError(args.recog_unit)
-        elif args.recog_metric in ['ppl', 'loss']:
-            ppl, loss = eval_ppl(ensemble_models, dataset, progressbar=True)
-            ppl_avg += ppl
-            loss_avg += loss
-        elif args.recog_metric == 'accuracy':
-            acc_avg += eval_accuracy(ensemble_models, dataset, progressbar=True)
-        elif args.recog_metric == 'bleu':
-            bleu = eval_wordpiece_bleu(ensemble_models, dataset, recog_params,
-                                       epoch=epoch - 1,
-                                       recog_dir=args.recog_dir,
-                                       streaming=args.recog_streaming,
-                                       progressbar=True,
-                                       fine_grained=True)
-            bleu_avg += bleu
+                variants.append(('', ensemble_models, args.recog_dir))
+
+        for name, models, recog_dir in variants:
+            profiler.reset()
+            if len(models) > 1:
+                models[0].ensemble_executor = EnsembleExecutor(args.recog_ensemble_n_workers)
+            start_time = time.time()
+            result = evaluate(models, dataset, recog_params, args, epoch, recog_dir)
+            elasped_time = time.time() - start_time
+            if models[0].ensemble_executor is not None:
+                models[0].ensemble_executor.shutdown()
+                models[0].ensemble_executor = None
+            if args.recog_profile:
+                for k, (total, count) in sorted(profiler.summary().items(), key=lambda x: -x[1][0]):
+                    logger.info('%-20s %10.3f sec (%5.1f %%) %8d calls' %
+                                (k, total, total / elasped_time * 100, count))
+                profiler.export_chrome_trace(os.path.join(recog_dir, 'trace.json'))
+            if name:
+                logger.info('[%s] %s' % (name, ', '.join(['%s: %.3f' % (k, v) for k, v in result.items()])))
+            logger.info('Elasped time: %.3f [sec]' % elasped_time)
+            logger.info('RTF: %.3f' % (elasped_time / (dataset.n_frames * 0.01)))
+
+            result['time'] = elasped_time
+            result['n_frames'] = dataset.n_frames
+            if name not in results:
+                results[name] = {k: 0 for k in result.keys()}
+            for k, v in result.items():
+                results[name][k] += v
+
+    for name, _, _ in variants:
+        if name:
+            logger.info('========== %s ==========' % name)
+        log_results(results[name], args)
+
+    if len(variants) > 1:
+        # Differences from the fp32 model
+        ref, hyp = results['fp32'], results['int8']
+        n_sets = len(args.recog_sets)
+        for k in ref.keys():
+            if k in ['time', 'n_frames']:
+                continue
+            logger.info('%s (avg.): %.3f -> %.3f (%+.3f)' %
+                        (k.upper(), ref[k] / n_sets, hyp[k] / n_sets, (hyp[k] - ref[k]) / n_sets))
+        rtf_ref = ref['time'] / (ref['n_frames'] * 0.01)
+        rtf_hyp = hyp['time'] / (hyp['n_frames'] * 0.01)
+        logger.info('RTF: %.3f -> %.3f (x%.2f speedup)' % (rtf_ref, rtf_hyp, rtf_ref / rtf_hyp))
+        print('RTF: %.3f -> %.3f (x%.2f speedup)' % (rtf_ref, rtf_hyp, rtf_ref / rtf_hyp))
+
+
+def evaluate(models, dataset, recog_params, args, epoch, recog_dir):
+    """Evaluate models on a single evaluation set.
+
+    Args:
+        models (list): models to evaluate
+        dataset (Dataset): evaluation dataset
+        recog_params (dict):
+        args (Namespace):
+        epoch (int):
+        recog_dir (str): directory to save decoding results
+    Returns:
+        result (dict): metric name -> value
+
+    """
+    if args.recog_metric == 'edit_distance':
+        if args.recog_unit in ['word', 'word_char']:
+            wer, cer, _ = eval_word(models, dataset, recog_params,
+                                    epoch=epoch - 1,
+                                    recog_dir=recog_dir,
+                                    progressbar=True)
+            return {'wer': wer, 'cer': cer}
+        elif args.recog_unit == 'wp':
+            wer, cer = eval_wordpiece(models, dataset, recog_params,
+                                      epoch=epoch - 1,
+                                      recog_dir=recog_dir,
+                                      streaming=args.recog_streaming,
+                                      progressbar=True,
+                                      fine_grained=True)
+            return {'wer': wer, 'cer': cer}
+        elif 'char' in args.recog_unit:
+            wer, cer = eval_char(models, dataset, recog_params,
+                                 epoch=epoch - 1,
+                                 recog_dir=recog_dir,
+                                 progressbar=True,
+                                 task_idx=0)
+            #  task_idx=1 if args.recog_unit and 'char' in args.recog_unit else 0)
+            return {'wer': wer, 'cer': cer}
+        elif 'phone' in args.recog_unit:
+            per = eval_phone(models, dataset, recog_params,
+                             epoch=epoch - 1,
+                             recog_dir=recog_dir,
+                             progressbar=True)
+            return {'per': per}
         else:
-            raise NotImplementedError(args.recog_metric)
-        elasped_time = time.time() - start_time
-        logger.info('Elasped time: %.3f [sec]' % elasped_time)
-        logger.info('RTF: %.3f' % (elasped_time / (dataset.n_frames * 0.01)))
+            raise ValueError(args.recog_unit)
+    elif args.recog_metric in ['ppl', 'loss']:
+        ppl, loss = eval_ppl(models, dataset, progressbar=True)
+        return {'ppl': ppl, 'loss': loss}
+    elif args.recog_metric == 'accuracy':
+        return {'accuracy': eval_accuracy(models, dataset, progressbar=True)}
+    elif args.recog_metric == 'bleu':
+        bleu = eval_wordpiece_bleu(models, dataset, recog_params,
+                                   epoch=epoch - 1,
+                                   recog_dir=recog_dir,
+                                   streaming=args.recog_streaming,
+                                   progressbar=True,
+                                   fine_grained=True)
+        return {'bleu': bleu}
+    else:
+        raise NotImplementedError(args.recog_metric)
 
+
+def log_results(result, args):
+    n_sets = len(args.recog_sets)
     if args.recog_metric == 'edit_distance':
         if 'phone' in args.recog_unit:
-            logger.info('PER (avg.): %.2f %%\n' % (per_avg / len(args.recog_sets)))
+            logger.info('PER (avg.): %.2f %%\n' % (result['per'] / n_sets))
         else:
             logger.info('WER / CER (avg.): %.2f / %.2f %%\n' %
-                        (wer_avg / len(args.recog_sets), cer_avg / len(args.recog_sets)))
+                        (result['wer'] / n_sets, result['cer'] / n_sets))
     elif args.recog_metric in ['ppl', 'loss']:
-        logger.info('PPL (avg.): %.2f\n' % (ppl_avg / len(args.recog_sets)))
-        print('PPL (avg.): %.3f' % (ppl_avg / len(args.recog_sets)))
-        logger.info('Loss (avg.): %.2f\n' % (loss_avg / len(args.recog_sets)))
-        print('Loss (avg.): %.3f' % (loss_avg / len(args.recog_sets)))
+        logger.info('PPL (avg.): %.2f\n' % (result['ppl'] / n_sets))
+        print('PPL (avg.): %.3f' % (result['ppl'] / n_sets))
+        logger.info('Loss (avg.): %.2f\n' % (result['loss'] / n_sets))
+        print('Loss (avg.): %.3f' % (result['loss'] / n_sets))
     elif args.recog_metric == 'accuracy':
-        logger.info('Accuracy (avg.): %.2f\n' % (acc_avg / len(args.recog_sets)))
-        print('Accuracy (avg.): %.3f' % (acc_avg / len(args.recog_sets)))
+        logger.info('Accuracy (avg.): %.2f\n' % (result['accuracy'] / n_sets))
+        print('Accuracy (avg.): %.3f' % (result['accuracy'] / n_sets))
     elif args.recog_metric == 'bleu':
-        logger.info('BLEU (avg.): %.2f\n' % (bleu / len(args.recog_sets)))
-        print('BLEU (avg.): %.3f' % (bleu / len(args.recog_sets)))
+        logger.info('BLEU (avg.): %.2f\n' % (result['bleu'] / n_sets))
+        print('BLEU (avg.): %.3f' % (result['bleu'] / n_sets))
+
+
+def calibrate(model, dataset, n_batches):
+    """Forward the first mini-batches through the encoder for static quantization.
+
+    Args:
+        model (Speech2Text):
+        dataset (Dataset): evaluation dataset
+        n_batches (int): number of mini-batches
+
+    """
+    dataset.reset()
+    for _ in range(n_batches):
+        batch, is_new_epoch = dataset.next()
+        model.encode(batch['xs'], task='ys')
+        if is_new_epoch:
+            break
+    dataset.reset()
 
 
 if __name__ == '__main__':
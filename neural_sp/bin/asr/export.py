@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Export the ASR model to TorchScript/ONNX graphs."""
+
+import logging
+import os
+import sys
+
+from neural_sp.bin.args_asr import parse_args_eval
+from neural_sp.bin.eval_utils import average_checkpoints
+from neural_sp.bin.train_utils import (
+    load_checkpoint,
+    set_logger
+)
+from neural_sp.models.seq2seq.export import export_speech2text
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.utils import mkdir_join
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+
+    # Load configuration
+    args, recog_params, dir_name = parse_args_eval(sys.argv[1:])
+
+    # Setting for logging
+    if os.path.isfile(os.path.join(args.recog_dir, 'export.log')):
+        os.remove(os.path.join(args.recog_dir, 'export.log'))
+    set_logger(os.path.join(args.recog_dir, 'export.log'), stdout=args.recog_stdout)
+
+    # Load the ASR model
+    model = Speech2Text(args, dir_name)
+    epoch = int(args.recog_model[0].split('-')[-1])
+    if args.recog_n_average > 1:
+        # Model averaging for Transformer
+        model = average_checkpoints(model, args.recog_model[0],
+                                    n_average=args.recog_n_average)
+    else:
+        load_checkpoint(args.recog_model[0], model)
+    model.eval()
+
+    logger.info('epoch: %d' % epoch)
+    logger.info('format: %s' % args.export_format)
+
+    save_path = mkdir_join(args.recog_dir, args.export_format)
+    paths = export_speech2text(model, save_path, fmt=args.export_format)
+    for name, path in paths.items():
+        logger.info('%s: %s' % (name, path))
+
+
+if __name__ == '__main__':
+    main()
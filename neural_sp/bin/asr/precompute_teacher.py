@@ -0,0 +1,115 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Precompute top-k teacher posteriors over the training set for knowledge distillation."""
+
+import argparse
+import copy
+import logging
+import numpy as np
+import os
+import sys
+import torch
+from tqdm import tqdm
+
+from neural_sp.bin.args_asr import parse_args_train
+from neural_sp.bin.train_utils import (
+    compute_susampling_factor,
+    load_checkpoint,
+    load_config,
+    set_logger
+)
+from neural_sp.datasets.asr import Dataset
+from neural_sp.datasets.teacher_posterior import TeacherPosteriorWriter
+from neural_sp.models.lm.build import build_lm
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.models.torch_utils import np2tensor
+from neural_sp.models.torch_utils import pad_list
+
+logger = logging.getLogger(__name__)
+
+
+def generate_lm_logits(lm, ys, eos, pad):
+    """Generate teacher LM logits of size `[B, L + 1, vocab]`."""
+    ys = [np2tensor(np.fromiter(y, dtype=np.int64), lm.device) for y in ys]
+    eos = ys[0].new_zeros(1).fill_(eos)
+    ys_in = pad_list([torch.cat([eos, y], dim=0) for y in ys], pad)
+    logits = lm.decode(ys_in, None)[0]
+    return logits
+
+
+def main():
+
+    args = parse_args_train(sys.argv[1:])
+    args_teacher = copy.deepcopy(args)
+    args = compute_susampling_factor(args)
+    assert args.teacher_posterior, 'Set --teacher_posterior to the output prefix.'
+    assert args.teacher or args.teacher_lm
+    set_logger(args.teacher_posterior + '.log', stdout=args.stdout)
+
+    # Load dataset
+    dataset = Dataset(corpus=args.corpus,
+                      tsv_path=args.train_set,
+                      dict_path=args.dict,
+                      nlsyms=args.nlsyms,
+                      unit=args.unit,
+                      wp_model=args.wp_model,
+                      batch_size=args.batch_size,
+                      n_epochs=1,
+                      min_n_frames=args.min_n_frames,
+                      max_n_frames=args.max_n_frames,
+                      sort_by='input',
+                      ctc=args.ctc_weight > 0,
+                      subsample_factor=args.subsample_factor)
+
+    # Load the teacher
+    if args.teacher:
+        conf_teacher = load_config(os.path.join(os.path.dirname(args.teacher), 'conf.yml'))
+        for k, v in conf_teacher.items():
+            setattr(args_teacher, k, v)
+        args_teacher.ss_prob = 0
+        teacher = Speech2Text(args_teacher)
+        load_checkpoint(args.teacher, teacher)
+    else:
+        conf_lm = load_config(os.path.join(os.path.dirname(args.teacher_lm), 'conf.yml'))
+        args_lm = argparse.Namespace()
+        for k, v in conf_lm.items():
+            setattr(args_lm, k, v)
+        teacher = build_lm(args_lm)
+        load_checkpoint(args.teacher_lm, teacher)
+    if args.n_gpus >= 1:
+        teacher.cuda()
+    teacher.eval()
+
+    # NOTE: the same temperature as distillation() in training
+    temperature = 5.0
+    writer = TeacherPosteriorWriter(args.teacher_posterior, dataset.vocab,
+                                    topk=args.teacher_topk, temperature=temperature)
+    pbar = tqdm(total=len(dataset))
+    with torch.no_grad():
+        while True:
+            batch, is_new_epoch = dataset.next()
+            if args.teacher:
+                logits = teacher.generate_logits(batch)
+            else:
+                logits = generate_lm_logits(teacher, batch['ys'], dataset.eos, dataset.pad)
+            probs = torch.softmax(logits / temperature, dim=-1)
+            topk_probs, topk_ids = probs.topk(args.teacher_topk, dim=-1)  # `[B, L + 1, k]`
+            topk_probs, topk_ids = topk_probs.cpu().numpy(), topk_ids.cpu().numpy()
+            for b, utt_id in enumerate(batch['utt_ids']):
+                ylen = len(batch['ys'][b]) + 1  # +1 for <eos>
+                writer.add(utt_id, topk_ids[b, :ylen], topk_probs[b, :ylen])
+            pbar.update(len(batch['utt_ids']))
+
+            if is_new_epoch:
+                break
+    pbar.close()
+    writer.close()
+    logger.info('Saved teacher posteriors of %d positions to %s' % (writer.offset, args.teacher_posterior))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Score hyp.trn/ref.trn files by WER and CER."""
+
+import argparse
+from distutils.util import strtobool
+import json
+import os
+import time
+
+from neural_sp.evaluators.scorer import TrnScorer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--ref', type=str,
+                    help='path to ref.trn')
+parser.add_argument('--hyp', type=str,
+                    help='path to hyp.trn')
+parser.add_argument('--n_workers', type=int, default=1,
+                    help='number of processes for scoring')
+parser.add_argument('--chunk_size', type=int, default=1000,
+                    help='number of utterances per job')
+parser.add_argument('--bin_size', type=int, default=10,
+                    help='width of reference length bins in words')
+parser.add_argument('--remove_space', type=strtobool, default=False,
+                    help='remove spaces before computing CER')
+parser.add_argument('--follow', type=float, default=0,
+                    help='poll files being written every this seconds until both stop growing')
+parser.add_argument('--json', type=str, default='',
+                    help='path to the output json file')
+args = parser.parse_args()
+
+
+def print_rates(name, rates):
+    print('%s: WER %.2f %% (SUB %.2f / INS %.2f / DEL %.2f) CER %.2f %% (SUB %.2f / INS %.2f / DEL %.2f) [%d utts]' %
+          (name, rates['wer'], rates['sub_w'], rates['ins_w'], rates['del_w'],
+           rates['cer'], rates['sub_c'], rates['ins_c'], rates['del_c'], rates['n_utt']))
+
+
+def main():
+
+    scorer = TrnScorer(args.ref, args.hyp, n_workers=args.n_workers, chunk_size=args.chunk_size,
+                       bin_size=args.bin_size, remove_space=args.remove_space)
+    scorer.update()
+    if args.follow > 0:
+        sizes = None
+        while sizes != (os.path.getsize(args.ref), os.path.getsize(args.hyp)):
+            sizes = (os.path.getsize(args.ref), os.path.getsize(args.hyp))
+            time.sleep(args.follow)
+            if scorer.update() > 0:
+                print_rates('Total (%d utts so far)' % scorer.n_utt, scorer.summary()['total'])
+
+    summary = scorer.summary()
+    print_rates('Total', summary['total'])
+    for len_bin, rates in summary['len_bins'].items():
+        print_rates('  length < %d' % len_bin, rates)
+    for speaker, rates in summary['speakers'].items():
+        print_rates('  %s' % speaker, rates)
+    if summary['n_unmatched'] > 0:
+        print('Unmatched utterances: %d' % summary['n_unmatched'])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Serve a streaming ASR model to multiple concurrent clients."""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from neural_sp.bin.args_asr import parse_args_eval
+from neural_sp.bin.eval_utils import build_idx2token
+from neural_sp.bin.train_utils import (
+    load_checkpoint,
+    load_config,
+    set_logger
+)
+from neural_sp.models.lm.build import build_lm
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.serving.server import StreamingServer
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+
+    # Load configuration
+    args, recog_params, dir_name = parse_args_eval(sys.argv[1:])
+    set_logger(None, stdout=True)
+
+    # Load the ASR model
+    model = Speech2Text(args, dir_name)
+    load_checkpoint(args.recog_model[0], model)
+
+    # Load the LM for shallow fusion
+    if args.recog_lm is not None and args.recog_lm_weight > 0:
+        conf_lm = load_config(os.path.join(os.path.dirname(args.recog_lm), 'conf.yml'))
+        args_lm = argparse.Namespace()
+        for k, v in conf_lm.items():
+            setattr(args_lm, k, v)
+        args_lm.recog_mem_len = args.recog_mem_len
+        lm = build_lm(args_lm)
+        load_checkpoint(args.recog_lm, lm)
+        model.lm_fwd = lm
+
+    if args.recog_n_gpus >= 1:
+        model.cudnn_setting(deterministic=True, benchmark=False)
+        model.cuda()
+
+    logger.info('beam width: %d' % args.recog_beam_width)
+    logger.info('CTC weight: %.3f' % args.recog_ctc_weight)
+    logger.info('LM path: %s' % args.recog_lm)
+    logger.info('LM weight: %.3f' % args.recog_lm_weight)
+    logger.info('chunk sync: %s' % args.recog_chunk_sync)
+    logger.info('max sessions: %d' % args.recog_server_max_sessions)
+    logger.info('max batch size: %d' % args.recog_server_max_batch_size)
+    logger.info('max wait: %.3f [sec]' % args.recog_server_max_wait)
+
+    server = StreamingServer(model, recog_params, build_idx2token(args.unit, dir_name),
+                             max_sessions=args.recog_server_max_sessions,
+                             max_batch_size=args.recog_server_max_batch_size,
+                             max_wait=args.recog_server_max_wait)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start(args.recog_server_host, args.recog_server_port,
+                                         path=args.recog_server_socket))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
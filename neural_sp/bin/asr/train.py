@@ -21,18 +21,27 @@ from tqdm import tqdm
 from neural_sp.bin.args_asr import parse_args_train
 from neural_sp.bin.model_name import set_asr_model_name
 from neural_sp.bin.train_utils import (
+    broadcast_object,
     compute_susampling_factor,
+    get_rng_state,
+    init_distributed,
     load_checkpoint,
     load_config,
+    load_training_state,
     save_config,
     set_logger,
+    set_rng_state,
     set_save_path
 )
 from neural_sp.datasets.asr import Dataset
 from neural_sp.models.data_parallel import CustomDataParallel
+from neural_sp.models.data_parallel import CustomDistributedDataParallel
 from neural_sp.models.data_parallel import CPUWrapperASR
 from neural_sp.models.lm.build import build_lm
 from neural_sp.models.seq2seq.speech2text import Speech2Text
+from neural_sp.profiler import profiler
+from neural_sp.profiler import timer
+from neural_sp.trainers.async_evaluator import AsyncEvaluator
 from neural_sp.trainers.lr_scheduler import LRScheduler
 from neural_sp.trainers.optimizer import set_optimizer
 from neural_sp.trainers.reporter import Reporter
@@ -54,14 +63,24 @@ def main():
     if args.resume:
         conf = load_config(os.path.join(os.path.dirname(args.resume), 'conf.yml'))
         for k, v in conf.items():
-            if k != 'resume':
+            if k not in ['resume', 'local_rank']:
                 setattr(args, k, v)
     recog_params = vars(args)
 
     args = compute_susampling_factor(args)
 
+    # Set distributed training
+    rank, world_size = 0, 1
+    if args.distributed:
+        rank, world_size = init_distributed(args.dist_backend, args.dist_timeout)
+        assert args.n_gpus <= 1, 'Use a single GPU per process in distributed training.'
+        assert args.eval_n_workers == 0
+
     # Load dataset
-    batch_size = args.batch_size * args.n_gpus if args.n_gpus >= 1 else args.batch_size
+    if args.distributed:
+        batch_size = args.batch_size * world_size  # global mini-batch split over processes
+    else:
+        batch_size = args.batch_size * args.n_gpus if args.n_gpus >= 1 else args.batch_size
     train_set = Dataset(corpus=args.corpus,
                         tsv_path=args.train_set,
                         tsv_path_sub1=args.train_set_sub1,
@@ -91,38 +110,11 @@ def main():
                         subsample_factor=args.subsample_factor,
                         subsample_factor_sub1=args.subsample_factor_sub1,
                         subsample_factor_sub2=args.subsample_factor_sub2,
-                        discourse_aware=args.discourse_aware)
-    dev_set = Dataset(corpus=args.corpus,
-                      tsv_path=args.dev_set,
-                      tsv_path_sub1=args.dev_set_sub1,
-                      tsv_path_sub2=args.dev_set_sub2,
-                      dict_path=args.dict,
-                      dict_path_sub1=args.dict_sub1,
-                      dict_path_sub2=args.dict_sub2,
-                      nlsyms=args.nlsyms,
-                      unit=args.unit,
-                      unit_sub1=args.unit_sub1,
-                      unit_sub2=args.unit_sub2,
-                      wp_model=args.wp_model,
-                      wp_model_sub1=args.wp_model_sub1,
-                      wp_model_sub2=args.wp_model_sub2,
-                      batch_size=batch_size,
-                      min_n_frames=args.min_n_frames,
-                      max_n_frames=args.max_n_frames,
-                      ctc=args.ctc_weight > 0,
-                      ctc_sub1=args.ctc_weight_sub1 > 0,
-                      ctc_sub2=args.ctc_weight_sub2 > 0,
-                      subsample_factor=args.subsample_factor,
-                      subsample_factor_sub1=args.subsample_factor_sub1,
-                      subsample_factor_sub2=args.subsample_factor_sub2)
-    eval_sets = [Dataset(corpus=args.corpus,
-                         tsv_path=s,
-                         dict_path=args.dict,
-                         nlsyms=args.nlsyms,
-                         unit=args.unit,
-                         wp_model=args.wp_model,
-                         batch_size=1,
-                         is_test=True) for s in args.eval_sets]
+                        discourse_aware=args.discourse_aware,
+                        teacher_posterior=args.teacher_posterior,
+                        rank=rank,
+                        world_size=world_size)
+    dev_set, eval_sets = build_eval_datasets(args, batch_size)
 
     args.vocab = train_set.vocab
     args.vocab_sub1 = train_set.vocab_sub1
@@ -135,16 +127,21 @@ def main():
         dir_name = os.path.basename(save_path)
     else:
         dir_name = set_asr_model_name(args)
-        if args.mbr_training:
-            assert args.asr_init
-            save_path = mkdir_join(os.path.dirname(args.asr_init), dir_name)
-        else:
-            save_path = mkdir_join(args.model_save_dir, '_'.join(
-                os.path.basename(args.train_set).split('.')[:-1]), dir_name)
-        save_path = set_save_path(save_path)  # avoid overwriting
+        save_path = None
+        if rank == 0:
+            if args.mbr_training:
+                assert args.asr_init
+                save_path = mkdir_join(os.path.dirname(args.asr_init), dir_name)
+            else:
+                save_path = mkdir_join(args.model_save_dir, '_'.join(
+                    os.path.basename(args.train_set).split('.')[:-1]), dir_name)
+            save_path = set_save_path(save_path)  # avoid overwriting
+        if args.distributed:
+            save_path = broadcast_object(save_path)
 
     # Set logger
-    set_logger(os.path.join(save_path, 'train.log'), stdout=args.stdout)
+    set_logger(os.path.join(save_path, 'train.log' if rank == 0 else 'train.rank%d.log' % rank),
+               stdout=args.stdout)
 
     # Load a LM conf file for LM fusion & LM initialization
     if not args.resume and args.external_lm:
@@ -159,19 +156,20 @@ def main():
     model = Speech2Text(args, save_path, train_set.idx2token[0])
 
     if not args.resume:
-        # Save the conf file as a yaml file
-        save_config(vars(args), os.path.join(save_path, 'conf.yml'))
-        if args.external_lm:
-            save_config(args.lm_conf, os.path.join(save_path, 'conf_lm.yml'))
-
-        # Save the nlsyms, dictionary, and wp_model
-        if args.nlsyms:
-            shutil.copy(args.nlsyms, os.path.join(save_path, 'nlsyms.txt'))
-        for sub in ['', '_sub1', '_sub2']:
-            if getattr(args, 'dict' + sub):
-                shutil.copy(getattr(args, 'dict' + sub), os.path.join(save_path, 'dict' + sub + '.txt'))
-            if getattr(args, 'unit' + sub) == 'wp':
-                shutil.copy(getattr(args, 'wp_model' + sub), os.path.join(save_path, 'wp' + sub + '.model'))
+        if rank == 0:
+            # Save the conf file as a yaml file
+            save_config(vars(args), os.path.join(save_path, 'conf.yml'))
+            if args.external_lm:
+                save_config(args.lm_conf, os.path.join(save_path, 'conf_lm.yml'))
+
+            # Save the nlsyms, dictionary, and wp_model
+            if args.nlsyms:
+                shutil.copy(args.nlsyms, os.path.join(save_path, 'nlsyms.txt'))
+            for sub in ['', '_sub1', '_sub2']:
+                if getattr(args, 'dict' + sub):
+                    shutil.copy(getattr(args, 'dict' + sub), os.path.join(save_path, 'dict' + sub + '.txt'))
+                if getattr(args, 'unit' + sub) == 'wp':
+                    shutil.copy(getattr(args, 'wp_model' + sub), os.path.join(save_path, 'wp' + sub + '.model'))
 
         for k, v in sorted(vars(args).items(), key=lambda x: x[0]):
             logger.info('%s: %s' % (k, str(v)))
@@ -204,9 +202,17 @@ def main():
 
     # Set optimizer
     resume_epoch = 0
+    resume_state = None
     if args.resume:
-        resume_epoch = int(args.resume.split('-')[-1])
-        optimizer = set_optimizer(model, 'sgd' if resume_epoch > args.convert_to_sgd_epoch else args.optimizer,
+        if os.path.basename(args.resume) == 'training_state.pt':
+            # Resume in the middle of an epoch
+            resume_state = load_training_state(args.resume)
+            resume_epoch = resume_state['optimizer_state_dict']['_epoch']
+            is_sgd = resume_epoch >= args.convert_to_sgd_epoch  # already converted
+        else:
+            resume_epoch = int(args.resume.split('-')[-1])
+            is_sgd = resume_epoch > args.convert_to_sgd_epoch
+        optimizer = set_optimizer(model, 'sgd' if is_sgd else args.optimizer,
                                   args.lr, args.weight_decay)
     else:
         optimizer = set_optimizer(model, args.optimizer, args.lr, args.weight_decay)
@@ -225,14 +231,15 @@ def main():
                             model_size=getattr(args, 'transformer_d_model', 0),
                             factor=args.lr_factor,
                             noam=args.optimizer == 'noam',
-                            save_checkpoints_topk=10 if is_transformer else 1)
+                            save_checkpoints_topk=10 if is_transformer else 1,
+                            async_save=args.async_checkpoint)
 
     if args.resume:
         # Restore the last saved model
         load_checkpoint(args.resume, model, optimizer)
 
         # Resume between convert_to_sgd_epoch -1 and convert_to_sgd_epoch
-        if resume_epoch == args.convert_to_sgd_epoch:
+        if resume_state is None and resume_epoch == args.convert_to_sgd_epoch:
             optimizer.convert_to_sgd(model, args.lr, args.weight_decay,
                                      decay_type='always', decay_rate=0.5)
 
@@ -249,6 +256,11 @@ def main():
         teacher = Speech2Text(args_teacher)
         load_checkpoint(args.teacher, teacher)
 
+    # Use precomputed teacher posteriors
+    if args.teacher_posterior:
+        assert not args.teacher and not args.teacher_lm
+        args.lsm_prob = 0
+
     # Load the teacher LM
     teacher_lm = None
     if args.teacher_lm:
@@ -266,6 +278,8 @@ def main():
     if args.n_gpus >= 1:
         model.cudnn_setting(deterministic=not (is_transformer or args.cudnn_benchmark),
                             benchmark=args.cudnn_benchmark)
+        if args.distributed:
+            torch.cuda.set_device(args.local_rank)
         model.cuda()
 
         # Mix precision training setting
@@ -279,12 +293,18 @@ def main():
             amp.init()
             if args.resume:
                 load_checkpoint(args.resume, amp=amp)
-        model = CustomDataParallel(model, device_ids=list(range(0, args.n_gpus)))
+        if args.distributed:
+            model = CustomDistributedDataParallel(model, device_ids=[args.local_rank],
+                                                  find_unused_parameters=True)
+        else:
+            model = CustomDataParallel(model, device_ids=list(range(0, args.n_gpus)))
 
         if teacher is not None:
             teacher.cuda()
         if teacher_lm is not None:
             teacher_lm.cuda()
+    elif args.distributed:
+        model = CustomDistributedDataParallel(model, find_unused_parameters=True)
     else:
         model = CPUWrapperASR(model)
 
@@ -295,7 +315,21 @@ def main():
     setproctitle(args.job_name if args.job_name else dir_name)
 
     # Set reporter
-    reporter = Reporter(save_path)
+    reporter = Reporter(save_path, enabled=rank == 0)
+    if args.profile:
+        profiler.enable(trace=args.profile_trace_n_steps > 0 and rank == 0, sync_cuda=args.n_gpus > 0)
+
+    # Decode dev/eval sets in background processes
+    evaluator = None
+    if args.eval_n_workers > 0:
+        evaluator = AsyncEvaluator(init_eval_worker, (args, recog_params, save_path, batch_size, args.eval_gpu_id),
+                                   eval_worker, n_workers=args.eval_n_workers)
+        # Evaluate checkpoints whose metrics were not reported before resuming
+        for epoch in optimizer.pending_epochs:
+            evaluator.submit({'epoch': epoch, 'set': dev_set.set, 'report': True,
+                              'model_path': os.path.join(save_path, 'model.epoch-' + str(epoch))})
+    else:
+        assert len(optimizer.pending_epochs) == 0, 'Set --eval_n_workers to evaluate pending checkpoints.'
 
     if args.mtl_per_batch:
         # NOTE: from easier to harder tasks
@@ -314,17 +348,37 @@ def main():
                     tasks = ['ys_' + sub] + tasks
                 if getattr(args, 'ctc_weight_' + sub) > 0:
                     tasks = ['ys_' + sub + '.ctc'] + tasks
+        if args.mtl_shared_encoder:
+            tasks = [tasks]
+            # NOTE: all tasks are computed from a single encoder pass per mini-batch.
+            # The optimizer already steps at most once per mini-batch without this option,
+            # but the gradients of later tasks would spill over into the step of the next
+            # mini-batch. The summed loss puts the gradients of all tasks from the same
+            # mini-batch into the same optimizer step.
     else:
         tasks = ['all']
 
     start_time_train = time.time()
     start_time_epoch = time.time()
     start_time_step = time.time()
-    pbar_epoch = tqdm(total=len(train_set))
+    pbar_epoch = tqdm(total=len(train_set), disable=rank > 0)
     accum_n_steps = 0
     n_steps = optimizer.n_steps * args.accum_grad_n_steps
     epoch_detail_prev = 0
     session_prev = None
+    if resume_state is not None:
+        # Restore the data order, history and random number generators
+        train_set.load_state_dict(resume_state['dataset_state'])
+        dev_set.load_state_dict(resume_state['dataset_state_dev'])
+        reporter.load_state_dict(resume_state['reporter_state'])
+        n_steps = resume_state['n_steps']
+        epoch_detail_prev = resume_state['epoch_detail_prev']
+        session_prev = resume_state['session_prev']
+        set_rng_state(resume_state['rng_state'])
+        pbar_epoch.update(train_set.offset)
+        logger.info('Resume from step %d (ep:%.2f)' % (n_steps, optimizer.n_epochs + train_set.epoch_detail))
+        del resume_state
+    n_steps_state = n_steps
     while True:
         # Compute loss in the training set
         batch_train, is_new_epoch = train_set.next()
@@ -337,35 +391,45 @@ def main():
         if accum_n_steps == 1:
             loss_train = 0  # moving average over gradient accumulation
         for task in tasks:
-            loss, observation = model(batch_train, task,
-                                      teacher=teacher, teacher_lm=teacher_lm)
+            with timer('forward'):
+                loss, observation = model(batch_train, task,
+                                          teacher=teacher, teacher_lm=teacher_lm)
             reporter.add(observation)
-            if use_apex:
-                with amp.scale_loss(loss, optimizer.optimizer) as scaled_loss:
-                    scaled_loss.backward()
-            else:
-                loss.backward()
+            with timer('backward'):
+                if use_apex:
+                    with amp.scale_loss(loss, optimizer.optimizer) as scaled_loss:
+                        scaled_loss.backward()
+                else:
+                    loss.backward()
             loss.detach()  # Trancate the graph
             loss_train = (loss_train * (accum_n_steps - 1) + loss.item()) / accum_n_steps
             if accum_n_steps >= args.accum_grad_n_steps or is_new_epoch:
-                if args.clip_grad_norm > 0:
-                    total_norm = torch.nn.utils.clip_grad_norm_(
-                        model.module.parameters(), args.clip_grad_norm)
-                    reporter.add_tensorboard_scalar('total_norm', total_norm)
-                optimizer.step()
-                optimizer.zero_grad()
+                with timer('optimizer'):
+                    if args.clip_grad_norm > 0:
+                        total_norm = torch.nn.utils.clip_grad_norm_(
+                            model.module.parameters(), args.clip_grad_norm)
+                        reporter.add_tensorboard_scalar('total_norm', total_norm)
+                    optimizer.step()
+                    optimizer.zero_grad()
                 accum_n_steps = 0
                 # NOTE: parameters are forcibly updated at the end of every epoch
             del loss
 
-        pbar_epoch.update(len(batch_train['utt_ids']))
+        pbar_epoch.update(len(batch_train['utt_ids']) * world_size)
         reporter.add_tensorboard_scalar('learning_rate', optimizer.lr)
         # NOTE: loss/acc/ppl are already added in the model
         reporter.step()
         n_steps += 1
         # NOTE: n_steps is different from the step counter in Noam Optimizer
 
-        if n_steps % args.print_step == 0:
+        if args.profile:
+            if n_steps % args.print_step == 0:
+                reporter.add_profile(profiler.summary(), args.print_step)
+                profiler.reset()
+            if args.profile_trace_n_steps > 0 and n_steps % args.profile_trace_n_steps == 0 and rank == 0:
+                profiler.export_chrome_trace(os.path.join(save_path, 'trace.step%d.json' % n_steps))
+
+        if n_steps % args.print_step == 0 and rank == 0:
             # Compute loss in the dev set
             batch_dev = dev_set.next(batch_size=1 if 'transducer' in args.dec_type else None)[0]
             # Change mini-batch depending on task
@@ -391,21 +455,35 @@ def main():
             start_time_step = time.time()
 
         # Save fugures of loss and accuracy
-        if n_steps % (args.print_step * 10) == 0:
+        if n_steps % (args.print_step * 10) == 0 and rank == 0:
             reporter.snapshot()
             model.module.plot_attention()
             model.module.plot_ctc()
 
+        # Collect metrics evaluated in background processes
+        if evaluator is not None:
+            if report_async_results(evaluator.poll(), evaluator, optimizer, reporter,
+                                    eval_sets, save_path, args, is_transformer):
+                break  # early stopping
+
         # Ealuate model every 0.1 epoch during MBR training
         if args.mbr_training:
-            if int(train_set.epoch_detail * 10) != int(epoch_detail_prev * 10):
-                # dev
-                evaluate([model.module], dev_set, recog_params, args,
-                         int(train_set.epoch_detail * 10) / 10, logger)
-                # Save the model
-                optimizer.save_checkpoint(
-                    model, save_path, remove_old=False, amp=amp,
-                    epoch_detail=train_set.epoch_detail)
+            if int(train_set.epoch_detail * 10) != int(epoch_detail_prev * 10) and rank == 0:
+                if evaluator is not None:
+                    # Save the model and decode it in the background
+                    model_path = optimizer.save_checkpoint(
+                        model, save_path, remove_old=False, amp=amp,
+                        epoch_detail=train_set.epoch_detail)
+                    evaluator.submit({'epoch': int(train_set.epoch_detail * 10) / 10, 'set': dev_set.set,
+                                      'report': False, 'model_path': model_path})
+                else:
+                    # dev
+                    evaluate([model.module], dev_set, recog_params, args,
+                             int(train_set.epoch_detail * 10) / 10, logger)
+                    # Save the model
+                    optimizer.save_checkpoint(
+                        model, save_path, remove_old=False, amp=amp,
+                        epoch_detail=train_set.epoch_detail)
             epoch_detail_prev = train_set.epoch_detail
 
         # Save checkpoint and evaluate model per epoch
@@ -419,17 +497,36 @@ def main():
                 reporter.epoch()  # plot
 
                 # Save the model
-                optimizer.save_checkpoint(
-                    model, save_path, remove_old=not is_transformer, amp=amp)
+                if rank == 0:
+                    optimizer.save_checkpoint(
+                        model, save_path, remove_old=not is_transformer, amp=amp)
+            elif evaluator is not None:
+                # NOTE: metric-based lr decay, top-k checkpointing and early stopping
+                # are applied when the metric of this epoch is reported
+                optimizer.epoch(pending=True)  # lr decay (decay_type='always')
+
+                # Save the model and decode the dev set in the background
+                model_path = optimizer.save_checkpoint(model, save_path, remove_old=False, amp=amp)
+                evaluator.submit({'epoch': optimizer.n_epochs, 'set': dev_set.set,
+                                  'report': True, 'model_path': model_path})
+
+                # Convert to fine-tuning stage
+                if optimizer.n_epochs == args.convert_to_sgd_epoch:
+                    optimizer.convert_to_sgd(model, args.lr, args.weight_decay,
+                                             decay_type='always', decay_rate=0.5)
             else:
                 start_time_eval = time.time()
                 # dev
-                metric_dev = evaluate([model.module], dev_set, recog_params, args,
-                                      optimizer.n_epochs + 1, logger)
+                metric_dev = None
+                if rank == 0:
+                    metric_dev = evaluate([model.module], dev_set, recog_params, args,
+                                          optimizer.n_epochs + 1, logger)
+                if args.distributed:
+                    metric_dev = broadcast_object(metric_dev)  # the same lr schedule for all processes
                 optimizer.epoch(metric_dev)  # lr decay
                 reporter.epoch(metric_dev, name=args.metric)  # plot
 
-                if optimizer.is_topk or is_transformer:
+                if rank == 0 and (optimizer.is_topk or is_transformer):
                     # Save the model
                     optimizer.save_checkpoint(
                         model, save_path, remove_old=not is_transformer, amp=amp)
@@ -452,7 +549,7 @@ def main():
                     optimizer.convert_to_sgd(model, args.lr, args.weight_decay,
                                              decay_type='always', decay_rate=0.5)
 
-            pbar_epoch = tqdm(total=len(train_set))
+            pbar_epoch = tqdm(total=len(train_set), disable=rank > 0)
             session_prev = None
 
             if optimizer.n_epochs >= args.n_epochs:
@@ -463,15 +560,143 @@ def main():
             start_time_step = time.time()
             start_time_epoch = time.time()
 
+        # Save the training state to resume in the middle of an epoch
+        # NOTE: only after parameter updates, so that no gradients are accumulated
+        if rank == 0 and args.save_state_n_steps > 0 and accum_n_steps == 0 and \
+                (is_new_epoch or n_steps - n_steps_state >= args.save_state_n_steps):
+            optimizer.save_training_state(
+                model, os.path.join(save_path, 'training_state.pt'), amp=amp,
+                dataset_state=train_set.state_dict(),
+                dataset_state_dev=dev_set.state_dict(),
+                reporter_state=reporter.state_dict(),
+                rng_state=get_rng_state(),
+                n_steps=n_steps,
+                epoch_detail_prev=epoch_detail_prev,
+                session_prev=session_prev)
+            n_steps_state = n_steps
+
+    if evaluator is not None:
+        # Wait for the remaining evaluation
+        report_async_results(evaluator.close(), evaluator, optimizer, reporter,
+                             eval_sets, save_path, args, is_transformer)
+
+    optimizer.wait_checkpoints()
+
     duration_train = time.time() - start_time_train
     logger.info('Total time: %.2f hour' % (duration_train / 3600))
 
-    reporter.tf_writer.close()
+    reporter.close()
     pbar_epoch.close()
 
     return save_path
 
 
+def build_eval_datasets(args, batch_size):
+    """Build the dev set and evaluation sets used during training."""
+    dev_set = Dataset(corpus=args.corpus,
+                      tsv_path=args.dev_set,
+                      tsv_path_sub1=args.dev_set_sub1,
+                      tsv_path_sub2=args.dev_set_sub2,
+                      dict_path=args.dict,
+                      dict_path_sub1=args.dict_sub1,
+                      dict_path_sub2=args.dict_sub2,
+                      nlsyms=args.nlsyms,
+                      unit=args.unit,
+                      unit_sub1=args.unit_sub1,
+                      unit_sub2=args.unit_sub2,
+                      wp_model=args.wp_model,
+                      wp_model_sub1=args.wp_model_sub1,
+                      wp_model_sub2=args.wp_model_sub2,
+                      batch_size=batch_size,
+                      min_n_frames=args.min_n_frames,
+                      max_n_frames=args.max_n_frames,
+                      ctc=args.ctc_weight > 0,
+                      ctc_sub1=args.ctc_weight_sub1 > 0,
+                      ctc_sub2=args.ctc_weight_sub2 > 0,
+                      subsample_factor=args.subsample_factor,
+                      subsample_factor_sub1=args.subsample_factor_sub1,
+                      subsample_factor_sub2=args.subsample_factor_sub2)
+    eval_sets = [Dataset(corpus=args.corpus,
+                         tsv_path=s,
+                         dict_path=args.dict,
+                         nlsyms=args.nlsyms,
+                         unit=args.unit,
+                         wp_model=args.wp_model,
+                         batch_size=1,
+                         is_test=True) for s in args.eval_sets]
+    return dev_set, eval_sets
+
+
+def report_async_results(results, evaluator, optimizer, reporter, eval_sets,
+                         save_path, args, is_transformer):
+    """Feed metrics evaluated in background processes back to the scheduler.
+       Results are given in the order of submission, so metrics of the dev set
+       are reported in the order of epochs.
+
+    Args:
+        results (list): list of (job, metric) returned by AsyncEvaluator
+        evaluator (AsyncEvaluator):
+        optimizer (LRScheduler):
+        reporter (Reporter):
+        eval_sets (list): list of Dataset
+        save_path (str): path to the directory of checkpoints
+        args (Namespace): arguments for training
+        is_transformer (bool): keep all checkpoints
+    Returns:
+        is_early_stop (bool): stop training
+
+    """
+    is_early_stop = False
+    for job, metric in results:
+        logger.info('Evaluated (%s, ep:%s): %.3f' % (job['set'], str(job['epoch']), metric))
+        if not job['report']:
+            continue
+
+        optimizer.report_metric(job['epoch'], metric)  # lr decay
+        reporter.epoch(metric, name=args.metric)  # plot
+
+        # test
+        if optimizer.is_topk:
+            for eval_set in eval_sets:
+                evaluator.submit({'epoch': job['epoch'], 'set': eval_set.set,
+                                  'report': False, 'model_path': job['model_path']})
+
+        if not is_transformer:
+            optimizer.remove_old_checkpoints(
+                save_path, keep_epochs=[j['epoch'] for j in evaluator.jobs.values()])
+
+        # Early stopping
+        if optimizer.is_early_stop:
+            is_early_stop = True
+    return is_early_stop
+
+
+def init_eval_worker(args, recog_params, save_path, batch_size, gpu_id):
+    """Build a model and datasets in a background process for evaluation."""
+    set_logger(os.path.join(save_path, 'eval_worker.log'), stdout=False)
+    model = Speech2Text(args, save_path)
+    if gpu_id >= 0:
+        torch.cuda.set_device(gpu_id)
+        model.cuda()
+    dev_set, eval_sets = build_eval_datasets(args, batch_size)
+    datasets = {dataset.set: dataset for dataset in [dev_set] + eval_sets}
+    return model, datasets, recog_params, args
+
+
+def eval_worker(state, job):
+    """Decode a dataset with a checkpoint in a background process."""
+    model, datasets, recog_params, args = state
+    start_time = time.time()
+    while not os.path.isfile(job['model_path']):
+        # being written in the background
+        if time.time() - start_time > args.eval_checkpoint_timeout:
+            raise RuntimeError('Checkpoint was not written in %d [sec]: %s' %
+                               (args.eval_checkpoint_timeout, job['model_path']))
+        time.sleep(1)
+    load_checkpoint(job['model_path'], model)
+    return evaluate([model], datasets[job['set']], recog_params, args, job['epoch'], logger)
+
+
 def evaluate(models, dataset, recog_params, args, epoch, logger):
 
     if args.metric == 'edit_distance':
@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Transcribe long-form recordings with VAD segmentation."""
+
+import argparse
+import codecs
+import kaldiio
+import logging
+import numpy as np
+import os
+import sys
+import time
+
+from neural_sp.bin.args_asr import parse_args_eval
+from neural_sp.bin.eval_utils import build_idx2token
+from neural_sp.bin.train_utils import (
+    load_checkpoint,
+    load_config,
+    set_logger
+)
+from neural_sp.models.lm.build import build_lm
+from neural_sp.models.seq2seq.frontends.segmentation import (
+    ctc_speech_frames,
+    energy_speech_frames,
+    get_segments
+)
+from neural_sp.models.seq2seq.speech2text import Speech2Text
+
+logger = logging.getLogger(__name__)
+
+FRAME_SHIFT = 0.01  # [sec]
+
+
+def segment(model, x, args):
+    """Segment a long-form recording.
+
+    Args:
+        model (Speech2Text):
+        x (np.ndarray): `[T, input_dim]`
+        args (Namespace):
+    Returns:
+        segments (list): tuples of (start, end) frames
+
+    """
+    if args.recog_vad_type == 'energy':
+        is_speech, energy = energy_speech_frames(x, offset=args.recog_vad_energy_offset)
+        scores = energy
+    elif args.recog_vad_type == 'ctc':
+        # Compute CTC posteriors per window, mapped back to the input frame rate
+        is_speech = np.zeros(len(x), dtype=bool)
+        scores = np.zeros(len(x), dtype=np.float32)
+        windows = [(t, min(t + args.recog_vad_window, len(x)))
+                   for t in range(0, len(x), args.recog_vad_window)]
+        for i in range(0, len(windows), args.recog_batch_size):
+            windows_mb = windows[i:i + args.recog_batch_size]
+            ctc_probs, _, elens = model.get_ctc_probs([x[s:e] for s, e in windows_mb], topk=1)
+            for b, (s, e) in enumerate(windows_mb):
+                is_speech_b, blank_probs_b = ctc_speech_frames(
+                    ctc_probs[b, :elens[b]], blank=0,
+                    spike_threshold=args.recog_ctc_vad_spike_threshold)
+                idx = (np.arange(e - s) * int(elens[b])) // (e - s)
+                is_speech[s:e] = is_speech_b[idx]
+                scores[s:e] = -blank_probs_b[idx]
+    else:
+        raise ValueError(args.recog_vad_type)
+
+    return get_segments(is_speech,
+                        min_silence=args.recog_vad_min_silence,
+                        min_speech=args.recog_vad_min_speech,
+                        max_len=args.recog_vad_max_len,
+                        margin=args.recog_vad_margin,
+                        scores=scores)
+
+
+def main():
+
+    # Load configuration
+    args, recog_params, dir_name = parse_args_eval(sys.argv[1:])
+
+    # Setting for logging
+    if os.path.isfile(os.path.join(args.recog_dir, 'transcribe.log')):
+        os.remove(os.path.join(args.recog_dir, 'transcribe.log'))
+    set_logger(os.path.join(args.recog_dir, 'transcribe.log'), stdout=args.recog_stdout)
+
+    # Load the ASR model
+    model = Speech2Text(args, dir_name)
+    load_checkpoint(args.recog_model[0], model)
+
+    # Load the LM for shallow fusion
+    if args.recog_lm is not None and args.recog_lm_weight > 0:
+        conf_lm = load_config(os.path.join(os.path.dirname(args.recog_lm), 'conf.yml'))
+        args_lm = argparse.Namespace()
+        for k, v in conf_lm.items():
+            setattr(args_lm, k, v)
+        args_lm.recog_mem_len = args.recog_mem_len
+        lm = build_lm(args_lm)
+        load_checkpoint(args.recog_lm, lm)
+        model.lm_fwd = lm
+
+    if args.recog_n_gpus >= 1:
+        model.cudnn_setting(deterministic=True, benchmark=False)
+        model.cuda()
+    model.eval()
+    idx2token = build_idx2token(args.unit, dir_name)
+
+    logger.info('VAD type: %s' % args.recog_vad_type)
+    logger.info('batch size: %d' % args.recog_batch_size)
+    logger.info('beam width: %d' % args.recog_beam_width)
+    logger.info('CTC weight: %.3f' % args.recog_ctc_weight)
+    logger.info('LM path: %s' % args.recog_lm)
+    logger.info('LM weight: %.3f' % args.recog_lm_weight)
+
+    # Segmentation
+    start_time = time.time()
+    recordings = kaldiio.load_scp(args.recog_longform_scp)
+    segments = []  # (reco_id, start, end, x)
+    n_frames = 0
+    for reco_id in recordings.keys():
+        x = recordings[reco_id]
+        n_frames += len(x)
+        segs = segment(model, x, args)
+        logger.info('%s: %d segments (%.1f [sec])' % (reco_id, len(segs), len(x) * FRAME_SHIFT))
+        segments += [(reco_id, s, e, x[s:e]) for s, e in segs]
+    logger.info('Segmentation time: %.2f [sec]' % (time.time() - start_time))
+
+    # Decode segments in mini-batches sorted by length
+    hyps = {}
+    order = sorted(range(len(segments)), key=lambda i: len(segments[i][3]), reverse=True)
+    for i in range(0, len(order), args.recog_batch_size):
+        indices_mb = order[i:i + args.recog_batch_size]
+        best_hyps_id, _ = model.decode([segments[j][3] for j in indices_mb], recog_params,
+                                       idx2token, exclude_eos=True)
+        for j, hyp_id in zip(indices_mb, best_hyps_id):
+            hyps[j] = idx2token(hyp_id)
+    elapsed = time.time() - start_time
+    logger.info('Total time: %.2f [sec] (RTF: %.3f)' % (elapsed, elapsed / max(n_frames * FRAME_SHIFT, 1e-9)))
+
+    # Stitch segments in the order of time
+    with codecs.open(os.path.join(args.recog_dir, 'hyp.trn'), 'w', encoding='utf-8') as f_trn, \
+            codecs.open(os.path.join(args.recog_dir, 'hyp.ctm'), 'w', encoding='utf-8') as f_ctm, \
+            codecs.open(os.path.join(args.recog_dir, 'hyp.txt'), 'w', encoding='utf-8') as f_txt:
+        for reco_id in recordings.keys():
+            texts = []
+            for j, (reco_id_j, start_f, end_f, _) in enumerate(segments):
+                if reco_id_j != reco_id:
+                    continue
+                hyp = hyps[j]
+                texts.append(hyp)
+                f_trn.write('%s (%s-%07d_%07d)\n' % (hyp, reco_id, start_f, end_f))
+
+                # NOTE: word durations are uniform within each segment
+                words = hyp.split()
+                if len(words) == 0:
+                    continue
+                dur = (end_f - start_f) * FRAME_SHIFT / len(words)
+                for i_w, w in enumerate(words):
+                    f_ctm.write('%s 1 %.2f %.2f %s %.3f\n' %
+                                (reco_id, start_f * FRAME_SHIFT + dur * i_w, dur, w, 1))
+            f_txt.write('%s %s\n' % (reco_id, ' '.join([t for t in texts if len(t) > 0])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Utility functions for inference benchmarks."""
+
+import json
+import logging
+import numpy as np
+import platform
+import resource
+import sys
+import torch
+
+logger = logging.getLogger(__name__)
+
+# metric name -> True if higher is better
+METRICS = {
+    'rtf': False,
+    'latency_ms.p50': False,
+    'latency_ms.p90': False,
+    'latency_ms.p99': False,
+    'chunk_latency_ms.p50': False,
+    'chunk_latency_ms.p90': False,
+    'chunk_latency_ms.p99': False,
+    'tokens_per_sec': True,
+    'peak_rss_mb': False,
+}
+
+
+def sample_lengths(n_utts, min_len, max_len, dist='uniform', seed=1):
+    """Sample utterance lengths.
+
+    Args:
+        n_utts (int): number of utterances
+        min_len (int): minimum number of frames
+        max_len (int): maximum number of frames
+        dist (str): uniform or normal (mean at the center and 2 sigmas at both ends)
+        seed (int): random seed
+    Returns:
+        lengths (list): number of frames per utterance
+
+    """
+    rng = np.random.RandomState(seed)
+    if dist == 'uniform':
+        lengths = rng.randint(min_len, max_len + 1, n_utts)
+    elif dist == 'normal':
+        lengths = rng.normal((min_len + max_len) / 2, (max_len - min_len) / 4, n_utts)
+        lengths = np.clip(np.round(lengths), min_len, max_len)
+    else:
+        raise NotImplementedError(dist)
+    return [int(i) for i in lengths]
+
+
+def percentiles(values, qs=(50, 90, 95, 99)):
+    """Summarize latencies.
+
+    Args:
+        values (list): latencies in seconds
+        qs (tuple): percentiles to report
+    Returns:
+        summary (dict): `p50`, `p90`, ..., `mean` and `max` in milliseconds
+
+    """
+    if len(values) == 0:
+        return {}
+    values = np.array(values) * 1000
+    summary = {'p%d' % q: float(np.percentile(values, q)) for q in qs}
+    summary['mean'] = float(values.mean())
+    summary['max'] = float(values.max())
+    return summary
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: bytes on macOS, kilobytes on Linux
+    return rss / (1024 ** 2) if sys.platform == 'darwin' else rss / 1024
+
+
+def environment():
+    """Information about the runtime to interpret results."""
+    return {'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'n_threads': torch.get_num_threads()}
+
+
+def _get(result, name):
+    for k in name.split('.'):
+        if not isinstance(result, dict) or k not in result:
+            return None
+        result = result[k]
+    return result
+
+
+def compare_results(results, baseline, tolerance=0.1):
+    """Compare benchmark results against a baseline.
+
+    Args:
+        results (dict): mode -> metrics
+        baseline (dict): mode -> metrics
+        tolerance (float): relative degradation regarded as a regression
+    Returns:
+        diffs (list): tuples of (mode, metric, baseline, current, relative change, is_regression)
+
+    """
+    diffs = []
+    for mode in sorted(results.keys()):
+        if mode not in baseline:
+            continue
+        for name, higher_better in METRICS.items():
+            cur = _get(results[mode], name)
+            ref = _get(baseline[mode], name)
+            if cur is None or ref is None or ref == 0:
+                continue
+            change = (cur - ref) / ref
+            is_regression = (-change if higher_better else change) > tolerance
+            diffs.append((mode, name, ref, cur, change, is_regression))
+    return diffs
+
+
+def save_results(path, config, results):
+    """Save benchmark results in JSON."""
+    with open(path, 'w') as f:
+        json.dump({'config': config, 'env': environment(), 'results': results},
+                  f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    """Load results saved by `save_results`."""
+    with open(path) as f:
+        return json.load(f)['results']
@@ -8,46 +8,228 @@
 
 import logging
 import os
+import pickle
 import torch
+import zipfile
+
+from neural_sp.datasets.token_converter.character import Idx2char
+from neural_sp.datasets.token_converter.phone import Idx2phone
+from neural_sp.datasets.token_converter.word import Idx2word
+from neural_sp.datasets.token_converter.wordpiece import Idx2wp
+from neural_sp.trainers.checkpoint_writer import atomic_save
 
 logger = logging.getLogger(__name__)
 
 
-def average_checkpoints(model, best_model_path, n_average, topk_list=[]):
+class _LazyStorage(object):
+    def __init__(self, storage_type, key):
+        self.storage_type = storage_type
+        self.key = key
+
+
+class _LazyTensor(object):
+    def __init__(self, storage, *args):
+        self.storage = storage
+        self.args = args
+
+
+class _Stub(object):
+    """Placeholder of objects which are not restored (e.g., optimizers)."""
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+
+class _LazyUnpickler(pickle.Unpickler):
+    """Unpickler replacing tensors with placeholders to be read on demand.
+       Objects other than containers, storages and tensors are replaced with stubs
+       so that their `__setstate__` (e.g., that of optimizers) is not run on placeholders.
+    """
+
+    def find_class(self, module, name):
+        if module == 'torch._utils' and name == '_rebuild_tensor_v2':
+            return _LazyTensor
+        if module == 'torch._utils' and name == '_rebuild_parameter':
+            return lambda data, requires_grad, backward_hooks: data
+        is_storage = module == 'torch' and name.endswith('Storage')
+        if is_storage or module.split('.')[0] in ['builtins', 'collections', 'copyreg', '_codecs', 'numpy']:
+            return super(_LazyUnpickler, self).find_class(module, name)
+        return _Stub
+
+    def persistent_load(self, saved_id):
+        typename, storage_type, key, location, numel = saved_id
+        assert typename == 'storage', typename
+        return _LazyStorage(storage_type, key)
+
+
+def load_model_state_dict(checkpoint_path):
+    """Load only model parameters from a checkpoint.
+       For checkpoints in the zip format (PyTorch>=1.6), tensors other than
+       model parameters (e.g., optimizer states) are not read from the disk.
+
+    Args:
+        checkpoint_path (str): path to the saved model
+    Returns:
+        model_state_dict (dict):
+        checkpoint (dict): the other entries in the checkpoint
+            (tensors are not loaded, and objects such as optimizers are replaced with stubs)
+
+    """
+    if zipfile.is_zipfile(checkpoint_path):
+        try:
+            with zipfile.ZipFile(checkpoint_path) as zf:
+                prefix = zf.namelist()[0].split('/')[0]
+                with zf.open(prefix + '/data.pkl') as f:
+                    checkpoint = _LazyUnpickler(f).load()
+                storages = {}
+                model_state_dict = checkpoint.pop('model_state_dict')
+                for k, v in model_state_dict.items():
+                    if v.storage.key not in storages:
+                        storages[v.storage.key] = v.storage.storage_type.from_buffer(
+                            zf.read(prefix + '/data/' + v.storage.key), 'little')
+                    model_state_dict[k] = torch._utils._rebuild_tensor_v2(storages[v.storage.key], *v.args)
+            return model_state_dict, checkpoint
+        except Exception as e:
+            logger.warning('Failed to load %s lazily (%s)' % (checkpoint_path, str(e)))
+
+    checkpoint = torch.load(checkpoint_path, map_location=lambda storage, loc: storage)
+    return checkpoint.pop('model_state_dict'), checkpoint
+
+
+def load_topk_list(checkpoint_path):
+    """Load the list of top-k epochs saved in a checkpoint.
+
+    Args:
+        checkpoint_path (str): path to the saved model
+    Returns:
+        topk_list (list): list of (epoch, metric)
+
+    """
+    checkpoint = load_model_state_dict(checkpoint_path)[1]
+    if 'optimizer_state_dict' in checkpoint and 'topk_list' in checkpoint['optimizer_state_dict']:
+        return checkpoint['optimizer_state_dict']['topk_list']
+    return []
+
+
+def average_state_dicts(checkpoint_paths, weights=None):
+    """Average model parameters over checkpoints.
+       Only one checkpoint is resident in memory at a time.
+
+    Args:
+        checkpoint_paths (list): paths to the saved models
+        weights (list): weights of checkpoints (normalized to sum to 1). Uniform if None.
+    Returns:
+        state_dict_avg (dict):
+
+    """
+    if weights is None:
+        weights = [1.] * len(checkpoint_paths)
+    assert len(weights) == len(checkpoint_paths)
+    weights = [w / sum(weights) for w in weights]
+
+    state_dict_avg = None
+    for checkpoint_path, w in zip(checkpoint_paths, weights):
+        logger.info("=> Loading checkpoint (weight:%.3f): %s" % (w, checkpoint_path))
+        state_dict = load_model_state_dict(checkpoint_path)[0]
+        if state_dict_avg is None:
+            # first checkpoint
+            state_dict_avg = state_dict
+            for k, v in state_dict_avg.items():
+                if v.is_floating_point():
+                    v.mul_(w)
+            continue
+        for k, v in state_dict.items():
+            if v.is_floating_point():
+                state_dict_avg[k].add_(v, alpha=w)
+            # NOTE: integer buffers are taken from the first checkpoint
+        del state_dict
+    return state_dict_avg
+
+
+def _checkpoint_signature(checkpoint_paths, weights):
+    return [(os.path.basename(path), os.path.getsize(path), os.path.getmtime(path), w)
+            for path, w in zip(checkpoint_paths, weights)]
+
+
+def average_checkpoints(model, best_model_path, n_average, topk_list=[], weights=None):
+    """Load the average of checkpoints into a model.
+       The result is cached as `model-avg{n_average}` together with the list of
+       source checkpoints, and reused while the source checkpoints are unchanged.
+
+    Args:
+        model (torch.nn.Module):
+        best_model_path (str): path to the best checkpoint (model.epoch-*)
+        n_average (int): number of checkpoints to average
+        topk_list (list): list of (epoch, metric). If empty, the last `n_average`
+            epochs up to the best one are averaged.
+        weights (list): weights of checkpoints in the order of `topk_list`. Uniform if None.
+    Returns:
+        model (torch.nn.Module):
+
+    """
     if n_average == 1:
         return model
 
-    n_models = 0
-    checkpoint_avg = {'model_state_dict': None}
     if len(topk_list) == 0:
         epoch = int(best_model_path.split('model.epoch-')[1])
         topk_list = [(i, 0) for i in range(epoch, epoch - n_average - 1, -1)]
-    for ep, _ in topk_list:
-        if n_models == n_average:
+    if weights is None:
+        weights = [1.] * len(topk_list)
+    checkpoint_paths, checkpoint_weights = [], []
+    for (ep, _), w in zip(topk_list, weights):
+        if len(checkpoint_paths) == n_average:
             break
         checkpoint_path = best_model_path.split('model.epoch-')[0] + 'model.epoch-' + str(ep)
         if os.path.isfile(checkpoint_path):
-            logger.info("=> Loading checkpoint (epoch:%d): %s" % (ep, checkpoint_path))
-            checkpoint = torch.load(checkpoint_path, map_location=lambda storage, loc: storage)
-            if checkpoint_avg['model_state_dict'] is None:
-                # first checkpoint
-                checkpoint_avg['model_state_dict'] = checkpoint['model_state_dict']
-                n_models += 1
-                continue
-            for k, v in checkpoint['model_state_dict'].items():
-                checkpoint_avg['model_state_dict'][k] += v
-            n_models += 1
+            checkpoint_paths.append(checkpoint_path)
+            checkpoint_weights.append(w)
+    signature = _checkpoint_signature(checkpoint_paths, checkpoint_weights)
+
+    # Reuse the cache
+    checkpoint_avg_path = best_model_path.split('model.epoch-')[0] + 'model-avg' + str(n_average)
+    if os.path.isfile(checkpoint_avg_path):
+        state_dict_avg, checkpoint = load_model_state_dict(checkpoint_avg_path)
+        if checkpoint.get('sources') == signature:
+            logger.info('Load the average of %d models: %s' % (len(checkpoint_paths), checkpoint_avg_path))
+            model.load_state_dict(state_dict_avg)
+            return model
+        del state_dict_avg
 
     # take an average
-    logger.info('Take average for %d models' % n_models)
-    for k, v in checkpoint_avg['model_state_dict'].items():
-        checkpoint_avg['model_state_dict'][k] /= n_models
-    model.load_state_dict(checkpoint_avg['model_state_dict'])
+    logger.info('Take average for %d models' % len(checkpoint_paths))
+    state_dict_avg = average_state_dicts(checkpoint_paths, checkpoint_weights)
+    model.load_state_dict(state_dict_avg)
 
     # save as a new checkpoint
-    checkpoint_avg_path = best_model_path.split('model.epoch-')[0] + 'model-avg' + str(n_average)
-    if os.path.isfile(checkpoint_avg_path):
-        os.remove(checkpoint_avg_path)
-    torch.save(checkpoint_avg, checkpoint_avg_path)
+    atomic_save({'model_state_dict': state_dict_avg, 'sources': signature}, checkpoint_avg_path)
 
     return model
+
+
+def build_idx2token(unit, dir_name):
+    """Build the index-to-token converter saved with the model.
+
+    Args:
+        unit (str): word/word_char/wp/char/phone
+        dir_name (str): directory of the model
+    Returns:
+        idx2token ():
+
+    """
+    dict_path = os.path.join(dir_name, 'dict.txt')
+    if unit in ['word', 'word_char']:
+        return Idx2word(dict_path)
+    elif unit == 'wp':
+        return Idx2wp(dict_path, os.path.join(dir_name, 'wp.model'))
+    elif unit == 'char':
+        return Idx2char(dict_path)
+    elif 'phone' in unit:
+        return Idx2phone(dict_path)
+    else:
+        raise ValueError(unit)
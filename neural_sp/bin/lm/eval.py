@@ -6,6 +6,7 @@
 
 """Evaluate the LM."""
 
+import copy
 import logging
 import os
 import sys
@@ -19,6 +20,7 @@ from neural_sp.bin.train_utils import (
 from neural_sp.datasets.lm import Dataset
 from neural_sp.evaluators.ppl import eval_ppl
 from neural_sp.models.lm.build import build_lm
+from neural_sp.models.quantization import quantize_model
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +35,11 @@ def main():
         os.remove(os.path.join(args.recog_dir, 'decode.log'))
     set_logger(os.path.join(args.recog_dir, 'decode.log'), stdout=args.recog_stdout)
 
-    ppl_avg = 0
+    if args.recog_quantize:
+        assert args.recog_n_gpus == 0, 'Quantized models run on CPU only.'
+
+    variants = []  # (name, model)
+    ppl_avg, elapsed_time_total = {}, {}
     for i, s in enumerate(args.recog_sets):
         # Load dataset
         dataset = Dataset(corpus=args.corpus,
@@ -61,6 +67,7 @@ def main():
             logger.info('cache theta: %.3f' % (args.recog_cache_theta))
             logger.info('cache lambda: %.3f' % (args.recog_cache_lambda))
             logger.info('model average (Transformer): %d' % (args.recog_n_average))
+            logger.info('int8 quantization: %s' % (args.recog_quantize))
             model.cache_theta = args.recog_cache_theta
             model.cache_lambda = args.recog_cache_lambda
 
@@ -68,15 +75,39 @@ def main():
             if args.recog_n_gpus > 0:
                 model.cuda()
 
-        start_time = time.time()
-
-        ppl, _ = eval_ppl([model], dataset, batch_size=1, bptt=args.bptt,
-                          n_caches=args.recog_n_caches, progressbar=True)
-        ppl_avg += ppl
-        print('PPL (%s): %.2f' % (dataset.set, ppl))
-        logger.info('Elasped time: %.2f [sec]:' % (time.time() - start_time))
-
-    logger.info('PPL (avg.): %.2f\n' % (ppl_avg / len(args.recog_sets)))
+            # Quantization for CPU inference
+            if args.recog_quantize:
+                if args.recog_quantize_compare:
+                    variants.append(('fp32', copy.deepcopy(model)))
+                quantize_model(model, skip_modules=args.recog_quantize_skip)
+                variants.append(('int8', model))
+            else:
+                variants.append(('', model))
+
+        for name, model in variants:
+            start_time = time.time()
+
+            ppl, _ = eval_ppl([model], dataset, batch_size=1, bptt=args.bptt,
+                              n_caches=args.recog_n_caches, progressbar=True)
+            ppl_avg[name] = ppl_avg.get(name, 0) + ppl
+            elapsed_time = time.time() - start_time
+            elapsed_time_total[name] = elapsed_time_total.get(name, 0) + elapsed_time
+            print('PPL (%s%s): %.2f' % (dataset.set, ' ' + name if name else '', ppl))
+            logger.info('Elasped time: %.2f [sec]:' % elapsed_time)
+
+    for name, _ in variants:
+        logger.info('PPL (avg.%s): %.2f\n' % (' ' + name if name else '', ppl_avg[name] / len(args.recog_sets)))
+
+    if len(variants) > 1:
+        # Differences from the fp32 model
+        n_sets = len(args.recog_sets)
+        logger.info('PPL (avg.): %.2f -> %.2f (%+.2f)' %
+                    (ppl_avg['fp32'] / n_sets, ppl_avg['int8'] / n_sets,
+                     (ppl_avg['int8'] - ppl_avg['fp32']) / n_sets))
+        speedup = elapsed_time_total['fp32'] / elapsed_time_total['int8']
+        logger.info('Elasped time: %.2f -> %.2f [sec] (x%.2f speedup)' %
+                    (elapsed_time_total['fp32'], elapsed_time_total['int8'], speedup))
+        print('Speedup: x%.2f' % speedup)
 
 
 if __name__ == '__main__':
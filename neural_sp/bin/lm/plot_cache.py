@@ -87,16 +87,19 @@ def main():
         fig_count = 0
         toknen_count = 0
         n_tokens = args.recog_n_caches
+        cache_ids = []
+        model.reset_cache()
         while True:
             ys, is_new_epoch = dataset.next()
 
             for t in range(ys.shape[1] - 1):
                 loss, hidden = model(ys[:, t:t + 2], hidden, is_eval=True, n_caches=args.recog_n_caches)[:2]
+                cache_ids = (cache_ids + [ys[0, t + 1]])[-(args.recog_n_caches + 1):]
 
                 if len(model.cache_attn) > 0:
                     if toknen_count == n_tokens:
-                        tokens_keys = dataset.idx2token[0](model.cache_ids[:args.recog_n_caches], return_list=True)
-                        tokens_query = dataset.idx2token[0](model.cache_ids[-n_tokens:], return_list=True)
+                        tokens_keys = dataset.idx2token[0](cache_ids[:args.recog_n_caches], return_list=True)
+                        tokens_query = dataset.idx2token[0](cache_ids[-n_tokens:], return_list=True)
 
                         # Slide attention matrix
                         n_keys = len(tokens_keys)
@@ -19,17 +19,25 @@ from tqdm import tqdm
 from neural_sp.bin.args_lm import parse_args_train
 from neural_sp.bin.model_name import set_lm_name
 from neural_sp.bin.train_utils import (
+    broadcast_object,
+    get_rng_state,
+    init_distributed,
     load_checkpoint,
     load_config,
+    load_training_state,
     save_config,
     set_logger,
+    set_rng_state,
     set_save_path
 )
 from neural_sp.datasets.lm import Dataset
 from neural_sp.evaluators.ppl import eval_ppl
 from neural_sp.models.data_parallel import CustomDataParallel
+from neural_sp.models.data_parallel import CustomDistributedDataParallel
 from neural_sp.models.data_parallel import CPUWrapperLM
 from neural_sp.models.lm.build import build_lm
+from neural_sp.profiler import profiler
+from neural_sp.profiler import timer
 from neural_sp.trainers.lr_scheduler import LRScheduler
 from neural_sp.trainers.optimizer import set_optimizer
 from neural_sp.trainers.reporter import Reporter
@@ -49,11 +57,20 @@ def main():
     if args.resume:
         conf = load_config(os.path.join(os.path.dirname(args.resume), 'conf.yml'))
         for k, v in conf.items():
-            if k != 'resume':
+            if k not in ['resume', 'local_rank']:
                 setattr(args, k, v)
 
+    # Set distributed training
+    rank, world_size = 0, 1
+    if args.distributed:
+        rank, world_size = init_distributed(args.dist_backend, args.dist_timeout)
+        assert args.n_gpus <= 1, 'Use a single GPU per process in distributed training.'
+
     # Load dataset
-    batch_size = args.batch_size * args.n_gpus if args.n_gpus >= 1 else args.batch_size
+    if args.distributed:
+        batch_size = args.batch_size * world_size  # global mini-batch split over processes
+    else:
+        batch_size = args.batch_size * args.n_gpus if args.n_gpus >= 1 else args.batch_size
     train_set = Dataset(corpus=args.corpus,
                         tsv_path=args.train_set,
                         dict_path=args.dict,
@@ -66,7 +83,9 @@ def main():
                         bptt=args.bptt,
                         shuffle=args.shuffle,
                         backward=args.backward,
-                        serialize=args.serialize)
+                        serialize=args.serialize,
+                        rank=rank,
+                        world_size=world_size)
     dev_set = Dataset(corpus=args.corpus,
                       tsv_path=args.dev_set,
                       dict_path=args.dict,
@@ -96,26 +115,32 @@ def main():
         dir_name = os.path.basename(save_path)
     else:
         dir_name = set_lm_name(args)
-        save_path = mkdir_join(args.model_save_dir, '_'.join(
-            os.path.basename(args.train_set).split('.')[:-1]), dir_name)
-        save_path = set_save_path(save_path)  # avoid overwriting
+        save_path = None
+        if rank == 0:
+            save_path = mkdir_join(args.model_save_dir, '_'.join(
+                os.path.basename(args.train_set).split('.')[:-1]), dir_name)
+            save_path = set_save_path(save_path)  # avoid overwriting
+        if args.distributed:
+            save_path = broadcast_object(save_path)
 
     # Set logger
-    set_logger(os.path.join(save_path, 'train.log'), stdout=args.stdout)
+    set_logger(os.path.join(save_path, 'train.log' if rank == 0 else 'train.rank%d.log' % rank),
+               stdout=args.stdout)
 
     # Model setting
     model = build_lm(args, save_path)
 
     if not args.resume:
-        # Save the conf file as a yaml file
-        save_config(vars(args), os.path.join(save_path, 'conf.yml'))
+        if rank == 0:
+            # Save the conf file as a yaml file
+            save_config(vars(args), os.path.join(save_path, 'conf.yml'))
 
-        # Save the nlsyms, dictionary, and wp_model
-        if args.nlsyms:
-            shutil.copy(args.nlsyms, os.path.join(save_path, 'nlsyms.txt'))
-        shutil.copy(args.dict, os.path.join(save_path, 'dict.txt'))
-        if args.unit == 'wp':
-            shutil.copy(args.wp_model, os.path.join(save_path, 'wp.model'))
+            # Save the nlsyms, dictionary, and wp_model
+            if args.nlsyms:
+                shutil.copy(args.nlsyms, os.path.join(save_path, 'nlsyms.txt'))
+            shutil.copy(args.dict, os.path.join(save_path, 'dict.txt'))
+            if args.unit == 'wp':
+                shutil.copy(args.wp_model, os.path.join(save_path, 'wp.model'))
 
         for k, v in sorted(vars(args).items(), key=lambda x: x[0]):
             logger.info('%s: %s' % (k, str(v)))
@@ -129,9 +154,17 @@ def main():
 
     # Set optimizer
     resume_epoch = 0
+    resume_state = None
     if args.resume:
-        epoch = int(args.resume.split('-')[-1])
-        optimizer = set_optimizer(model, 'sgd' if epoch > args.convert_to_sgd_epoch else args.optimizer,
+        if os.path.basename(args.resume) == 'training_state.pt':
+            # Resume in the middle of an epoch
+            resume_state = load_training_state(args.resume)
+            resume_epoch = resume_state['optimizer_state_dict']['_epoch']
+            is_sgd = resume_epoch >= args.convert_to_sgd_epoch  # already converted
+        else:
+            resume_epoch = int(args.resume.split('-')[-1])
+            is_sgd = resume_epoch > args.convert_to_sgd_epoch
+        optimizer = set_optimizer(model, 'sgd' if is_sgd else args.optimizer,
                                   args.lr, args.weight_decay)
     else:
         optimizer = set_optimizer(model, args.optimizer, args.lr, args.weight_decay)
@@ -149,14 +182,15 @@ def main():
                             model_size=getattr(args, 'transformer_d_model', 0),
                             factor=args.lr_factor,
                             noam=args.optimizer == 'noam',
-                            save_checkpoints_topk=10 if is_transformer else 1)
+                            save_checkpoints_topk=10 if is_transformer else 1,
+                            async_save=args.async_checkpoint)
 
     if args.resume:
         # Restore the last saved model
         load_checkpoint(args.resume, model, optimizer)
 
         # Resume between convert_to_sgd_epoch -1 and convert_to_sgd_epoch
-        if resume_epoch == args.convert_to_sgd_epoch:
+        if resume_state is None and resume_epoch == args.convert_to_sgd_epoch:
             optimizer.convert_to_sgd(model, args.lr, args.weight_decay,
                                      decay_type='always', decay_rate=0.5)
 
@@ -166,6 +200,8 @@ def main():
     if args.n_gpus >= 1:
         model.cudnn_setting(deterministic=not (is_transformer or args.cudnn_benchmark),
                             benchmark=not is_transformer and args.cudnn_benchmark)
+        if args.distributed:
+            torch.cuda.set_device(args.local_rank)
         model.cuda()
 
         # Mix precision training setting
@@ -176,7 +212,13 @@ def main():
             amp.init()
             if args.resume:
                 load_checkpoint(args.resume, amp=amp)
-        model = CustomDataParallel(model, device_ids=list(range(0, args.n_gpus)))
+        if args.distributed:
+            model = CustomDistributedDataParallel(model, device_ids=[args.local_rank],
+                                                  find_unused_parameters=True)
+        else:
+            model = CustomDataParallel(model, device_ids=list(range(0, args.n_gpus)))
+    elif args.distributed:
+        model = CustomDistributedDataParallel(model, find_unused_parameters=True)
     else:
         model = CPUWrapperLM(model)
 
@@ -187,15 +229,29 @@ def main():
     setproctitle(args.job_name if args.job_name else dir_name)
 
     # Set reporter
-    reporter = Reporter(save_path)
+    reporter = Reporter(save_path, enabled=rank == 0)
+    if args.profile:
+        profiler.enable(trace=args.profile_trace_n_steps > 0 and rank == 0, sync_cuda=args.n_gpus > 0)
 
     hidden = None
     start_time_train = time.time()
     start_time_epoch = time.time()
     start_time_step = time.time()
-    pbar_epoch = tqdm(total=len(train_set))
+    pbar_epoch = tqdm(total=len(train_set), disable=rank > 0)
     accum_n_steps = 0
     n_steps = optimizer.n_steps * args.accum_grad_n_steps
+    if resume_state is not None:
+        # Restore the data order, history and random number generators
+        # NOTE: hidden states are reset at the resumed step
+        train_set.load_state_dict(resume_state['dataset_state'])
+        dev_set.load_state_dict(resume_state['dataset_state_dev'])
+        reporter.load_state_dict(resume_state['reporter_state'])
+        n_steps = resume_state['n_steps']
+        set_rng_state(resume_state['rng_state'])
+        pbar_epoch.update(train_set.offset * train_set.batch_size)
+        logger.info('Resume from step %d (ep:%.2f)' % (n_steps, optimizer.n_epochs + train_set.epoch_detail))
+        del resume_state
+    n_steps_state = n_steps
     while True:
         # Compute loss in the training set
         ys_train, is_new_epoch = train_set.next()
@@ -203,35 +259,45 @@ def main():
 
         if accum_n_steps == 1:
             loss_train = 0  # moving average over gradient accumulation
-        loss, hidden, observation = model(ys_train, hidden)
+        with timer('forward'):
+            loss, hidden, observation = model(ys_train, hidden)
         reporter.add(observation)
-        if use_apex:
-            with amp.scale_loss(loss, optimizer.optimizer) as scaled_loss:
-                scaled_loss.backward()
-        else:
-            loss.backward()
+        with timer('backward'):
+            if use_apex:
+                with amp.scale_loss(loss, optimizer.optimizer) as scaled_loss:
+                    scaled_loss.backward()
+            else:
+                loss.backward()
         loss.detach()  # Trancate the graph
         loss_train = (loss_train * (accum_n_steps - 1) + loss.item()) / accum_n_steps
         if accum_n_steps >= args.accum_grad_n_steps or is_new_epoch:
-            if args.clip_grad_norm > 0:
-                total_norm = torch.nn.utils.clip_grad_norm_(
-                    model.module.parameters(), args.clip_grad_norm)
-                reporter.add_tensorboard_scalar('total_norm', total_norm)
-            optimizer.step()
-            optimizer.zero_grad()
+            with timer('optimizer'):
+                if args.clip_grad_norm > 0:
+                    total_norm = torch.nn.utils.clip_grad_norm_(
+                        model.module.parameters(), args.clip_grad_norm)
+                    reporter.add_tensorboard_scalar('total_norm', total_norm)
+                optimizer.step()
+                optimizer.zero_grad()
             accum_n_steps = 0
             # NOTE: parameters are forcibly updated at the end of every epoch
         del loss
         hidden = model.module.repackage_state(hidden)
 
-        pbar_epoch.update(ys_train.shape[0] * (ys_train.shape[1] - 1))
+        pbar_epoch.update(ys_train.shape[0] * (ys_train.shape[1] - 1) * world_size)
         reporter.add_tensorboard_scalar('learning_rate', optimizer.lr)
         # NOTE: loss/acc/ppl are already added in the model
         reporter.step()
         n_steps += 1
         # NOTE: n_steps is different from the step counter in Noam Optimizer
 
-        if n_steps % args.print_step == 0:
+        if args.profile:
+            if n_steps % args.print_step == 0:
+                reporter.add_profile(profiler.summary(), args.print_step)
+                profiler.reset()
+            if args.profile_trace_n_steps > 0 and n_steps % args.profile_trace_n_steps == 0 and rank == 0:
+                profiler.export_chrome_trace(os.path.join(save_path, 'trace.step%d.json' % n_steps))
+
+        if n_steps % args.print_step == 0 and rank == 0:
             # Compute loss in the dev set
             ys_dev = dev_set.next(bptt=args.bptt)[0]
             loss, _, observation = model(ys_dev, None, is_eval=True)
@@ -248,7 +314,7 @@ def main():
             start_time_step = time.time()
 
         # Save fugures of loss and accuracy
-        if n_steps % (args.print_step * 10) == 0:
+        if n_steps % (args.print_step * 10) == 0 and rank == 0:
             reporter.snapshot()
             model.module.plot_attention()
 
@@ -263,21 +329,26 @@ def main():
                 reporter.epoch()  # plot
 
                 # Save the model
-                optimizer.save_checkpoint(
-                    model, save_path, remove_old=not is_transformer, amp=amp)
+                if rank == 0:
+                    optimizer.save_checkpoint(
+                        model, save_path, remove_old=not is_transformer, amp=amp)
             else:
                 start_time_eval = time.time()
                 # dev
-                model.module.reset_length(args.bptt)
-                ppl_dev, _ = eval_ppl([model.module], dev_set,
-                                      batch_size=1, bptt=args.bptt)
-                model.module.reset_length(args.bptt)
+                ppl_dev = None
+                if rank == 0:
+                    model.module.reset_length(args.bptt)
+                    ppl_dev, _ = eval_ppl([model.module], dev_set,
+                                          batch_size=1, bptt=args.bptt)
+                    model.module.reset_length(args.bptt)
+                if args.distributed:
+                    ppl_dev = broadcast_object(ppl_dev)  # the same lr schedule for all processes
                 optimizer.epoch(ppl_dev)  # lr decay
                 reporter.epoch(ppl_dev, name='perplexity')  # plot
                 logger.info('PPL (%s, ep:%d): %.2f' %
                             (dev_set.set, optimizer.n_epochs, ppl_dev))
 
-                if optimizer.is_topk or is_transformer:
+                if rank == 0 and (optimizer.is_topk or is_transformer):
                     # Save the model
                     optimizer.save_checkpoint(
                         model, save_path, remove_old=not is_transformer, amp=amp)
@@ -308,7 +379,7 @@ def main():
                     optimizer.convert_to_sgd(model, args.lr, args.weight_decay,
                                              decay_type='always', decay_rate=0.5)
 
-            pbar_epoch = tqdm(total=len(train_set))
+            pbar_epoch = tqdm(total=len(train_set), disable=rank > 0)
 
             if optimizer.n_epochs >= args.n_epochs:
                 break
@@ -316,10 +387,25 @@ def main():
             start_time_step = time.time()
             start_time_epoch = time.time()
 
+        # Save the training state to resume in the middle of an epoch
+        # NOTE: only after parameter updates, so that no gradients are accumulated
+        if rank == 0 and args.save_state_n_steps > 0 and accum_n_steps == 0 and \
+                (is_new_epoch or n_steps - n_steps_state >= args.save_state_n_steps):
+            optimizer.save_training_state(
+                model, os.path.join(save_path, 'training_state.pt'), amp=amp,
+                dataset_state=train_set.state_dict(),
+                dataset_state_dev=dev_set.state_dict(),
+                reporter_state=reporter.state_dict(),
+                rng_state=get_rng_state(),
+                n_steps=n_steps)
+            n_steps_state = n_steps
+
+    optimizer.wait_checkpoints()
+
     duration_train = time.time() - start_time_train
     logger.info('Total time: %.2f hour' % (duration_train / 3600))
 
-    reporter.tf_writer.close()
+    reporter.close()
     pbar_epoch.close()
 
     return save_path
@@ -6,12 +6,15 @@
 
 """Utility functions for training."""
 
+import datetime
 import functools
 import logging
 import numpy as np
 import os
+import random
 import time
 import torch
+import torch.distributed as dist
 import yaml
 
 logger = logging.getLogger(__name__)
@@ -147,7 +150,7 @@ def load_checkpoint(checkpoint_path, model=None, optimizer=None, amp=None):
         raise ValueError("No checkpoint found at %s" % checkpoint_path)
 
     # Restore parameters
-    if 'avg' not in checkpoint_path:
+    if 'model.epoch-' in checkpoint_path and 'avg' not in checkpoint_path:
         epoch = int(os.path.basename(checkpoint_path).split('-')[-1]) - 1
         logger.info("=> Loading checkpoint (epoch:%d): %s" % (epoch + 1, checkpoint_path))
     else:
@@ -176,3 +179,81 @@ def load_checkpoint(checkpoint_path, model=None, optimizer=None, amp=None):
     else:
         topk_list = []
     return topk_list
+
+
+def load_training_state(state_path):
+    """Load the training state saved by LRScheduler.save_training_state().
+
+    Args:
+        state_path (str): path to the training state
+    Returns:
+        state (dict):
+
+    """
+    if not os.path.isfile(state_path):
+        raise ValueError("No training state found at %s" % state_path)
+    return torch.load(state_path, map_location=lambda storage, loc: storage)
+
+
+def get_rng_state():
+    """Get states of random number generators.
+
+    Returns:
+        state (dict):
+
+    """
+    state = {'random': random.getstate(),
+             'numpy': np.random.get_state(),
+             'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    """Restore states of random number generators.
+
+    Args:
+        state (dict): states returned by get_rng_state()
+
+    """
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def init_distributed(backend='gloo', timeout=120):
+    """Initialize the process group for distributed training.
+       The rank and world size are read from environment variables set by
+       the launcher (e.g., torchrun or python -m torch.distributed.launch).
+
+    Args:
+        backend (str): gloo (CPU/GPU) or nccl (GPU)
+        timeout (int): timeout for collective operations in minutes
+    Returns:
+        rank (int): global rank of this process
+        world_size (int): number of processes
+
+    """
+    dist.init_process_group(backend, init_method='env://',
+                            timeout=datetime.timedelta(minutes=timeout))
+    rank, world_size = dist.get_rank(), dist.get_world_size()
+    logger.info('Distributed training: rank %d/%d (%s)' % (rank, world_size, backend))
+    return rank, world_size
+
+
+def broadcast_object(obj, src=0):
+    """Broadcast a picklable object from the source rank to all processes.
+
+    Args:
+        obj: object to broadcast (ignored except for the source rank)
+        src (int): source rank
+    Returns:
+        obj: object of the source rank
+
+    """
+    objs = [obj]
+    dist.broadcast_object_list(objs, src=src)
+    return objs[0]
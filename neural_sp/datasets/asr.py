@@ -16,6 +16,7 @@ import os
 import pandas as pd
 import random
 
+from neural_sp.datasets.teacher_posterior import TeacherPosteriorStore
 from neural_sp.datasets.token_converter.character import Char2idx
 from neural_sp.datasets.token_converter.character import Idx2char
 from neural_sp.datasets.token_converter.phone import Idx2phone
@@ -24,6 +25,7 @@ from neural_sp.datasets.token_converter.word import Idx2word
 from neural_sp.datasets.token_converter.word import Word2idx
 from neural_sp.datasets.token_converter.wordpiece import Idx2wp
 from neural_sp.datasets.token_converter.wordpiece import Wp2idx
+from neural_sp.profiler import timed
 
 random.seed(1)
 np.random.seed(1)
@@ -50,7 +52,8 @@ class Dataset(object):
                  wp_model_sub1=False, ctc_sub1=False, subsample_factor_sub1=1,
                  tsv_path_sub2=False, dict_path_sub2=False, unit_sub2=False,
                  wp_model_sub2=False, ctc_sub2=False, subsample_factor_sub2=1,
-                 discourse_aware=False, first_n_utterances=-1):
+                 discourse_aware=False, first_n_utterances=-1, teacher_posterior=False,
+                 rank=0, world_size=1):
         """A class for loading dataset.
 
         Args:
@@ -78,6 +81,10 @@ class Dataset(object):
             corpus (str): name of corpus
             discourse_aware (bool):
             first_n_utterances (int): evaluate the first N utterances
+            teacher_posterior (str): prefix of precomputed teacher posteriors for knowledge distillation
+            rank (int): rank of this process in distributed training
+            world_size (int): number of processes in distributed training.
+                Each process takes a slice of the same global mini-batch of size `batch_size`.
 
         """
         super(Dataset, self).__init__()
@@ -86,6 +93,13 @@ class Dataset(object):
         self.iteration = 0
         self.offset = 0
 
+        self.rank = rank
+        self.world_size = world_size
+        # NOTE: all processes must generate the same sequence of global mini-batches
+        # regardless of random numbers consumed elsewhere
+        self.rng = random.Random(1) if world_size > 1 else random
+        self.np_rng = np.random.RandomState(1) if world_size > 1 else np.random
+
         self.set = os.path.basename(tsv_path).split('.')[0]
         self.is_test = is_test
         self.unit = unit
@@ -101,6 +115,9 @@ class Dataset(object):
         self.dynamic_batching = dynamic_batching
         self.corpus = corpus
         self.discourse_aware = discourse_aware
+        self.teacher_posterior = None
+        if teacher_posterior:
+            self.teacher_posterior = TeacherPosteriorStore(teacher_posterior)
         if discourse_aware:
             assert not is_test
 
@@ -251,7 +268,7 @@ class Dataset(object):
             elif sort_by == 'output':
                 df = df.sort_values(by=['ylen'], ascending=short2long)
             elif sort_by == 'shuffle':
-                df = df.reindex(np.random.permutation(self.df.index))
+                df = df.reindex(self.np_rng.permutation(self.df.index))
 
         # Re-indexing
         if discourse_aware:
@@ -304,6 +321,52 @@ class Dataset(object):
             self.df_indices = list(self.df.index)
         self.offset = 0
 
+    def state_dict(self):
+        """Returns the state of the data iterator to resume in the middle of an epoch.
+
+        Returns:
+            state (dict): epoch, offset and remaining indices of the current epoch
+
+        """
+        return {
+            'epoch': self.epoch,
+            'offset': self.offset,
+            'sort_by': self.sort_by,
+            # NOTE: the order of utterances is saved only after shuffling
+            'utt_ids': list(self.df['utt_id']) if self.sort_by == 'shuffle' else None,
+            'df_indices': list(self.df_indices) if hasattr(self, 'df_indices') else None,
+            'df_indices_buckets': [list(b) for b in self.df_indices_buckets]
+            if hasattr(self, 'df_indices_buckets') else None,
+            'rng_state': (self.rng.getstate(), self.np_rng.get_state()) if self.world_size > 1 else None,
+        }
+
+    def load_state_dict(self, state):
+        """Restore the state of the data iterator.
+
+        Args:
+            state (dict): state returned by `state_dict()`
+
+        """
+        if state['utt_ids'] is not None:
+            positions = pd.Series(np.arange(len(self.df)), index=self.df['utt_id'].values)
+            perm = positions[state['utt_ids']].values
+            self.df = self.df.iloc[perm].reset_index(drop=True)
+            for i in range(1, 3):
+                if getattr(self, 'df_sub' + str(i)) is not None:
+                    setattr(self, 'df_sub' + str(i),
+                            getattr(self, 'df_sub' + str(i)).iloc[perm].reset_index(drop=True))
+        self.epoch = state['epoch']
+        self.offset = state['offset']
+        self.sort_by = state['sort_by']
+        if state['df_indices'] is not None:
+            self.df_indices = list(state['df_indices'])
+        if state['df_indices_buckets'] is not None:
+            self.df_indices_buckets = [list(b) for b in state['df_indices_buckets']]
+        if state.get('rng_state') is not None and self.world_size > 1:
+            self.rng.setstate(state['rng_state'][0])
+            self.np_rng.set_state(state['rng_state'][1])
+
+    @timed('data')
     def next(self, batch_size=None):
         """Generate each mini-batch.
 
@@ -321,13 +384,16 @@ class Dataset(object):
             raise StopIteration
 
         df_indices_mb, is_new_epoch = self.sample_index(batch_size)
+        if self.world_size > 1:
+            # Take a slice of the global mini-batch
+            df_indices_mb = df_indices_mb[self.rank::self.world_size] or df_indices_mb[-1:]
         mini_batch = self.make_mini_batch(df_indices_mb)
 
         if is_new_epoch:
             # shuffle the whole data
             if self.epoch + 1 == self.sort_stop_epoch:
                 self.sort_by = 'shuffle'
-                self.df = self.df.reindex(np.random.permutation(self.df.index))
+                self.df = self.df.reindex(self.np_rng.permutation(self.df.index))
                 for i in range(1, 3):
                     if getattr(self, 'df_sub' + str(i)) is not None:
                         setattr(self, 'df_sub' + str(i),
@@ -364,7 +430,7 @@ class Dataset(object):
             is_new_epoch = (len(self.df_indices_buckets) == 0)
 
             # Shuffle uttrances in mini-batch
-            df_indices_mb = random.sample(df_indices_mb, len(df_indices_mb))
+            df_indices_mb = self.rng.sample(df_indices_mb, len(df_indices_mb))
         else:
             if len(self.df_indices) > batch_size:
                 # Change batch size dynamically
@@ -389,7 +455,7 @@ class Dataset(object):
                 df_indices_mb = df_indices_mb[:batch_size]
 
             # Shuffle uttrances in mini-batch
-            df_indices_mb = random.sample(df_indices_mb, len(df_indices_mb))
+            df_indices_mb = self.rng.sample(df_indices_mb, len(df_indices_mb))
 
             for i in df_indices_mb:
                 self.df_indices.remove(i)
@@ -411,6 +477,7 @@ class Dataset(object):
                 utt_ids (list): name of each utterance
                 speakers (list): name of each speaker
                 sessions (list): name of each session
+                teacher_topk (list): top-k ids and probabilities of teacher posteriors of size `[L + 1, k]`
 
         """
         # inputs
@@ -434,6 +501,11 @@ class Dataset(object):
         elif self.vocab_sub2 > 0 and not self.is_test:
             ys_sub2 = [self.token2idx[2](self.df['text'][i]) for i in df_indices_mb]
 
+        # teacher posteriors for knowledge distillation
+        teacher_topk = []
+        if self.teacher_posterior is not None:
+            teacher_topk = [self.teacher_posterior.get(self.df['utt_id'][i]) for i in df_indices_mb]
+
         mini_batch_dict = {
             'xs': xs,
             'xlens': [self.df['xlen'][i] for i in df_indices_mb],
@@ -445,6 +517,7 @@ class Dataset(object):
             'sessions': [self.df['session'][i] for i in df_indices_mb],
             'text': [self.df['text'][i] for i in df_indices_mb],
             'feat_path': [self.df['feat_path'][i] for i in df_indices_mb],  # for plot
+            'teacher_topk': teacher_topk,
         }
         return mini_batch_dict
 
@@ -475,14 +548,14 @@ class Dataset(object):
                 break
 
         # shuffle buckets
-        random.shuffle(df_indices_buckets)
+        self.rng.shuffle(df_indices_buckets)
         return df_indices_buckets
 
     def discourse_bucketing(self, batch_size):
         df_indices_buckets = []  # list of list
         session_groups = [(k, v) for k, v in self.df.groupby('n_utt_in_session').groups.items()]
         if self.shuffle_bucket:
-            random.shuffle(session_groups)
+            self.rng.shuffle(session_groups)
         for n_utt, ids in session_groups:
             first_utt_ids = [i for i in ids if self.df['n_prev_utt'][i] == 0]
             for i in range(0, len(first_utt_ids), batch_size):
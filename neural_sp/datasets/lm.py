@@ -24,6 +24,8 @@ from neural_sp.datasets.token_converter.word import Idx2word
 from neural_sp.datasets.token_converter.word import Word2idx
 from neural_sp.datasets.token_converter.wordpiece import Idx2wp
 from neural_sp.datasets.token_converter.wordpiece import Wp2idx
+from neural_sp.datasets.token_stream import TokenStream
+from neural_sp.profiler import timed
 
 random.seed(1)
 np.random.seed(1)
@@ -37,11 +39,12 @@ class Dataset(object):
                  unit, batch_size, nlsyms=False, n_epochs=1e10,
                  is_test=False, min_n_tokens=1,
                  bptt=2, shuffle=False, backward=False, serialize=False,
-                 wp_model=None, corpus=''):
+                 wp_model=None, corpus='', block_size=65536, rank=0, world_size=1):
         """A class for loading dataset.
 
         Args:
-            tsv_path (str): path to the dataset tsv file
+            tsv_path (str): path to the dataset tsv file,
+                or the memory-mapped token stream (<prefix>.bin) made by utils/make_lm_bin.py
             dict_path (str): path to the dictionary
             unit (str): word or wp or char or phone or word_char
             batch_size (int): size of mini-batch
@@ -55,6 +58,10 @@ class Dataset(object):
             serialize (bool): serialize text according to contexts in dialogue
             wp_model (): path to the word-piece model for sentencepiece
             corpus (str): name of corpus
+            block_size (int): number of tokens per shuffling block for the token stream
+            rank (int): rank of this process in distributed training
+            world_size (int): number of processes in distributed training.
+                Each process takes rows of the same global mini-batch of size `batch_size`.
 
         """
         super(Dataset, self).__init__()
@@ -63,6 +70,13 @@ class Dataset(object):
         self.iteration = 0
         self.offset = 0
 
+        self.rank = rank
+        self.world_size = world_size
+        # NOTE: all processes must generate the same sequence of global mini-batches
+        self.np_rng = np.random.RandomState(1) if world_size > 1 else np.random
+        if world_size > 1:
+            assert batch_size % world_size == 0
+
         self.set = os.path.basename(tsv_path).split('.')[0]
         self.is_test = is_test
         self.unit = unit
@@ -95,6 +109,19 @@ class Dataset(object):
         else:
             raise ValueError(unit)
 
+        self.df = None
+        self.stream = None
+        if tsv_path.endswith('.bin'):
+            # Read tokens from the memory-mapped token stream
+            # NOTE: filtering is done when making the token stream
+            assert not backward and not serialize
+            self.stream = TokenStream(tsv_path, block_size=block_size)
+            assert self.stream.eos == self.eos
+            print('Utterance num: %d (%d blocks)' % (self.stream.n_utts, self.stream.n_blocks))
+            if shuffle:
+                self.stream.shuffle(self.np_rng)
+            return
+
         # Load dataset tsv file
         self.df = pd.read_csv(tsv_path, encoding='utf-8', delimiter='\t')
         self.df = self.df.loc[:, ['utt_id', 'speaker', 'feat_path',
@@ -115,7 +142,7 @@ class Dataset(object):
         # Sort tsv records
         if shuffle:
             assert not serialize
-            self.df = self.df.reindex(np.random.permutation(self.df.index))
+            self.df = self.df.reindex(self.np_rng.permutation(self.df.index))
         elif serialize:
             assert not shuffle
             assert corpus == 'swbd'
@@ -148,6 +175,8 @@ class Dataset(object):
         return concat_ids
 
     def __len__(self):
+        if self.stream is not None:
+            return len(self.stream) // self.batch_size * self.batch_size
         return len(self.concat_ids.reshape((-1,)))
 
     @property
@@ -157,11 +186,48 @@ class Dataset(object):
 
     def reset(self):
         """Reset data counter and offset."""
-        if self.shuffle:
-            self.df = self.df.reindex(np.random.permutation(self.df.index))
+        if self.shuffle and self.stream is not None:
+            self.stream.shuffle(self.np_rng)
+        elif self.shuffle:
+            self.df = self.df.reindex(self.np_rng.permutation(self.df.index))
             self.concat_ids = self.concat_utterances(self.df)
         self.offset = 0
 
+    def state_dict(self):
+        """Returns the state of the data iterator to resume in the middle of an epoch.
+
+        Returns:
+            state (dict): epoch, offset and the order of utterances
+
+        """
+        state = {'epoch': self.epoch, 'offset': self.offset, 'batch_size': self.batch_size,
+                 'order': None,
+                 'rng_state': self.np_rng.get_state() if self.world_size > 1 else None}
+        if self.shuffle and self.stream is not None:
+            state['order'] = self.stream.order.copy()
+        elif self.shuffle:
+            state['order'] = list(self.df.index)
+        return state
+
+    def load_state_dict(self, state):
+        """Restore the state of the data iterator.
+
+        Args:
+            state (dict): state returned by `state_dict()`
+
+        """
+        self.batch_size = state['batch_size']
+        if state['order'] is not None and self.stream is not None:
+            self.stream.set_order(state['order'])
+        elif state['order'] is not None:
+            self.df = self.df.reindex(state['order'])
+            self.concat_ids = self.concat_utterances(self.df)
+        self.epoch = state['epoch']
+        self.offset = state['offset']
+        if state.get('rng_state') is not None and self.world_size > 1:
+            self.np_rng.set_state(state['rng_state'])
+
+    @timed('data')
     def next(self, batch_size=None, bptt=None):
         """Generate each mini-batch.
 
@@ -175,6 +241,8 @@ class Dataset(object):
         """
         if batch_size is None:
             batch_size = self.batch_size
+        elif self.stream is not None:
+            self.batch_size = batch_size
         elif self.concat_ids.shape[0] != batch_size:
             self.concat_ids = self.concat_ids.reshape((batch_size, -1))
             # NOTE: only for the first iteration during evaluation
@@ -185,7 +253,10 @@ class Dataset(object):
         if self.epoch >= self.max_epoch:
             raise StopIteration
 
-        ys = self.concat_ids[:, self.offset:self.offset + bptt]
+        if self.stream is not None:
+            ys = self.stream.read_rows(batch_size, self.offset, bptt)
+        else:
+            ys = self.concat_ids[:, self.offset:self.offset + bptt]
         self.offset += bptt - 1
         # ys = self.concat_ids[:, self.offset:self.offset + (bptt + 1)]
         # self.offset += (bptt + 1) - 1
@@ -199,4 +270,8 @@ class Dataset(object):
             self.reset()
             self.epoch += 1
 
+        if self.world_size > 1:
+            # Take rows of the global mini-batch
+            ys = ys[self.rank::self.world_size]
+
         return ys, is_new_epoch
@@ -0,0 +1,117 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Memory-mapped store of teacher posteriors for knowledge distillation.
+   Top-k (id, prob) pairs per output position are stored in files sharing the same prefix:
+       <prefix>.ids.bin: uint16/uint32 token ids of size `[n_positions, k]`
+       <prefix>.probs.bin: float16 probabilities of size `[n_positions, k]`
+       <prefix>.index.tsv: utterance ID, offset and the number of positions per utterance
+       <prefix>.meta.json: k, temperature, vocabulary size and dtypes
+"""
+
+import codecs
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TeacherPosteriorWriter(object):
+
+    def __init__(self, prefix, vocab, topk=8, temperature=5.0):
+        """A class for writing teacher posteriors.
+
+        Args:
+            prefix (str): prefix of the output files
+            vocab (int): vocabulary size
+            topk (int): number of tokens to keep per output position
+            temperature (float): softmax temperature applied to teacher logits
+
+        """
+        super(TeacherPosteriorWriter, self).__init__()
+
+        self.prefix = prefix
+        self.vocab = vocab
+        self.topk = topk
+        self.temperature = temperature
+        self.ids_dtype = np.uint16 if vocab <= np.iinfo(np.uint16).max + 1 else np.uint32
+        self.offset = 0
+
+        self.f_ids = open(prefix + '.ids.bin', 'wb')
+        self.f_probs = open(prefix + '.probs.bin', 'wb')
+        self.f_index = codecs.open(prefix + '.index.tsv', 'w', encoding='utf-8')
+
+    def add(self, utt_id, topk_ids, topk_probs):
+        """Append top-k posteriors of an utterance.
+
+        Args:
+            utt_id (str): utterance ID
+            topk_ids (np.ndarray): `[L, k]`
+            topk_probs (np.ndarray): `[L, k]`
+
+        """
+        assert topk_ids.shape == topk_probs.shape == (len(topk_ids), self.topk)
+        self.f_ids.write(np.ascontiguousarray(topk_ids, dtype=self.ids_dtype).tobytes())
+        self.f_probs.write(np.ascontiguousarray(topk_probs, dtype=np.float16).tobytes())
+        self.f_index.write('%s\t%d\t%d\n' % (utt_id, self.offset, len(topk_ids)))
+        self.offset += len(topk_ids)
+
+    def close(self):
+        self.f_ids.close()
+        self.f_probs.close()
+        self.f_index.close()
+        with codecs.open(self.prefix + '.meta.json', 'w', encoding='utf-8') as f:
+            json.dump({'topk': self.topk, 'temperature': self.temperature, 'vocab': self.vocab,
+                       'ids_dtype': np.dtype(self.ids_dtype).name, 'n_positions': self.offset},
+                      f, indent=2)
+
+
+class TeacherPosteriorStore(object):
+
+    def __init__(self, prefix):
+        """A class for reading teacher posteriors.
+
+        Args:
+            prefix (str): prefix of the files made by TeacherPosteriorWriter
+
+        """
+        super(TeacherPosteriorStore, self).__init__()
+
+        with codecs.open(prefix + '.meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.topk = self.meta['topk']
+        self.temperature = self.meta['temperature']
+        shape = (self.meta['n_positions'], self.topk)
+        self.ids = np.memmap(prefix + '.ids.bin', dtype=self.meta['ids_dtype'], mode='r', shape=shape)
+        self.probs = np.memmap(prefix + '.probs.bin', dtype=np.float16, mode='r', shape=shape)
+
+        self.index = {}
+        with codecs.open(prefix + '.index.tsv', 'r', encoding='utf-8') as f:
+            for line in f:
+                utt_id, offset, length = line.rstrip('\n').split('\t')
+                self.index[utt_id] = (int(offset), int(length))
+        logger.info('Teacher posteriors: %d utterances (top-%d)' % (len(self.index), self.topk))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, utt_id):
+        return utt_id in self.index
+
+    def get(self, utt_id):
+        """Read top-k posteriors of an utterance.
+
+        Args:
+            utt_id (str): utterance ID
+        Returns:
+            topk_ids (np.ndarray): `[L, k]`
+            topk_probs (np.ndarray): `[L, k]`
+
+        """
+        offset, length = self.index[utt_id]
+        return (self.ids[offset:offset + length].astype(np.int64),
+                self.probs[offset:offset + length].astype(np.float32))
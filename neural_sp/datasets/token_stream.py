@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Memory-mapped token stream for language model training.
+   A corpus is stored as three files sharing the same prefix:
+       <prefix>.bin: flat uint16/uint32 token ids. Each utterance is preceded by <eos>.
+       <prefix>.idx.npy: int64 offsets of utterances in <prefix>.bin of size `[n_utts + 1]`
+       <prefix>.meta.json: dtype, vocabulary size and corpus statistics
+"""
+
+import codecs
+import json
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _prefix(path):
+    return path[:-len('.bin')] if path.endswith('.bin') else path
+
+
+def write_token_stream(tsv_path, bin_path, vocab, eos=2, min_n_tokens=1):
+    """Convert a dataset tsv file into a memory-mapped token stream.
+       The tsv file is read line by line and utterances are stored in the same order.
+
+    Args:
+        tsv_path (str): path to the dataset tsv file
+        bin_path (str): path to the output token stream (<prefix>.bin)
+        vocab (int): vocabulary size
+        eos (int): index of <eos>, inserted before each utterance
+        min_n_tokens (int): exclude utterances shorter than this value
+    Returns:
+        n_utts (int): number of stored utterances
+        n_tokens (int): number of stored tokens including <eos>
+
+    """
+    prefix = _prefix(bin_path)
+    dtype = np.uint16 if vocab <= np.iinfo(np.uint16).max + 1 else np.uint32
+    offsets = [0]
+    n_removed = 0
+    with codecs.open(tsv_path, 'r', encoding='utf-8') as f, open(prefix + '.bin', 'wb') as fw:
+        header = f.readline().rstrip('\n').split('\t')
+        col = header.index('token_id')
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            token_ids = fields[col].split()
+            if len(token_ids) < max(1, min_n_tokens):
+                n_removed += 1
+                continue
+            ids = np.array([eos] + token_ids, dtype=np.int64)
+            assert ids.max() < vocab, ids.max()
+            fw.write(ids.astype(dtype).tobytes())
+            offsets.append(offsets[-1] + len(ids))
+    np.save(prefix + '.idx.npy', np.array(offsets, dtype=np.int64))
+    with codecs.open(prefix + '.meta.json', 'w', encoding='utf-8') as f:
+        json.dump({'dtype': np.dtype(dtype).name, 'vocab': vocab, 'eos': eos,
+                   'n_utts': len(offsets) - 1, 'n_tokens': offsets[-1]}, f, indent=2)
+    logger.info('Removed %d utterances (threshold)' % n_removed)
+    return len(offsets) - 1, offsets[-1]
+
+
+class TokenStream(object):
+
+    def __init__(self, bin_path, block_size=65536):
+        """A class for reading a memory-mapped token stream.
+           Utterances are grouped into blocks of about `block_size` tokens, and
+           the stream is shuffled by permuting blocks so that only the block
+           boundaries are kept in memory.
+
+        Args:
+            bin_path (str): path to the token stream (<prefix>.bin)
+            block_size (int): number of tokens per shuffling block
+
+        """
+        super(TokenStream, self).__init__()
+
+        prefix = _prefix(bin_path)
+        with codecs.open(prefix + '.meta.json', 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.eos = self.meta['eos']
+        self.data = np.memmap(prefix + '.bin', dtype=self.meta['dtype'], mode='r')
+        offsets = np.load(prefix + '.idx.npy', mmap_mode='r')
+        self.n_utts = len(offsets) - 1
+        assert offsets[-1] == len(self.data)
+
+        # Split into blocks at utterance boundaries
+        n_tokens = len(self.data)
+        boundaries = np.searchsorted(offsets, np.arange(0, n_tokens, block_size), side='left')
+        boundaries = np.unique(np.append(boundaries, self.n_utts))
+        self.block_starts = np.asarray(offsets[boundaries[:-1]], dtype=np.int64)
+        self.block_lens = np.asarray(offsets[boundaries[1:]], dtype=np.int64) - self.block_starts
+        self.order = np.arange(len(self.block_starts))
+        self._cum_lens = np.append(0, np.cumsum(self.block_lens))
+
+    def __len__(self):
+        """Number of tokens including the final <eos>."""
+        return len(self.data) + 1
+
+    @property
+    def n_blocks(self):
+        return len(self.block_starts)
+
+    def set_order(self, order):
+        """Set the order of blocks.
+
+        Args:
+            order (np.ndarray): permutation of block indices of size `[n_blocks]`
+
+        """
+        assert len(order) == self.n_blocks
+        self.order = np.asarray(order, dtype=np.int64)
+        self._cum_lens = np.append(0, np.cumsum(self.block_lens[self.order]))
+
+    def shuffle(self, rng=np.random):
+        """Permute blocks.
+
+        Args:
+            rng (np.random.RandomState): random number generator
+
+        """
+        self.set_order(rng.permutation(self.n_blocks))
+
+    def read(self, start, end):
+        """Read tokens in the range `[start, end)` of the (permuted) stream.
+
+        Args:
+            start (int): start position
+            end (int): end position (exclusive)
+        Returns:
+            ids (np.ndarray): token ids of size `[end - start]`
+
+        """
+        end = min(end, len(self))
+        ids = np.full(max(end - start, 0), self.eos, dtype=np.int64)
+        pos = start
+        i = int(np.searchsorted(self._cum_lens, start, side='right')) - 1
+        while pos < end and i < self.n_blocks:
+            b = self.order[i]
+            offset = pos - self._cum_lens[i]
+            n = min(end - pos, self.block_lens[b] - offset)
+            begin = self.block_starts[b] + offset
+            ids[pos - start:pos - start + n] = self.data[begin:begin + n]
+            pos += n
+            i += 1
+        # NOTE: the remaining position is the final <eos>
+        return ids
+
+    def read_rows(self, batch_size, offset, length):
+        """Read a mini-batch from the stream split into `batch_size` rows.
+
+        Args:
+            batch_size (int): number of rows
+            offset (int): start position in each row
+            length (int): number of tokens to read per row
+        Returns:
+            ys (np.ndarray): token ids of size `[B, length]`
+
+        """
+        row_len = len(self) // batch_size
+        length = max(min(length, row_len - offset), 0)
+        return np.stack([self.read(b * row_len + offset, b * row_len + offset + length)
+                         for b in range(batch_size)], axis=0)
@@ -56,93 +56,166 @@ def compute_cer(ref, hyp, normalize=False):
     return cer * 100
 
 
-def compute_wer(ref, hyp, normalize=False):
-    """Compute Word Error Rate.
+def _map_tokens(refs, hyps):
+    """Map tokens to integer ids shared over all pairs."""
+    token2idx = {}
+    refs = [np.array([token2idx.setdefault(t, len(token2idx)) for t in ref], dtype=np.int64)
+            for ref in refs]
+    hyps = [np.array([token2idx.setdefault(t, len(token2idx)) for t in hyp], dtype=np.int64)
+            for hyp in hyps]
+    return refs, hyps
+
+
+def _distance_matrix(refs, hyps):
+    """Fill edit distance matrices of padded pairs row by row.
+       Insertions along a row are resolved by a cumulative minimum,
+       so each row is computed with vector operations over all pairs at once.
 
-        [Reference]
-            https://martin-thoma.com/word-error-rate-calculation/
     Args:
-        ref (list): words in the reference transcript
-        hyp (list): words in the predicted transcript
-        normalize (bool, optional): if True, divide by the length of ref
+        refs (list): length `B`, each of which contains token ids of size `[n]`
+        hyps (list): length `B`, each of which contains token ids of size `[m]`
     Returns:
-        wer (float): Word Error Rate between ref and hyp
-        n_sub (int): the number of substitution
-        n_ins (int): the number of insertion
-        n_del (int): the number of deletion
+        d (np.ndarray): `[B, max(n) + 1, max(m) + 1]`
 
     """
-    # Initialisation
-    d = np.zeros((len(ref) + 1) * (len(hyp) + 1), dtype=np.uint16)
-    d = d.reshape((len(ref) + 1, len(hyp) + 1))
-    for i in range(len(ref) + 1):
-        for j in range(len(hyp) + 1):
-            if i == 0:
-                d[0][j] = j
-            elif j == 0:
-                d[i][0] = i
-
-    # Computation
-    for i in range(1, len(ref) + 1):
-        for j in range(1, len(hyp) + 1):
-            if ref[i - 1] == hyp[j - 1]:
-                d[i][j] = d[i - 1][j - 1]
-            else:
-                sub_tmp = d[i - 1][j - 1] + 1
-                ins_tmp = d[i][j - 1] + 1
-                del_tmp = d[i - 1][j] + 1
-                d[i][j] = min(sub_tmp, ins_tmp, del_tmp)
+    bs = len(refs)
+    n_max = max(len(ref) for ref in refs)
+    m_max = max(len(hyp) for hyp in hyps)
+    dtype = np.uint16 if n_max + m_max < np.iinfo(np.uint16).max else np.uint32
+    d = np.zeros((bs, n_max + 1, m_max + 1), dtype=dtype)
+
+    refs_pad = np.full((bs, n_max), -1, dtype=np.int64)
+    hyps_pad = np.full((bs, m_max), -2, dtype=np.int64)
+    for b in range(bs):
+        refs_pad[b, :len(refs[b])] = refs[b]
+        hyps_pad[b, :len(hyps[b])] = hyps[b]
+
+    j = np.arange(m_max + 1, dtype=np.int64)
+    prev = np.tile(j, (bs, 1))  # `[B, m + 1]`
+    d[:, 0] = prev
+    for i in range(1, n_max + 1):
+        cost = (refs_pad[:, i - 1:i] != hyps_pad).astype(np.int64)  # `[B, m]`
+        row = np.empty_like(prev)
+        row[:, 0] = i
+        row[:, 1:] = np.minimum(prev[:, :-1] + cost, prev[:, 1:] + 1)
+        row = np.minimum.accumulate(row - j, axis=1) + j
+        d[:, i] = row
+        prev = row
+    return d
+
+
+def _backtrace(d, ref, hyp):
+    """Find out the manipulation steps.
 
-    wer = d[len(ref)][len(hyp)]
+    Args:
+        d (np.ndarray): `[n + 1, m + 1]` (or larger)
+        ref (np.ndarray): token ids of size `[n]`
+        hyp (np.ndarray): token ids of size `[m]`
+    Returns:
+        error_list (list): `C`, `S`, `I` or `D` from the end of sequences
 
-    # Find out the manipulation steps
+    """
     x = len(ref)
     y = len(hyp)
     error_list = []
-    while True:
-        if x == 0 and y == 0:
-            break
-        else:
-            if x > 0 and y > 0:
-                if d[x][y] == d[x - 1][y - 1] and ref[x - 1] == hyp[y - 1]:
-                    error_list.append("C")
-                    x = x - 1
-                    y = y - 1
-                elif d[x][y] == d[x][y - 1] + 1:
-                    error_list.append("I")
-                    y = y - 1
-                elif d[x][y] == d[x - 1][y - 1] + 1:
-                    error_list.append("S")
-                    x = x - 1
-                    y = y - 1
-                else:
-                    error_list.append("D")
-                    x = x - 1
-            elif x == 0 and y > 0:
-                if d[x][y] == d[x][y - 1] + 1:
-                    error_list.append("I")
-                    y = y - 1
-                else:
-                    error_list.append("D")
-                    x = x - 1
-            elif y == 0 and x > 0:
-                error_list.append("D")
+    while x > 0 or y > 0:
+        if x > 0 and y > 0:
+            if d[x, y] == d[x - 1, y - 1] and ref[x - 1] == hyp[y - 1]:
+                error_list.append("C")
                 x = x - 1
+                y = y - 1
+            elif int(d[x, y]) == int(d[x, y - 1]) + 1:
+                error_list.append("I")
+                y = y - 1
+            elif int(d[x, y]) == int(d[x - 1, y - 1]) + 1:
+                error_list.append("S")
+                x = x - 1
+                y = y - 1
             else:
-                raise ValueError
+                error_list.append("D")
+                x = x - 1
+        elif y > 0:
+            error_list.append("I")
+            y = y - 1
+        else:
+            error_list.append("D")
+            x = x - 1
+    return error_list
 
-    n_sub = error_list.count("S")
-    n_ins = error_list.count("I")
-    n_del = error_list.count("D")
-    n_cor = error_list.count("C")
 
-    assert wer == (n_sub + n_ins + n_del)
-    assert n_cor == (len(ref) - n_sub - n_del)
+def compute_wers(refs, hyps, normalize=False, max_cells=2 ** 24):
+    """Compute Word Error Rates over many pairs.
+       Pairs are sorted by length and scored in mini-batches.
 
-    if normalize:
-        wer /= len(ref)
+    Args:
+        refs (list): length `B`, each of which contains words in the reference transcript
+        hyps (list): length `B`, each of which contains words in the predicted transcript
+        normalize (bool, optional): if True, divide by the length of ref
+        max_cells (int): maximum number of cells of distance matrices in a mini-batch
+    Returns:
+        results (list): length `B`, each of which contains a tuple of (wer, n_sub, n_ins, n_del)
+
+    """
+    assert len(refs) == len(hyps)
+    refs_id, hyps_id = _map_tokens(refs, hyps)
+    order = sorted(range(len(refs)), key=lambda b: (len(refs_id[b]), len(hyps_id[b])))
+
+    results = [None] * len(refs)
+    start = 0
+    while start < len(order):
+        # Grow the mini-batch while the padded matrices fit
+        end = start + 1
+        n_max = len(refs_id[order[start]])
+        m_max = len(hyps_id[order[start]])
+        while end < len(order):
+            n = max(n_max, len(refs_id[order[end]]))
+            m = max(m_max, len(hyps_id[order[end]]))
+            if (end - start + 1) * (n + 1) * (m + 1) > max_cells:
+                break
+            n_max, m_max = n, m
+            end += 1
+
+        indices = order[start:end]
+        d = _distance_matrix([refs_id[b] for b in indices], [hyps_id[b] for b in indices])
+        for k, b in enumerate(indices):
+            ref, hyp = refs_id[b], hyps_id[b]
+            wer = int(d[k, len(ref), len(hyp)])
+            error_list = _backtrace(d[k], ref, hyp)
+
+            n_sub = error_list.count("S")
+            n_ins = error_list.count("I")
+            n_del = error_list.count("D")
+            n_cor = error_list.count("C")
+
+            assert wer == (n_sub + n_ins + n_del)
+            assert n_cor == (len(ref) - n_sub - n_del)
+
+            if normalize:
+                wer /= len(ref)
+
+            results[b] = (wer * 100, n_sub * 100, n_ins * 100, n_del * 100)
+        start = end
+
+    return results
 
-    return wer * 100, n_sub * 100, n_ins * 100, n_del * 100
+
+def compute_wer(ref, hyp, normalize=False):
+    """Compute Word Error Rate.
+
+        [Reference]
+            https://martin-thoma.com/word-error-rate-calculation/
+    Args:
+        ref (list): words in the reference transcript
+        hyp (list): words in the predicted transcript
+        normalize (bool, optional): if True, divide by the length of ref
+    Returns:
+        wer (float): Word Error Rate between ref and hyp
+        n_sub (int): the number of substitution
+        n_ins (int): the number of insertion
+        n_del (int): the number of deletion
+
+    """
+    return compute_wers([ref], [hyp], normalize=normalize)[0]
 
 
 def wer_align(ref, hyp, normalize=False, double_byte=False):
@@ -167,61 +240,12 @@ def wer_align(ref, hyp, normalize=False, double_byte=False):
     i_char = "Ｉ" if double_byte else "I"
     d_char = "Ｄ" if double_byte else "D"
 
-    # Build the matrix
-    d = np.zeros((len(ref) + 1) * (len(hyp) + 1),
-                 dtype=np.uint8).reshape((len(ref) + 1, len(hyp) + 1))
-    for i in range(len(ref) + 1):
-        for j in range(len(hyp) + 1):
-            if i == 0:
-                d[0][j] = j
-            elif j == 0:
-                d[i][0] = i
-    for i in range(1, len(ref) + 1):
-        for j in range(1, len(hyp) + 1):
-            if ref[i - 1] == hyp[j - 1]:
-                d[i][j] = d[i - 1][j - 1]
-            else:
-                n_sub = d[i - 1][j - 1] + 1
-                n_ins = d[i][j - 1] + 1
-                n_del = d[i - 1][j] + 1
-                d[i][j] = min(n_sub, n_ins, n_del)
+    refs_id, hyps_id = _map_tokens([ref], [hyp])
+    d = _distance_matrix(refs_id, hyps_id)[0]
     wer = float(d[len(ref)][len(hyp)])
 
     # Find out the manipulation steps
-    x = len(ref)
-    y = len(hyp)
-    error_list = []
-    while True:
-        if x == 0 and y == 0:
-            break
-        else:
-            if x > 0 and y > 0:
-                if d[x][y] == d[x - 1][y - 1] and ref[x - 1] == hyp[y - 1]:
-                    error_list.append("C")
-                    x = x - 1
-                    y = y - 1
-                elif d[x][y] == d[x][y - 1] + 1:
-                    error_list.append("I")
-                    y = y - 1
-                elif d[x][y] == d[x - 1][y - 1] + 1:
-                    error_list.append("S")
-                    x = x - 1
-                    y = y - 1
-                else:
-                    error_list.append("D")
-                    x = x - 1
-            elif x == 0 and y > 0:
-                if d[x][y] == d[x][y - 1] + 1:
-                    error_list.append("I")
-                    y = y - 1
-                else:
-                    error_list.append("D")
-                    x = x - 1
-            elif y == 0 and x > 0:
-                error_list.append("D")
-                x = x - 1
-            else:
-                raise ValueError
+    error_list = _backtrace(d, refs_id[0], hyps_id[0])
     error_list = error_list[::-1]
 
     # Print the result in aligned way
@@ -0,0 +1,227 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Score hyp.trn/ref.trn files by WER and CER."""
+
+from collections import OrderedDict
+import logging
+import multiprocessing
+
+from neural_sp.evaluators.edit_distance import compute_wers
+
+logger = logging.getLogger(__name__)
+
+
+def parse_trn_line(line):
+    """Parse a line of a trn file.
+
+    Args:
+        line (str): `text (speaker-utt_id)`
+    Returns:
+        key (str): `speaker-utt_id`
+        speaker (str):
+        text (str):
+
+    """
+    line = line.rstrip('\n')
+    idx = line.rfind(' (')
+    if idx < 0 or not line.endswith(')'):
+        raise ValueError(line)
+    key = line[idx + 2:-1]
+    return key, key.split('-')[0], line[:idx]
+
+
+def _score_chunk(args):
+    """Score a chunk of utterance pairs (for the process pool).
+
+    Args:
+        args (tuple): list of (speaker, ref, hyp) and remove_space (bool)
+    Returns:
+        results (list): list of (speaker, n_word, word-level errors, n_char, character-level errors)
+
+    """
+    pairs, remove_space = args
+    if len(pairs) == 0:
+        return []
+    refs_w = [ref.split(' ') for _, ref, _ in pairs]
+    hyps_w = [hyp.split(' ') for _, _, hyp in pairs]
+    if remove_space:
+        refs_c = [list(ref.replace(' ', '')) for _, ref, _ in pairs]
+        hyps_c = [list(hyp.replace(' ', '')) for _, _, hyp in pairs]
+    else:
+        refs_c = [list(ref) for _, ref, _ in pairs]
+        hyps_c = [list(hyp) for _, _, hyp in pairs]
+
+    results = []
+    for (speaker, _, _), ref_w, res_w, ref_c, res_c in zip(
+            pairs, refs_w, compute_wers(refs_w, hyps_w), refs_c, compute_wers(refs_c, hyps_c)):
+        results.append((speaker,
+                        len(ref_w), [int(v) // 100 for v in res_w],
+                        len(ref_c), [int(v) // 100 for v in res_c]))
+    return results
+
+
+class TrnScorer(object):
+
+    def __init__(self, ref_trn, hyp_trn, n_workers=1, chunk_size=1000,
+                 bin_size=10, remove_space=False):
+        """A class for scoring trn files incrementally.
+           Only complete lines are consumed, so `update()` can be called
+           repeatedly on files being written during decoding.
+
+        Args:
+            ref_trn (str): path to ref.trn
+            hyp_trn (str): path to hyp.trn
+            n_workers (int): number of processes for scoring
+            chunk_size (int): number of utterances per job
+            bin_size (int): width of reference length bins in words
+            remove_space (bool): remove spaces before computing CER (e.g., CSJ)
+
+        """
+        super(TrnScorer, self).__init__()
+
+        self.paths = {'ref': ref_trn, 'hyp': hyp_trn}
+        self.offsets = {'ref': 0, 'hyp': 0}
+        self.pending = {'ref': OrderedDict(), 'hyp': OrderedDict()}
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.bin_size = bin_size
+        self.remove_space = remove_space
+
+        self.n_utt = 0
+        self.total = self._new_counts()
+        self.len_bins = {}
+        self.speakers = {}
+
+    @staticmethod
+    def _new_counts():
+        return {'n_word': 0, 'err_w': 0, 'sub_w': 0, 'ins_w': 0, 'del_w': 0,
+                'n_char': 0, 'err_c': 0, 'sub_c': 0, 'ins_c': 0, 'del_c': 0, 'n_utt': 0}
+
+    def _read_new_lines(self, side, max_lines):
+        """Read at most `max_lines` complete lines appended since the last call."""
+        n_lines = 0
+        with open(self.paths[side], 'rb') as f:
+            f.seek(self.offsets[side])
+            while n_lines < max_lines:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break  # EOF or being written
+                self.offsets[side] += len(line)
+                key, speaker, text = parse_trn_line(line.decode('utf-8'))
+                self.pending[side][key] = (speaker, text)
+                n_lines += 1
+        return n_lines
+
+    def _pop_pairs(self):
+        pairs = []
+        for key in list(self.pending['hyp'].keys()):
+            if key in self.pending['ref']:
+                speaker, hyp = self.pending['hyp'].pop(key)
+                _, ref = self.pending['ref'].pop(key)
+                pairs.append((speaker, ref, hyp))
+        return pairs
+
+    def _accumulate(self, results):
+        for speaker, n_word, res_w, n_char, res_c in results:
+            len_bin = (n_word // self.bin_size + 1) * self.bin_size
+            if len_bin not in self.len_bins:
+                self.len_bins[len_bin] = self._new_counts()
+            if speaker not in self.speakers:
+                self.speakers[speaker] = self._new_counts()
+            for counts in [self.total, self.len_bins[len_bin], self.speakers[speaker]]:
+                counts['n_word'] += n_word
+                counts['n_char'] += n_char
+                for k, v in zip(['err', 'sub', 'ins', 'del'], res_w):
+                    counts[k + '_w'] += v
+                for k, v in zip(['err', 'sub', 'ins', 'del'], res_c):
+                    counts[k + '_c'] += v
+                counts['n_utt'] += 1
+            self.n_utt += 1
+
+    def update(self):
+        """Score utterances written since the last call.
+
+        Returns:
+            n_utt (int): number of newly scored utterances
+
+        """
+        n_workers = max(self.n_workers, 1)
+        max_lines = self.chunk_size * n_workers
+        pool = multiprocessing.Pool(n_workers) if n_workers > 1 else None
+        n_utt = 0
+        try:
+            while True:
+                n_lines = sum([self._read_new_lines(side, max_lines) for side in ['ref', 'hyp']])
+                pairs = self._pop_pairs()
+                chunks = [(pairs[i:i + self.chunk_size], self.remove_space)
+                          for i in range(0, len(pairs), self.chunk_size)]
+                if pool is not None:
+                    for results in pool.imap(_score_chunk, chunks):
+                        self._accumulate(results)
+                else:
+                    for chunk in chunks:
+                        self._accumulate(_score_chunk(chunk))
+                n_utt += len(pairs)
+                if n_lines == 0:
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return n_utt
+
+    @staticmethod
+    def _rates(counts):
+        n_word = max(counts['n_word'], 1)
+        n_char = max(counts['n_char'], 1)
+        return OrderedDict([
+            ('wer', counts['err_w'] * 100 / n_word),
+            ('sub_w', counts['sub_w'] * 100 / n_word),
+            ('ins_w', counts['ins_w'] * 100 / n_word),
+            ('del_w', counts['del_w'] * 100 / n_word),
+            ('cer', counts['err_c'] * 100 / n_char),
+            ('sub_c', counts['sub_c'] * 100 / n_char),
+            ('ins_c', counts['ins_c'] * 100 / n_char),
+            ('del_c', counts['del_c'] * 100 / n_char),
+            ('n_word', counts['n_word']),
+            ('n_char', counts['n_char']),
+            ('n_utt', counts['n_utt']),
+        ])
+
+    def summary(self):
+        """Summarize error rates.
+
+        Returns:
+            summary (dict): error rates in total, per reference length bin and per speaker
+
+        """
+        return OrderedDict([
+            ('total', self._rates(self.total)),
+            ('len_bins', OrderedDict([(k, self._rates(v)) for k, v in sorted(self.len_bins.items())])),
+            ('speakers', OrderedDict([(k, self._rates(v)) for k, v in sorted(self.speakers.items())])),
+            ('n_unmatched', len(self.pending['ref']) + len(self.pending['hyp'])),
+        ])
+
+
+def score_trn(ref_trn, hyp_trn, n_workers=1, chunk_size=1000, bin_size=10,
+              remove_space=False):
+    """Score hyp.trn against ref.trn.
+
+    Args:
+        ref_trn (str): path to ref.trn
+        hyp_trn (str): path to hyp.trn
+        n_workers (int): number of processes for scoring
+        chunk_size (int): number of utterances per job
+        bin_size (int): width of reference length bins in words
+        remove_space (bool): remove spaces before computing CER (e.g., CSJ)
+    Returns:
+        summary (dict): error rates in total, per reference length bin and per speaker
+
+    """
+    scorer = TrnScorer(ref_trn, hyp_trn, n_workers, chunk_size, bin_size, remove_space)
+    scorer.update()
+    return scorer.summary()
@@ -31,23 +31,23 @@ class MBR(torch.autograd.Function):
             log_probs (FloatTensor): `[N_best, L, vocab]`
             hyps (LongTensor): `[N_best, L]`
             exp_risk (FloatTensor): `[1]` (for forward)
-            grad (FloatTensor): `[1]` (for backward)
+            grad (FloatTensor): `[N_best, L]` (for backward)
+                gradients w.r.t. log-probabilities of hypothesis tokens (0 for padding)
         Returns:
             loss (FloatTensor): `[1]`
 
         """
-        device_id = torch.cuda.device_of(log_probs).idx
-        onehot = torch.eye(log_probs.size(-1)).cuda(device_id)[hyps]
-        grads = grad * onehot  # mask out other classes
-        log_probs = log_probs.requires_grad_()
-        ctx.save_for_backward(log_probs, grads)
-        return exp_risk
+        ctx.save_for_backward(hyps, grad)
+        ctx.size = log_probs.size()
+        return exp_risk.clone()
 
     @staticmethod
     def backward(ctx, grad_output):
-        input, grads, = ctx.saved_tensors
-        input.grad = grads
-        return input, None, None, None
+        hyps, grad, = ctx.saved_tensors
+        # scatter gradients to hypothesis tokens instead of masking with one-hot vectors
+        grads = grad.new_zeros(ctx.size).scatter_(
+            2, hyps.unsqueeze(2), grad.expand_as(hyps).unsqueeze(2))
+        return grads * grad_output, None, None, None
 
 
 def cross_entropy_lsm(logits, ys, lsm_prob, ignore_index, training, normalize_length=False):
@@ -114,6 +114,24 @@ def distillation(logits_student, logits_teacher, ylens, temperature=5.0):
     return loss_mean
 
 
+def distillation_topk(logits_student, topk_ids, topk_probs, ylens):
+    """Compute cross entropy loss for knowledge distillation from top-k teacher posteriors.
+
+    Args:
+        logits_student (FloatTensor): `[B, T, vocab]`
+        topk_ids (LongTensor): `[B, T, k]`
+        topk_probs (FloatTensor): `[B, T, k]` (padded with 0)
+        ylens (IntTensor): `[B]`
+    Returns:
+        loss_mean (FloatTensor): `[1]`
+
+    """
+    log_probs_student = torch.log_softmax(logits_student, dim=-1)
+    loss = -torch.mul(topk_probs, log_probs_student.gather(2, topk_ids))
+    loss_mean = loss.sum() / ylens.sum()
+    return loss_mean
+
+
 def kldiv_lsm_ctc(logits, ylens):
     """Compute KL divergence loss for label smoothing of CTC and Transducer models.
 
@@ -9,6 +9,7 @@
 import torch.nn as nn
 
 from torch.nn import DataParallel
+from torch.nn.parallel import DistributedDataParallel
 from torch.nn.parallel.scatter_gather import gather
 
 
@@ -37,6 +38,18 @@ class CustomDataParallel(DataParallel):
             raise ValueError(n_returns)
 
 
+class CustomDistributedDataParallel(DistributedDataParallel):
+    """DistributedDataParallel for ASR and LM models.
+       Forward passes for evaluation (is_eval=True) run on the local module
+       without gradient synchronization, so that only some processes can evaluate.
+    """
+
+    def forward(self, *args, **kwargs):
+        if kwargs.get('is_eval', False):
+            return self.module(*args, **kwargs)
+        return super(CustomDistributedDataParallel, self).forward(*args, **kwargs)
+
+
 class CPUWrapperASR(nn.Module):
     def __init__(self, model):
         super(CPUWrapperASR, self).__init__()
@@ -8,6 +8,7 @@
 
 from collections import OrderedDict
 import logging
+import torch
 import torch.nn as nn
 
 from neural_sp.models.lm.lm_base import LMBase
@@ -40,9 +41,7 @@ class GatedConvLM(LMBase):
         # for cache
         self.cache_theta = 0.2  # smoothing parameter
         self.cache_lambda = 0.2  # cache weight
-        self.cache_ids = []
-        self.cache_keys = []
-        self.cache_attn = []
+        self.reset_cache()
 
         self.embed = nn.Embedding(self.vocab, args.emb_dim, padding_idx=self.pad)
         self.dropout_embed = nn.Dropout(p=args.dropout_in)
@@ -188,27 +187,43 @@ class GatedConvLM(LMBase):
             else:
                 raise ValueError(n)
 
-    def decode(self, ys, state=None, mems=None, incremental=False):
+    def decode(self, ys, state=None, mems=None, cache=None, incremental=False):
         """Decode function.
 
         Args:
             ys (LongTensor): `[B, L]`
-            state: dummy interfance for RNNLM
+            state (list): length `n_blocks`, each of which contains a FloatTensor
+                `[B, in_ch, kernel_size - 1, 1]` (the last inputs to each block).
+                This is used only in the incremental mode.
+            mems: dummy interfance for TransformerXL
             cache: dummy interfance for TransformerLM/TransformerXL
-            incremental: dummy interfance for TransformerLM/TransformerXL
+            incremental (bool): ASR decoding mode.
+                If state is given, ys contains only new tokens following the state.
         Returns:
             logits (FloatTensor): `[B, L, vocab]`
             out (FloatTensor): `[B, L, d_model]` (for cache)
-            new_cache: dummy interfance for RNNLM/TransformerLM/TransformerXL
-            new_mems: dummy interfance for TransformerXL
+            new_state (list): length `n_blocks`, each of which contains a FloatTensor
+                `[B, in_ch, kernel_size - 1, 1]`. None is returned in the non-incremental mode.
 
         """
         out = self.dropout_embed(self.embed(ys.long()))
         bs, max_ylen = out.size()[:2]
 
         # NOTE: consider embed_dim as in_ch
-        out = out.unsqueeze(3)
-        out = self.blocks(out.transpose(2, 1))  # [B, out_ch, T, 1]
+        out = out.unsqueeze(3).transpose(2, 1)  # `[B, in_ch, T, 1]`
+        new_state = None
+        if incremental:
+            new_state = []
+            for lth, block in enumerate(self.blocks):
+                if state is None:
+                    left = out.new_zeros(bs, out.size(1), block.kernel_size - 1, 1)
+                else:
+                    left = state[lth]
+                cat = torch.cat([left, out], dim=2)
+                new_state.append(cat[:, :, cat.size(2) - (block.kernel_size - 1):])
+                out = block(out, cache=left)  # `[B, out_ch, T, 1]`
+        else:
+            out = self.blocks(out)  # `[B, out_ch, T, 1]`
         out = out.transpose(2, 1).contiguous()  # `[B, T, out_ch, 1]`
         out = out.squeeze(3)
         if self.adaptive_softmax is None:
@@ -216,4 +231,4 @@ class GatedConvLM(LMBase):
         else:
             logits = out
 
-        return logits, out, None
+        return logits, out, new_state
@@ -15,6 +15,7 @@ from neural_sp.models.criterion import cross_entropy_lsm
 from neural_sp.models.torch_utils import compute_accuracy
 from neural_sp.models.torch_utils import np2tensor
 from neural_sp.models.torch_utils import pad_list
+from neural_sp.profiler import timed
 
 logger = logging.getLogger(__name__)
 
@@ -72,33 +73,19 @@ class LMBase(ModelBase):
             logits = logits[:, -1].unsqueeze(1)
 
         # Compute XE sequence loss
-        if n_caches > 0 and len(self.cache_ids) > 0:
-            assert ys_out.size(1) == 1
-            assert ys_out.size(0) == 1
+        if n_caches > 0:
+            if predict_last:
+                out = out[:, -1:]
             if self.adaptive_softmax is None:
                 probs = torch.softmax(logits, dim=-1)
             else:
-                probs = self.adaptive_softmax.log_prob(logits).exp()
-            cache_probs = probs.new_zeros(probs.size())
-
-            # Truncate cache
-            self.cache_ids = self.cache_ids[-n_caches:]  # list of `[B, 1]`
-            self.cache_keys = self.cache_keys[-n_caches:]  # list of `[B, 1, n_units]`
-
-            # Compute inner-product over caches
-            cache_attn = torch.softmax(self.cache_theta * torch.matmul(
-                torch.cat(self.cache_keys, dim=1), out.transpose(2, 1)).squeeze(2), dim=1)
-
-            # For visualization
-            if len(self.cache_ids) == n_caches:
-                self.cache_attn += [cache_attn.cpu().numpy()]
-                self.cache_attn = self.cache_attn[-n_caches:]
-
-            # Sum all probabilities
-            for offset, idx in enumerate(self.cache_ids):
-                cache_probs[:, :, idx] += cache_attn[:, offset]
-            probs = (1 - self.cache_lambda) * probs + self.cache_lambda * cache_probs
-            loss = -torch.log(probs[:, :, ys_out[:, -1]])
+                bs, ymax = logits.size()[:2]
+                probs = self.adaptive_softmax.log_prob(
+                    logits.reshape(-1, logits.size(2))).exp().view(bs, ymax, -1)
+            probs = self.cache_probs(probs, out, ys_out, n_caches)
+            nll = -torch.log(probs.gather(2, ys_out.unsqueeze(2))).squeeze(2)  # `[B, L]`
+            loss = nll.masked_select(ys_out != self.pad).mean()
+            ppl = np.exp(loss.item())
         else:
             if self.adaptive_softmax is None:
                 loss, ppl = cross_entropy_lsm(logits, ys_out.contiguous(),
@@ -109,11 +96,6 @@ class LMBase(ModelBase):
                                              ys_out.contiguous().view(-1)).loss
                 ppl = np.exp(loss.item())
 
-        if n_caches > 0:
-            # Register to cache
-            self.cache_ids += [ys_out[0, -1].item()]
-            self.cache_keys += [out]
-
         # Compute token-level accuracy in teacher-forcing
         if self.adaptive_softmax is None:
             acc = compute_accuracy(logits, ys_out, pad=self.pad)
@@ -124,6 +106,76 @@ class LMBase(ModelBase):
         observation = {'loss.lm': loss.item(), 'acc.lm': acc, 'ppl.lm': ppl}
         return loss, new_state, observation
 
+    def reset_cache(self):
+        """Reset the neural cache."""
+        self.cache_keys = None  # ring buffer of `[B, n_caches, n_units]`
+        self.cache_ids = None  # ring buffer of `[B, n_caches]`
+        self.cache_len = 0
+        self.cache_pos = 0
+        self.cache_attn = []  # for visualization
+
+    def cache_probs(self, probs, out, ys_out, n_caches):
+        """Interpolate output probabilities with the neural cache and register new states.
+           Each query attends to the last `n_caches` states before it.
+
+        Args:
+            probs (FloatTensor): `[B, L, vocab]`
+            out (FloatTensor): `[B, L, n_units]`
+            ys_out (LongTensor): `[B, L]`
+            n_caches (int): number of cached states
+        Returns:
+            probs (FloatTensor): `[B, L, vocab]`
+
+        """
+        bs, ylen = ys_out.size()
+        if self.cache_keys is None or self.cache_keys.size()[:2] != (bs, n_caches):
+            self.reset_cache()
+            self.cache_keys = out.new_zeros(bs, n_caches, out.size(2))
+            self.cache_ids = ys_out.new_zeros(bs, n_caches)
+
+        # Concatenate cached states in chronological order with the current ones
+        n_prev = self.cache_len
+        slots = (torch.arange(n_prev, device=out.device) + self.cache_pos - n_prev) % n_caches
+        keys = torch.cat([self.cache_keys[:, slots], out], dim=1)  # `[B, n_prev + L, n_units]`
+        ids = torch.cat([self.cache_ids[:, slots], ys_out], dim=1)  # `[B, n_prev + L]`
+
+        query_pos = torch.arange(ylen, device=out.device).unsqueeze(1) + n_prev  # `[L, 1]`
+        key_pos = torch.arange(n_prev + ylen, device=out.device).unsqueeze(0)  # `[1, n_prev + L]`
+        mask = (key_pos < query_pos) & (key_pos >= query_pos - n_caches)  # `[L, n_prev + L]`
+
+        # Compute inner-product over caches
+        e = self.cache_theta * torch.matmul(out, keys.transpose(2, 1))  # `[B, L, n_prev + L]`
+        NEG_INF = float(np.finfo(torch.tensor(0, dtype=e.dtype).numpy().dtype).min)
+        e = e.masked_fill_(mask.unsqueeze(0) == 0, NEG_INF)
+        cache_attn = torch.softmax(e, dim=-1) * mask.unsqueeze(0).type_as(e)
+
+        # Sum all probabilities
+        cache_probs = torch.zeros_like(probs).scatter_add_(
+            2, ids.unsqueeze(1).expand(-1, ylen, -1), cache_attn)
+        has_cache = (query_pos > 0).unsqueeze(0)  # `[1, L, 1]`
+        probs = torch.where(has_cache,
+                            (1 - self.cache_lambda) * probs + self.cache_lambda * cache_probs,
+                            probs)
+
+        # For visualization
+        is_full = (query_pos >= n_caches).squeeze(1)
+        if is_full.any():
+            window = (query_pos - n_caches + torch.arange(n_caches, device=out.device)).clamp(min=0)
+            aws = cache_attn.gather(2, window.unsqueeze(0).expand(bs, -1, -1))  # `[B, L, n_caches]`
+            aws = aws[:, is_full].cpu().numpy()
+            self.cache_attn += [aws[:, t] for t in range(aws.shape[1])]
+            self.cache_attn = self.cache_attn[-n_caches:]
+
+        # Register to cache
+        n_new = min(ylen, n_caches)
+        slots = (torch.arange(n_new, device=out.device) + self.cache_pos) % n_caches
+        self.cache_keys[:, slots] = out[:, -n_new:]
+        self.cache_ids[:, slots] = ys_out[:, -n_new:]
+        self.cache_pos = (self.cache_pos + n_new) % n_caches
+        self.cache_len = min(self.cache_len + ylen, n_caches)
+
+        return probs
+
     def repackage_state(self, state):
         return state
 
@@ -134,6 +186,7 @@ class LMBase(ModelBase):
     def decode(self, ys, state=None, mems=None, incremental=False):
         raise NotImplementedError
 
+    @timed('lm.predict')
     def predict(self, ys, state=None, mems=None, cache=None):
         """Precict function for ASR.
 
@@ -63,7 +63,8 @@ class CIF(nn.Module):
             eouts (FloatTensor): `[B, T, enc_dim]`
             elens (IntTensor): `[B]`
             ylens (IntTensor): `[B]`
-            mode (str): parallel/incremental
+            mode (str): parallel/incremental.
+                In the incremental mode, the first token fired over the given frames is returned.
         Returns:
             cv (FloatTensor): `[B, L, enc_dim]`
             alpha (FloatTensor): `[B, T]`
@@ -86,74 +87,54 @@ class CIF(nn.Module):
             mask = make_pad_mask(elens.to(device))
             alpha = alpha.clone().masked_fill_(mask == 0, 0)
 
-            alpha_norm = alpha / alpha.sum(1, keepdim=True) * ylens.float().unsqueeze(1)
+            # NOTE: integrate exactly ylens * beta so that ylens tokens are fired
+            alpha_norm = alpha / alpha.sum(1, keepdim=True) * (ylens.float().unsqueeze(1) * self.beta)
             ymax = int(ylens.max().item())
         elif mode == 'incremental':
             alpha_norm = alpha  # infernece time
+            if elens is not None:
+                mask = make_pad_mask(elens.to(eouts.device))
+                alpha_norm = alpha_norm.masked_fill(mask == 0, 0)
             ymax = 1
-            if bs > 1:
-                raise NotImplementedError('Batch mode is not supported.')
-                # TODO(hirofumi0810): support batch mode
         else:
             raise ValueError(mode)
 
-        cv = eouts.new_zeros(bs, ymax + 1, enc_dim)
-        aws = eouts.new_zeros(bs, ymax + 1, xmax)
-        n_tokens = torch.zeros(bs, dtype=torch.int64)
-        state = eouts.new_zeros(bs, self.enc_dim)
-        alpha_accum = eouts.new_zeros(bs)
-        for j in range(xmax):
-            alpha_accum_prev = alpha_accum
-            alpha_accum += alpha_norm[:, j]
-
-            if mode == 'parallel' and (alpha_accum >= self.beta).sum() == 0:
-                # No boundary is located in all utterances in mini-batch
-                # Carry over to the next frame
-                state += alpha_norm[:, j, None] * eouts[:, j]
-                aws[:, n_tokens, j] += alpha_norm[:, j]
-            else:
-                for b in range(bs):
-                    # skip the padding region
-                    if j > elens[b] - 1:
-                        continue
-
-                    # skip all-fired utterance
-                    if mode == 'parallel' and n_tokens[b].item() >= ylens[b]:
-                        continue
-
-                    if alpha_accum[b] < self.beta:
-                        # No boundary is located
-                        # Carry over to the next frame
-                        state[b] += alpha_norm[b, j, None] * eouts[b, j]
-                        aws[b, n_tokens[b], j] += alpha_norm[b, j]
-
-                        # tail handling
-                        if mode == 'incremental' and j == elens[b] - 1:
-                            if alpha_accum[b] >= 0.5:
-                                n_tokens[b] += 1
-                                cv[b, n_tokens[b]] = state[b]
-                            break
-                    else:
-                        # A boundary is located
-                        ak1 = 1 - alpha_accum_prev[b]
-                        ak2 = alpha_norm[b, j] - ak1
-                        cv[b, n_tokens[b]] = state[b] + ak1 * eouts[b, j]
-                        aws[b, n_tokens[b], j] += ak1
-                        n_tokens[b] += 1
-                        # Carry over to the next frame
-                        state[b] = ak2 * eouts[b, j]
-                        alpha_accum[b] = ak2
-                        aws[b, n_tokens[b], j] += ak2
-
-                        if mode == 'incremental':
-                            break
-
-                if mode == 'incremental' and n_tokens[0] >= 1:
-                    break
-                    # TODO(hirofumi0810): support batch mode
-
-        # truncate
-        cv = cv[:, :ymax]
-        aws = aws[:, :ymax]
+        aws = self.integrate(alpha_norm, ymax)  # `[B, ymax, T]`
+
+        if mode == 'parallel':
+            # remove numerical residuals beyond the reference length
+            token_mask = make_pad_mask(ylens)  # `[B, ymax]`
+            aws = aws.masked_fill(token_mask.unsqueeze(2) == 0, 0)
+            cv = torch.bmm(aws, eouts)  # `[B, ymax, enc_dim]`
+        else:
+            # A boundary is located in the given frames, or the accumulated weights
+            # at the last frame are large enough (tail handling)
+            alpha_accum = alpha_norm.sum(1)  # `[B]`
+            fired = alpha_accum >= min(self.beta, 0.5)
+            cv = torch.bmm(aws, eouts) * fired.float().view(bs, 1, 1)  # `[B, 1, enc_dim]`
 
         return cv, alpha, aws
+
+    def integrate(self, alpha, ymax):
+        """Integrate weights and fire at every threshold crossing.
+
+        The n-th token integrates the part of the cumulative weights in
+        `[n * beta, (n + 1) * beta)`, so that the weight of a frame crossing a
+        boundary is split into the current and the next tokens.
+        This is equivalent to the frame-by-frame integration but
+        computed for all utterances and frames at once.
+
+        Args:
+            alpha (FloatTensor): `[B, T]`
+            ymax (int): number of tokens to integrate
+        Returns:
+            aws (FloatTensor): `[B, ymax, T]`
+
+        """
+        alpha_accum = torch.cumsum(alpha, dim=1)  # `[B, T]`
+        alpha_accum_prev = alpha_accum - alpha  # `[B, T]`
+        lower = torch.arange(ymax, dtype=alpha.dtype, device=alpha.device) * self.beta  # `[ymax]`
+        upper = lower + self.beta
+        aws = torch.min(alpha_accum.unsqueeze(1), upper.view(1, ymax, 1)) - \
+            torch.max(alpha_accum_prev.unsqueeze(1), lower.view(1, ymax, 1))
+        return aws.clamp(min=0)  # `[B, ymax, T]`
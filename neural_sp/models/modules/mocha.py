@@ -387,6 +387,12 @@ class MoChA(nn.Module):
         # for chunkwise attention during streaming decoding
         self.key_prev_tail = key[:, -(self.w - 1):]
 
+    def _key_prev_tail(self, bs):
+        """Broadcast the cached tail to the current batch (e.g., beams)."""
+        if self.key_prev_tail.size(0) == bs:
+            return self.key_prev_tail
+        return self.key_prev_tail[0:1].repeat([bs, 1, 1])
+
     def recursive(self, e_ma, aw_prev):
         bs, n_heads_ma, qlen, klen = e_ma.size()
         p_choose = torch.sigmoid(add_gaussian_noise(e_ma, self.noise_std))  # `[B, H_ma, qlen, klen]`
@@ -398,11 +404,14 @@ class MoChA(nn.Module):
             # Compute attention distribution recursively as
             # q_j = (1 - p_choose_j) * q_(j-1) + aw_prev_j
             # alpha_j = p_choose_j * q_j
-            q = e_ma.new_zeros(bs, self.n_heads_ma, 1, klen + 1)
+            # NOTE: accumulate q_j in a list instead of in-place updates to avoid cloning at every step
+            q_j = e_ma.new_zeros(bs, self.n_heads_ma, 1)
+            q = []
             for j in range(klen):
-                q[:, :, i:i + 1, j + 1] = shifted_1mp_choose[:, :, i:i + 1, j].clone() * q[:, :, i:i + 1, j].clone() + \
-                    aw_prev[:, :, :, j].clone()
-            aw_prev = p_choose[:, :, i:i + 1] * q[:, :, i:i + 1, 1:]  # `[B, H_ma, 1, klen]`
+                q_j = shifted_1mp_choose[:, :, :, j] * q_j + aw_prev[:, :, :, j]
+                q.append(q_j)
+            q = torch.stack(q, dim=-1)  # `[B, H_ma, 1, klen]`
+            aw_prev = p_choose[:, :, i:i + 1] * q  # `[B, H_ma, 1, klen]`
             alpha.append(aw_prev)
         alpha = torch.cat(alpha, dim=2) if qlen > 1 else alpha[-1]  # `[B, H_ma, qlen, klen]`
         return alpha, p_choose
@@ -414,16 +423,23 @@ class MoChA(nn.Module):
 
         # safe_cumprod computes cumprod in logspace with numeric checks
         cumprod_1mp_choose = safe_cumprod(1 - p_choose, eps=self.eps)  # `[B, H_ma, qlen, klen]`
+
+        # Mask the right part from the trigger point
+        decot_mask = None
+        if self.decot and trigger_point is not None:
+            pos = torch.arange(klen, device=e_ma.device)
+            trigger_point = torch.as_tensor(trigger_point, device=e_ma.device).long()
+            decot_mask = pos.unsqueeze(0) > (trigger_point.view(bs, 1) + self.lookahead)
+            decot_mask = decot_mask.view(bs, 1, 1, klen)  # `[B, 1, 1, klen]`
+
         # Compute recurrence relation solution
         for i in range(qlen):
             denom = 1 if self.no_denom else torch.clamp(
                 cumprod_1mp_choose[:, :, i:i + 1], min=self.eps, max=1.0)
             aw_prev = p_choose[:, :, i:i + 1] * cumprod_1mp_choose[:, :, i:i + 1] * torch.cumsum(
                 aw_prev / denom, dim=-1)  # `[B, H_ma, 1, klen]`
-            # Mask the right part from the trigger point
-            if self.decot and trigger_point is not None:
-                for b in range(bs):
-                    aw_prev[b, :, :, trigger_point[b] + self.lookahead + 1:] = 0
+            if decot_mask is not None:
+                aw_prev = aw_prev.masked_fill(decot_mask, 0)
             alpha.append(aw_prev)
 
         alpha = torch.cat(alpha, dim=2) if qlen > 1 else alpha[-1]  # `[B, H_ma, qlen, klen]`
@@ -461,23 +477,7 @@ class MoChA(nn.Module):
             alpha = p_choose_i * exclusive_cumprod(1 - p_choose_i)  # `[B, H_ma, 1 (qlen), klen]`
 
         if eps_wait > 0:
-            for b in range(bs):
-                # no boundary until the last frame for all heads
-                if alpha[b].sum() == 0:
-                    continue
-
-                leftmost = alpha[b, :, 0].nonzero()[:, -1].min().item()
-                rightmost = alpha[b, :, 0].nonzero()[:, -1].max().item()
-                for h in range(self.n_heads_ma):
-                    # no bondary at the h-th head
-                    if alpha[b, h, 0].sum().item() == 0:
-                        alpha[b, h, 0, min(rightmost, leftmost + eps_wait)] = 1
-                        continue
-
-                    # surpass acceptable latency
-                    if alpha[b, h, 0].nonzero()[:, -1].min().item() >= leftmost + eps_wait:
-                        alpha[b, h, 0, :] = 0  # reset
-                        alpha[b, h, 0, leftmost + eps_wait] = 1
+            alpha = head_synchronous_boundary(alpha, eps_wait)
 
         return alpha, None
 
@@ -551,7 +551,7 @@ class MoChA(nn.Module):
 
             if mode == 'hard':
                 if self.key_prev_tail is not None:
-                    key_ = torch.cat([self.key_prev_tail[0:1].repeat([bs, 1, 1]), key], dim=1)
+                    key_ = torch.cat([self._key_prev_tail(bs), key], dim=1)
                 else:
                     key_ = key
                 e_ca = self.chunk_energy(key_, query, mask, cache=cache,
@@ -603,7 +603,7 @@ class MoChA(nn.Module):
                 cv = torch.bmm(alpha.squeeze(1), value)  # `[B, 1, adim]`
             else:
                 if self.key_prev_tail is not None:
-                    value_ = torch.cat([self.key_prev_tail[0:1].repeat([bs, 1, 1]), value], dim=1)
+                    value_ = torch.cat([self._key_prev_tail(bs), value], dim=1)
                     cv = torch.bmm(beta.squeeze(1), value_)  # `[B, 1, adim]`
                 else:
                     cv = torch.bmm(beta.squeeze(1), value)  # `[B, 1, adim]`
@@ -789,18 +789,58 @@ def hard_chunkwise_attention(alpha, u, mask, chunk_size, n_heads_chunk,
         else:
             u = u.view(bs, n_heads_mono, n_heads_chunk, qlen, klen)
 
-    mask = alpha.clone().byte()  # `[B, H_ma, H_ca, qlen, klen]`
-    for b in range(bs):
-        for h in range(n_heads_mono):
-            if alpha[b, h, 0, 0].sum() > 0:
-                boundary = alpha[b, h, 0, 0].nonzero()[:, -1].min().item()
-                if chunk_size == -1:
-                    # infinite lookback attention
-                    mask[b, h, :, 0, 0:boundary + 1] = 1
-                else:
-                    mask[b, h, :, 0, max(0, boundary - chunk_size + 1):boundary + 1] = 1
+    # Attend to the window ending at the boundary of each monotonic head
+    boundary = first_boundary(alpha[:, :, 0])  # `[B, H_ma, qlen]`
+    pos = torch.arange(klen, device=alpha.device)
+    window = (pos <= boundary.unsqueeze(-1)) & (boundary < klen).unsqueeze(-1)  # `[B, H_ma, qlen, klen]`
+    if chunk_size != -1:
+        window = window & (pos >= (boundary - chunk_size + 1).unsqueeze(-1))
+    # NOTE: infinite lookback attention when chunk_size == -1
+    mask = (alpha != 0) | window.unsqueeze(2)  # `[B, H_ma, H_ca, qlen, klen]`
 
     NEG_INF = float(np.finfo(torch.tensor(0, dtype=u.dtype).numpy().dtype).min)
     u = u.masked_fill(mask == 0, NEG_INF)
     beta = torch.softmax(u, dim=-1)
     return beta.view(bs, -1, qlen, klen)
+
+
+def first_boundary(alpha):
+    """Find the leftmost boundary of each monotonic head.
+
+    Args:
+        alpha (FloatTensor): `[B, H_ma, qlen, klen]`
+    Returns:
+        boundary (LongTensor): `[B, H_ma, qlen]`. klen is filled where no boundary is detected.
+
+    """
+    klen = alpha.size(-1)
+    pos = torch.arange(klen, device=alpha.device).expand_as(alpha)
+    return pos.masked_fill(alpha == 0, klen).min(dim=-1)[0]
+
+
+def head_synchronous_boundary(alpha, eps_wait):
+    """Synchronize boundaries of monotonic heads at test time (head-synchronous decoding).
+
+    Heads that have not detected a boundary or surpass the acceptable latency
+    are forced to attend to `min(rightmost, leftmost + eps_wait)`.
+
+    Args:
+        alpha (FloatTensor): `[B, H_ma, qlen, klen]`
+        eps_wait (int): wait time delay for head-synchronous decoding in MMA
+    Returns:
+        alpha (FloatTensor): `[B, H_ma, qlen, klen]`
+
+    """
+    klen = alpha.size(-1)
+    boundary = first_boundary(alpha)  # `[B, H_ma, qlen]`
+    has_boundary = boundary < klen
+    leftmost = boundary.min(dim=1, keepdim=True)[0]  # `[B, 1, qlen]`
+    rightmost = boundary.masked_fill(~has_boundary, -1).max(dim=1, keepdim=True)[0]  # `[B, 1, qlen]`
+    # no boundary until the last frame for all heads
+    active = has_boundary.any(dim=1, keepdim=True)
+    # no boundary at the h-th head or surpass acceptable latency
+    update = active & (~has_boundary | (boundary >= leftmost + eps_wait))  # `[B, H_ma, qlen]`
+    target = torch.min(rightmost, leftmost + eps_wait).clamp(min=0, max=klen - 1)
+    target = target.expand_as(boundary).unsqueeze(-1)
+    alpha_sync = alpha.new_zeros(alpha.size()).scatter_(-1, target, 1)
+    return torch.where(update.unsqueeze(-1), alpha_sync, alpha)
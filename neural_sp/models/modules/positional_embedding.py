@@ -6,6 +6,7 @@
 
 """Positional Embeddings."""
 
+from collections import OrderedDict
 import copy
 import logging
 import math
@@ -96,9 +97,20 @@ class PositionalEncoding(nn.Module):
 
 
 class XLPositionalEmbedding(nn.Module):
-    """Positional embedding for TransformerXL."""
+    """Positional embedding for TransformerXL.
 
-    def __init__(self, d_model, dropout):
+    Sinusoidal tables are cached per device and grown on demand, so that
+    repeated calls (after each subsampling layer in the encoder and at every
+    incremental decoding step) only slice a precomputed table.
+
+    Args:
+        d_model (int): dimension of MultiheadAttentionMechanism
+        dropout (float): dropout probability
+        max_cache (int): maximum number of cached positional embeddings
+
+    """
+
+    def __init__(self, d_model, dropout, max_cache=64):
 
         super().__init__()
 
@@ -108,6 +120,65 @@ class XLPositionalEmbedding(nn.Module):
 
         self.dropout = nn.Dropout(p=dropout)
 
+        # for cache
+        self.max_cache = max_cache
+        self._tables = {}  # (device, dtype) -> (table, top position, bottom position)
+        self._cache = OrderedDict()  # (L, mlen, clamp_len, zero_center_offset, device) -> pos_emb
+
+    def reset_cache(self):
+        """Clear all cached tables."""
+        self._tables = {}
+        self._cache = OrderedDict()
+
+    def _sinusoid(self, pos_idxs):
+        # outer product
+        sinusoid_inp = torch.einsum("i,j->ij", pos_idxs, self.inv_freq)
+        return torch.cat([sinusoid_inp.sin(), sinusoid_inp.cos()], dim=-1)
+
+    def _table(self, top, bottom, device):
+        """Get a table covering positions from `top` down to `bottom`.
+
+        Args:
+            top (int): largest position
+            bottom (int): smallest position
+            device (torch.device): device
+        Returns:
+            table (FloatTensor): `[table_top - table_bottom + 1, d_model]`,
+                where the i-th row corresponds to position `table_top - i`
+            table_top (int): largest position in the table
+
+        """
+        key = (device, self.inv_freq.dtype)
+        if key in self._tables:
+            table, table_top, table_bottom = self._tables[key]
+            if table_top >= top and table_bottom <= bottom:
+                return table, table_top
+            # grow geometrically to amortize recomputation over incremental steps
+            top = max(top, 2 * table_top + 1) if top > table_top else table_top
+            bottom = min(bottom, 2 * table_bottom - 1) if bottom < table_bottom else table_bottom
+        pos_idxs = torch.arange(top, bottom - 1, -1.0, dtype=self.inv_freq.dtype, device=device)
+        table = self._sinusoid(pos_idxs)
+        self._tables[key] = (table, top, bottom)
+        return table, top
+
+    def _lookup(self, qlen, mlen, clamp_len, zero_center_offset, device):
+        if zero_center_offset:
+            top, bottom = mlen - 1, -qlen
+        else:
+            top, bottom = mlen + qlen - 1, 0
+
+        if clamp_len <= 0 or top <= clamp_len:
+            table, table_top = self._table(top, bottom, device)
+            return table[table_top - top:table_top - bottom + 1]
+
+        # truncate by maximum length
+        table, table_top = self._table(clamp_len, min(bottom, clamp_len), device)
+        n_clamped = top - clamp_len + 1 if bottom <= clamp_len else top - bottom + 1
+        pos_emb_clamped = table[table_top - clamp_len:table_top - clamp_len + 1].expand(n_clamped, -1)
+        if bottom > clamp_len:
+            return pos_emb_clamped.contiguous()
+        return torch.cat([pos_emb_clamped, table[table_top - clamp_len + 1:table_top - bottom + 1]], dim=0)
+
     def forward(self, xs, mlen=0, clamp_len=-1, zero_center_offset=False):
         """Forward pass.
 
@@ -120,17 +191,15 @@ class XLPositionalEmbedding(nn.Module):
             pos_emb (LongTensor): `[L, 1, d_model]`
 
         """
-        if zero_center_offset:
-            pos_idxs = torch.arange(mlen - 1, -xs.size(1) - 1, -1.0, dtype=torch.float, device=xs.device)
+        key = (xs.size(1), mlen, clamp_len, zero_center_offset, xs.device)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            pos_emb = self._cache[key]
         else:
-            pos_idxs = torch.arange(mlen + xs.size(1) - 1, -1, -1.0, dtype=torch.float, device=xs.device)
-
-        # truncate by maximum length
-        if clamp_len > 0:
-            pos_idxs.clamp_(max=clamp_len)
-
-        # outer product
-        sinusoid_inp = torch.einsum("i,j->ij", pos_idxs, self.inv_freq)
-        pos_emb = torch.cat([sinusoid_inp.sin(), sinusoid_inp.cos()], dim=-1)
-        pos_emb = self.dropout(pos_emb)
+            pos_emb = self._lookup(xs.size(1), mlen, clamp_len, zero_center_offset, xs.device)
+            self._cache[key] = pos_emb
+            if len(self._cache) > self.max_cache:
+                self._cache.popitem(last=False)
+        if self.training:
+            pos_emb = self.dropout(pos_emb)
         return pos_emb.unsqueeze(1)
@@ -6,6 +6,7 @@
 
 """Relative multi-head attention layer for TransformerXL."""
 
+from collections import OrderedDict
 import logging
 import math
 import numpy as np
@@ -60,6 +61,9 @@ class RelativeMultiheadAttentionMechanism(nn.Module):
         if xl_like:
             self.w_pos = nn.Linear(qdim, adim, bias=bias)
 
+        # for cache of projected positional embeddings during inference
+        self._pos_proj_cache = OrderedDict()
+
         if param_init == 'xavier_uniform':
             self.reset_parameters(bias)
         else:
@@ -105,6 +109,50 @@ class RelativeMultiheadAttentionMechanism(nn.Module):
                       .view_as(xs))
         return xs_shifted.view(qlen, klen, bs, n_heads).permute(2, 0, 1, 3)
 
+    def _project_pos_embs(self, pos_embs, linear, max_cache=8):
+        """Project positional embeddings.
+
+        During inference, positional embeddings are slices of a table cached in
+        XLPositionalEmbedding. The whole table is projected once and sliced
+        afterwards, so that the projection is shared across beams and decoding steps.
+
+        Args:
+            pos_embs (FloatTensor): `[L, 1, d_model]`
+            linear (nn.Linear): projection layer
+            max_cache (int): maximum number of cached projected tables
+        Returns:
+            pos_embs (FloatTensor): `[L, 1, adim]`
+
+        """
+        if self.training or torch.is_grad_enabled():
+            return linear(pos_embs)
+
+        base = pos_embs if pos_embs._base is None else pos_embs._base
+        d_model = pos_embs.size(-1)
+        offset = pos_embs.storage_offset()
+        is_contiguous = pos_embs.is_contiguous() and base.is_contiguous() and base.storage_offset() == 0
+        is_row_slice = offset % d_model == 0 and offset + pos_embs.numel() <= base.numel()
+        if not (is_contiguous and is_row_slice):
+            return linear(pos_embs)
+
+        if isinstance(linear.weight, torch.Tensor):
+            key = (id(base), linear.weight.data_ptr(), linear.weight._version)
+        else:
+            # dynamically quantized layer (weights are fixed)
+            key = (id(base), id(linear), 0)
+        if key in self._pos_proj_cache:
+            self._pos_proj_cache.move_to_end(key)
+            pos_embs_proj = self._pos_proj_cache[key][1]
+        else:
+            pos_embs_proj = linear(base.view(-1, d_model))
+            # NOTE: keep a reference to the base table so that its id is not reused
+            self._pos_proj_cache[key] = (base, pos_embs_proj)
+            if len(self._pos_proj_cache) > max_cache:
+                self._pos_proj_cache.popitem(last=False)
+        start = offset // d_model
+        end = start + pos_embs.numel() // d_model
+        return pos_embs_proj[start:end].view(pos_embs.size()[:-1] + (-1,))
+
     def forward(self, key, query, pos_embs, mask, u_bias=None, v_bias=None):
         """Forward pass.
 
@@ -133,9 +181,9 @@ class RelativeMultiheadAttentionMechanism(nn.Module):
         q = self.w_query(key[:, -qlen:]).view(bs, -1, self.n_heads, self.d_k)  # `[B, qlen, H, d_k]`
 
         if self.xl_like:
-            _pos_embs = self.w_pos(pos_embs)
+            _pos_embs = self._project_pos_embs(pos_embs, self.w_pos)
         else:
-            _pos_embs = self.w_value(pos_embs)
+            _pos_embs = self._project_pos_embs(pos_embs, self.w_value)
         _pos_embs = _pos_embs.view(-1, self.n_heads, self.d_k)  # `[mlen+qlen, H, d_k]`
 
         # content-based attention term: (a) + (c)
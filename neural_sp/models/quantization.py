@@ -0,0 +1,175 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Post-training int8 quantization for CPU inference."""
+
+import importlib
+import logging
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+
+def _quantized_nn(name='quantized'):
+    """Namespace of quantized modules in this PyTorch version (moved to torch.ao in 1.13).
+
+    Args:
+        name (str): quantized or quantized.dynamic
+    Returns:
+        module (module):
+
+    """
+    try:
+        return importlib.import_module('torch.ao.nn.' + name)
+    except ImportError:
+        return importlib.import_module('torch.nn.' + name)
+
+
+def _dynamic_module_types():
+    """Float module types supported by dynamic quantization in this PyTorch version."""
+    dynamic = _quantized_nn('quantized.dynamic')
+    types = [nn.Linear, nn.LSTM]
+    for name in ['GRU', 'LSTMCell', 'GRUCell']:
+        if hasattr(dynamic, name):
+            types.append(getattr(nn, name))
+    return types
+
+
+def _is_skipped(name, skip_modules):
+    """Check if a module is under any of the module names to keep in fp32."""
+    return any([name == n or name.startswith(n + '.') for n in skip_modules])
+
+
+def _no_op():
+    pass
+
+
+def quantize_dynamic(model, skip_modules=[], dtype=torch.qint8):
+    """Quantize weights of Linear and recurrent layers to int8 in place.
+       Activations are quantized on the fly, so no calibration is required.
+
+    Args:
+        model (torch.nn.Module):
+        skip_modules (list): names of modules (e.g., `dec_fwd.output`) whose
+            submodules are kept in fp32
+        dtype (torch.dtype): dtype of weights
+    Returns:
+        model (torch.nn.Module):
+
+    """
+    types = _dynamic_module_types()
+    names = set([n for n, m in model.named_modules()
+                 if type(m) in types and not _is_skipped(n, skip_modules)])
+    logger.info('Quantize %d modules dynamically' % len(names))
+    torch.quantization.quantize_dynamic(model, qconfig_spec=names, dtype=dtype, inplace=True)
+
+    dynamic = _quantized_nn('quantized.dynamic')
+    rnn_types = tuple([getattr(dynamic, name) for name in ['LSTM', 'GRU'] if hasattr(dynamic, name)])
+    for m in model.modules():
+        if isinstance(m, rnn_types) and not hasattr(m, 'flatten_parameters'):
+            # NOTE: weights are already packed
+            m.flatten_parameters = _no_op
+    return model
+
+
+class QuantizedConv(nn.Module):
+
+    def __init__(self, conv):
+        """Convolution with int8 weights and activations taking and returning float tensors.
+           Hyperparameters of the wrapped layer are exposed to compute output lengths.
+
+        Args:
+            conv (nn.Conv1d or nn.Conv2d):
+
+        """
+        super(QuantizedConv, self).__init__()
+
+        self.kernel_size = conv.kernel_size
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+
+        self.quant = torch.quantization.QuantStub()
+        self.conv = conv
+        self.dequant = torch.quantization.DeQuantStub()
+
+    def forward(self, xs):
+        return self.dequant(self.conv(self.quant(xs)))
+
+
+def quantize_conv_frontend(model, calibrate_fn, skip_modules=[], backend='fbgemm'):
+    """Quantize convolutions in CNN encoders (frontends) statically in place.
+       Scales of activations are estimated by running `calibrate_fn(model)`.
+       Normalization and pooling layers are kept in fp32.
+
+    Args:
+        model (torch.nn.Module):
+        calibrate_fn (callable): function to forward representative inputs
+        skip_modules (list): names of modules whose submodules are kept in fp32
+        backend (str): quantization engine (fbgemm for x86, qnnpack for ARM)
+    Returns:
+        model (torch.nn.Module):
+
+    """
+    from neural_sp.models.seq2seq.encoders.conv import ConvEncoder
+
+    torch.backends.quantized.engine = backend
+    types = [nn.Conv2d]
+    if hasattr(_quantized_nn(), 'Conv1d'):
+        types.append(nn.Conv1d)
+
+    convs = []
+    for name, m in model.named_modules():
+        if not isinstance(m, ConvEncoder):
+            continue
+        for parent_name, parent in m.named_modules():
+            for child_name, child in parent.named_children():
+                full_name = '.'.join([n for n in [name, parent_name, child_name] if n])
+                if type(child) in types and not _is_skipped(full_name, skip_modules):
+                    convs.append((parent, child_name, child))
+    if len(convs) == 0:
+        logger.warning('No convolution to quantize statically')
+        return model
+
+    wrappers = []
+    for parent, child_name, child in convs:
+        wrapper = QuantizedConv(child)
+        wrapper.qconfig = torch.quantization.get_default_qconfig(backend)
+        torch.quantization.prepare(wrapper, inplace=True)
+        setattr(parent, child_name, wrapper)
+        wrappers.append(wrapper)
+
+    # Calibration
+    training = model.training
+    model.eval()
+    with torch.no_grad():
+        calibrate_fn(model)
+    model.train(training)
+
+    for wrapper in wrappers:
+        torch.quantization.convert(wrapper, inplace=True)
+    logger.info('Quantize %d convolutions statically' % len(wrappers))
+    return model
+
+
+def quantize_model(model, skip_modules=[], conv_calibrate_fn=None):
+    """Quantize a model for int8 inference on CPU.
+
+    Args:
+        model (torch.nn.Module):
+        skip_modules (list): names of modules whose submodules are kept in fp32
+        conv_calibrate_fn (callable): if given, convolutions in CNN encoders are
+            quantized statically with activation scales calibrated by this function
+    Returns:
+        model (torch.nn.Module):
+
+    """
+    model.eval()
+    if conv_calibrate_fn is not None:
+        quantize_conv_frontend(model, conv_calibrate_fn, skip_modules)
+    quantize_dynamic(model, skip_modules)
+    return model
@@ -70,9 +70,44 @@ class BeamSearch(object):
     def update_rnnlm_state_batch(self, lm, hyps, y):
         lmout, lmstate, scores_lm = None, None, None
         if lm is not None:
-            if hyps[0]['lmstate'] is not None:
-                lm_hxs = torch.cat([beam['lmstate']['hxs'] for beam in hyps], dim=1)
-                lm_cxs = torch.cat([beam['lmstate']['cxs'] for beam in hyps], dim=1)
-                lmstate = {'hxs': lm_hxs, 'cxs': lm_cxs}
+            lmstate = self.merge_lmstate(hyps)
             lmout, lmstate, scores_lm = lm.predict(y, lmstate)
         return lmout, lmstate, scores_lm
+
+    @staticmethod
+    def merge_lmstate(hyps):
+        """Batchfy LM states of all hypotheses.
+
+        Args:
+            hyps (list): hypotheses, each of which contains LM state of batch size 1:
+                - RNNLM (dict): hxs/cxs `[n_layers, 1, n_units]`
+                - GatedConvLM (list): length `n_blocks`, each of which contains `[1, in_ch, kernel_size - 1, 1]`
+        Returns:
+            lmstate (dict or list): LM states of batch size `len(hyps)`
+
+        """
+        if hyps[0]['lmstate'] is None:
+            return None
+        if isinstance(hyps[0]['lmstate'], dict):
+            return {'hxs': torch.cat([beam['lmstate']['hxs'] for beam in hyps], dim=1),
+                    'cxs': torch.cat([beam['lmstate']['cxs'] for beam in hyps], dim=1)}
+        return [torch.cat([beam['lmstate'][lth] for beam in hyps], dim=0)
+                for lth in range(len(hyps[0]['lmstate']))]
+
+    @staticmethod
+    def select_lmstate(lmstate, j):
+        """Select the LM state of the j-th hypothesis.
+
+        Args:
+            lmstate (dict or list): LM states batchfied by `merge_lmstate`
+            j (int): index of hypothesis
+        Returns:
+            lmstate (dict or list): LM state of batch size 1
+
+        """
+        if lmstate is None:
+            return None
+        if isinstance(lmstate, dict):
+            return {'hxs': lmstate['hxs'][:, j:j + 1],
+                    'cxs': lmstate['cxs'][:, j:j + 1]}
+        return [lmstate_l[j:j + 1] for lmstate_l in lmstate]
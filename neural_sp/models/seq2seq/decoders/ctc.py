@@ -20,6 +20,7 @@ from neural_sp.models.torch_utils import make_pad_mask
 from neural_sp.models.torch_utils import np2tensor
 from neural_sp.models.torch_utils import pad_list
 from neural_sp.models.torch_utils import tensor2np
+from neural_sp.profiler import timed
 
 random.seed(1)
 
@@ -178,6 +179,7 @@ class CTC(DecoderBase):
 
         return trigger_points
 
+    @timed('ctc.greedy')
     def greedy(self, eouts, elens):
         """Greedy decoding.
 
@@ -204,6 +206,7 @@ class CTC(DecoderBase):
 
         return np.array(hyps)
 
+    @timed('ctc.beam_search')
     def beam_search(self, eouts, elens, params, idx2token,
                     lm=None, lm_second=None, lm_second_rev=None,
                     nbest=1, refs_id=None, utt_ids=None, speakers=None):
@@ -573,6 +576,108 @@ class CTCForcedAligner(object):
         return trigger_points
 
 
+class CTCViterbiAligner(object):
+    """Batched Viterbi alignment of reference labels over CTC posteriors.
+
+    Args:
+        blank (int): index for <blank>
+
+    """
+
+    def __init__(self, blank=0):
+        self.blank = blank
+
+    def align(self, log_probs, elens, ys, ylens):
+        """Calculate the most likely CTC path of each reference.
+
+        Args:
+            log_probs (FloatTensor): `[B, T, vocab]`
+            elens (IntTensor): `[B]`
+            ys (LongTensor): `[B, L]`
+            ylens (IntTensor): `[B]`
+        Returns:
+            best_paths (LongTensor): `[B, T]`, index of the state in the label sequence
+                with blanks interleaved (`2 * l + 1` for the l-th label) per frame.
+                Padded frames are filled with -1.
+            scores (FloatTensor): `[B]`, log probability of the best path.
+                Less than LOG_0 / 2 if no valid path exists.
+
+        """
+        bs, xmax, _ = log_probs.size()
+        device = log_probs.device
+        elens = elens.to(device).long()
+        path = _label_to_path(ys.to(device), self.blank)  # `[B, 2L+1]`
+        path_lens = 2 * ylens.to(device).long() + 1
+        max_path_len = path.size(1)
+
+        batch_index = torch.arange(bs, dtype=torch.int64, device=device).unsqueeze(1)
+        log_probs_path = log_probs.transpose(0, 1)[:, batch_index, path]  # `[T, B, 2L+1]`
+        state_index = torch.arange(max_path_len, dtype=torch.int64, device=device)
+        outside = state_index.unsqueeze(0) >= path_lens.unsqueeze(1)  # `[B, 2L+1]`
+        # disable skip transitions between the same symbols (including blank-to-blank)
+        same_transition = (path[:, 2:] == path[:, :-2])
+
+        # forward pass (max-product)
+        alpha = log_probs.new_full((bs, max_path_len), LOG_0)
+        alpha[:, :2] = log_probs_path[0, :, :2]
+        alpha = alpha.masked_fill(outside, LOG_0)
+        backptrs = path.new_zeros(xmax, bs, max_path_len).byte()  # 0: stay, 1: next, 2: skip
+        for t in range(1, xmax):
+            cands = alpha.new_full((3, bs, max_path_len), LOG_0)
+            cands[0] = alpha
+            cands[1, :, 1:] = alpha[:, :-1]
+            cands[2, :, 2:] = alpha[:, :-2].masked_fill(same_transition, LOG_0)
+            best, backptr = cands.max(dim=0)
+            # keep the states at padded frames
+            active = (elens > t).unsqueeze(1)
+            alpha = torch.where(active, (best + log_probs_path[t]).masked_fill(outside, LOG_0), alpha)
+            backptrs[t] = backptr.masked_fill(active == 0, 0).byte()
+
+        # end with the last label or the trailing blank
+        state_last = (path_lens - 1).unsqueeze(1)
+        state_second = (path_lens - 2).clamp(min=0).unsqueeze(1)
+        score_last = alpha.gather(1, state_last)
+        score_second = alpha.gather(1, state_second)
+        state = torch.where(score_second > score_last, state_second, state_last).squeeze(1)
+        scores = torch.max(score_last, score_second).squeeze(1)
+
+        # backtracking
+        best_paths = path.new_zeros(bs, xmax)
+        for t in range(xmax - 1, -1, -1):
+            best_paths[:, t] = state
+            state = state - backptrs[t].gather(1, state.unsqueeze(1)).squeeze(1).long()
+        padded = torch.arange(xmax, dtype=torch.int64, device=device).unsqueeze(0) >= elens.unsqueeze(1)
+        best_paths = best_paths.masked_fill(padded, -1)
+        return best_paths, scores
+
+
+def ctc_token_segments(best_path, probs, y):
+    """Convert the best CTC path to token-level segments.
+
+    Args:
+        best_path (np.ndarray): `[T]`, output of `CTCViterbiAligner.align` without padding
+        probs (np.ndarray): `[T, vocab]`
+        y (np.ndarray): `[L]`
+    Returns:
+        segments (list): tuples of (token_id, start, end, confidence) per label,
+            where start/end are frame indices (end is exclusive) and confidence
+            is the average posterior of the label over its frames
+
+    """
+    token_frames = np.where(best_path % 2 == 1)[0]
+    if len(token_frames) == 0:
+        return []
+    labels = (best_path[token_frames] - 1) // 2
+    is_start = np.concatenate([[True], labels[1:] != labels[:-1]])
+    is_end = np.concatenate([labels[1:] != labels[:-1], [True]])
+    token_probs = probs[token_frames, y[labels]]
+    offsets = np.where(is_start)[0]
+    confidences = np.add.reduceat(token_probs, offsets) / np.diff(np.append(offsets, len(token_frames)))
+    return [(int(y[lab]), int(s), int(e) + 1, float(c))
+            for lab, s, e, c in zip(labels[is_start], token_frames[is_start],
+                                    token_frames[is_end], confidences)]
+
+
 class CTCPrefixScore(object):
     """Compute CTC label sequence scores.
 
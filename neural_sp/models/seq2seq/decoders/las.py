@@ -14,11 +14,13 @@ import random
 import torch
 import torch.nn as nn
 
-from neural_sp.evaluators.edit_distance import compute_wer
+from neural_sp.evaluators.edit_distance import compute_wers
 from neural_sp.models.criterion import cross_entropy_lsm
 from neural_sp.models.criterion import distillation
+from neural_sp.models.criterion import distillation_topk
 from neural_sp.models.criterion import MBR
 # from neural_sp.models.criterion import minimum_bayes_risk
+from neural_sp.models.lm.gated_convlm import GatedConvLM
 from neural_sp.models.lm.rnnlm import RNNLM
 from neural_sp.models.lm.transformerlm import TransformerLM
 from neural_sp.models.lm.transformer_xl import TransformerXL
@@ -31,6 +33,7 @@ from neural_sp.models.seq2seq.decoders.beam_search import BeamSearch
 from neural_sp.models.seq2seq.decoders.ctc import CTC
 from neural_sp.models.seq2seq.decoders.ctc import CTCPrefixScore
 from neural_sp.models.seq2seq.decoders.decoder_base import DecoderBase
+from neural_sp.models.seq2seq.ensemble import EnsembleExecutor
 from neural_sp.models.torch_utils import append_sos_eos
 from neural_sp.models.torch_utils import compute_accuracy
 from neural_sp.models.torch_utils import make_pad_mask
@@ -39,6 +42,7 @@ from neural_sp.models.torch_utils import pad_list
 from neural_sp.models.torch_utils import np2tensor
 from neural_sp.models.torch_utils import tensor2np
 from neural_sp.models.torch_utils import tensor2scalar
+from neural_sp.profiler import timed
 
 random.seed(1)
 
@@ -418,7 +422,8 @@ class RNNDecoder(DecoderBase):
             elens (IntTensor): `[B]`
             ys (list): length `B`, each of which contains a list of size `[L]`
             task (str): all/ys*/ys_sub*
-            teacher_logits (FloatTensor): `[B, L, vocab]`
+            teacher_logits (FloatTensor or tuple): `[B, L, vocab]`,
+                or top-k ids and probabilities of teacher posteriors of size `[B, L, k]`
             recog_params (dict): parameters for MBR training
             idx2token ():
         Returns:
@@ -467,63 +472,43 @@ class RNNDecoder(DecoderBase):
             N_best = recog_params['recog_beam_width']
             alpha = 1.0
             assert N_best >= 2
-            loss_mbr = 0.
-            loss_ce = 0.
-            bs = eouts.size(0)
-            for b in range(bs):
-                # 1. beam search
-                self.eval()
-                with torch.no_grad():
-                    nbest_hyps_id, _, log_scores = self.beam_search(
-                        eouts[b:b + 1], elens[b:b + 1], params=recog_params,
-                        nbest=N_best, exclude_eos=True)
-                nbest_hyps_id_b = [np.fromiter(y, dtype=np.int64) for y in nbest_hyps_id[0]]
-                log_scores_b = np2tensor(np.array(log_scores[0], dtype=np.float32), self.device)
-                scores_b_norm = torch.softmax(alpha * log_scores_b, dim=-1)  # `[N_best]`
-                # print((scores_b_norm * 100).int())
-
-                # 2. calculate expected WER
-                wers_b = np2tensor(np.array([
-                    compute_wer(ref=idx2token(ys[b]).split(' '),
-                                hyp=idx2token(nbest_hyps_id_b[n]).split(' '))[0] / 100
-                    for n in range(N_best)], dtype=np.float32), self.device)
-                exp_wer_b = (scores_b_norm * wers_b).sum()
-                grad_b = (scores_b_norm * (wers_b - exp_wer_b)).sum()
-                # print(wers_b)
-                # print(exp_wer_b)
-                # print(scores_b_norm * (wers_b - exp_wer_b))
-                # print(grad_b)
-
-                # 3. forward pass (teacher-forcing with hypotheses)
-                self.train()
-                logits_b = self.forward_mbr(eouts[b:b + 1].repeat([N_best, 1, 1]),
-                                            elens[b:b + 1].repeat([N_best]),
-                                            nbest_hyps_id_b)
-                log_probs_b = torch.log_softmax(logits_b, dim=-1)  # `[nbest, L, vocab]`
-
-                # 4. backward pass (attach gradient)
-                _eos = eouts.new_zeros((1,), dtype=torch.int64).fill_(self.eos)
-                nbest_hyps_id_b_pad = pad_list([torch.cat([np2tensor(y, self.device), _eos], dim=0)
-                                                for y in nbest_hyps_id_b], self.pad)
-                loss_mbr += self.mbr(log_probs_b, nbest_hyps_id_b_pad, exp_wer_b, grad_b)
-
-                # 4. calculate MBR loss
-                # loss_mbr_b, scores_b = minimum_bayes_risk(log_probs_b, nbest_hyps_id_b, wers_b,
-                #                                           self.eos, self.pad)
-                # loss_mbr += loss_mbr_b
-
-                # 5. CE loss regularization
-                loss_ce += self.forward_att(eouts[b:b + 1], elens[b:b + 1], ys[b:b + 1])[0]
-
-                # ys_out_b = append_sos_eos([ys[b]], self.eos, self.eos, self.pad, self.device)[1]
-                # ys_out_b = ys_out_b.repeat([N_best, 1])
-                # # NOTE: truncate to match the lengths
-                # ymax = min(logits_b.size(1), ys_out_b.size(1))
-                # logits_b = logits_b[:, :ymax].contiguous()
-                # ys_out_b = ys_out_b[:, :ymax].contiguous()
-                # for k in range(N_best):
-                #     loss_ce_k = cross_entropy_lsm(logits_b, ys_out_b, 0, self.pad, self.training)[0]
-                #     loss_ce += loss_ce_k * scores_b_norm[k]
+            bs, xmax = eouts.size()[:2]
+
+            # 1. beam search for the whole mini-batch
+            self.eval()
+            with torch.no_grad():
+                nbest_hyps_id, _, log_scores = self.beam_search(
+                    eouts, elens, params=recog_params,
+                    nbest=N_best, exclude_eos=True)
+            nbest_hyps_id = [np.fromiter(y, dtype=np.int64) for hyps_b in nbest_hyps_id for y in hyps_b]
+            log_scores = np2tensor(np.array(log_scores, dtype=np.float32), self.device)  # `[B, N_best]`
+            scores_norm = torch.softmax(alpha * log_scores, dim=-1)  # `[B, N_best]`
+
+            # 2. calculate expected WER
+            refs = [idx2token(ys[b]).split(' ') for b in range(bs) for _ in range(N_best)]
+            hyps = [idx2token(y).split(' ') for y in nbest_hyps_id]
+            wers = np2tensor(np.array([wer / 100 for wer, _, _, _ in compute_wers(refs, hyps)],
+                                      dtype=np.float32), self.device).view(bs, N_best)
+            exp_wer = (scores_norm * wers).sum(1)  # `[B]`
+            grads = scores_norm * (wers - exp_wer.unsqueeze(1))  # `[B, N_best]`
+
+            # 3. forward pass (teacher-forcing with hypotheses)
+            self.train()
+            logits = self.forward_mbr(eouts.unsqueeze(1).repeat([1, N_best, 1, 1]).view(bs * N_best, xmax, -1),
+                                      elens.unsqueeze(1).repeat([1, N_best]).view(-1),
+                                      nbest_hyps_id)
+            log_probs = torch.log_softmax(logits, dim=-1)  # `[B * N_best, L, vocab]`
+
+            # 4. backward pass (attach gradient)
+            _eos = eouts.new_zeros((1,), dtype=torch.int64).fill_(self.eos)
+            nbest_hyps_id_pad = pad_list([torch.cat([np2tensor(y, self.device), _eos], dim=0)
+                                          for y in nbest_hyps_id], self.pad)
+            grads = grads.view(-1, 1) * (nbest_hyps_id_pad != self.pad).float()  # `[B * N_best, L]`
+            loss_mbr = self.mbr(log_probs, nbest_hyps_id_pad, exp_wer.sum(), grads)
+
+            # 5. CE loss regularization
+            # NOTE: forward_att normalizes the loss by batch size
+            loss_ce = self.forward_att(eouts, elens, ys)[0] * bs
 
             # NOTE: MBR loss is accumlated over N-best and mini-batch
             loss = loss_mbr + loss_ce * self.mbr_ce_weight
@@ -607,7 +592,8 @@ class RNNDecoder(DecoderBase):
             elens (IntTensor): `[B]`
             ys (list): length `B`, each of which contains a list of size `[L]`
             return_logits (bool): return logits for knowledge distillation
-            teacher_logits (FloatTensor): `[B, L, vocab]`
+            teacher_logits (FloatTensor or tuple): `[B, L, vocab]`,
+                or top-k ids and probabilities of teacher posteriors of size `[B, L, k]`
             trigger_points (IntTensor): `[B, L]`
         Returns:
             loss (FloatTensor): `[1]`
@@ -748,7 +734,11 @@ class RNNDecoder(DecoderBase):
             loss_latency = loss_latency.sum() / ylens.sum()
 
         # Knowledge distillation
-        if teacher_logits is not None:
+        if isinstance(teacher_logits, tuple):
+            # precomputed top-k teacher posteriors
+            kl_loss = distillation_topk(logits, teacher_logits[0], teacher_logits[1], ylens)
+            loss = loss * (1 - self.distillation_weight) + kl_loss * self.distillation_weight
+        elif teacher_logits is not None:
             kl_loss = distillation(logits, teacher_logits, ylens, temperature=5.0)
             loss = loss * (1 - self.distillation_weight) + kl_loss * self.distillation_weight
 
@@ -757,6 +747,7 @@ class RNNDecoder(DecoderBase):
 
         return loss, acc, ppl, loss_quantity, loss_latency
 
+    @timed('decoder.step')
     def decode_step(self, eouts, dstates, cv, y_emb, mask, aw, lmout,
                     mode='hard', trigger_point=None, cache=True):
         dstates = self.recurrency(torch.cat([y_emb, cv], dim=-1), dstates['dstate'])
@@ -861,6 +852,7 @@ class RNNDecoder(DecoderBase):
         attn_v = torch.tanh(out)
         return attn_v
 
+    @timed('decoder.greedy')
     def greedy(self, eouts, elens, max_len_ratio, idx2token,
                exclude_eos=False, refs_id=None, utt_ids=None, speakers=None,
                trigger_points=None):
@@ -989,11 +981,13 @@ class RNNDecoder(DecoderBase):
 
         return hyps, aws
 
+    @timed('decoder.beam_search')
     def beam_search(self, eouts, elens, params, idx2token=None,
                     lm=None, lm_second=None, lm_second_bwd=None, ctc_log_probs=None,
                     nbest=1, exclude_eos=False,
                     refs_id=None, utt_ids=None, speakers=None,
-                    ensmbl_eouts=[], ensmbl_elens=[], ensmbl_decs=[], cache_states=True):
+                    ensmbl_eouts=[], ensmbl_elens=[], ensmbl_decs=[], cache_states=True,
+                    ensmbl_executor=None):
         """Beam search decoding.
 
         Args:
@@ -1014,6 +1008,7 @@ class RNNDecoder(DecoderBase):
             ensmbl_elens (list) list of list
             ensmbl_decs (list): list of torch.nn.Module
             cache_states (bool): cache TransformerLM/TransformerXL states for fast decoding
+            ensmbl_executor (EnsembleExecutor): run decoder steps of ensemble members concurrently
         Returns:
             nbest_hyps_idx (list): length `B`, each of which contains list of N hypotheses
             aws (list): length `B`, each of which contains arrays of size `[H, L, T]`
@@ -1022,6 +1017,8 @@ class RNNDecoder(DecoderBase):
         """
         bs, xmax, _ = eouts.size()
         n_models = len(ensmbl_decs) + 1
+        if ensmbl_executor is None:
+            ensmbl_executor = EnsembleExecutor()  # sequential
 
         beam_width = params['recog_beam_width']
         assert 1 <= nbest <= beam_width
@@ -1051,6 +1048,7 @@ class RNNDecoder(DecoderBase):
             assert lm_weight_second_bwd > 0
             lm_second_bwd.eval()
         trfm_lm = isinstance(lm, TransformerLM) or isinstance(lm, TransformerXL)
+        conv_lm = isinstance(lm, GatedConvLM)
 
         if ctc_log_probs is not None:
             assert ctc_weight > 0
@@ -1086,7 +1084,7 @@ class RNNDecoder(DecoderBase):
                     if asr_state_CO:
                         dstates = self.dstates_final
                     if lm_state_CO:
-                        if isinstance(lm, RNNLM):
+                        if isinstance(lm, RNNLM) or conv_lm:
                             lmstate = self.lmstate_final
                         elif isinstance(lm, TransformerLM):
                             ys_prev = self.lmstate_final
@@ -1148,7 +1146,10 @@ class RNNDecoder(DecoderBase):
                     else:
                         y_lm = y
 
-                    if i > 0 or (i == 0 and trfm_lm and lm_state_CO and self.lmstate_final is not None):
+                    if conv_lm:
+                        # left context of each convolution block (carried over from the previous utterance at i == 0)
+                        lmstate = helper.merge_lmstate(hyps)
+                    elif i > 0 or (i == 0 and trfm_lm and lm_state_CO and self.lmstate_final is not None):
                         if isinstance(lm, RNNLM):
                             lmstate = {'hxs': torch.cat([beam['lmstate']['hxs'] for beam in hyps], dim=1),
                                        'cxs': torch.cat([beam['lmstate']['cxs'] for beam in hyps], dim=1)}
@@ -1167,15 +1168,9 @@ class RNNDecoder(DecoderBase):
                                                                mems=self.lmmemory,
                                                                cache=lmstate if cache_states else None)
 
-                # for the main model
-                dstates, cv, aw, attn_v, _, _ = self.decode_step(
-                    eouts[b:b + 1, :elens[b]].repeat([cv.size(0), 1, 1]),
-                    dstates, cv, self.dropout_emb(self.embed(y)), None, aw, lmout)
-                probs = torch.softmax(self.output(attn_v).squeeze(1) * softmax_smoothing, dim=1)
-
-                # for the ensemble
-                ensmbl_dstate, ensmbl_cv, ensmbl_aws = [], [], []
-                for i_e, dec in enumerate(ensmbl_decs):
+                # for the ensemble (run concurrently with the main model)
+                def ensemble_step(i_e):
+                    dec = ensmbl_decs[i_e]
                     cv_e = torch.cat([beam['ensmbl_cv'][i_e] for beam in hyps], dim=0)
                     aw_e = torch.cat([beam['ensmbl_aws'][i_e][-1] for beam in hyps], dim=0) if i > 0 else None
                     hxs_e = torch.cat([beam['ensmbl_dstate'][i_e]['dstate'][0] for beam in hyps], dim=1)
@@ -1186,12 +1181,19 @@ class RNNDecoder(DecoderBase):
                     dstates_e, cv_e, aw_e, attn_v_e, _, _ = dec.decode_step(
                         ensmbl_eouts[i_e][b:b + 1, :ensmbl_elens[i_e][b]].repeat([cv_e.size(0), 1, 1]),
                         dstates_e, cv_e, dec.dropout_emb(dec.embed(y)), None, aw_e, lmout)
+                    return dstates_e, cv_e, aw_e, torch.softmax(dec.output(attn_v_e).squeeze(1), dim=1)
+
+                wait_ensmbl = ensmbl_executor.submit(ensemble_step, list(range(n_models - 1)))
+
+                # for the main model
+                dstates, cv, aw, attn_v, _, _ = self.decode_step(
+                    eouts[b:b + 1, :elens[b]].repeat([cv.size(0), 1, 1]),
+                    dstates, cv, self.dropout_emb(self.embed(y)), None, aw, lmout)
+                probs = torch.softmax(self.output(attn_v).squeeze(1) * softmax_smoothing, dim=1)
 
-                    ensmbl_dstate += [{'dstate': (dstates_e['dstate'][0][:, j:j + 1],
-                                                  dstates_e['dstate'][1][:, j:j + 1])}]
-                    ensmbl_cv += [cv_e[j:j + 1]]
-                    ensmbl_aws += [beam['ensmbl_aws'][i_e] + [aw_e[j:j + 1]]]
-                    probs += torch.softmax(dec.output(attn_v_e).squeeze(1), dim=1)
+                ensmbl_outs = wait_ensmbl()
+                for _, _, _, probs_e in ensmbl_outs:
+                    probs += probs_e
                     # NOTE: sum in the probability scale (not log-scale)
 
                 # Ensemble
@@ -1262,9 +1264,8 @@ class RNNDecoder(DecoderBase):
 
                         new_lmstate = None
                         if lmstate is not None:
-                            if isinstance(lm, RNNLM) or isinstance(self.lm, RNNLM):
-                                new_lmstate = {'hxs': lmstate['hxs'][:, j:j + 1],
-                                               'cxs': lmstate['cxs'][:, j:j + 1]}
+                            if isinstance(lm, RNNLM) or isinstance(self.lm, RNNLM) or conv_lm:
+                                new_lmstate = helper.select_lmstate(lmstate, j)
                             elif trfm_lm:
                                 new_lmstate = [lmstate_l[j:j + 1] for lmstate_l in lmstate]
                             else:
@@ -1286,9 +1287,12 @@ class RNNDecoder(DecoderBase):
                              'aws': beam['aws'] + [aw[j:j + 1]],
                              'lmstate': new_lmstate,
                              'ctc_state': new_ctc_states[k] if ctc_prefix_scorer is not None else None,
-                             'ensmbl_dstate': ensmbl_dstate,
-                             'ensmbl_cv': ensmbl_cv,
-                             'ensmbl_aws': ensmbl_aws})
+                             'ensmbl_dstate': [{'dstate': (dstates_e['dstate'][0][:, j:j + 1],
+                                                           dstates_e['dstate'][1][:, j:j + 1])}
+                                               for dstates_e, _, _, _ in ensmbl_outs],
+                             'ensmbl_cv': [cv_e[j:j + 1] for _, cv_e, _, _ in ensmbl_outs],
+                             'ensmbl_aws': [beam['ensmbl_aws'][i_e] + [aw_e[j:j + 1]]
+                                            for i_e, (_, _, aw_e, _) in enumerate(ensmbl_outs)]})
 
                 # Local pruning
                 new_hyps_sorted = sorted(new_hyps, key=lambda x: x['score'], reverse=True)[:beam_width]
@@ -1371,7 +1375,7 @@ class RNNDecoder(DecoderBase):
 
         # Store ASR/LM state
         self.dstates_final = end_hyps[0]['dstates']
-        if isinstance(lm, RNNLM):
+        if isinstance(lm, RNNLM) or conv_lm:
             self.lmstate_final = end_hyps[0]['lmstate']
         elif trfm_lm:
             if isinstance(lm, TransformerXL):
@@ -1387,6 +1391,7 @@ class RNNDecoder(DecoderBase):
 
         return nbest_hyps_idx, aws, scores
 
+    @timed('decoder.beam_search')
     def beam_search_chunk_sync(self, eouts_c, params, idx2token,
                                lm=None, ctc_log_probs=None,
                                hyps=False, state_carry_over=False, ignore_eos=False):
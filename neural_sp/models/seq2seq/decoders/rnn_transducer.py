@@ -23,6 +23,7 @@ from neural_sp.models.torch_utils import pad_list
 from neural_sp.models.torch_utils import repeat
 from neural_sp.models.torch_utils import tensor2np
 from neural_sp.models.torch_utils import tensor2scalar
+from neural_sp.profiler import timed
 
 random.seed(1)
 
@@ -286,6 +287,7 @@ class RNNTransducer(DecoderBase):
         out = self.output(out)
         return out
 
+    @timed('decoder.step')
     def recurrency(self, ys_emb, dstate):
         """Update prediction network.
 
@@ -343,6 +345,7 @@ class RNNTransducer(DecoderBase):
             zero_state['cxs'] = w.new_zeros(self.n_layers, batch_size, self.dec_n_units)
         return zero_state
 
+    @timed('decoder.greedy')
     def greedy(self, eouts, elens, max_len_ratio, idx2token,
                exclude_eos=False, refs_id=None, utt_ids=None, speakers=None):
         """Greedy decoding.
@@ -395,11 +398,12 @@ class RNNTransducer(DecoderBase):
 
         return hyps, None
 
+    @timed('decoder.beam_search')
     def beam_search(self, eouts, elens, params, idx2token=None,
                     lm=None, lm_second=None, lm_second_bwd=None, ctc_log_probs=None,
                     nbest=1, exclude_eos=False,
                     refs_id=None, utt_ids=None, speakers=None,
-                    ensmbl_eouts=None, ensmbl_elens=None, ensmbl_decs=[]):
+                    ensmbl_eouts=None, ensmbl_elens=None, ensmbl_decs=[], ensmbl_executor=None):
         """Beam search decoding.
 
         Args:
@@ -419,6 +423,7 @@ class RNNTransducer(DecoderBase):
             ensmbl_eouts (list): list of FloatTensor
             ensmbl_elens (list) list of list
             ensmbl_decs (list): list of torch.nn.Module
+            ensmbl_executor (EnsembleExecutor): not used (to make compatible)
         Returns:
             nbest_hyps_idx (list): length `B`, each of which contains list of N hypotheses
             aws: dummy
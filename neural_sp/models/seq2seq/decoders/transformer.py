@@ -16,6 +16,7 @@ import torch
 import torch.nn as nn
 
 from neural_sp.models.criterion import cross_entropy_lsm
+from neural_sp.models.lm.gated_convlm import GatedConvLM
 from neural_sp.models.lm.rnnlm import RNNLM
 from neural_sp.models.modules.initialization import init_like_transformer_xl
 from neural_sp.models.modules.positional_embedding import PositionalEncoding
@@ -25,11 +26,14 @@ from neural_sp.models.seq2seq.decoders.beam_search import BeamSearch
 from neural_sp.models.seq2seq.decoders.ctc import CTC
 from neural_sp.models.seq2seq.decoders.ctc import CTCPrefixScore
 from neural_sp.models.seq2seq.decoders.decoder_base import DecoderBase
+from neural_sp.models.seq2seq.ensemble import EnsembleExecutor
 from neural_sp.models.torch_utils import append_sos_eos
 from neural_sp.models.torch_utils import compute_accuracy
 from neural_sp.models.torch_utils import make_pad_mask
 from neural_sp.models.torch_utils import tensor2np
 from neural_sp.models.torch_utils import tensor2scalar
+from neural_sp.profiler import timed
+from neural_sp.profiler import timer
 
 random.seed(1)
 
@@ -528,6 +532,7 @@ class TransformerDecoder(DecoderBase):
 
         return loss, acc, ppl, losses_auxiliary
 
+    @timed('decoder.greedy')
     def greedy(self, eouts, elens, max_len_ratio, idx2token,
                exclude_eos=False, refs_id=None, utt_ids=None, speakers=None,
                cache_states=True):
@@ -598,7 +603,7 @@ class TransformerDecoder(DecoderBase):
         # Concatenate in L dimension
         hyps_batch = tensor2np(torch.cat(hyps_batch, dim=1))
         xy_aws_layers_steps = torch.cat(xy_aws_layers_steps, dim=-2)  # `[B, H, n_layers, L, T]`
-        xy_aws_layers_steps = xy_aws_layers_steps.view(bs, self.n_heads * self.n_layers, ys.size(1), xmax)
+        xy_aws_layers_steps = xy_aws_layers_steps.reshape(bs, self.n_heads * self.n_layers, ys.size(1), xmax)
         xy_aws = tensor2np(xy_aws_layers_steps)
 
         # Truncate by the first <eos> (<sos> in case of the backward decoder)
@@ -634,11 +639,13 @@ class TransformerDecoder(DecoderBase):
 
         return hyps, aws
 
+    @timed('decoder.beam_search')
     def beam_search(self, eouts, elens, params, idx2token=None,
                     lm=None, lm_second=None, lm_second_bwd=None, ctc_log_probs=None,
                     nbest=1, exclude_eos=False,
                     refs_id=None, utt_ids=None, speakers=None,
-                    ensmbl_eouts=[], ensmbl_elens=[], ensmbl_decs=[], cache_states=True):
+                    ensmbl_eouts=[], ensmbl_elens=[], ensmbl_decs=[], cache_states=True,
+                    ensmbl_executor=None):
         """Beam search decoding.
 
         Args:
@@ -659,6 +666,7 @@ class TransformerDecoder(DecoderBase):
             ensmbl_elens (list) list of list
             ensmbl_decs (list): list of torch.nn.Module
             cache_states (bool): cache decoder states for fast decoding
+            ensmbl_executor (EnsembleExecutor): run decoder steps of ensemble members concurrently
         Returns:
             nbest_hyps_idx (list): length `B`, each of which contains list of N hypotheses
             aws (list): length `B`, each of which contains arrays of size `[H, L, T]`
@@ -667,6 +675,8 @@ class TransformerDecoder(DecoderBase):
         """
         bs, xmax, _ = eouts.size()
         n_models = len(ensmbl_decs) + 1
+        if ensmbl_executor is None:
+            ensmbl_executor = EnsembleExecutor()  # sequential
 
         beam_width = params['recog_beam_width']
         assert 1 <= nbest <= beam_width
@@ -714,7 +724,7 @@ class TransformerDecoder(DecoderBase):
 
             if speakers is not None:
                 if speakers[b] == self.prev_spk:
-                    if lm_state_carry_over and isinstance(lm, RNNLM):
+                    if lm_state_carry_over and isinstance(lm, (RNNLM, GatedConvLM)):
                         lmstate = self.lmstate_final
                 self.prev_spk = speakers[b]
 
@@ -758,6 +768,24 @@ class TransformerDecoder(DecoderBase):
                 causal_mask = eouts.new_ones(i + 1, i + 1).byte()
                 causal_mask = torch.tril(causal_mask, out=causal_mask).unsqueeze(0).repeat([ys.size(0), 1, 1])
 
+                # for the ensemble (run concurrently with the main model)
+                def ensemble_step(i_e):
+                    dec = ensmbl_decs[i_e]
+                    cache_e = [None] * dec.n_layers
+                    if cache_states and i > 0:
+                        for lth in range(dec.n_layers):
+                            cache_e[lth] = torch.cat([beam['ensmbl_cache'][i_e][lth] for beam in hyps], dim=0)
+                    out_e = dec.pos_enc(dec.embed(ys))  # scaled + dropout
+                    eouts_e = ensmbl_eouts[i_e][b:b + 1, :ensmbl_elens[i_e][b]].repeat([ys.size(0), 1, 1])
+                    new_cache_e = [None] * dec.n_layers
+                    for lth in range(dec.n_layers):
+                        out_e = dec.layers[lth](out_e, causal_mask, eouts_e, None, cache=cache_e[lth])
+                        new_cache_e[lth] = out_e
+                    logits_e = dec.output(dec.norm_out(out_e))
+                    return torch.softmax(logits_e[:, -1] * softmax_smoothing, dim=1), new_cache_e
+
+                wait_ensmbl = ensmbl_executor.submit(ensemble_step, list(range(n_models - 1)))
+
                 out = self.pos_enc(self.embed(ys))  # scaled + dropout
 
                 mlen = 0  # TODO: fix later
@@ -771,45 +799,32 @@ class TransformerDecoder(DecoderBase):
                 new_cache = [None] * self.n_layers
                 xy_aws_layers = []
                 lth_s = self.mocha_first_layer - 1
-                for lth, layer in enumerate(self.layers):
-                    if self.memory_transformer:
-                        out = layer(
-                            out, causal_mask, eouts_b, None,
-                            cache=cache[lth],
-                            pos_embs=pos_embs, memory=mems[lth], u_bias=self.u_bias, v_bias=self.v_bias)
-                        hidden_states.append(out)
-                    else:
-                        out = layer(
-                            out, causal_mask, eouts_b, None,
-                            cache=cache[lth],
-                            xy_aws_prev=xy_aws_prev[:, lth - lth_s] if lth >= lth_s and i > 0 else None,
-                            eps_wait=eps_wait)
-
-                    new_cache[lth] = out
-                    if layer.xy_aws is not None:
-                        xy_aws_layers.append(layer.xy_aws)
-                logits = self.output(self.norm_out(out))
-                probs = torch.softmax(logits[:, -1] * softmax_smoothing, dim=1)
-                xy_aws_layers = torch.stack(xy_aws_layers, dim=1)  # `[B, H, n_layers, L, T]`
-
-                # Ensemble initialization
-                ensmbl_cache = [[None] * dec.n_layers for dec in ensmbl_decs]
-                if n_models > 1 and cache_states and i > 0:
-                    for i_e, dec in enumerate(ensmbl_decs):
-                        for lth in range(dec.n_layers):
-                            ensmbl_cache[i_e][lth] = torch.cat([beam['ensmbl_cache'][i_e][lth] for beam in hyps], dim=0)
-
-                # for the ensemble
-                ensmbl_new_cache = [[None] * dec.n_layers for dec in ensmbl_decs]
-                for i_e, dec in enumerate(ensmbl_decs):
-                    out_e = dec.pos_enc(dec.embed(ys))  # scaled + dropout
-                    eouts_e = ensmbl_eouts[i_e][b:b + 1, :elens[b]].repeat([ys.size(0), 1, 1])
-                    for lth in range(dec.n_layers):
-                        out_e = dec.layers[lth](out_e, causal_mask, eouts_e, None,
-                                                cache=ensmbl_cache[i_e][lth])
-                        ensmbl_new_cache[i_e][lth] = out_e
-                    logits_e = dec.output(dec.norm_out(out_e))
-                    probs += torch.softmax(logits_e[:, -1] * softmax_smoothing, dim=1)
+                with timer('decoder.step'):
+                    for lth, layer in enumerate(self.layers):
+                        if self.memory_transformer:
+                            out = layer(
+                                out, causal_mask, eouts_b, None,
+                                cache=cache[lth],
+                                pos_embs=pos_embs, memory=mems[lth], u_bias=self.u_bias, v_bias=self.v_bias)
+                            hidden_states.append(out)
+                        else:
+                            out = layer(
+                                out, causal_mask, eouts_b, None,
+                                cache=cache[lth],
+                                xy_aws_prev=xy_aws_prev[:, lth - lth_s] if lth >= lth_s and i > 0 else None,
+                                eps_wait=eps_wait)
+
+                        new_cache[lth] = out
+                        if layer.xy_aws is not None:
+                            xy_aws_layers.append(layer.xy_aws)
+                    logits = self.output(self.norm_out(out))
+                    probs = torch.softmax(logits[:, -1] * softmax_smoothing, dim=1)
+                    xy_aws_layers = torch.stack(xy_aws_layers, dim=1)  # `[B, H, n_layers, L, T]`
+
+                ensmbl_outs = wait_ensmbl()
+                ensmbl_new_cache = [new_cache_e for _, new_cache_e in ensmbl_outs]
+                for probs_e, _ in ensmbl_outs:
+                    probs += probs_e
                     # NOTE: sum in the probability scale (not log-scale)
 
                 # Ensemble
@@ -889,8 +904,7 @@ class TransformerDecoder(DecoderBase):
                              'score_ctc': total_scores_ctc[k].item(),
                              'score_lm': total_scores_lm[0, idx].item(),
                              'aws': new_aws,
-                             'lmstate': {'hxs': lmstate['hxs'][:, j:j + 1],
-                                         'cxs': lmstate['cxs'][:, j:j + 1]} if lmstate is not None else None,
+                             'lmstate': helper.select_lmstate(lmstate, j),
                              'ctc_state': new_ctc_states[k] if ctc_prefix_scorer is not None else None,
                              'ensmbl_cache': [[new_cache_e_l[j:j + 1] for new_cache_e_l in new_cache_e] for new_cache_e in ensmbl_new_cache] if cache_states else None,
                              'streamable': streamable_global,
@@ -995,7 +1009,7 @@ class TransformerDecoder(DecoderBase):
                 aws = [[aws[b][n][:, :-1] if eos_flags[b][n] else aws[b][n] for n in range(nbest)] for b in range(bs)]
 
         # Store ASR/LM state
-        if isinstance(lm, RNNLM):
+        if isinstance(lm, (RNNLM, GatedConvLM)):
             self.lmstate_final = end_hyps[0]['lmstate']
 
         return nbest_hyps_idx, aws, scores
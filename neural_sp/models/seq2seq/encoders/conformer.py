@@ -330,7 +330,7 @@ class ConformerEncoder(EncoderBase):
 
         Args:
             xs (FloatTensor): `[B, T, input_dim]`
-            xlens (InteTensor): `[B]` (on CPU)
+            xlens (InteTensor): `[B]` (on CPU). None for inputs without padding
             task (str): ys/ys_sub1/ys_sub2
             streaming (bool): streaming encoding
             lookback (bool): truncate leftmost frames for lookback in CNN context
@@ -438,11 +438,13 @@ class ConformerEncoder(EncoderBase):
             pos_embs = self.pos_emb(xs, clamp_len=clamp_len, zero_center_offset=True)
 
             # Create the self-attention mask
-            xx_mask = make_pad_mask(xlens.to(self.device)).unsqueeze(1).repeat([1, xs.size(1), 1])
+            xx_mask = None  # no padding
+            if xlens is not None:
+                xx_mask = make_pad_mask(xlens.to(self.device)).unsqueeze(1).repeat([1, xs.size(1), 1])
 
             for lth, layer in enumerate(self.layers):
                 xs = layer(xs, xx_mask, pos_embs=pos_embs, u_bias=self.u_bias, v_bias=self.v_bias)
-                if not self.training:
+                if not self.training and xlens is not None:
                     self.aws_dict['xx_aws_layer%d' % lth] = tensor2np(layer.xx_aws)
                     self.data_dict['elens%d' % lth] = tensor2np(xlens)
 
@@ -461,7 +463,8 @@ class ConformerEncoder(EncoderBase):
                 if self.subsample is not None:
                     xs, xlens = self.subsample[lth](xs, xlens)
                     # Create the self-attention mask
-                    xx_mask = make_pad_mask(xlens.to(self.device)).unsqueeze(1).repeat([1, xs.size(1), 1])
+                    if xlens is not None:
+                        xx_mask = make_pad_mask(xlens.to(self.device)).unsqueeze(1).repeat([1, xs.size(1), 1])
                     # Create sinusoidal positional embeddings for relative positional encoding
                     clamp_len = clamp_len // self.subsample[lth].subsampling_factor
                     pos_embs = self.pos_emb(xs, clamp_len=clamp_len, zero_center_offset=True)
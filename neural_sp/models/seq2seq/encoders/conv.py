@@ -14,6 +14,7 @@ import torch
 import torch.nn as nn
 
 from neural_sp.models.modules.initialization import init_with_lecun_normal
+from neural_sp.models.quantization import QuantizedConv
 from neural_sp.models.seq2seq.encoders.encoder_base import EncoderBase
 
 logger = logging.getLogger(__name__)
@@ -412,7 +413,7 @@ def update_lens_1d(seq_lens, layer):
 
     Args:
         seq_lens (IntTensor): `[B]`
-        layer (nn.Conv1d or nn.MaxPool1d):
+        layer (nn.Conv1d or nn.MaxPool1d or QuantizedConv):
     Returns:
         seq_lens (IntTensor): `[B]`
 
@@ -420,7 +421,7 @@ def update_lens_1d(seq_lens, layer):
     if seq_lens is None:
         return seq_lens
     assert isinstance(seq_lens, torch.IntTensor)
-    assert type(layer) in [nn.Conv1d, nn.MaxPool1d]
+    assert type(layer) in [nn.Conv1d, nn.MaxPool1d, QuantizedConv]
     # seq_lens = [_update_1d(seq_len.item(), layer) for seq_len in seq_lens]
     seq_lens = [_update_1d(seq_len, layer) for seq_len in seq_lens]
     seq_lens = torch.IntTensor(seq_lens)
@@ -441,7 +442,7 @@ def update_lens_2d(seq_lens, layer, dim=0):
 
     Args:
         seq_lens (IntTensor): `[B]`
-        layer (nn.Conv2d or nn.MaxPool2d):
+        layer (nn.Conv2d or nn.MaxPool2d or QuantizedConv):
         dim (int):
     Returns:
         seq_lens (IntTensor): `[B]`
@@ -450,7 +451,7 @@ def update_lens_2d(seq_lens, layer, dim=0):
     if seq_lens is None:
         return seq_lens
     assert isinstance(seq_lens, torch.IntTensor)
-    assert type(layer) in [nn.Conv2d, nn.MaxPool2d]
+    assert type(layer) in [nn.Conv2d, nn.MaxPool2d, QuantizedConv]
     # seq_lens = [_update_2d(seq_len.item(), layer, dim) for seq_len in seq_lens]
     seq_lens = [_update_2d(seq_len, layer, dim) for seq_len in seq_lens]
     seq_lens = torch.IntTensor(seq_lens)
@@ -41,6 +41,12 @@ class EncoderBase(ModelBase):
     def reset_cache(self):
         raise NotImplementedError
 
+    def stack_cache(self, caches):
+        raise NotImplementedError
+
+    def unstack_cache(self, batch_size):
+        raise NotImplementedError
+
     def turn_on_ceil_mode(self, encoder):
         if isinstance(encoder, torch.nn.Module):
             for name, module in encoder.named_children():
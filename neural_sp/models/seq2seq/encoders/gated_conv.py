@@ -51,8 +51,7 @@ class GatedConvEncoder(EncoderBase):
         layers = OrderedDict()
         for lth in range(len(channels)):
             layers['conv%d' % lth] = ConvGLUBlock(kernel_sizes[lth][0], input_dim, channels[lth],
-                                                  weight_norm=True,
-                                                  dropout=0.2)
+                                                  dropout=dropout)
             input_dim = channels[lth]
 
         # weight normalization + GLU for the last fully-connected layer
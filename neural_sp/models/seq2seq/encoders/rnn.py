@@ -258,12 +258,57 @@ class RNNEncoder(EncoderBase):
         self.hx_fwd = [None] * self.n_layers
         logger.debug('Reset cache.')
 
+    def stack_cache(self, caches):
+        """Merge states of multiple streams to encode their chunks in a mini-batch.
+
+        Args:
+            caches (list): A list of length `[B]`, which contains `hx_fwd` of
+                each stream (None for a stream starting from zero states)
+
+        """
+        self.reset_cache()
+        for lth in range(self.n_layers):
+            states = [None if c is None else c[lth] for c in caches]
+            ref = next((state for state in states if state is not None), None)
+            if ref is None:
+                continue
+            if isinstance(ref, tuple):
+                # LSTM: (h, c), each `[n_dirs, 1, n_units]`
+                self.hx_fwd[lth] = tuple(
+                    torch.cat([torch.zeros_like(ref[i]) if state is None else state[i]
+                               for state in states], dim=1) for i in range(len(ref)))
+            else:
+                self.hx_fwd[lth] = torch.cat([torch.zeros_like(ref) if state is None else state
+                                              for state in states], dim=1)
+
+    def unstack_cache(self, batch_size):
+        """Split states of a mini-batch into streams.
+
+        Args:
+            batch_size (int):
+        Returns:
+            caches (list): A list of length `[B]`, which contains `hx_fwd` of each stream
+
+        """
+        caches = []
+        for b in range(batch_size):
+            cache = []
+            for hx in self.hx_fwd:
+                if hx is None:
+                    cache.append(None)
+                elif isinstance(hx, tuple):
+                    cache.append(tuple(h[:, b:b + 1] for h in hx))
+                else:
+                    cache.append(hx[:, b:b + 1])
+            caches.append(cache)
+        return caches
+
     def forward(self, xs, xlens, task, streaming=False, lookback=False, lookahead=False):
         """Forward pass.
 
         Args:
             xs (FloatTensor): `[B, T, input_dim]`
-            xlens (list): A list of length `[B]`
+            xlens (list): A list of length `[B]`. None for inputs without padding
             task (str): all or ys or ys_sub1 or ys_sub2
             streaming (bool): streaming encoding
             lookback (bool): truncate leftmost frames for lookback in CNN context
@@ -283,7 +328,10 @@ class RNNEncoder(EncoderBase):
                  'ys_sub2': {'xs': None, 'xlens': None}}
 
         # Sort by lenghts in the descending order for pack_padded_sequence
-        if not self.lc_bidir:
+        # NOTE: inputs are not packed in streaming encoding, and the order of
+        # mini-batch must be kept consistent with the cached states
+        perm_ids_unsort = None
+        if not self.lc_bidir and xlens is not None and not streaming:
             xlens, perm_ids = torch.IntTensor(xlens).sort(0, descending=True)
             xs = xs[perm_ids]
             _, perm_ids_unsort = perm_ids.sort()
@@ -345,7 +393,7 @@ class RNNEncoder(EncoderBase):
             xs = self.bridge(xs)
 
         # Unsort
-        if not self.lc_bidir:
+        if perm_ids_unsort is not None:
             xs = xs[perm_ids_unsort]
             xlens = xlens[perm_ids_unsort]
 
@@ -481,10 +529,14 @@ class RNNEncoder(EncoderBase):
             xs_sub, _ = self.padding(xs, xlens, getattr(self, 'rnn_' + module))
             xs_sub = self.dropout(xs_sub)
         else:
-            xs_sub = xs.clone()[perm_ids_unsort]
+            xs_sub = xs.clone()
+            if perm_ids_unsort is not None:
+                xs_sub = xs_sub[perm_ids_unsort]
         if getattr(self, 'bridge_' + module) is not None:
             xs_sub = getattr(self, 'bridge_' + module)(xs_sub)
-        xlens_sub = xlens[perm_ids_unsort]
+        xlens_sub = xlens
+        if perm_ids_unsort is not None:
+            xlens_sub = xlens[perm_ids_unsort]
         return xs_sub, xlens_sub
 
 
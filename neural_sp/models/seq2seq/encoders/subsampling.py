@@ -44,8 +44,9 @@ class ConcatSubsampler(nn.Module):
         # NOTE: Exclude the last frames if the length is not divisible
         xs = torch.relu(self.proj(xs))
 
-        xlens = [max(1, i.item() // self.subsampling_factor) for i in xlens]
-        xlens = torch.IntTensor(xlens)
+        if xlens is not None:
+            xlens = [max(1, i.item() // self.subsampling_factor) for i in xlens]
+            xlens = torch.IntTensor(xlens)
         return xs, xlens
 
 
@@ -113,8 +114,9 @@ class DropSubsampler(nn.Module):
 
         xs = xs[:, ::self.subsampling_factor, :]
 
-        xlens = [max(1, math.ceil(i.item() / self.subsampling_factor)) for i in xlens]
-        xlens = torch.IntTensor(xlens)
+        if xlens is not None:
+            xlens = [max(1, math.ceil(i.item() / self.subsampling_factor)) for i in xlens]
+            xlens = torch.IntTensor(xlens)
         return xs, xlens
 
 
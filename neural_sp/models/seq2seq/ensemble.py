@@ -0,0 +1,97 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Run members of a model ensemble concurrently."""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class EnsembleExecutor(object):
+    """Executor of ensemble members.
+
+    Encoders of all members are run concurrently, and their outputs are cached
+    per member. Decoder steps of all members at each beam search step are
+    also dispatched concurrently. PyTorch releases the GIL inside operators,
+    so threads run in parallel on multi-core CPUs.
+
+    Args:
+        n_workers (int): number of threads. Members are run sequentially if <= 1.
+        cache_size (int): number of mini-batches to cache encoder outputs per member
+
+    """
+
+    def __init__(self, n_workers=1, cache_size=1):
+        self.n_workers = n_workers
+        self.cache_size = cache_size
+        self.executor = ThreadPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+        self.caches = {}  # id(model) -> OrderedDict(key -> eout_dict)
+
+    def submit(self, func, items):
+        """Start applying `func` to each item concurrently.
+
+        Args:
+            func (callable):
+            items (list):
+        Returns:
+            wait (callable): returns outputs of `func` in the same order as `items`
+
+        """
+        if self.executor is None:
+            results = [func(item) for item in items]
+            return lambda: results
+
+        # NOTE: the gradient mode is thread-local
+        grad_enabled = torch.is_grad_enabled()
+
+        def run(item):
+            with torch.set_grad_enabled(grad_enabled):
+                return func(item)
+
+        futures = [self.executor.submit(run, item) for item in items]
+        return lambda: [future.result() for future in futures]
+
+    def map(self, func, items):
+        """Apply `func` to each item concurrently and wait for the results."""
+        return self.submit(func, items)()
+
+    def encode(self, models, xs, task, key=None):
+        """Encode the same inputs with all members.
+
+        Args:
+            models (list): A list of `Speech2Text`
+            xs (list): A list of length `[B]`, which contains arrays of size `[T, input_dim]`
+            task (str): ys* or ys_sub1* or ys_sub2*
+            key (tuple): cache key of the mini-batch (e.g., utterance IDs). Not cached if None.
+        Returns:
+            eout_dicts (list): A list of outputs of `Speech2Text.encode` per member
+
+        """
+        def encode_member(model):
+            cache = self.caches.setdefault(id(model), OrderedDict())
+            if key is not None and (key, task) in cache:
+                return cache[(key, task)]
+            eout_dict = model.encode(xs, task)
+            if key is not None and self.cache_size > 0:
+                cache[(key, task)] = eout_dict
+                while len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+            return eout_dict
+
+        return self.map(encode_member, models)
+
+    def clear_cache(self):
+        self.caches = {}
+
+    def shutdown(self):
+        self.clear_cache()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
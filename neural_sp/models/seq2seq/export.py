@@ -0,0 +1,443 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Export-friendly wrappers of encoders, decoder steps and CTC (TorchScript/ONNX).
+
+Every wrapper takes and returns tensors only, so that decoder states which are
+kept in dictionaries, lists and module attributes in the eager modules are
+passed explicitly. Inputs are assumed not to include padding.
+
+"""
+
+import logging
+import os
+import torch
+import torch.nn as nn
+
+from neural_sp.models.modules.attention import AttentionMechanism
+from neural_sp.models.modules.multihead_attention import MultiheadAttentionMechanism
+
+logger = logging.getLogger(__name__)
+
+
+class EncoderExport(nn.Module):
+    """Encoder without length bookkeeping.
+
+    Lengths of encoders are updated in Python (e.g., packing of RNN encoders and
+    self-attention masks of Transformer encoders), so the traced graph is
+    specialized to the length of the example inputs.
+
+    Args:
+        enc (EncoderBase): RNN/Transformer/Conformer/TDS/GatedConv encoder
+        input_dim (int): dimension of input features after frame stacking/splicing
+
+    """
+
+    input_names = ['xs']
+    output_names = ['eouts']
+    dynamic_axes = {'xs': {0: 'batch', 1: 'time'},
+                    'eouts': {0: 'batch', 1: 'time_sub'}}
+
+    def __init__(self, enc, input_dim):
+        super(EncoderExport, self).__init__()
+        self.enc = enc
+        self.input_dim = input_dim
+
+    def dummy_inputs(self, batch_size=1, xmax=64):
+        w = next(self.parameters())
+        return (w.new_zeros(batch_size, xmax, self.input_dim).normal_(),)
+
+    def forward(self, xs):
+        """Forward pass.
+
+        Args:
+            xs (FloatTensor): `[B, T, input_dim]` (after frame stacking/splicing)
+        Returns:
+            eouts (FloatTensor): `[B, T', enc_n_units]`
+
+        """
+        # NOTE: inputs are not padded, but some encoders require lengths
+        xlens = torch.full((xs.size(0),), xs.size(1), dtype=torch.int32)  # on CPU
+        return self.enc(xs, xlens, task='ys')['ys']['xs']
+
+
+class CTCExport(nn.Module):
+    """CTC output layer.
+
+    Args:
+        ctc (CTC):
+
+    """
+
+    input_names = ['eouts']
+    output_names = ['log_probs']
+    dynamic_axes = {'eouts': {0: 'batch', 1: 'time'},
+                    'log_probs': {0: 'batch', 1: 'time'}}
+
+    def __init__(self, ctc):
+        super(CTCExport, self).__init__()
+        self.ctc = ctc
+        self.enc_n_units = ctc.output[0].in_features if isinstance(ctc.output, nn.Sequential) \
+            else ctc.output.in_features
+
+    def dummy_inputs(self, batch_size=1, xmax=16):
+        w = next(self.parameters())
+        return (w.new_zeros(batch_size, xmax, self.enc_n_units).normal_(),)
+
+    def forward(self, eouts):
+        """Forward pass.
+
+        Args:
+            eouts (FloatTensor): `[B, T, enc_n_units]`
+        Returns:
+            log_probs (FloatTensor): `[B, T, vocab]`
+
+        """
+        return torch.log_softmax(self.ctc.output(eouts), dim=-1)
+
+
+def _check_rnn_decoder(dec):
+    if type(dec.score) not in [AttentionMechanism, MultiheadAttentionMechanism]:
+        raise NotImplementedError('%s is not supported for export.' % dec.attn_type)
+    if dec.attn_type == 'triggered_attention':
+        raise NotImplementedError('%s is not supported for export.' % dec.attn_type)
+    if dec.lm is not None:
+        raise NotImplementedError('LM fusion is not supported for export.')
+
+
+class RNNDecoderInit(nn.Module):
+    """Pre-computation of encoder-side features for attention scoring.
+       This corresponds to the first call of the attention layer with `cache=True`.
+
+    Args:
+        dec (RNNDecoder):
+
+    """
+
+    input_names = ['eouts']
+    dynamic_axes = {'eouts': {0: 'batch', 1: 'time'},
+                    'key': {0: 'batch', 1: 'time'},
+                    'value': {0: 'batch', 1: 'time'}}
+
+    def __init__(self, dec):
+        super(RNNDecoderInit, self).__init__()
+        _check_rnn_decoder(dec)
+        self.dec = dec
+        self.multihead = isinstance(dec.score, MultiheadAttentionMechanism)
+        self.output_names = ['key', 'value'] if self.multihead else ['key']
+
+    def dummy_inputs(self, batch_size=1, xmax=16):
+        w = next(self.parameters())
+        return (w.new_zeros(batch_size, xmax, self.dec.enc_n_units).normal_(),)
+
+    def forward(self, eouts):
+        """Forward pass.
+
+        Args:
+            eouts (FloatTensor): `[B, T, enc_n_units]`
+        Returns:
+            key (FloatTensor): `[B, T, attn_dim]` or `[B, T, H, d_k]`
+            value (FloatTensor): `[B, T, H, d_k]` (multi-head attention only)
+
+        """
+        score = self.dec.score
+        bs = eouts.size(0)
+        if self.multihead:
+            key = score.w_key(eouts).view(bs, -1, score.n_heads, score.d_k)
+            value = score.w_value(eouts).view(bs, -1, score.n_heads, score.d_k)
+            return key, value
+        if score.atype in ['add', 'location', 'dot', 'luong_general']:
+            return score.w_key(eouts)
+        return eouts
+
+
+class RNNDecoderStep(nn.Module):
+    """Single step of the attention-based RNN decoder.
+
+    Args:
+        dec (RNNDecoder):
+
+    """
+
+    output_names = ['log_probs', 'cv_out', 'hxs_out', 'cxs_out', 'aw_out']
+
+    def __init__(self, dec):
+        super(RNNDecoderStep, self).__init__()
+        _check_rnn_decoder(dec)
+        self.dec = dec
+        self.multihead = isinstance(dec.score, MultiheadAttentionMechanism)
+        self.input_names = ['y', 'cv', 'hxs', 'cxs', 'aw', 'eouts', 'key']
+        if self.multihead:
+            self.input_names += ['value']
+        self.dynamic_axes = {n: {0: 'batch'} for n in self.input_names + self.output_names}
+        for n in ['hxs', 'cxs', 'hxs_out', 'cxs_out']:
+            self.dynamic_axes[n] = {1: 'batch'}
+        for n in ['aw', 'aw_out', 'eouts', 'key', 'value']:
+            self.dynamic_axes[n] = {0: 'batch', (3 if 'aw' in n else 1): 'time'}
+
+    def dummy_inputs(self, batch_size=1, xmax=16):
+        dec = self.dec
+        n_heads = dec.score.n_heads if self.multihead else 1
+        eouts = next(self.parameters()).new_zeros(batch_size, xmax, dec.enc_n_units).normal_()
+        y = eouts.new_zeros((batch_size, 1), dtype=torch.int64).fill_(dec.eos)
+        cv = eouts.new_zeros(batch_size, 1, dec.enc_n_units)
+        hxs, cxs = dec.zero_state(batch_size)['dstate']
+        if cxs is None:
+            cxs = hxs.clone()
+        aw = eouts.new_zeros(batch_size, n_heads, 1, xmax)
+        with torch.no_grad():
+            keys = RNNDecoderInit(dec)(eouts)
+        if not self.multihead:
+            keys = (keys,)
+        return (y, cv, hxs, cxs, aw, eouts) + tuple(keys)
+
+    def forward(self, y, cv, hxs, cxs, aw, eouts, key, value=None):
+        """Forward pass.
+
+        Args:
+            y (LongTensor): `[B, 1]`
+            cv (FloatTensor): `[B, 1, enc_n_units]`
+            hxs (FloatTensor): `[n_layers, B, dec_n_units]`
+            cxs (FloatTensor): `[n_layers, B, dec_n_units]` (passed through for GRU)
+            aw (FloatTensor): `[B, H, 1, T]`
+            eouts (FloatTensor): `[B, T, enc_n_units]`
+            key (FloatTensor): output of RNNDecoderInit
+            value (FloatTensor): output of RNNDecoderInit (multi-head attention only)
+        Returns:
+            log_probs (FloatTensor): `[B, vocab]`
+            cv (FloatTensor): `[B, 1, enc_n_units]`
+            hxs (FloatTensor): `[n_layers, B, dec_n_units]`
+            cxs (FloatTensor): `[n_layers, B, dec_n_units]`
+            aw (FloatTensor): `[B, H, 1, T]`
+
+        """
+        dec = self.dec
+        # NOTE: set pre-computed features explicitly instead of caching them in the first step
+        dec.score.key = key
+        dec.score.mask = None
+        if self.multihead:
+            dec.score.value = value
+
+        lstm = dec.rnn_type == 'lstm'
+        dstates = {'dstate': (hxs, cxs if lstm else None)}
+        y_emb = dec.dropout_emb(dec.embed(y))
+        dstates, cv, aw, attn_v, _, _ = dec.decode_step(eouts, dstates, cv, y_emb, None, aw, None,
+                                                        cache=True)
+        hxs, cxs_new = dstates['dstate']
+        log_probs = torch.log_softmax(dec.output(attn_v).squeeze(1), dim=-1)
+        return log_probs, cv, hxs, cxs_new if lstm else cxs, aw
+
+
+class TransformerDecoderStep(nn.Module):
+    """Single step of the Transformer decoder with cached outputs of previous steps.
+
+    Args:
+        dec (TransformerDecoder):
+
+    """
+
+    input_names = ['ys', 'eouts', 'cache']
+    output_names = ['log_probs', 'cache_out']
+    dynamic_axes = {'ys': {0: 'batch', 1: 'length'},
+                    'eouts': {0: 'batch', 1: 'time'},
+                    'cache': {1: 'batch', 2: 'length_prev'},
+                    'log_probs': {0: 'batch'},
+                    'cache_out': {1: 'batch', 2: 'length'}}
+
+    def __init__(self, dec):
+        super(TransformerDecoderStep, self).__init__()
+        if dec.memory_transformer or dec.attn_type == 'mocha':
+            raise NotImplementedError('%s is not supported for export.' % dec.attn_type)
+        if getattr(dec, 'lm', None) is not None:
+            raise NotImplementedError('LM fusion is not supported for export.')
+        self.dec = dec
+
+    def dummy_inputs(self, batch_size=1, xmax=16, ymax=3):
+        dec = self.dec
+        eouts = next(self.parameters()).new_zeros(batch_size, xmax, dec.enc_n_units).normal_()
+        ys = eouts.new_zeros((batch_size, ymax), dtype=torch.int64).fill_(dec.eos)
+        cache = eouts.new_zeros(dec.n_layers, batch_size, ymax - 1, dec.d_model).normal_()
+        return (ys, eouts, cache)
+
+    def forward(self, ys, eouts, cache):
+        """Forward pass.
+
+        Args:
+            ys (LongTensor): `[B, L]` (including <sos>)
+            eouts (FloatTensor): `[B, T, enc_n_units]`
+            cache (FloatTensor): `[n_layers, B, L-1, d_model]`
+        Returns:
+            log_probs (FloatTensor): `[B, vocab]`
+            cache (FloatTensor): `[n_layers, B, L, d_model]`
+
+        """
+        dec = self.dec
+        # NOTE: the last query attends to all previous tokens, so the causal mask is not necessary
+        yy_mask = torch.ones_like(ys).byte().unsqueeze(1)  # `[B, 1, L]`
+        out = dec.pos_enc(dec.embed(ys))  # scaled + dropout
+        new_cache = []
+        for lth, layer in enumerate(dec.layers):
+            out = layer(out, yy_mask, eouts, None, cache=cache[lth])
+            new_cache.append(out)
+        log_probs = torch.log_softmax(dec.output(dec.norm_out(out))[:, -1], dim=-1)
+        return log_probs, torch.stack(new_cache, dim=0)
+
+
+class RNNTransducerPredictionStep(nn.Module):
+    """Single step of the prediction network of RNN-T.
+
+    Args:
+        dec (RNNTransducer):
+
+    """
+
+    input_names = ['y', 'hxs', 'cxs']
+    output_names = ['dout', 'hxs_out', 'cxs_out']
+    dynamic_axes = {'y': {0: 'batch'}, 'dout': {0: 'batch'},
+                    'hxs': {1: 'batch'}, 'cxs': {1: 'batch'},
+                    'hxs_out': {1: 'batch'}, 'cxs_out': {1: 'batch'}}
+
+    def __init__(self, dec):
+        super(RNNTransducerPredictionStep, self).__init__()
+        self.dec = dec
+
+    def dummy_inputs(self, batch_size=1):
+        dec = self.dec
+        dstate = dec.zero_state(batch_size)
+        hxs = dstate['hxs']
+        cxs = dstate['cxs'] if dstate['cxs'] is not None else hxs.clone()
+        y = hxs.new_zeros((batch_size, 1), dtype=torch.int64).fill_(dec.eos)
+        return (y, hxs, cxs)
+
+    def forward(self, y, hxs, cxs):
+        """Forward pass.
+
+        Args:
+            y (LongTensor): `[B, 1]`
+            hxs (FloatTensor): `[n_layers, B, dec_n_units]`
+            cxs (FloatTensor): `[n_layers, B, dec_n_units]` (passed through for GRU)
+        Returns:
+            dout (FloatTensor): `[B, 1, dec_n_units]`
+            hxs (FloatTensor): `[n_layers, B, dec_n_units]`
+            cxs (FloatTensor): `[n_layers, B, dec_n_units]`
+
+        """
+        dec = self.dec
+        lstm = dec.rnn_type == 'lstm_transducer'
+        y_emb = dec.dropout_emb(dec.embed(y))
+        dout, dstate = dec.recurrency(y_emb, {'hxs': hxs, 'cxs': cxs if lstm else None})
+        return dout, dstate['hxs'], dstate['cxs'] if lstm else cxs
+
+
+class RNNTransducerJoint(nn.Module):
+    """Joint network of RNN-T.
+
+    Args:
+        dec (RNNTransducer):
+
+    """
+
+    input_names = ['eouts', 'douts']
+    output_names = ['log_probs']
+    dynamic_axes = {'eouts': {0: 'batch', 1: 'time'},
+                    'douts': {0: 'batch', 1: 'length'},
+                    'log_probs': {0: 'batch', 1: 'time', 2: 'length'}}
+
+    def __init__(self, dec):
+        super(RNNTransducerJoint, self).__init__()
+        self.dec = dec
+
+    def dummy_inputs(self, batch_size=1, xmax=16):
+        dec = self.dec
+        w = next(self.parameters())
+        eouts = w.new_zeros(batch_size, xmax, dec.enc_n_units).normal_()
+        douts = w.new_zeros(batch_size, 1, dec.w_dec.in_features).normal_()
+        return (eouts, douts)
+
+    def forward(self, eouts, douts):
+        """Forward pass.
+
+        Args:
+            eouts (FloatTensor): `[B, T, enc_n_units]`
+            douts (FloatTensor): `[B, L, dec_n_units]`
+        Returns:
+            log_probs (FloatTensor): `[B, T, L, vocab]`
+
+        """
+        return torch.log_softmax(self.dec.joint(eouts, douts), dim=-1)
+
+
+def export(module, path, fmt='torchscript', example_inputs=None, check_inputs=None):
+    """Trace an export wrapper and save it.
+
+    Args:
+        module (nn.Module): export wrapper
+        path (str): path to the output file
+        fmt (str): torchscript or onnx
+        example_inputs (tuple): inputs for tracing. `module.dummy_inputs()` is used by default
+        check_inputs (list): tuples of inputs to check the traced module with (torchscript only).
+            `example_inputs` is used by default
+    Returns:
+        path (str): path to the output file
+
+    """
+    # NOTE: wrappers are built right before export, so keep the mode of the wrapped modules
+    training = [m.training for m in module.modules()]
+    module.eval()
+    if example_inputs is None:
+        example_inputs = module.dummy_inputs()
+    with torch.no_grad():
+        if fmt == 'torchscript':
+            traced = torch.jit.trace(module, example_inputs, check_inputs=check_inputs)
+            traced.save(path)
+        elif fmt == 'onnx':
+            torch.onnx.export(module, example_inputs, path,
+                              input_names=module.input_names,
+                              output_names=module.output_names,
+                              dynamic_axes=module.dynamic_axes,
+                              opset_version=11)
+        else:
+            raise NotImplementedError(fmt)
+    for m, mode in zip(module.modules(), training):
+        m.training = mode
+    logger.info('Exported %s to %s' % (module.__class__.__name__, path))
+    return path
+
+
+def export_speech2text(model, save_dir, fmt='torchscript'):
+    """Export the encoder, the CTC layer and decoder steps of an ASR model.
+
+    Args:
+        model (Speech2Text):
+        save_dir (str): directory to save exported files
+        fmt (str): torchscript or onnx
+    Returns:
+        paths (dict): module name -> path to the exported file
+
+    """
+    from neural_sp.models.seq2seq.decoders.las import RNNDecoder
+    from neural_sp.models.seq2seq.decoders.rnn_transducer import RNNTransducer
+    from neural_sp.models.seq2seq.decoders.transformer import TransformerDecoder
+
+    ext = 'pt' if fmt == 'torchscript' else 'onnx'
+    input_dim = model.input_dim * model.n_stacks * model.n_splices
+    wrappers = [('encoder', EncoderExport(model.enc, input_dim))]
+    dec = model.dec_fwd
+    if getattr(dec, 'ctc_weight', 0) > 0:
+        wrappers += [('ctc', CTCExport(dec.ctc))]
+    if isinstance(dec, RNNTransducer):
+        wrappers += [('prediction_step', RNNTransducerPredictionStep(dec)),
+                     ('joint', RNNTransducerJoint(dec))]
+    elif isinstance(dec, RNNDecoder) and dec.att_weight > 0:
+        wrappers += [('decoder_init', RNNDecoderInit(dec)),
+                     ('decoder_step', RNNDecoderStep(dec))]
+    elif isinstance(dec, TransformerDecoder) and dec.att_weight > 0:
+        wrappers += [('decoder_step', TransformerDecoderStep(dec))]
+
+    paths = {}
+    for name, wrapper in wrappers:
+        paths[name] = export(wrapper, os.path.join(save_dir, '%s.%s' % (name, ext)), fmt)
+    return paths
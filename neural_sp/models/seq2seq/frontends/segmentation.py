@@ -0,0 +1,103 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Segment long-form recordings with voice activity detection."""
+
+import numpy as np
+
+
+def energy_speech_frames(x, noise_percentile=10, offset=0.5):
+    """Frame-level VAD based on the average of log-mel features.
+
+    Args:
+        x (np.ndarray): `[T, input_dim]`
+        noise_percentile (float): percentile of frame energies regarded as the noise floor
+        offset (float): margin above the noise floor for speech frames
+    Returns:
+        is_speech (np.ndarray): `[T]`
+        energy (np.ndarray): `[T]`
+
+    """
+    energy = x.mean(axis=1)
+    noise_floor = np.percentile(energy, noise_percentile)
+    return energy > noise_floor + offset, energy
+
+
+def ctc_speech_frames(ctc_probs, blank=0, spike_threshold=0.1):
+    """Frame-level VAD based on CTC posteriors (the same criterion as `Streaming.ctc_vad`).
+
+    Args:
+        ctc_probs (np.ndarray): `[T, vocab]`
+        blank (int): index of the blank label
+        spike_threshold (float): non-blank labels below this probability are regarded as blank
+    Returns:
+        is_speech (np.ndarray): `[T]`
+        blank_probs (np.ndarray): `[T]`
+
+    """
+    topk_ids = ctc_probs.argmax(axis=1)
+    topk_probs = ctc_probs.max(axis=1)
+    is_speech = (topk_ids != blank) & (topk_probs >= spike_threshold)
+    return is_speech, ctc_probs[:, blank]
+
+
+def get_segments(is_speech, min_silence, min_speech, max_len, margin=0, scores=None):
+    """Convert frame-level decisions to segments.
+
+    Args:
+        is_speech (np.ndarray): `[T]`
+        min_silence (int): non-speech regions shorter than this are merged into speech
+        min_speech (int): segments shorter than this are discarded
+        max_len (int): segments longer than this are split
+        margin (int): number of frames added to both ends of each segment
+            (without overlapping with the previous segment)
+        scores (np.ndarray): `[T]`, long segments are split at the frame with
+            the lowest score (e.g., energy) in the latter half of the window.
+            Split into segments of equal lengths if None.
+    Returns:
+        segments (list): tuples of (start, end) frames (end is exclusive)
+
+    """
+    n_frames = len(is_speech)
+
+    # Runs of speech frames
+    segments = []
+    start = None
+    for t in range(n_frames):
+        if is_speech[t] and start is None:
+            start = t
+        elif not is_speech[t] and start is not None:
+            segments.append([start, t])
+            start = None
+    if start is not None:
+        segments.append([start, n_frames])
+
+    # Merge short pauses
+    merged = []
+    for seg in segments:
+        if len(merged) > 0 and seg[0] - merged[-1][1] < min_silence:
+            merged[-1][1] = seg[1]
+        else:
+            merged.append(seg)
+
+    # Add margins and split long segments
+    outputs = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start = max(0, start - margin, outputs[-1][1] if len(outputs) > 0 else 0)
+        end = min(n_frames, end + margin)
+        while end - start > max_len:
+            if scores is None:
+                n_splits = int(np.ceil((end - start) / max_len))
+                boundary = start + int(np.ceil((end - start) / n_splits))
+            else:
+                offset = start + max_len // 2
+                boundary = offset + int(np.argmin(scores[offset:start + max_len]))
+            outputs.append((start, boundary))
+            start = boundary
+        outputs.append((start, end))
+    return outputs
@@ -6,8 +6,12 @@
 
 """Streaming encoding interface."""
 
+import numpy as np
 import torch
 
+# decoder states carried over between chunks in chunk-synchronous decoding
+DECODER_CACHE_ATTRS = ['n_frames', 'chunk_size', 'ctc_prefix_scorer', 'dstates_final', 'lmstate_final']
+
 
 class Streaming(object):
     """Streaming encoding interface."""
@@ -15,12 +19,15 @@ class Streaming(object):
     def __init__(self, x_whole, params, encoder, idx2token):
         """
         Args:
-            x_whole (FloatTensor): `[T, input_dim]`
+            x_whole (FloatTensor): `[T, input_dim]`. Features can be appended
+                later with `append_feature` for live input.
 
         """
         super(Streaming, self).__init__()
 
         self.x_whole = x_whole
+        self.n_dropped = 0  # number of leading frames discarded from x_whole
+        self.is_finished = False
         self.encoder = encoder
         if self.encoder.conv is not None:
             self.encoder.turn_off_ceil_mode(self.encoder)
@@ -55,6 +62,16 @@ class Streaming(object):
         self.conv_lookback_n_frames = encoder.conv.n_frames_context if encoder.conv is not None else 0
         self.conv_lookahead_n_frames = encoder.conv.n_frames_context if encoder.conv is not None else 0
 
+        # decoding states in the current segment
+        self.is_reset = True  # for the first chunk
+        self.hyps = None
+        self.best_hyp_id_prefix = []
+        self.best_hyp_id_stream = []
+
+        # model states saved while other sessions are decoded
+        self.enc_cache = None
+        self.dec_cache = None
+
         # for test
         self.eout_chunks = []
 
@@ -62,9 +79,78 @@ class Streaming(object):
         self.eout_chunks = []
         self.n_blanks = 0
         self.n_accum_frames = 0
+        self.hyps = None
         if stdout:
             print('Reset')
 
+    @property
+    def n_frames(self):
+        """Number of input frames received so far."""
+        return self.n_dropped + len(self.x_whole)
+
+    def append_feature(self, x):
+        """Append input features received from a live stream.
+
+        Args:
+            x (np.ndarray): `[T_new, input_dim]`
+
+        """
+        self.x_whole = np.concatenate([self.x_whole, x], axis=0)
+
+    def chunk_ready(self, is_final):
+        """Check if the next chunk can be encoded.
+
+        Args:
+            is_final (bool): no more features will be appended
+        Returns:
+            ready (bool):
+
+        """
+        if self.is_finished or self.n_frames == 0:
+            return False
+        if is_final:
+            return True
+        # NOTE: wait until the right context (and lookahead for CNN) is filled
+        # so that chunking is the same as decoding the whole utterance at once
+        return self.n_frames > self.offset + self.N_l + self.N_r + self.conv_lookahead_n_frames
+
+    def discard_consumed(self):
+        """Discard input frames that are no longer referred to by the next chunk."""
+        n = self.offset - self.conv_lookback_n_frames - self.n_dropped
+        if n > 0:
+            self.x_whole = self.x_whole[n:]
+            self.n_dropped += n
+
+    def save_cache(self, model):
+        """Save encoder/decoder states carried over to the next chunk.
+
+        Args:
+            model (Speech2Text):
+
+        """
+        self.enc_cache = getattr(model.enc, 'hx_fwd', None)
+        self.dec_cache = {k: getattr(model.dec_fwd, k) for k in DECODER_CACHE_ATTRS
+                          if hasattr(model.dec_fwd, k)}
+        score = getattr(model.dec_fwd, 'score', None)
+        if hasattr(score, 'key_prev_tail'):
+            self.dec_cache['score.key_prev_tail'] = score.key_prev_tail
+
+    def load_cache(self, model):
+        """Restore states saved by `save_cache` before decoding the next chunk.
+
+        Args:
+            model (Speech2Text):
+
+        """
+        if self.enc_cache is not None:
+            model.enc.hx_fwd = self.enc_cache
+        if self.dec_cache is not None:
+            for k, v in self.dec_cache.items():
+                if k == 'score.key_prev_tail':
+                    model.dec_fwd.score.key_prev_tail = v
+                else:
+                    setattr(model.dec_fwd, k, v)
+
     def register(self):
         pass
 
@@ -75,22 +161,23 @@ class Streaming(object):
         j = self.offset
         l = self.N_l
         r = self.N_r
+        d = self.n_dropped
 
         # Encode input features chunk by chunk
         if getattr(self.encoder, 'conv', None) is not None:
             context = self.encoder.conv.n_frames_context
-            x_chunk = self.x_whole[max(0, j - context):j + (l + r) + context]
+            x_chunk = self.x_whole[max(0, j - context) - d:j + (l + r) + context - d]
         else:
-            x_chunk = self.x_whole[j:j + (l + r)]
+            x_chunk = self.x_whole[j - d:j + (l + r) - d]
 
-        is_last_chunk = (j + l - 1) >= len(self.x_whole) - 1
+        is_last_chunk = (j + l - 1) >= self.n_frames - 1
         self.bd_offset = -1  # reset
         self.n_accum_frames += min(self.N_l, x_chunk.shape[1])
 
         start = j - self.conv_lookback_n_frames
         end = j + (l + r) + self.conv_lookahead_n_frames
         lookback = start >= 0
-        lookahead = end <= self.x_whole.shape[0] - 1
+        lookahead = end <= self.n_frames - 1
 
         return x_chunk, is_last_chunk, lookback, lookahead
 
@@ -10,6 +10,7 @@ import copy
 import logging
 import numpy as np
 import random
+import time
 import torch
 import torch.nn as nn
 
@@ -17,6 +18,9 @@ from neural_sp.bin.train_utils import load_checkpoint
 from neural_sp.models.base import ModelBase
 from neural_sp.models.lm.rnnlm import RNNLM
 from neural_sp.models.seq2seq.decoders.build import build_decoder
+from neural_sp.models.seq2seq.decoders.ctc import CTCViterbiAligner
+from neural_sp.models.seq2seq.decoders.ctc import ctc_token_segments
+from neural_sp.models.seq2seq.decoders.ctc import LOG_0
 from neural_sp.models.seq2seq.decoders.fwd_bwd_attention import fwd_bwd_attention
 from neural_sp.models.seq2seq.decoders.rnn_transducer import RNNTransducer
 from neural_sp.models.seq2seq.encoders.build import build_encoder
@@ -28,6 +32,8 @@ from neural_sp.models.seq2seq.frontends.splicing import splice
 from neural_sp.models.torch_utils import np2tensor
 from neural_sp.models.torch_utils import tensor2np
 from neural_sp.models.torch_utils import pad_list
+from neural_sp.profiler import timed
+from neural_sp.profiler import timer
 from neural_sp.utils import mkdir_join
 
 random.seed(1)
@@ -91,6 +97,9 @@ class Speech2Text(ModelBase):
         # for discourse-aware model
         self.utt_id_prev = None
 
+        # for ensemble decoding (set `EnsembleExecutor` to run members concurrently)
+        self.ensemble_executor = None
+
         # Feature extraction
         self.input_noise_std = args.input_noise_std
         self.n_stacks = args.n_stacks
@@ -229,7 +238,8 @@ class Speech2Text(ModelBase):
                 ys_sub2 (list): reference labels in the 2nd auxiliary task of size `[L_sub2]`
                 utt_ids (list): name of utterances
                 speakers (list): name of speakers
-            task (str): all/ys*/ys_sub*
+            task (str or list): all/ys*/ys_sub*
+                A list of tasks shares a single encoder pass (for mtl_per_batch).
             is_eval (bool): evaluation mode
                 This should be used in inference model for memory efficiency.
             teacher (Speech2Text): used for knowledge distillation from ASR
@@ -252,13 +262,28 @@ class Speech2Text(ModelBase):
     def _forward(self, batch, task, teacher=None, teacher_lm=None):
         # Encode input features
         if self.input_type == 'speech':
-            if self.mtl_per_batch:
+            if self.mtl_per_batch and isinstance(task, str):
                 eout_dict = self.encode(batch['xs'], task)
             else:
                 eout_dict = self.encode(batch['xs'], 'all')
         else:
             eout_dict = self.encode(batch['ys_sub1'])
 
+        if isinstance(task, str):
+            return self._forward_dec(batch, task, eout_dict, teacher, teacher_lm)
+
+        # Share encoder outputs among tasks
+        loss = torch.zeros((1,), dtype=torch.float32, device=self.device)
+        observation = {}
+        for t in task:
+            loss_t, obs_t = self._forward_dec(batch, t, eout_dict, teacher, teacher_lm)
+            loss += loss_t
+            for k, v in obs_t.items():
+                if v is not None or k not in observation.keys():
+                    observation[k] = v
+        return loss, observation
+
+    def _forward_dec(self, batch, task, eout_dict, teacher=None, teacher_lm=None):
         observation = {}
         loss = torch.zeros((1,), dtype=torch.float32, device=self.device)
 
@@ -272,6 +297,8 @@ class Speech2Text(ModelBase):
             elif teacher_lm is not None:
                 teacher_lm.eval()
                 teacher_logits = self.generate_lm_logits(batch['ys'], lm=teacher_lm)
+            elif len(batch.get('teacher_topk', [])) > 0:
+                teacher_logits = self.pad_teacher_topk(batch['teacher_topk'], batch['ys'])
 
             loss_fwd, obs_fwd = self.dec_fwd(eout_dict['ys']['xs'], eout_dict['ys']['xlens'],
                                              batch['ys'], task,
@@ -347,6 +374,30 @@ class Speech2Text(ModelBase):
         logits = lm.output(lmout)
         return logits
 
+    def pad_teacher_topk(self, teacher_topk, ys):
+        """Pad precomputed top-k teacher posteriors.
+
+        Args:
+            teacher_topk (list): A list of length `[B]`, which contains tuples of
+                top-k ids and probabilities of size `[L + 1, k]`
+            ys (list): A list of length `[B]`, which contains reference labels of size `[L]`
+        Returns:
+            topk_ids (LongTensor): `[B, L_max + 1, k]`
+            topk_probs (FloatTensor): `[B, L_max + 1, k]`
+
+        """
+        bs = len(ys)
+        ymax = max(len(y) for y in ys) + 1  # +1 for <eos>
+        k = teacher_topk[0][0].shape[1]
+        topk_ids = np.zeros((bs, ymax, k), dtype=np.int64)
+        topk_probs = np.zeros((bs, ymax, k), dtype=np.float32)
+        for b, (ids, probs) in enumerate(teacher_topk):
+            assert len(ids) == len(ys[b]) + 1, 'Teacher posteriors do not match references.'
+            topk_ids[b, :len(ids)] = ids
+            topk_probs[b, :len(probs)] = probs
+        return np2tensor(topk_ids, self.device), np2tensor(topk_probs, self.device)
+
+    @timed('encode')
     def encode(self, xs, task='all', streaming=False, lookback=False, lookahead=False):
         """Encode acoustic or text features.
 
@@ -361,32 +412,33 @@ class Speech2Text(ModelBase):
 
         """
         if self.input_type == 'speech':
-            # Frame stacking
-            if self.n_stacks > 1:
-                xs = [stack_frame(x, self.n_stacks, self.n_skips) for x in xs]
+            with timer('frontend'):
+                # Frame stacking
+                if self.n_stacks > 1:
+                    xs = [stack_frame(x, self.n_stacks, self.n_skips) for x in xs]
 
-            # Splicing
-            if self.n_splices > 1:
-                xs = [splice(x, self.n_splices, self.n_stacks) for x in xs]
+                # Splicing
+                if self.n_splices > 1:
+                    xs = [splice(x, self.n_splices, self.n_stacks) for x in xs]
 
-            xlens = torch.IntTensor([len(x) for x in xs])
-            xs = pad_list([np2tensor(x, self.device).float() for x in xs], 0.)
+                xlens = torch.IntTensor([len(x) for x in xs])
+                xs = pad_list([np2tensor(x, self.device).float() for x in xs], 0.)
 
-            # SpecAugment
-            if self.specaug is not None and self.training:
-                xs = self.specaug(xs)
+                # SpecAugment
+                if self.specaug is not None and self.training:
+                    xs = self.specaug(xs)
 
-            # Weight noise injection
-            if self.weight_noise_std > 0:
-                self.add_weight_noise(std=self.weight_noise_std)
+                # Weight noise injection
+                if self.weight_noise_std > 0:
+                    self.add_weight_noise(std=self.weight_noise_std)
 
-            # Input Gaussian noise injection
-            if self.input_noise_std > 0:
-                xs = add_input_noise(xs, std=self.input_noise_std)
+                # Input Gaussian noise injection
+                if self.input_noise_std > 0:
+                    xs = add_input_noise(xs, std=self.input_noise_std)
 
-            # Sequence summary network
-            if self.ssn is not None:
-                xs = self.ssn(xs, xlens)
+                # Sequence summary network
+                if self.ssn is not None:
+                    xs = self.ssn(xs, xlens)
 
         elif self.input_type == 'text':
             xlens = torch.IntTensor([len(x) for x in xs])
@@ -425,6 +477,44 @@ class Speech2Text(ModelBase):
                 eout_dict[task]['xs'], temperature, topk)
             return tensor2np(ctc_probs), tensor2np(indices_topk), eout_dict[task]['xlens']
 
+    def ctc_forced_align(self, xs, ys, task='ys'):
+        """Align references to encoder frames with batched CTC Viterbi alignment.
+
+        Args:
+            xs (list): A list of length `[B]`, which contains arrays of size `[T, input_dim]`
+            ys (list): A list of length `[B]`, which contains lists of size `[L]`
+            task (str): ys/ys_sub1/ys_sub2
+        Returns:
+            alignments (list): A list of length `[B]`, which contains lists of
+                (token_id, start, end, confidence) per token in encoder frames.
+                None if the reference cannot be aligned.
+
+        """
+        self.eval()
+        with torch.no_grad():
+            eout_dict = self.encode(xs, task)
+            # NOTE: references are aligned with the forward CTC
+            log_probs = getattr(self, 'dec_fwd' + task[2:]).ctc_log_probs(eout_dict[task]['xs'])
+            elens = eout_dict[task]['xlens']
+            if not isinstance(elens, torch.Tensor):
+                elens = torch.IntTensor(elens)
+
+            ylens = np2tensor(np.fromiter([len(y) for y in ys], dtype=np.int64), self.device)
+            ys_pad = pad_list([np2tensor(np.fromiter(y, dtype=np.int64), self.device) for y in ys], 0)
+            best_paths, scores = CTCViterbiAligner(self.blank).align(log_probs, elens, ys_pad, ylens)
+
+        best_paths = tensor2np(best_paths)
+        probs = tensor2np(torch.exp(log_probs))
+        alignments = []
+        for b in range(len(xs)):
+            if scores[b].item() < LOG_0 / 2:
+                alignments.append(None)
+                continue
+            elen = int(elens[b])
+            alignments.append(ctc_token_segments(best_paths[b, :elen], probs[b, :elen],
+                                                 np.array(ys[b], dtype=np.int64)))
+        return alignments
+
     def plot_attention(self):
         """Plot attention weights during training."""
         # encoder
@@ -454,134 +544,167 @@ class Speech2Text(ModelBase):
         assert self.fwd_weight > 0
         assert len(xs) == 1  # batch size
         # assert params['recog_length_norm']
-        global_params = copy.deepcopy(params)
-        global_params['recog_max_len_ratio'] = 1.0
 
         streaming = Streaming(xs[0], params, self.enc, idx2token)
 
-        hyps = None
-        best_hyp_id_stream = []
-        is_reset = True  # for the first chunk
-
-        stdout = False
+        # processing time per chunk (the last one includes global decoding)
+        self.chunk_latencies = []
 
         self.eval()
         with torch.no_grad():
-            lm = getattr(self, 'lm_fwd', None)
-            lm_second = getattr(self, 'lm_second', None)
-
             while True:
-                # Encode input features chunk by chunk
-                x_chunk, is_last_chunk, lookback, lookahead = streaming.extract_feature()
-                if is_reset:
-                    self.enc.reset_cache()
-                eout_chunk = self.encode([x_chunk], task,
-                                         streaming=True,
-                                         lookback=lookback,
-                                         lookahead=lookahead)[task]['xs']
-                is_reset = False  # detect the first boundary in the same chunk
-
-                # CTC-based VAD
-                ctc_log_probs_chunk = None
-                if streaming.is_ctc_vad:
-                    ctc_probs_chunk = self.dec_fwd.ctc_probs(eout_chunk)
-                    if params['recog_ctc_weight'] > 0:
-                        ctc_log_probs_chunk = torch.log(ctc_probs_chunk)
-                    is_reset = streaming.ctc_vad(ctc_probs_chunk, stdout=stdout)
-
-                # Truncate the most right frames
-                if is_reset and not is_last_chunk and streaming.bd_offset >= 0:
-                    eout_chunk = eout_chunk[:, :streaming.bd_offset]
-                streaming.eout_chunks.append(eout_chunk)
-
-                # Chunk-synchronous attention decoding
-                if params['recog_chunk_sync']:
-                    end_hyps, hyps, aws_seg = self.dec_fwd.beam_search_chunk_sync(
-                        eout_chunk, params, idx2token, lm,
-                        ctc_log_probs=ctc_log_probs_chunk, hyps=hyps,
-                        state_carry_over=False,
-                        ignore_eos=self.enc.enc_type in ['lstm', 'conv_lstm'])
-                    merged_hyps = sorted(end_hyps + hyps, key=lambda x: x['score'], reverse=True)
-                    best_hyp_id_prefix = np.array(merged_hyps[0]['hyp'][1:])
-                    if len(best_hyp_id_prefix) > 0 and best_hyp_id_prefix[-1] == self.eos:
-                        # reset beam if <eos> is generated from the best hypothesis
-                        best_hyp_id_prefix = best_hyp_id_prefix[:-1]  # exclude <eos>
-                        # Segmentation strategy 2:
-                        # If <eos> is emitted from the decoder (not CTC),
-                        # the current chunk is segmented.
-                        if not is_reset:
-                            streaming.bd_offset = eout_chunk.size(1) - 1
-                            is_reset = True
-                    if len(best_hyp_id_prefix) > 0:
-                        # print('\rStreaming (T:%d [frame], offset:%d [frame], blank:%d [frame]): %s' %
-                        #       (streaming.offset + eout_chunk.size(1) * streaming.factor,
-                        #        self.dec_fwd.n_frames * streaming.factor,
-                        #        streaming.n_blanks * streaming.factor,
-                        #        idx2token(best_hyp_id_prefix)))
-                        print('\r%s' % (idx2token(best_hyp_id_prefix)))
-
-                if is_reset:
-                    # Global decoding over the segmented region
-                    if not params['recog_chunk_sync']:
-                        eout = torch.cat(streaming.eout_chunks, dim=1)
-                        elens = torch.IntTensor([eout.size(1)])
-                        ctc_log_probs = None
-                        if params['recog_ctc_weight'] > 0:
-                            ctc_log_probs = torch.log(self.dec_fwd.ctc_probs(eout))
-                        nbest_hyps_id_offline = self.dec_fwd.beam_search(
-                            eout, elens, global_params, idx2token, lm, lm_second,
-                            ctc_log_probs=ctc_log_probs)[0]
-                        # print('Offline (T:%d [frame]): %s' %
-                        #       (streaming.offset + eout_chunk.size(1) * streaming.factor,
-                        #        idx2token(nbest_hyps_id_offline[0][0])))
-
-                    # pick up the best hyp from ended and active hypotheses
-                    if not params['recog_chunk_sync']:
-                        if len(nbest_hyps_id_offline[0][0]) > 0:
-                            best_hyp_id_stream.extend(nbest_hyps_id_offline[0][0])
-                    else:
-                        if len(best_hyp_id_prefix) > 0:
-                            best_hyp_id_stream.extend(best_hyp_id_prefix)
-                        # print('Final (T:%d [frame], offset:%d [frame]): %s' %
-                        #       (streaming.offset + eout_chunk.size(1) * streaming.factor,
-                        #        self.dec_fwd.n_frames * streaming.factor,
-                        #        idx2token(best_hyp_id_prefix)))
-                        # print('-' * 50)
-                        # for test
-                        # eos_hyp = np.zeros(1, dtype=np.int32)
-                        # eos_hyp[0] = self.eos
-                        # best_hyp_id_stream.extend(eos_hyp)
-
-                    # reset
-                    streaming.reset(stdout=stdout)
-                    hyps = None
-
-                streaming.next_chunk()
-                # next chunk will start from the frame next to the boundary
-                if not is_last_chunk:
-                    streaming.backoff(x_chunk, self.dec_fwd, stdout=stdout)
+                t_chunk = time.time()
+                is_last_chunk = self.decode_streaming_chunk(streaming, params, idx2token)
+                if params['recog_chunk_sync'] and len(streaming.best_hyp_id_prefix) > 0:
+                    print('\r%s' % (idx2token(streaming.best_hyp_id_prefix)))
+                self.chunk_latencies.append(time.time() - t_chunk)
                 if is_last_chunk:
                     break
 
-            # Global decoding over the last chunk
-            if not params['recog_chunk_sync'] and len(streaming.eout_chunks) > 0:
+            self.decode_streaming_finalize(streaming, params, idx2token)
+            self.chunk_latencies[-1] = time.time() - t_chunk
+
+        if len(streaming.best_hyp_id_stream) > 0:
+            return [np.stack(streaming.best_hyp_id_stream, axis=0)], [None]
+        else:
+            return [[]], [None]
+
+    def decode_streaming_chunk(self, streaming, params, idx2token):
+        """Encode and decode the next chunk in the streaming buffer.
+
+        Hypotheses of segments detected by CTC-VAD (or <eos> in chunk-synchronous
+        decoding) are appended to `streaming.best_hyp_id_stream`.
+
+        Args:
+            streaming (Streaming): input buffer and decoding states of a session
+            params (dict): hyper-parameters for decoding
+            idx2token (): converter from index to token
+        Returns:
+            is_last_chunk (bool):
+
+        """
+        # Encode input features chunk by chunk
+        x_chunk, is_last_chunk, lookback, lookahead = streaming.extract_feature()
+        if streaming.is_reset:
+            self.enc.reset_cache()
+        eout_chunk = self.encode([x_chunk], 'ys',
+                                 streaming=True,
+                                 lookback=lookback,
+                                 lookahead=lookahead)['ys']['xs']
+        ctc_probs_chunk = self.dec_fwd.ctc_probs(eout_chunk) if streaming.is_ctc_vad else None
+        self.decode_streaming_eout(streaming, x_chunk, is_last_chunk, eout_chunk, ctc_probs_chunk,
+                                   params, idx2token)
+        return is_last_chunk
+
+    def decode_streaming_eout(self, streaming, x_chunk, is_last_chunk, eout_chunk, ctc_probs_chunk,
+                              params, idx2token):
+        """Decode the encoder outputs of the next chunk.
+
+        Args:
+            streaming (Streaming): input buffer and decoding states of a session
+            x_chunk (np.ndarray): `[T_chunk, input_dim]`
+            is_last_chunk (bool):
+            eout_chunk (FloatTensor): `[1, T_chunk', enc_n_units]`
+            ctc_probs_chunk (FloatTensor): `[1, T_chunk', vocab]` (None if CTC-VAD is not used)
+            params (dict): hyper-parameters for decoding
+            idx2token (): converter from index to token
+
+        """
+        global_params = copy.deepcopy(params)
+        global_params['recog_max_len_ratio'] = 1.0
+        lm = getattr(self, 'lm_fwd', None)
+        lm_second = getattr(self, 'lm_second', None)
+        stdout = False
+
+        streaming.is_reset = False  # detect the first boundary in the same chunk
+
+        # CTC-based VAD
+        ctc_log_probs_chunk = None
+        if streaming.is_ctc_vad:
+            if params['recog_ctc_weight'] > 0:
+                ctc_log_probs_chunk = torch.log(ctc_probs_chunk)
+            streaming.is_reset = streaming.ctc_vad(ctc_probs_chunk, stdout=stdout)
+
+        # Truncate the most right frames
+        if streaming.is_reset and not is_last_chunk and streaming.bd_offset >= 0:
+            eout_chunk = eout_chunk[:, :streaming.bd_offset]
+        streaming.eout_chunks.append(eout_chunk)
+
+        # Chunk-synchronous attention decoding
+        if params['recog_chunk_sync']:
+            end_hyps, streaming.hyps, aws_seg = self.dec_fwd.beam_search_chunk_sync(
+                eout_chunk, params, idx2token, lm,
+                ctc_log_probs=ctc_log_probs_chunk, hyps=streaming.hyps,
+                state_carry_over=False,
+                ignore_eos=self.enc.enc_type in ['lstm', 'conv_lstm'])
+            merged_hyps = sorted(end_hyps + streaming.hyps, key=lambda x: x['score'], reverse=True)
+            best_hyp_id_prefix = np.array(merged_hyps[0]['hyp'][1:])
+            if len(best_hyp_id_prefix) > 0 and best_hyp_id_prefix[-1] == self.eos:
+                # reset beam if <eos> is generated from the best hypothesis
+                best_hyp_id_prefix = best_hyp_id_prefix[:-1]  # exclude <eos>
+                # Segmentation strategy 2:
+                # If <eos> is emitted from the decoder (not CTC),
+                # the current chunk is segmented.
+                if not streaming.is_reset:
+                    streaming.bd_offset = eout_chunk.size(1) - 1
+                    streaming.is_reset = True
+            streaming.best_hyp_id_prefix = best_hyp_id_prefix
+
+        if streaming.is_reset:
+            # Global decoding over the segmented region
+            if not params['recog_chunk_sync']:
                 eout = torch.cat(streaming.eout_chunks, dim=1)
                 elens = torch.IntTensor([eout.size(1)])
+                ctc_log_probs = None
+                if params['recog_ctc_weight'] > 0:
+                    ctc_log_probs = torch.log(self.dec_fwd.ctc_probs(eout))
                 nbest_hyps_id_offline = self.dec_fwd.beam_search(
-                    eout, elens, global_params, idx2token, lm, lm_second)[0]
-                # print('MoChA: ' + idx2token(nbest_hyps_id_offline[0][0]))
-                # print('*' * 50)
+                    eout, elens, global_params, idx2token, lm, lm_second,
+                    ctc_log_probs=ctc_log_probs)[0]
+
+            # pick up the best hyp from ended and active hypotheses
+            if not params['recog_chunk_sync']:
                 if len(nbest_hyps_id_offline[0][0]) > 0:
-                    best_hyp_id_stream.extend(nbest_hyps_id_offline[0][0])
+                    streaming.best_hyp_id_stream.extend(nbest_hyps_id_offline[0][0])
+            else:
+                if len(streaming.best_hyp_id_prefix) > 0:
+                    streaming.best_hyp_id_stream.extend(streaming.best_hyp_id_prefix)
 
-            # pick up the best hyp
-            if not is_reset and params['recog_chunk_sync'] and len(best_hyp_id_prefix) > 0:
-                best_hyp_id_stream.extend(best_hyp_id_prefix)
+            # reset
+            streaming.reset(stdout=stdout)
 
-            if len(best_hyp_id_stream) > 0:
-                return [np.stack(best_hyp_id_stream, axis=0)], [None]
-            else:
-                return [[]], [None]
+        streaming.next_chunk()
+        # next chunk will start from the frame next to the boundary
+        if not is_last_chunk:
+            streaming.backoff(x_chunk, self.dec_fwd, stdout=stdout)
+        streaming.is_finished = is_last_chunk
+
+    def decode_streaming_finalize(self, streaming, params, idx2token):
+        """Decode the remaining segment after the last chunk.
+
+        Args:
+            streaming (Streaming): input buffer and decoding states of a session
+            params (dict): hyper-parameters for decoding
+            idx2token (): converter from index to token
+
+        """
+        global_params = copy.deepcopy(params)
+        global_params['recog_max_len_ratio'] = 1.0
+        lm = getattr(self, 'lm_fwd', None)
+        lm_second = getattr(self, 'lm_second', None)
+
+        # Global decoding over the last chunk
+        if not params['recog_chunk_sync'] and len(streaming.eout_chunks) > 0:
+            eout = torch.cat(streaming.eout_chunks, dim=1)
+            elens = torch.IntTensor([eout.size(1)])
+            nbest_hyps_id_offline = self.dec_fwd.beam_search(
+                eout, elens, global_params, idx2token, lm, lm_second)[0]
+            if len(nbest_hyps_id_offline[0][0]) > 0:
+                streaming.best_hyp_id_stream.extend(nbest_hyps_id_offline[0][0])
+
+        # pick up the best hyp
+        if not streaming.is_reset and params['recog_chunk_sync'] and len(streaming.best_hyp_id_prefix) > 0:
+            streaming.best_hyp_id_stream.extend(streaming.best_hyp_id_prefix)
 
     def streamable(self):
         return getattr(self.dec_fwd, 'streamable', False)
@@ -617,6 +740,8 @@ class Speech2Text(ModelBase):
             speakers (list):
             task (str): ys* or ys_sub1* or ys_sub2*
             ensemble_models (list): list of Speech2Text classes
+                Their encoders and decoder steps are run concurrently
+                by `self.ensemble_executor` if set.
         Returns:
             best_hyps_id (list): A list of length `[B]`, which contains arrays of size `[L]`
             aws (list): A list of length `[B]`, which contains arrays of size `[L, T, n_heads]`
@@ -639,7 +764,16 @@ class Speech2Text(ModelBase):
         self.eval()
         with torch.no_grad():
             # Encode input features
-            if self.input_type == 'speech' and self.mtl_per_batch and 'bwd' in dir:
+            ensmbl_eout_dicts = []
+            # NOTE: ensemble members are used only for attention-based beam search
+            is_att_beam = params['recog_beam_width'] > 1 and params['recog_ctc_weight'] < 1
+            use_executor = len(ensemble_models) > 0 and self.ensemble_executor is not None
+            if use_executor and is_att_beam and not params['recog_fwd_bwd_attention']:
+                eout_dicts = self.ensemble_executor.encode(
+                    [self] + ensemble_models, xs, task,
+                    key=tuple(utt_ids) if utt_ids is not None else None)
+                eout_dict, ensmbl_eout_dicts = eout_dicts[0], eout_dicts[1:]
+            elif self.input_type == 'speech' and self.mtl_per_batch and 'bwd' in dir:
                 eout_dict = self.encode(xs, task)
             else:
                 eout_dict = self.encode(xs, task)
@@ -697,7 +831,9 @@ class Speech2Text(ModelBase):
                     ensmbl_eouts, ensmbl_elens, ensmbl_decs = [], [], []
                     if len(ensemble_models) > 0:
                         for i_e, model in enumerate(ensemble_models):
-                            if model.input_type == 'speech' and model.mtl_per_batch and 'bwd' in dir:
+                            if len(ensmbl_eout_dicts) > 0:
+                                enc_outs_e = ensmbl_eout_dicts[i_e]
+                            elif model.input_type == 'speech' and model.mtl_per_batch and 'bwd' in dir:
                                 enc_outs_e = model.encode(xs, task)
                             else:
                                 enc_outs_e = model.encode(xs, task)
@@ -714,7 +850,8 @@ class Speech2Text(ModelBase):
                         eout_dict[task]['xs'], eout_dict[task]['xlens'],
                         params, idx2token, lm, lm_second, lm_bwd, ctc_log_probs,
                         1, exclude_eos, refs_id, utt_ids, speakers,
-                        ensmbl_eouts, ensmbl_elens, ensmbl_decs)
+                        ensmbl_eouts, ensmbl_elens, ensmbl_decs,
+                        ensmbl_executor=self.ensemble_executor)
                     best_hyps_id = [hyp[0] for hyp in nbest_hyps_id]
 
             return best_hyps_id, aws
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Lightweight wall-clock profiler for training and decoding.
+
+Regions are measured with `with timer('name'):` or the `@timed('name')`
+decorator. The profiler is disabled by default, in which case a shared no-op
+context is returned and the overhead is a single attribute lookup.
+
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.sync_cuda:
+            torch.cuda.synchronize()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        if self.profiler.sync_cuda:
+            torch.cuda.synchronize()
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Profiler(object):
+    """Aggregate elapsed time per region and optionally keep events for Chrome trace.
+
+    Args:
+        max_events (int): maximum number of events kept for Chrome trace
+
+    """
+
+    def __init__(self, max_events=1000000):
+        self.enabled = False
+        self.sync_cuda = False
+        self.trace = False
+        self.max_events = max_events
+        self.origin = time.perf_counter()
+        self.events = []
+        self.reset()
+
+    def enable(self, trace=False, sync_cuda=False):
+        """Start profiling.
+
+        Args:
+            trace (bool): keep events for Chrome trace
+            sync_cuda (bool): synchronize CUDA streams at region boundaries
+                so that the elapsed time of GPU kernels is measured
+
+        """
+        self.enabled = True
+        self.trace = trace
+        self.sync_cuda = sync_cuda and torch.cuda.is_available()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Clear aggregated time. Events are kept until `export_chrome_trace` is called."""
+        self.totals = {}
+        self.counts = {}
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name, start, end):
+        self.totals[name] = self.totals.get(name, 0.) + end - start
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def summary(self):
+        """Aggregated time per region.
+
+        Returns:
+            summary (dict): region name -> (total time in seconds, number of calls)
+
+        """
+        return {name: (self.totals[name], self.counts[name]) for name in self.totals.keys()}
+
+    def export_chrome_trace(self, path):
+        """Save events in the Chrome trace event format (chrome://tracing, Perfetto).
+
+        Args:
+            path (str): path to the JSON file
+
+        """
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6}
+                  for name, start, end, tid in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        logger.info('Saved %d events to %s' % (len(events), path))
+        self.events = []
+
+
+# NOTE: shared by all modules in the process
+profiler = Profiler()
+
+
+def timer(name):
+    """Context manager to measure a region with the global profiler."""
+    return profiler.timer(name)
+
+
+def timed(name):
+    """Decorator to measure every call of a function with the global profiler."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,155 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Batch chunks of concurrent streaming sessions through the encoder."""
+
+import asyncio
+from collections import OrderedDict
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkScheduler(object):
+    """Collect ready chunks from sessions and encode them in mini-batches.
+
+    Chunks are grouped by their length and CNN context flags, so that no
+    padding is fed to the recurrent states carried over to the next chunk.
+    In steady state, all chunks except for the first and last ones of each
+    utterance have the same length.
+
+    NOTE: only the encoder is batched. Chunk-synchronous beam search is still
+    performed per session with a batch size of 1 after encoding, because
+    `beam_search_chunk_sync` keeps CTC prefix scores and MoChA boundary states
+    in the decoder and supports a single utterance only. Batching the beam
+    search across sessions is not implemented yet.
+
+    Args:
+        executor (concurrent.futures.Executor): single worker running the model
+        max_batch_size (int): maximum number of sessions in a mini-batch
+        max_wait (float): time in seconds to wait for chunks of other sessions
+            after the first chunk arrives. 0 batches only chunks already waiting.
+
+    """
+
+    def __init__(self, executor, max_batch_size=16, max_wait=0.):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.task = None
+
+        # statistics
+        self.n_batches = 0
+        self.n_chunks = 0
+
+    def start(self):
+        # NOTE: create the queue in the running event loop
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit(self, session):
+        """Decode the next chunk of a session.
+
+        Args:
+            session (Session):
+
+        """
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((session, future))
+        await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = await self._collect()
+            sessions = [session for session, _ in batch]
+            try:
+                await loop.run_in_executor(self.executor, decode_batch, sessions)
+            except Exception as e:
+                logger.exception('Failed to decode a mini-batch.')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.n_batches += 1
+            self.n_chunks += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    @property
+    def average_batch_size(self):
+        return self.n_chunks / max(1, self.n_batches)
+
+
+def decode_batch(sessions):
+    """Decode the next chunk of each session. This must be called from the worker thread.
+
+    Encoder outputs are computed in mini-batches, then decoded session by session.
+
+    Args:
+        sessions (list): A list of `Session` sharing the same model
+
+    """
+    model = sessions[0].model
+
+    # Group chunks that can be encoded without padding
+    groups = OrderedDict()
+    for session in sessions:
+        x_chunk, is_last_chunk, lookback, lookahead = session.streaming.extract_feature()
+        key = (x_chunk.shape[0], lookback, lookahead)
+        if key not in groups:
+            groups[key] = []
+        groups[key].append((session, x_chunk, is_last_chunk))
+
+    with torch.no_grad():
+        for (_, lookback, lookahead), group in groups.items():
+            model.enc.stack_cache([None if session.streaming.is_reset else session.streaming.enc_cache
+                                   for session, _, _ in group])
+            eouts = model.encode([x_chunk for _, x_chunk, _ in group], 'ys',
+                                 streaming=True,
+                                 lookback=lookback,
+                                 lookahead=lookahead)['ys']['xs']
+            ctc_probs = model.dec_fwd.ctc_probs(eouts) if group[0][0].streaming.is_ctc_vad else None
+            caches = model.enc.unstack_cache(len(group))
+
+            for b, (session, x_chunk, is_last_chunk) in enumerate(group):
+                streaming = session.streaming
+                streaming.enc_cache = caches[b]
+                streaming.load_cache(model)
+                model.decode_streaming_eout(streaming, x_chunk, is_last_chunk, eouts[b:b + 1],
+                                            None if ctc_probs is None else ctc_probs[b:b + 1],
+                                            session.params, session.idx2token)
+                streaming.save_cache(model)
+                session.update()
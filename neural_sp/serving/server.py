@@ -0,0 +1,317 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Asynchronous streaming recognition server for multiple concurrent sessions.
+
+Each connection (TCP or Unix socket) is a session. Messages are a JSON header
+per line, followed by `n_bytes` bytes of payload if any.
+
+client -> server:
+    {"type": "features", "n_bytes": N}  + float32 features `[T, input_dim]`
+    {"type": "pcm", "n_bytes": N}       + int16 samples (needs `pcm_frontend`)
+    {"type": "end"}                     end of utterance (the session is reused)
+
+server -> client:
+    {"type": "partial", "token_ids": [...], "text": "..."}
+    {"type": "final", "token_ids": [...], "text": "...", "end_of_utterance": bool}
+    {"type": "error", "message": "..."}
+
+Final results are returned at every endpoint detected by CTC-VAD and at the
+end of utterance. The model is run in a single worker thread, and chunks of
+concurrent sessions are encoded in mini-batches (see `ChunkScheduler`).
+
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+import json
+import logging
+import numpy as np
+import torch
+
+from neural_sp.models.seq2seq.frontends.streaming import Streaming
+from neural_sp.serving.scheduler import ChunkScheduler
+
+logger = logging.getLogger(__name__)
+
+
+async def read_message(reader):
+    """Read a message.
+
+    Args:
+        reader (asyncio.StreamReader):
+    Returns:
+        header (dict): None at EOF
+        payload (bytes): None if the message has no payload
+
+    """
+    line = await reader.readline()
+    if not line:
+        return None, None
+    header = json.loads(line.decode('utf-8'))
+    payload = None
+    if header.get('n_bytes', 0) > 0:
+        payload = await reader.readexactly(header['n_bytes'])
+    return header, payload
+
+
+def write_message(writer, header, payload=None):
+    """Write a message.
+
+    Args:
+        writer (asyncio.StreamWriter):
+        header (dict):
+        payload (bytes):
+
+    """
+    if payload is not None:
+        header = dict(header, n_bytes=len(payload))
+    writer.write((json.dumps(header) + '\n').encode('utf-8'))
+    if payload is not None:
+        writer.write(payload)
+
+
+class Session(object):
+    """Input buffer and decoding states of a streaming session.
+
+    Args:
+        model (Speech2Text):
+        params (dict): hyper-parameters for decoding
+        idx2token (): converter from index to token
+        pcm_frontend (): callable converting int16 samples to features `[T, input_dim]`
+
+    """
+
+    def __init__(self, model, params, idx2token, pcm_frontend=None):
+        self.model = model
+        self.params = params
+        self.idx2token = idx2token
+        self.pcm_frontend = pcm_frontend
+        self.reset()
+
+    def reset(self):
+        """Start a new utterance."""
+        x_empty = np.zeros((0, self.model.input_dim), dtype=np.float32)
+        self.streaming = Streaming(x_empty, self.params, self.model.enc, self.idx2token)
+        self.n_emitted = 0  # number of tokens returned as final results
+        self.ctc_ids = []  # CTC best path in the current segment for partial results
+        self.partial = []
+
+    def append(self, msg_type, payload):
+        if msg_type == 'features':
+            x = np.frombuffer(payload, dtype='<f4').reshape(-1, self.model.input_dim)
+        elif msg_type == 'pcm':
+            if self.pcm_frontend is None:
+                raise ValueError('PCM input is not supported by this server.')
+            x = self.pcm_frontend(np.frombuffer(payload, dtype='<i2'))
+        else:
+            raise ValueError(msg_type)
+        self.streaming.append_feature(x.astype(np.float32))
+
+    def update(self):
+        """Update the partial hypothesis after decoding a chunk."""
+        streaming = self.streaming
+        if streaming.is_reset:
+            self.ctc_ids = []
+        elif not self.params['recog_chunk_sync']:
+            with torch.no_grad():
+                ctc_probs = self.model.dec_fwd.ctc_probs(streaming.eout_chunks[-1])
+            self.ctc_ids += ctc_probs[0].argmax(-1).tolist()
+        streaming.discard_consumed()
+
+    def finalize(self):
+        """Decode the remaining segment. This must be called from the worker thread."""
+        with torch.no_grad():
+            self.model.decode_streaming_finalize(self.streaming, self.params, self.idx2token)
+
+    def new_final(self):
+        """Tokens finalized since the last call."""
+        token_ids = [int(i) for i in self.streaming.best_hyp_id_stream[self.n_emitted:]]
+        self.n_emitted = len(self.streaming.best_hyp_id_stream)
+        return token_ids
+
+    def new_partial(self):
+        """Partial hypothesis of the current segment if changed, otherwise None."""
+        if self.streaming.is_reset:
+            partial = []  # already returned as a final result
+        elif self.params['recog_chunk_sync']:
+            partial = [int(i) for i in self.streaming.best_hyp_id_prefix]
+        else:
+            blank = self.streaming.blank
+            partial = [i for i, _ in groupby(self.ctc_ids) if i != blank]
+        if partial == self.partial:
+            return None
+        self.partial = partial
+        return partial
+
+
+class StreamingServer(object):
+    """Streaming recognition server.
+
+    Args:
+        model (Speech2Text): ASR model with a streaming encoder
+        params (dict): hyper-parameters for decoding
+        idx2token (): converter from index to token
+        pcm_frontend (): factory of a per-session callable converting
+            int16 samples to features `[T, input_dim]`
+        max_sessions (int): maximum number of concurrent sessions
+        max_batch_size (int): maximum number of sessions encoded in a mini-batch
+        max_wait (float): time in seconds to wait for chunks of other sessions
+            before encoding a mini-batch (trade-off between latency and throughput)
+
+    """
+
+    def __init__(self, model, params, idx2token, pcm_frontend=None, max_sessions=64,
+                 max_batch_size=16, max_wait=0.):
+        assert model.ctc_weight > 0
+        assert model.fwd_weight > 0
+        model.eval()
+        self.model = model
+        self.params = params
+        self.idx2token = idx2token
+        self.pcm_frontend = pcm_frontend
+        self.max_sessions = max_sessions
+
+        # NOTE: the model is shared by all sessions, so it is run in a single thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.scheduler = ChunkScheduler(self.executor, max_batch_size, max_wait)
+        self.n_sessions = 0
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """Start listening on a TCP port or a Unix socket (if `path` is given).
+
+        Returns:
+            server (asyncio.AbstractServer):
+
+        """
+        self.scheduler.start()
+        if path:
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        logger.info('Listening on %s' % str(self.server.sockets[0].getsockname()))
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.scheduler.stop()
+        logger.info('average batch size: %.2f' % self.scheduler.average_batch_size)
+        self.executor.shutdown(wait=True)
+
+    async def _run(self, func):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, func)
+
+    async def _decode(self, session, writer, is_final):
+        while session.streaming.chunk_ready(is_final):
+            await self.scheduler.submit(session)
+            token_ids = session.new_final()
+            if len(token_ids) > 0:
+                self._send_result(writer, 'final', token_ids, end_of_utterance=False)
+            partial = session.new_partial()
+            if partial is not None:
+                self._send_result(writer, 'partial', partial)
+            await writer.drain()
+
+        if is_final:
+            await self._run(session.finalize)
+            self._send_result(writer, 'final', session.new_final(), end_of_utterance=True)
+            await writer.drain()
+            session.reset()
+
+    def _send_result(self, writer, msg_type, token_ids, **kwargs):
+        header = {'type': msg_type, 'token_ids': token_ids,
+                  'text': self.idx2token(token_ids) if len(token_ids) > 0 else ''}
+        header.update(kwargs)
+        write_message(writer, header)
+
+    async def _handle(self, reader, writer):
+        if self.n_sessions >= self.max_sessions:
+            write_message(writer, {'type': 'error', 'message': 'too many sessions'})
+            writer.close()
+            return
+
+        self.n_sessions += 1
+        frontend = self.pcm_frontend() if self.pcm_frontend is not None else None
+        session = Session(self.model, self.params, self.idx2token, frontend)
+        try:
+            while True:
+                header, payload = await read_message(reader)
+                if header is None:
+                    break
+                if header['type'] == 'end':
+                    await self._decode(session, writer, is_final=True)
+                else:
+                    session.append(header['type'], payload)
+                    await self._decode(session, writer, is_final=False)
+        except (ValueError, KeyError) as e:
+            write_message(writer, {'type': 'error', 'message': str(e)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.debug('Connection lost.')
+        finally:
+            self.n_sessions -= 1
+            writer.close()
+
+
+class StreamingClient(object):
+    """Client of `StreamingServer`."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send_features(self, x):
+        """Send features.
+
+        Args:
+            x (np.ndarray): `[T, input_dim]`
+
+        """
+        write_message(self.writer, {'type': 'features'}, x.astype('<f4').tobytes())
+        await self.writer.drain()
+
+    async def send_pcm(self, samples):
+        """Send int16 PCM samples."""
+        write_message(self.writer, {'type': 'pcm'}, samples.astype('<i2').tobytes())
+        await self.writer.drain()
+
+    async def end(self):
+        """Finish the utterance and wait for the last final result.
+
+        Returns:
+            results (list): messages received until the end of utterance
+
+        """
+        write_message(self.writer, {'type': 'end'})
+        await self.writer.drain()
+        results = []
+        while True:
+            header = await self.receive()
+            if header is None:
+                break
+            results.append(header)
+            if header['type'] == 'error' or header.get('end_of_utterance', False):
+                break
+        return results
+
+    async def receive(self):
+        """Receive a result message (None if the connection is closed)."""
+        header, _ = await read_message(self.reader)
+        return header
+
+    def close(self):
+        self.writer.close()
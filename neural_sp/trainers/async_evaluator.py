@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Asynchronous evaluation of checkpoints in worker processes."""
+
+import logging
+import multiprocessing
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_loop(init_fn, init_args, eval_fn, job_queue, result_queue):
+    state = init_fn(*init_args)
+    while True:
+        item = job_queue.get()
+        if item is None:
+            break
+        job_id, job = item
+        try:
+            result_queue.put((job_id, eval_fn(state, job), None))
+        except Exception:
+            result_queue.put((job_id, None, traceback.format_exc()))
+
+
+class AsyncEvaluator(object):
+
+    def __init__(self, init_fn, init_args, eval_fn, n_workers=1):
+        """A class for evaluating checkpoints in worker processes.
+           Results are returned in the order of submission regardless of
+           the order in which workers finish.
+
+        Args:
+            init_fn (callable): called once per worker with `init_args` to build a state (e.g., model)
+            init_args (tuple): picklable arguments for `init_fn`
+            eval_fn (callable): called with the state and a job to return a result
+            n_workers (int): number of worker processes
+
+        """
+        super(AsyncEvaluator, self).__init__()
+
+        ctx = multiprocessing.get_context('spawn')  # CUDA cannot be re-initialized in forked processes
+        self.job_queue = ctx.Queue()
+        self.result_queue = ctx.Queue()
+        self.workers = [ctx.Process(target=_worker_loop,
+                                    args=(init_fn, init_args, eval_fn, self.job_queue, self.result_queue),
+                                    daemon=True)
+                        for _ in range(n_workers)]
+        for p in self.workers:
+            p.start()
+
+        self.n_submitted = 0
+        self.n_returned = 0
+        self.jobs = {}
+        self.finished = {}
+
+    @property
+    def n_pending(self):
+        return self.n_submitted - self.n_returned
+
+    def submit(self, job):
+        """Submit a job.
+
+        Args:
+            job (dict): picklable job description
+
+        """
+        self.jobs[self.n_submitted] = job
+        self.job_queue.put((self.n_submitted, job))
+        self.n_submitted += 1
+
+    def poll(self, block=False):
+        """Collect finished jobs in the order of submission.
+
+        Args:
+            block (bool): wait until all submitted jobs are finished
+        Returns:
+            results (list): list of (job, result)
+
+        """
+        while True:
+            while not self.result_queue.empty() or (block and self.n_returned + len(self.finished) < self.n_submitted):
+                job_id, result, error = self.result_queue.get()
+                if error is not None:
+                    raise RuntimeError('Evaluation failed in a worker (%s):\n%s' % (self.jobs[job_id], error))
+                self.finished[job_id] = result
+            if not block or self.n_returned + len(self.finished) >= self.n_submitted:
+                break
+
+        results = []
+        while self.n_returned in self.finished:
+            results.append((self.jobs.pop(self.n_returned), self.finished.pop(self.n_returned)))
+            self.n_returned += 1
+        return results
+
+    def close(self):
+        """Wait for all jobs and terminate workers.
+
+        Returns:
+            results (list): list of (job, result) not collected yet
+
+        """
+        results = self.poll(block=True)
+        for _ in self.workers:
+            self.job_queue.put(None)
+        for p in self.workers:
+            p.join()
+        return results
@@ -0,0 +1,147 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Write checkpoints in a background thread."""
+
+import copy
+import logging
+import os
+import queue
+import threading
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_save(obj, path):
+    """Save an object to a temporary file and rename it to `path`.
+
+    Args:
+        obj: object to save by torch.save
+        path (str): path to the output file
+
+    """
+    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    try:
+        torch.save(obj, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+
+def snapshot(obj, memo=None):
+    """Copy tensors in (nested) state dicts to CPU.
+
+    Args:
+        obj: tensor, dict, list, tuple, torch.optim.Optimizer or other picklable object
+        memo (dict): copies of tensors already visited, to keep references to the same
+            tensor (e.g., parameters in the optimizer state and its param_groups) shared
+    Returns:
+        obj: copy of `obj` sharing no tensor storage with the original one
+
+    """
+    if memo is None:
+        memo = {}
+    if isinstance(obj, torch.Tensor):
+        if id(obj) not in memo:
+            memo[id(obj)] = obj.detach().to('cpu', copy=True)
+        return memo[id(obj)]
+    if isinstance(obj, dict):
+        # NOTE: copy.copy keeps the type-specific attributes (e.g., default_factory of defaultdict)
+        new_obj = copy.copy(obj)
+        new_obj.clear()
+        for k, v in obj.items():
+            new_obj[snapshot(k, memo)] = snapshot(v, memo)
+        return new_obj
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):  # namedtuple
+        return obj.__class__(*[snapshot(v, memo) for v in obj])
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__(snapshot(v, memo) for v in obj)
+    if isinstance(obj, torch.optim.Optimizer):
+        # NOTE: the optimizer itself is pickled in checkpoints (see LRScheduler.state_dict())
+        optimizer = obj.__class__.__new__(obj.__class__)
+        optimizer.__setstate__(snapshot(obj.__getstate__(), memo))
+        return optimizer
+    return obj
+
+
+class AsyncCheckpointWriter(object):
+
+    def __init__(self, max_pending=1):
+        """A class for writing checkpoints in a background thread.
+           Each checkpoint is written to a temporary file and renamed atomically,
+           so incomplete checkpoints are never visible. Jobs are processed in the
+           order of submission, and an error in the thread is raised by the
+           next call of `check()`, `save()` or `flush()`.
+
+        Args:
+            max_pending (int): maximum number of snapshots waiting to be written.
+                `save()` blocks when the queue is full.
+
+        """
+        super(AsyncCheckpointWriter, self).__init__()
+
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            fn = self.queue.get()
+            try:
+                if fn is None:
+                    break
+                if self.error is None:
+                    fn()
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        """Raise an error that occurred in the background thread."""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError('Failed to write a checkpoint: %s' % error) from error
+
+    def save(self, checkpoint, path):
+        """Snapshot a checkpoint and write it in the background.
+
+        Args:
+            checkpoint (dict): checkpoint containing state dicts
+            path (str): path to the checkpoint
+
+        """
+        self.check()
+        checkpoint = snapshot(checkpoint)
+        self.queue.put(lambda: self._write(checkpoint, path))
+
+    def run(self, fn):
+        """Run a function (e.g., removal of old checkpoints) after the preceding writes.
+
+        Args:
+            fn (callable): function without arguments
+
+        """
+        self.check()
+        self.queue.put(fn)
+
+    @staticmethod
+    def _write(checkpoint, path):
+        atomic_save(checkpoint, path)
+        logger.info("=> Wrote checkpoint: %s" % path)
+
+    def flush(self):
+        """Wait until all submitted jobs are finished."""
+        self.queue.join()
+        self.check()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
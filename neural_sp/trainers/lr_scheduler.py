@@ -11,6 +11,8 @@ import logging
 import os
 import torch
 
+from neural_sp.trainers.checkpoint_writer import AsyncCheckpointWriter
+from neural_sp.trainers.checkpoint_writer import atomic_save
 from neural_sp.trainers.optimizer import set_optimizer
 
 logger = logging.getLogger(__name__)
@@ -41,6 +43,7 @@ class LRScheduler(object):
         factor (float): factor of learning rate for Transformer
         noam (bool): learning rate scheduling for Transformer
         save_checkpoints_topk (int): save top-k checkpoints
+        async_save (bool): write checkpoints in a background thread
 
     """
 
@@ -48,7 +51,8 @@ class LRScheduler(object):
                  decay_type, decay_start_epoch, decay_rate,
                  decay_patient_n_epochs=0, early_stop_patient_n_epochs=-1, lower_better=True,
                  warmup_start_lr=0, warmup_n_steps=0, peak_lr=1e6,
-                 model_size=0, factor=1, noam=False, save_checkpoints_topk=1):
+                 model_size=0, factor=1, noam=False, save_checkpoints_topk=1,
+                 async_save=False):
 
         self.optimizer = optimizer
         self.noam = noam
@@ -82,6 +86,10 @@ class LRScheduler(object):
         self.topk = save_checkpoints_topk
         assert save_checkpoints_topk >= 1
         self.topk_list = []
+        self.pending_epochs = []  # epochs waiting for asynchronous evaluation
+
+        # NOTE: not included in state_dict()
+        self.writer = AsyncCheckpointWriter() if async_save else None
 
     @property
     def n_steps(self):
@@ -100,6 +108,8 @@ class LRScheduler(object):
         return self.not_improved_n_epochs >= self.early_stop_patient_n_epochs
 
     def step(self):
+        if self.writer is not None:
+            self.writer.check()  # raise errors in writing checkpoints
         self._step += 1
         self.optimizer.step()
         if self.noam:
@@ -124,14 +134,40 @@ class LRScheduler(object):
                 self.warmup_n_steps * self._step + self.warmup_start_lr
             self._update_lr()
 
-    def epoch(self, metric=None):
+    def epoch(self, metric=None, pending=False):
         """Decay learning rate per epoch.
 
         Args:
             metric: (float): A metric to evaluate
+            pending (bool): the metric of this epoch is evaluated asynchronously
+                and will be reported later by `report_metric()`
 
         """
         self._epoch += 1
+        if pending:
+            self._is_topk = False
+            self.pending_epochs.append(self._epoch)
+            if not self.noam and self._epoch >= self.decay_start_epoch and self.decay_type == 'always':
+                self._decay(self._epoch)
+            return
+        self._update_metric(self._epoch, metric)
+
+    def report_metric(self, epoch, metric):
+        """Report a metric of a past epoch evaluated asynchronously.
+           Metrics must be reported in the order of epochs, and the metric-based
+           decay is applied when the metric is reported.
+
+        Args:
+            epoch (int): epoch when the model was evaluated
+            metric: (float): A metric to evaluate
+
+        """
+        assert len(self.pending_epochs) > 0 and epoch == self.pending_epochs[0], \
+            'Metrics must be reported in the order of epochs: %d (expected: %s)' % (epoch, self.pending_epochs)
+        self.pending_epochs.pop(0)
+        self._update_metric(epoch, metric, decay_always=False)
+
+    def _update_metric(self, epoch, metric, decay_always=True):
         self._is_topk = False
         is_best = False
 
@@ -142,14 +178,14 @@ class LRScheduler(object):
             if len(self.topk_list) < self.topk or metric < self.topk_list[-1][1]:
                 topk = sum([v < metric for (ep, v) in self.topk_list]) + 1
                 logger.info('||||| Top-%d Score |||||' % topk)
-                self.topk_list.append((self.n_epochs, metric))
+                self.topk_list.append((epoch, metric))
                 self.topk_list = sorted(self.topk_list, key=lambda x: x[1])[:self.topk]
                 self._is_topk = True
                 is_best = topk == 1
                 for k, (ep, v) in enumerate(self.topk_list):
                     logger.info('----- Top-%d: epoch%d (%.3f)' % (k + 1, ep, v))
 
-        if not self.noam and self._epoch >= self.decay_start_epoch:
+        if not self.noam and epoch >= self.decay_start_epoch:
             if self.decay_type == 'metric':
                 if is_best:
                     # Improved
@@ -160,15 +196,14 @@ class LRScheduler(object):
                 else:
                     # Not improved, and learning rate is decayed
                     self.not_improved_n_epochs = 0
-                    self.lr *= self.decay_rate
-                    self._update_lr()
-                    logger.info('Epoch %d: reducing learning rate to %.7f'
-                                % (self._epoch, self.lr))
-            elif self.decay_type == 'always':
-                self.lr *= self.decay_rate
-                self._update_lr()
-                logger.info('Epoch %d: reducing learning rate to %.7f'
-                            % (self._epoch, self.lr))
+                    self._decay(epoch)
+            elif self.decay_type == 'always' and decay_always:
+                self._decay(epoch)
+
+    def _decay(self, epoch):
+        self.lr *= self.decay_rate
+        self._update_lr()
+        logger.info('Epoch %d: reducing learning rate to %.7f' % (epoch, self.lr))
 
     def _update_lr(self):
         """Reduce learning rate."""
@@ -190,6 +225,8 @@ class LRScheduler(object):
                 worse than the top-k ones are deleted
             amp ():
             epoch_detail (float): fine-grained epoch (used for MBR training)
+        Returns:
+            model_path (str): path to the saved checkpoint
 
         """
         if epoch_detail is None:
@@ -198,12 +235,7 @@ class LRScheduler(object):
 
         # Remove old checkpoints
         if remove_old:
-            for path in glob(os.path.join(save_path, 'model.epoch-*')):
-                if 'model.epoch-avg' in path:
-                    continue
-                epoch = int(path.split('-')[-1])
-                if epoch not in [ep for (ep, v) in self.topk_list]:
-                    os.remove(path)
+            self.remove_old_checkpoints(save_path)
 
         # Save parameters, optimizer, step index etc.
         checkpoint = {
@@ -212,9 +244,59 @@ class LRScheduler(object):
         }
         if amp is not None:
             checkpoint['amp_state_dict'] = amp.state_dict()
-        torch.save(checkpoint, model_path)
+        if self.writer is not None:
+            # NOTE: `model_path` appears after the write is completed
+            self.writer.save(checkpoint, model_path)
+        else:
+            torch.save(checkpoint, model_path)
 
         logger.info("=> Saved checkpoint (epoch:%s): %s" % (str(epoch_detail), model_path))
+        return model_path
+
+    def save_training_state(self, model, state_path, amp=None, **states):
+        """Save the training state to resume in the middle of an epoch.
+           The file is overwritten atomically every time.
+
+        Args:
+            model (torch.nn.Module):
+            state_path (str): path to the training state
+            amp ():
+            states: other states (e.g., data iterator, random number generators)
+
+        """
+        checkpoint = {
+            "model_state_dict": model.module.state_dict(),
+            "optimizer_state_dict": self.state_dict(),  # LRScheduler class
+        }
+        if amp is not None:
+            checkpoint['amp_state_dict'] = amp.state_dict()
+        checkpoint.update(states)
+        if self.writer is not None:
+            self.writer.save(checkpoint, state_path)
+        else:
+            atomic_save(checkpoint, state_path)
+
+        logger.info("=> Saved training state (step:%d): %s" % (self.n_steps, state_path))
+
+    def wait_checkpoints(self):
+        """Wait until all checkpoints are written."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def remove_old_checkpoints(self, save_path, keep_epochs=[]):
+        """Remove checkpoints worse than the top-k ones.
+           Checkpoints waiting for asynchronous evaluation are kept.
+
+        Args:
+            save_path (str): path to the directory of checkpoints
+            keep_epochs (list): epochs of checkpoints to keep in addition
+
+        """
+        keep_epochs = [ep for (ep, v) in self.topk_list] + self.pending_epochs + list(keep_epochs)
+        if self.writer is not None:
+            self.writer.run(lambda: remove_checkpoints(save_path, keep_epochs))
+        else:
+            remove_checkpoints(save_path, keep_epochs)
 
     def state_dict(self):
         """Returns the state of the scheduler as a :class:`dict`.
@@ -223,7 +305,7 @@ class LRScheduler(object):
         is not the optimizer.
 
         """
-        dict = {key: value for key, value in self.__dict__.items()}
+        dict = {key: value for key, value in self.__dict__.items() if key != 'writer'}
         dict['optimizer_state_dict'] = self.optimizer.state_dict()
         return dict
 
@@ -235,7 +317,8 @@ class LRScheduler(object):
                 from a call to :meth:`state_dict`.
 
         """
-        self.__dict__.update({k: v for k, v in state_dict.items() if k != 'optimizer_state_dict'})
+        self.__dict__.update({k: v for k, v in state_dict.items()
+                              if k not in ['optimizer_state_dict', 'writer']})
         self.optimizer.load_state_dict(state_dict['optimizer_state_dict'])
 
     def convert_to_sgd(self, model, lr, weight_decay, decay_type, decay_rate):
@@ -247,3 +330,19 @@ class LRScheduler(object):
         # weight_decay = self.optimizer.defaults['weight_decay']
         self.optimizer = set_optimizer(model, 'sgd', lr, weight_decay)
         logger.info('========== Convert to SGD ==========')
+
+
+def remove_checkpoints(save_path, keep_epochs):
+    """Remove checkpoints except for those of the given epochs.
+
+    Args:
+        save_path (str): path to the directory of checkpoints
+        keep_epochs (list): epochs of checkpoints to keep
+
+    """
+    for path in glob(os.path.join(save_path, 'model.epoch-*')):
+        if 'model.epoch-avg' in path:
+            continue
+        epoch = int(path.split('-')[-1])
+        if epoch not in keep_epochs:
+            os.remove(path)
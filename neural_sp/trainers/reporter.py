@@ -28,14 +28,16 @@ class Reporter(object):
 
     Args:
         save_path (str):
+        enabled (bool): if False, nothing is recorded (e.g., non-master processes in distributed training)
 
     """
 
-    def __init__(self, save_path):
+    def __init__(self, save_path, enabled=True):
         self.save_path = save_path
+        self.enabled = enabled
 
         # tensorboard
-        self.tf_writer = SummaryWriter(save_path)
+        self.tf_writer = SummaryWriter(save_path) if enabled else None
 
         # report per step
         self._step = 0
@@ -49,6 +51,19 @@ class Reporter(object):
         self.obsv_eval = []
         self.epochs = []
 
+    def state_dict(self):
+        """Returns the history of observations except for the tensorboard writer."""
+        return {k: v for k, v in self.__dict__.items() if k not in ['save_path', 'enabled', 'tf_writer']}
+
+    def load_state_dict(self, state_dict):
+        """Restore the history of observations.
+
+        Args:
+            state_dict (dict): history returned by `state_dict()`
+
+        """
+        self.__dict__.update(state_dict)
+
     def add(self, observation, is_eval=False):
         """Restore values per step.
 
@@ -57,6 +72,8 @@ class Reporter(object):
             is_eval (bool):
 
         """
+        if not self.enabled:
+            return
         for k, v in observation.items():
             if v is None:
                 continue
@@ -90,13 +107,33 @@ class Reporter(object):
 
     def add_tensorboard_scalar(self, key, value):
         """Add scalar value to tensorboard."""
+        if not self.enabled:
+            return
         self.tf_writer.add_scalar(key, value, self._step)
 
     def add_tensorboard_histogram(self, key, value):
         """Add histogram value to tensorboard."""
+        if not self.enabled:
+            return
         self.tf_writer.add_histogram(key, value, self._step)
 
+    def add_profile(self, summary, n_steps):
+        """Add elapsed time per module to tensorboard.
+
+        Args:
+            summary (dict): region name -> (total time in seconds, number of calls)
+            n_steps (int): number of training steps covered by `summary`
+
+        """
+        if not self.enabled or n_steps == 0:
+            return
+        for name, (total, count) in sorted(summary.items(), key=lambda x: -x[1][0]):
+            self.add_tensorboard_scalar('time/' + name, total * 1000 / n_steps)
+            logger.info('%-20s %10.2f ms/step %8d calls' % (name, total * 1000 / n_steps, count))
+
     def step(self, is_eval=False):
+        if not self.enabled:
+            return
         self._step += 1
         if is_eval:
             self.steps.append(self._step)
@@ -105,6 +142,8 @@ class Reporter(object):
             self.obsv_train_local = {'loss': {}, 'acc': {}, 'ppl': {}}
 
     def epoch(self, metric=None, name='wer'):
+        if not self.enabled:
+            return
         self._epoch += 1
         if metric is None:
             return
@@ -130,6 +169,8 @@ class Reporter(object):
         plt.savefig(os.path.join(self.save_path, name + ".png"), dvi=500)
 
     def snapshot(self):
+        if not self.enabled:
+            return
         # linestyles = ['solid', 'dashed', 'dotted', 'dashdotdotted']
         linestyles = ['-', '--', '-.', ':', ':', ':', ':', ':', ':', ':', ':', ':']
         for metric in self.obsv_train.keys():
@@ -164,3 +205,7 @@ class Reporter(object):
             if os.path.isfile(os.path.join(self.save_path, metric + ".png")):
                 os.remove(os.path.join(self.save_path, metric + ".png"))
             plt.savefig(os.path.join(self.save_path, metric + ".png"), dvi=500)
+
+    def close(self):
+        if self.tf_writer is not None:
+            self.tf_writer.close()
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for benchmark utilities."""
+
+import importlib
+import pytest
+
+
+@pytest.mark.parametrize("dist", ['uniform', 'normal'])
+def test_sample_lengths(dist):
+    module = importlib.import_module('neural_sp.bin.benchmark_utils')
+    lengths = module.sample_lengths(100, 50, 200, dist, seed=1)
+    assert len(lengths) == 100
+    assert min(lengths) >= 50 and max(lengths) <= 200
+    assert lengths == module.sample_lengths(100, 50, 200, dist, seed=1)
+
+
+def test_percentiles():
+    module = importlib.import_module('neural_sp.bin.benchmark_utils')
+    summary = module.percentiles([i / 1000 for i in range(1, 101)])
+    assert summary['p50'] == pytest.approx(50.5)
+    assert summary['max'] == pytest.approx(100)
+    assert module.percentiles([]) == {}
+
+
+@pytest.mark.parametrize(
+    "current, n_regressions",
+    [
+        ({'rtf': 0.5, 'tokens_per_sec': 100.}, 0),
+        ({'rtf': 0.52, 'tokens_per_sec': 95.}, 0),
+        ({'rtf': 0.6, 'tokens_per_sec': 100.}, 1),
+        ({'rtf': 0.6, 'tokens_per_sec': 80.}, 2),
+    ]
+)
+def test_compare_results(tmp_path, current, n_regressions):
+    module = importlib.import_module('neural_sp.bin.benchmark_utils')
+    baseline = {'greedy': {'rtf': 0.5, 'tokens_per_sec': 100., 'latency_ms': {'p50': 10.}}}
+    path = str(tmp_path / 'baseline.json')
+    module.save_results(path, {}, baseline)
+    assert module.load_results(path) == baseline
+
+    diffs = module.compare_results({'greedy': current, 'beam': current}, module.load_results(path),
+                                   tolerance=0.1)
+    assert len(diffs) == 2
+    assert sum([d[-1] for d in diffs]) == n_regressions
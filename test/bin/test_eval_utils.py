@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for checkpoint averaging."""
+
+import importlib
+import os
+import pytest
+import torch
+
+
+def save_checkpoints(save_path, n_epochs):
+    models = []
+    for ep in range(1, n_epochs + 1):
+        model = torch.nn.Linear(4, 3)
+        optimizer = torch.optim.Adam(model.parameters())
+        model(torch.randn(2, 4)).sum().backward()
+        optimizer.step()
+        torch.save({'model_state_dict': model.state_dict(),
+                    'optimizer_state_dict': {'optimizer': optimizer,
+                                             'optimizer_state_dict': optimizer.state_dict(),
+                                             'topk_list': [(2, 1.0), (3, 2.0), (1, 3.0)]}},
+                   os.path.join(save_path, 'model.epoch-' + str(ep)))
+        models.append(model)
+    return models
+
+
+def test_load_model_state_dict(tmp_path, monkeypatch):
+    module = importlib.import_module('neural_sp.bin.eval_utils')
+    models = save_checkpoints(str(tmp_path), 1)
+
+    # the whole checkpoint must not be loaded as a fallback
+    def torch_load(*args, **kwargs):
+        raise AssertionError('torch.load is called')
+
+    monkeypatch.setattr(torch, 'load', torch_load)
+    state_dict, checkpoint = module.load_model_state_dict(str(tmp_path / 'model.epoch-1'))
+    for k, v in models[0].state_dict().items():
+        assert torch.equal(state_dict[k], v)
+    # optimizer states are not restored
+    assert not isinstance(checkpoint['optimizer_state_dict']['optimizer'], torch.optim.Optimizer)
+    exp_avg = list(checkpoint['optimizer_state_dict']['optimizer_state_dict']['state'].values())[0]['exp_avg']
+    assert not isinstance(exp_avg, torch.Tensor)
+    assert module.load_topk_list(str(tmp_path / 'model.epoch-1')) == [(2, 1.0), (3, 2.0), (1, 3.0)]
+
+
+@pytest.mark.parametrize("weights", [None, [1., 2.]])
+def test_average_state_dicts(tmp_path, weights):
+    module = importlib.import_module('neural_sp.bin.eval_utils')
+    models = save_checkpoints(str(tmp_path), 2)
+    paths = [str(tmp_path / 'model.epoch-1'), str(tmp_path / 'model.epoch-2')]
+    state_dict_avg = module.average_state_dicts(paths, weights)
+    w = [0.5, 0.5] if weights is None else [1 / 3, 2 / 3]
+    for k in state_dict_avg.keys():
+        ref = models[0].state_dict()[k] * w[0] + models[1].state_dict()[k] * w[1]
+        assert torch.allclose(state_dict_avg[k], ref, atol=1e-6)
+
+
+def test_average_checkpoints_cache(tmp_path):
+    module = importlib.import_module('neural_sp.bin.eval_utils')
+    models = save_checkpoints(str(tmp_path), 3)
+    best_model_path = str(tmp_path / 'model.epoch-3')
+    topk_list = module.load_topk_list(best_model_path)
+
+    model = module.average_checkpoints(torch.nn.Linear(4, 3), best_model_path, 2, topk_list=topk_list)
+    ref = (models[1].weight + models[2].weight) / 2
+    assert torch.allclose(model.weight, ref, atol=1e-6)
+    avg_path = str(tmp_path / 'model-avg2')
+    mtime = os.path.getmtime(avg_path)
+
+    # cached
+    model = module.average_checkpoints(torch.nn.Linear(4, 3), best_model_path, 2, topk_list=topk_list)
+    assert torch.allclose(model.weight, ref, atol=1e-6)
+    assert os.path.getmtime(avg_path) == mtime
+
+    # different sources
+    model = module.average_checkpoints(torch.nn.Linear(4, 3), best_model_path, 2)
+    ref = (models[2].weight + models[1].weight) / 2
+    assert torch.allclose(model.weight, ref, atol=1e-6)
+    model = module.average_checkpoints(torch.nn.Linear(4, 3), best_model_path, 3)
+    ref = (models[0].weight + models[1].weight + models[2].weight) / 3
+    assert torch.allclose(model.weight, ref, atol=1e-6)
@@ -0,0 +1,32 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for teacher posterior store."""
+
+import importlib
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("vocab, topk", [(100, 4), (70000, 8)])
+def test_teacher_posterior(tmp_path, vocab, topk):
+    module = importlib.import_module('neural_sp.datasets.teacher_posterior')
+    prefix = str(tmp_path / 'train')
+    rng = np.random.RandomState(0)
+
+    writer = module.TeacherPosteriorWriter(prefix, vocab, topk=topk)
+    posteriors = {}
+    for i in range(10):
+        ylen = rng.randint(1, 20)
+        ids = rng.randint(0, vocab, (ylen, topk))
+        probs = rng.dirichlet(np.ones(topk), ylen).astype(np.float32)
+        writer.add('utt%d' % i, ids, probs)
+        posteriors['utt%d' % i] = (ids, probs)
+    writer.close()
+
+    store = module.TeacherPosteriorStore(prefix)
+    assert len(store) == len(posteriors)
+    for utt_id, (ids, probs) in posteriors.items():
+        ids_store, probs_store = store.get(utt_id)
+        assert np.array_equal(ids_store, ids)
+        assert np.allclose(probs_store, probs, atol=1e-3)
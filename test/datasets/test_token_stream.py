@@ -0,0 +1,138 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for memory-mapped token stream."""
+
+import importlib
+import numpy as np
+import pytest
+
+
+EOS = 2
+
+
+def make_tsv(path, n_utts=50, vocab=100, seed=0):
+    rng = np.random.RandomState(seed)
+    utts = []
+    with open(path, 'w') as f:
+        f.write('\t'.join(['utt_id', 'speaker', 'feat_path', 'xlen', 'xdim',
+                           'text', 'token_id', 'ylen', 'ydim']) + '\n')
+        for i in range(n_utts):
+            ylen = rng.randint(0, 8)
+            token_ids = rng.randint(3, vocab, ylen).tolist()
+            f.write('\t'.join(['utt%d' % i, 'spk', '', '0', '0', 'text',
+                               ' '.join(map(str, token_ids)), str(ylen), str(vocab)]) + '\n')
+            if ylen > 0:
+                utts.append(token_ids)
+    return utts
+
+
+def reference_stream(utts, order):
+    concat_ids = []
+    for i in order:
+        concat_ids += [EOS] + utts[i]
+    concat_ids += [EOS]
+    return np.array(concat_ids)
+
+
+@pytest.mark.parametrize(
+    "vocab, block_size",
+    [
+        (100, 1),
+        (100, 16),
+        (100, 10000),
+        (70000, 16),
+    ]
+)
+def test_token_stream(tmp_path, vocab, block_size):
+    module = importlib.import_module('neural_sp.datasets.token_stream')
+    utts = make_tsv(str(tmp_path / 'train.tsv'), vocab=vocab)
+    bin_path = str(tmp_path / 'train.bin')
+    n_utts, n_tokens = module.write_token_stream(str(tmp_path / 'train.tsv'), bin_path,
+                                                 vocab=vocab, eos=EOS)
+    assert n_utts == len(utts)
+
+    stream = module.TokenStream(bin_path, block_size=block_size)
+    assert stream.data.dtype == (np.uint16 if vocab <= 65536 else np.uint32)
+    ref = reference_stream(utts, range(len(utts)))
+    assert len(stream) == len(ref)
+    assert np.array_equal(stream.read(0, len(stream)), ref)
+
+    # shuffled blocks keep utterances intact
+    stream.shuffle()
+    ys = stream.read(0, len(stream))
+    assert len(ys) == len(ref)
+    assert sorted(ys.tolist()) == sorted(ref.tolist())
+    assert ys[0] == EOS and ys[-1] == EOS
+
+    # mini-batches are windows of the stream
+    batch_size, offset, bptt = 3, 5, 4
+    row_len = len(stream) // batch_size
+    ys_batch = stream.read_rows(batch_size, offset, bptt)
+    assert ys_batch.shape == (batch_size, bptt)
+    for b in range(batch_size):
+        assert np.array_equal(ys_batch[b], ys[b * row_len + offset:b * row_len + offset + bptt])
+
+
+@pytest.mark.parametrize("use_stream", [True, False])
+def test_resume(tmp_path, use_stream):
+    module = importlib.import_module('neural_sp.datasets.token_stream')
+    module_lm = importlib.import_module('neural_sp.datasets.lm')
+    vocab = 100
+    make_tsv(str(tmp_path / 'train.tsv'), vocab=vocab)
+    dict_path = str(tmp_path / 'dict.txt')
+    with open(dict_path, 'w') as f:
+        for i in range(1, vocab):
+            f.write('%s %d\n' % (chr(0x4e00 + i), i))
+    data_path = str(tmp_path / 'train.tsv')
+    if use_stream:
+        data_path = str(tmp_path / 'train.bin')
+        module.write_token_stream(str(tmp_path / 'train.tsv'), data_path, vocab=vocab, eos=EOS)
+
+    def build():
+        return module_lm.Dataset(tsv_path=data_path, dict_path=dict_path, unit='char',
+                                 batch_size=2, bptt=5, shuffle=True, block_size=16)
+
+    dataset = build()
+    for _ in range(7):
+        dataset.next()
+    state = dataset.state_dict()
+    ys_ref = [dataset.next()[0] for _ in range(10)]
+
+    # A new iterator with a different order continues from the same position
+    np.random.seed(100)
+    dataset = build()
+    dataset.load_state_dict(state)
+    ys = [dataset.next()[0] for _ in range(10)]
+    assert all([np.array_equal(y, y_ref) for y, y_ref in zip(ys, ys_ref)])
+
+
+@pytest.mark.parametrize("world_size", [2, 4])
+def test_distributed(tmp_path, world_size):
+    module = importlib.import_module('neural_sp.datasets.token_stream')
+    module_lm = importlib.import_module('neural_sp.datasets.lm')
+    vocab = 100
+    make_tsv(str(tmp_path / 'train.tsv'), vocab=vocab)
+    dict_path = str(tmp_path / 'dict.txt')
+    with open(dict_path, 'w') as f:
+        for i in range(1, vocab):
+            f.write('%s %d\n' % (chr(0x4e00 + i), i))
+    data_path = str(tmp_path / 'train.bin')
+    module.write_token_stream(str(tmp_path / 'train.tsv'), data_path, vocab=vocab, eos=EOS)
+
+    def build(rank, world_size):
+        return module_lm.Dataset(tsv_path=data_path, dict_path=dict_path, unit='char',
+                                 batch_size=4, bptt=5, shuffle=True, block_size=16,
+                                 rank=rank, world_size=world_size)
+
+    # Rows of all processes make up the global mini-batch
+    datasets = [build(rank, world_size) for rank in range(world_size)]
+    dataset_global = build(0, 1)
+    dataset_global.np_rng = np.random.RandomState(1)
+    dataset_global.stream.shuffle(dataset_global.np_rng)
+    for _ in range(10):
+        ys_global = dataset_global.next()[0]
+        ys = [dataset.next()[0] for dataset in datasets]
+        assert all([len(y) == 4 // world_size for y in ys])
+        for rank in range(world_size):
+            assert np.array_equal(ys[rank], ys_global[rank::world_size])
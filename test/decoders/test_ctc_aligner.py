@@ -0,0 +1,94 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for CTC Viterbi alignment."""
+
+import importlib
+import itertools
+import numpy as np
+import pytest
+import torch
+
+VOCAB = 4
+BLANK = 0
+
+
+def collapse(labels):
+    return [k for k, _ in itertools.groupby(labels) if k != BLANK]
+
+
+def brute_force(log_probs, y):
+    """Best path score by enumerating all frame-level label sequences."""
+    best = None
+    for labels in itertools.product(range(VOCAB), repeat=log_probs.shape[0]):
+        if collapse(labels) != list(y):
+            continue
+        score = sum(log_probs[t, k] for t, k in enumerate(labels))
+        if best is None or score > best:
+            best = score
+    return best
+
+
+@pytest.mark.parametrize(
+    "elens, ys",
+    [
+        ([5], [[1, 2]]),
+        ([6, 4, 5], [[1, 2, 3], [3], [2, 2]]),
+        ([6, 3], [[1, 1, 2], [1, 2]]),
+        ([4, 4], [[], [3, 1]]),
+    ]
+)
+def test_viterbi_align(elens, ys):
+    module = importlib.import_module('neural_sp.models.seq2seq.decoders.ctc')
+
+    torch.manual_seed(1)
+    bs, xmax = len(elens), max(elens)
+    log_probs = torch.log_softmax(torch.randn(bs, xmax, VOCAB), dim=-1)
+    ymax = max(1, max([len(y) for y in ys]))
+    ys_pad = torch.zeros(bs, ymax, dtype=torch.int64)
+    for b, y in enumerate(ys):
+        ys_pad[b, :len(y)] = torch.LongTensor(y)
+    ylens = torch.LongTensor([len(y) for y in ys])
+
+    aligner = module.CTCViterbiAligner(blank=BLANK)
+    best_paths, scores = aligner.align(log_probs, torch.IntTensor(elens), ys_pad, ylens)
+    assert best_paths.size() == (bs, xmax)
+
+    for b in range(bs):
+        lp = log_probs[b, :elens[b]].numpy()
+        path = best_paths[b].numpy()
+        assert (path[elens[b]:] == -1).all()
+        path = path[:elens[b]]
+        # states are monotonic
+        assert (np.diff(path) >= 0).all()
+
+        # state indices to labels
+        labels = [BLANK if s % 2 == 0 else ys[b][(s - 1) // 2] for s in path]
+        assert collapse(labels) == ys[b]
+        score = sum(lp[t, k] for t, k in enumerate(labels))
+        assert np.allclose(score, scores[b].item(), atol=1e-4)
+        assert np.allclose(scores[b].item(), brute_force(lp, ys[b]), atol=1e-4)
+
+        segments = module.ctc_token_segments(path, np.exp(lp), np.array(ys[b], dtype=np.int64))
+        assert [seg[0] for seg in segments] == ys[b]
+        for i, (token_id, start, end, confidence) in enumerate(segments):
+            assert 0 <= start < end <= elens[b]
+            assert all([labels[t] == token_id for t in range(start, end)])
+            assert np.allclose(confidence, np.exp(lp[start:end, token_id]).mean())
+            if i > 0:
+                assert segments[i - 1][2] <= start
+
+
+def test_viterbi_align_infeasible():
+    module = importlib.import_module('neural_sp.models.seq2seq.decoders.ctc')
+
+    torch.manual_seed(1)
+    log_probs = torch.log_softmax(torch.randn(2, 4, VOCAB), dim=-1)
+    ys_pad = torch.LongTensor([[1, 1, 1], [1, 2, 3]])
+    ylens = torch.LongTensor([3, 3])
+
+    aligner = module.CTCViterbiAligner(blank=BLANK)
+    _, scores = aligner.align(log_probs, torch.IntTensor([4, 4]), ys_pad, ylens)
+    # 3 repeated labels need at least 5 frames
+    assert scores[0].item() < module.LOG_0 / 2
+    assert scores[1].item() > module.LOG_0 / 2
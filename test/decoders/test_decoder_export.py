@@ -0,0 +1,291 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for exported decoder steps and CTC."""
+
+import importlib
+import numpy as np
+import pytest
+import torch
+
+from neural_sp.models.torch_utils import np2tensor
+
+
+ENC_N_UNITS = 32
+VOCAB = 10
+
+
+def make_args_las(**kwargs):
+    args = dict(
+        special_symbols={'blank': 0, 'unk': 1, 'eos': 2, 'pad': 3},
+        enc_n_units=ENC_N_UNITS,
+        attn_type='location',
+        rnn_type='lstm',
+        n_units=32,
+        n_projs=0,
+        n_layers=2,
+        bottleneck_dim=16,
+        emb_dim=16,
+        vocab=VOCAB,
+        tie_embedding=False,
+        attn_dim=32,
+        attn_sharpening_factor=1.0,
+        attn_sigmoid_smoothing=False,
+        attn_conv_out_channels=10,
+        attn_conv_kernel_size=201,
+        attn_n_heads=1,
+        dropout=0.1,
+        dropout_emb=0.1,
+        dropout_att=0.1,
+        lsm_prob=0.0,
+        ss_prob=0.0,
+        ss_type='constant',
+        ctc_weight=0.0,
+        ctc_lsm_prob=0.1,
+        ctc_fc_list='32_32',
+        mbr_training=False,
+        mbr_ce_weight=0.01,
+        external_lm=None,
+        lm_fusion='',
+        lm_init=False,
+        backward=False,
+        global_weight=1.0,
+        mtl_per_batch=False,
+        param_init=0.1,
+        mocha_chunk_size=4,
+        mocha_n_heads_mono=1,
+        mocha_init_r=-4,
+        mocha_eps=1e-6,
+        mocha_std=1.0,
+        mocha_no_denominator=False,
+        mocha_1dconv=False,
+        mocha_quantity_loss_weight=0.0,
+        latency_metric=False,
+        latency_loss_weight=0.0,
+        gmm_attn_n_mixtures=1,
+        replace_sos=False,
+        distillation_weight=0.0,
+        discourse_aware=False
+    )
+    args.update(kwargs)
+    return args
+
+
+def make_args_transformer(**kwargs):
+    args = dict(
+        special_symbols={'blank': 0, 'unk': 1, 'eos': 2, 'pad': 3},
+        enc_n_units=ENC_N_UNITS,
+        attn_type='scaled_dot',
+        n_heads=4,
+        n_layers=2,
+        d_model=32,
+        d_ff=128,
+        ffn_bottleneck_dim=0,
+        pe_type='add',
+        layer_norm_eps=1e-12,
+        ffn_activation='relu',
+        vocab=VOCAB,
+        tie_embedding=False,
+        dropout=0.1,
+        dropout_emb=0.1,
+        dropout_att=0.1,
+        dropout_layer=0.0,
+        dropout_head=0.0,
+        lsm_prob=0.0,
+        ctc_weight=0.0,
+        ctc_lsm_prob=0.1,
+        ctc_fc_list='32_32',
+        backward=False,
+        global_weight=1.0,
+        mtl_per_batch=False,
+        param_init='xavier_uniform',
+        memory_transformer=False,
+        mem_len=0,
+        mocha_chunk_size=4,
+        mocha_n_heads_mono=1,
+        mocha_n_heads_chunk=1,
+        mocha_init_r=-4,
+        mocha_eps=1e-6,
+        mocha_std=1.0,
+        mocha_no_denominator=False,
+        mocha_1dconv=False,
+        mocha_quantity_loss_weight=0.0,
+        mocha_head_divergence_loss_weight=0.0,
+        latency_metric=False,
+        latency_loss_weight=0.0,
+        mocha_first_layer=1,
+        share_chunkwise_attention=False,
+        external_lm=None,
+        lm_fusion='',
+        # lm_init=False,
+    )
+    args.update(kwargs)
+    return args
+
+
+def make_args_rnnt(**kwargs):
+    args = dict(
+        special_symbols={'blank': 0, 'unk': 1, 'eos': 2, 'pad': 3},
+        enc_n_units=ENC_N_UNITS,
+        rnn_type='lstm_transducer',
+        n_units=32,
+        n_projs=0,
+        n_layers=2,
+        bottleneck_dim=16,
+        emb_dim=16,
+        vocab=VOCAB,
+        dropout=0.1,
+        dropout_emb=0.1,
+        ctc_weight=0.0,
+        ctc_lsm_prob=0.1,
+        ctc_fc_list='32_32',
+        external_lm=None,
+        global_weight=1.0,
+        mtl_per_batch=False,
+        param_init=0.1,
+    )
+    args.update(kwargs)
+    return args
+
+
+def make_eouts(batch_size, emax):
+    return np2tensor(np.random.randn(batch_size, emax, ENC_N_UNITS).astype(np.float32)).float()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ({'rnn_type': 'lstm', 'attn_type': 'location'}),
+        ({'rnn_type': 'gru', 'attn_type': 'location'}),
+        ({'rnn_type': 'lstm', 'attn_type': 'add'}),
+        ({'rnn_type': 'lstm', 'attn_type': 'dot'}),
+        ({'rnn_type': 'lstm', 'attn_type': 'luong_dot'}),
+        ({'rnn_type': 'lstm', 'attn_type': 'add', 'attn_n_heads': 4}),
+    ]
+)
+def test_rnn_decoder(args, tmp_path):
+    torch.manual_seed(1)
+    args = make_args_las(**args)
+    module = importlib.import_module('neural_sp.models.seq2seq.export')
+    module_dec = importlib.import_module('neural_sp.models.seq2seq.decoders.las')
+    dec = module_dec.RNNDecoder(**args)
+    dec.eval()
+
+    init = module.RNNDecoderInit(dec)
+    step = module.RNNDecoderStep(dec)
+    init_traced = torch.jit.load(module.export(init, str(tmp_path / 'init.pt')))
+    step_traced = torch.jit.load(module.export(step, str(tmp_path / 'step.pt')))
+
+    batch_size, emax = 4, 40
+    eouts = make_eouts(batch_size, emax)
+    elens = torch.IntTensor([emax] * batch_size)
+    ymax = 8
+    with torch.no_grad():
+        hyps_ref, _ = dec.greedy(eouts, elens, max_len_ratio=ymax / emax, idx2token=None)
+
+        keys = init_traced(eouts)
+        if not isinstance(keys, tuple):
+            keys = (keys,)
+        y, cv, hxs, cxs, aw = step.dummy_inputs(batch_size, emax)[:5]
+        hyps = []
+        for _ in range(ymax):
+            log_probs, cv, hxs, cxs, aw = step_traced(y, cv, hxs, cxs, aw, eouts, *keys)
+            y = log_probs.argmax(-1, keepdim=True)
+            hyps.append(y)
+        hyps = torch.cat(hyps, dim=1).numpy()
+
+    for b in range(batch_size):
+        assert np.array_equal(hyps[b, :len(hyps_ref[b])], hyps_ref[b])
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ({'pe_type': 'add'}),
+        ({'pe_type': 'none'}),
+        ({'n_layers': 1}),
+    ]
+)
+def test_transformer_decoder(args, tmp_path):
+    torch.manual_seed(1)
+    args = make_args_transformer(**args)
+    module = importlib.import_module('neural_sp.models.seq2seq.export')
+    module_dec = importlib.import_module('neural_sp.models.seq2seq.decoders.transformer')
+    dec = module_dec.TransformerDecoder(**args)
+    dec.eval()
+
+    step = module.TransformerDecoderStep(dec)
+    step_traced = torch.jit.load(module.export(step, str(tmp_path / 'step.pt')))
+
+    batch_size, emax = 4, 40
+    eouts = make_eouts(batch_size, emax)
+    elens = torch.IntTensor([emax] * batch_size)
+    ymax = 8
+    with torch.no_grad():
+        hyps_ref, _ = dec.greedy(eouts, elens, max_len_ratio=ymax / emax, idx2token=None)
+
+        ys = eouts.new_zeros((batch_size, 1), dtype=torch.int64).fill_(dec.eos)
+        cache = eouts.new_zeros(args['n_layers'], batch_size, 0, args['d_model'])
+        for _ in range(ymax):
+            log_probs, cache = step_traced(ys, eouts, cache)
+            ys = torch.cat([ys, log_probs.argmax(-1, keepdim=True)], dim=1)
+        hyps = ys[:, 1:].numpy()
+
+    for b in range(batch_size):
+        assert np.array_equal(hyps[b, :len(hyps_ref[b])], hyps_ref[b])
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ({'rnn_type': 'lstm_transducer'}),
+        ({'rnn_type': 'gru_transducer'}),
+        ({'rnn_type': 'lstm_transducer', 'n_projs': 16}),
+    ]
+)
+def test_rnn_transducer(args, tmp_path):
+    torch.manual_seed(1)
+    args = make_args_rnnt(**args)
+    module = importlib.import_module('neural_sp.models.seq2seq.export')
+    module_dec = importlib.import_module('neural_sp.models.seq2seq.decoders.rnn_transducer')
+    dec = module_dec.RNNTransducer(**args)
+    dec.eval()
+
+    pred = module.RNNTransducerPredictionStep(dec)
+    joint = module.RNNTransducerJoint(dec)
+    pred_traced = torch.jit.load(module.export(pred, str(tmp_path / 'pred.pt')))
+    joint_traced = torch.jit.load(module.export(joint, str(tmp_path / 'joint.pt')))
+
+    batch_size, emax = 4, 40
+    eouts = make_eouts(batch_size, emax)
+    y, hxs, cxs = pred.dummy_inputs(batch_size)
+    dstate = None
+    with torch.no_grad():
+        for _ in range(3):
+            dout_ref, dstate = dec.recurrency(dec.embed(y), dstate)
+            log_probs_ref = torch.log_softmax(dec.joint(eouts, dout_ref), dim=-1)
+
+            dout, hxs, cxs = pred_traced(y, hxs, cxs)
+            log_probs = joint_traced(eouts, dout)
+            assert torch.allclose(dout, dout_ref, atol=1e-6)
+            assert torch.allclose(hxs, dstate['hxs'], atol=1e-6)
+            assert torch.allclose(log_probs, log_probs_ref, atol=1e-5)
+            y = log_probs[:, -1, -1].argmax(-1, keepdim=True)
+
+
+def test_ctc(tmp_path):
+    pytest.importorskip('warpctc_pytorch')
+    torch.manual_seed(1)
+    module = importlib.import_module('neural_sp.models.seq2seq.export')
+    module_ctc = importlib.import_module('neural_sp.models.seq2seq.decoders.ctc')
+    ctc = module_ctc.CTC(eos=2, blank=0, enc_n_units=ENC_N_UNITS, vocab=VOCAB, fc_list='32_32')
+    ctc.eval()
+
+    wrapper = module.CTCExport(ctc)
+    traced = torch.jit.load(module.export(wrapper, str(tmp_path / 'ctc.pt')))
+
+    eouts = make_eouts(4, 40)
+    with torch.no_grad():
+        log_probs_ref = torch.log_softmax(ctc.output(eouts), dim=-1)
+        log_probs = traced(eouts)
+    assert torch.allclose(log_probs, log_probs_ref, atol=1e-6)
@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for ensemble decoding."""
+
+import importlib
+import numpy as np
+import pytest
+import torch
+
+INPUT_DIM = 8
+VOCAB = 10
+
+
+def build_model(input_args, seed):
+    from neural_sp.bin.args_asr import build_parser
+    from neural_sp.bin.args_asr import register_args_decoder
+    from neural_sp.bin.args_asr import register_args_encoder
+    from neural_sp.models.seq2seq.speech2text import Speech2Text
+
+    input_args = ['--enc_type', 'blstm', '--enc_n_layers', '2', '--enc_n_units', '16',
+                  '--subsample', '1_1', '--dec_n_units', '16', '--emb_dim', '16',
+                  '--attn_dim', '16', '--recog_beam_width', '3'] + input_args
+    parser = build_parser()
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_encoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_decoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    args.input_dim = INPUT_DIM
+    args.vocab = VOCAB
+    args.vocab_sub1 = -1
+    args.vocab_sub2 = -1
+    torch.manual_seed(seed)
+    model = Speech2Text(args)
+    model.eval()
+    return model, vars(args)
+
+
+@pytest.mark.parametrize(
+    "input_args, n_workers",
+    [
+        ([], 1),
+        ([], 3),
+        (['--ctc_weight', '0.3', '--recog_ctc_weight', '0.3'], 3),
+    ]
+)
+def test_decode(input_args, n_workers):
+    module = importlib.import_module('neural_sp.models.seq2seq.ensemble')
+    models = [build_model(input_args, seed)[0] for seed in range(3)]
+    params = build_model(input_args, 0)[1]
+
+    rng = np.random.RandomState(1)
+    xs = [rng.randn(40, INPUT_DIM).astype(np.float32)]
+
+    # sequential
+    hyps_ref, _ = models[0].decode(xs, params, None, exclude_eos=True,
+                                   utt_ids=['utt1'], ensemble_models=models[1:])
+
+    # concurrent
+    models[0].ensemble_executor = module.EnsembleExecutor(n_workers)
+    hyps, _ = models[0].decode(xs, params, None, exclude_eos=True,
+                               utt_ids=['utt1'], ensemble_models=models[1:])
+    assert [list(h) for h in hyps] == [list(h) for h in hyps_ref]
+
+    # encoder outputs are cached per member
+    assert all([len(cache) == 1 for cache in models[0].ensemble_executor.caches.values()])
+    hyps, _ = models[0].decode(xs, params, None, exclude_eos=True,
+                               utt_ids=['utt1'], ensemble_models=models[1:])
+    assert [list(h) for h in hyps] == [list(h) for h in hyps_ref]
+    models[0].ensemble_executor.shutdown()
+
+
+def test_map():
+    module = importlib.import_module('neural_sp.models.seq2seq.ensemble')
+    executor = module.EnsembleExecutor(n_workers=4)
+
+    # the gradient mode of the caller is kept in worker threads
+    with torch.no_grad():
+        results = executor.map(lambda i: (i, torch.is_grad_enabled()), list(range(8)))
+    assert results == [(i, False) for i in range(8)]
+    executor.shutdown()
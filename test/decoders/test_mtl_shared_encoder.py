@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for multi-task learning with a shared encoder pass per mini-batch."""
+
+import numpy as np
+import pytest
+import torch
+
+INPUT_DIM = 8
+VOCAB = 10
+
+
+def build_model(input_args):
+    from neural_sp.bin.args_asr import build_parser
+    from neural_sp.bin.args_asr import register_args_decoder
+    from neural_sp.bin.args_asr import register_args_encoder
+    from neural_sp.models.seq2seq.speech2text import Speech2Text
+
+    input_args = ['--enc_type', 'blstm', '--enc_n_layers', '2', '--enc_n_units', '16',
+                  '--subsample', '1_1', '--dec_n_units', '16', '--emb_dim', '16',
+                  '--attn_dim', '16', '--mtl_per_batch', 'true'] + input_args
+    parser = build_parser()
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_encoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_decoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    args.input_dim = INPUT_DIM
+    args.vocab = VOCAB
+    args.vocab_sub1 = -1
+    args.vocab_sub2 = -1
+    torch.manual_seed(1)
+    return Speech2Text(args)
+
+
+def make_batch(xlens, ylens):
+    rng = np.random.RandomState(1)
+    return {'xs': [rng.randn(xlen, INPUT_DIM).astype(np.float32) for xlen in xlens],
+            'xlens': xlens,
+            'ys': [rng.randint(4, VOCAB, ylen).tolist() for ylen in ylens],
+            'ys_sub1': [], 'ys_sub2': [],
+            'utt_ids': ['utt%d' % b for b in range(len(xlens))],
+            'speakers': ['spk'] * len(xlens)}
+
+
+@pytest.mark.parametrize(
+    "input_args, tasks",
+    [
+        (['--ctc_weight', '0.3'], ['ys.ctc', 'ys']),
+        (['--ctc_weight', '0.3', '--bwd_weight', '0.3'], ['ys.ctc', 'ys.bwd', 'ys']),
+    ]
+)
+def test_forward_tasks(input_args, tasks):
+    model = build_model(input_args)
+    batch = make_batch([40, 33, 27], [5, 3, 4])
+
+    # count encoder passes
+    encode = model.encode
+    tasks_encoded = []
+
+    def encode_counted(xs, task='all', *args, **kwargs):
+        tasks_encoded.append(task)
+        return encode(xs, task, *args, **kwargs)
+
+    model.encode = encode_counted
+    loss, observation = model(batch, tasks, is_eval=True)
+    assert tasks_encoded == ['all']
+
+    # the sum of decoder losses over a single encoder pass
+    with torch.no_grad():
+        eout_dict = encode(batch['xs'], 'all')
+        loss_ref = sum([model._forward_dec(batch, t, eout_dict)[0] for t in tasks])
+    assert torch.allclose(loss, loss_ref, atol=1e-5)
+
+    # equal to the sum of losses of tasks encoded separately
+    loss_per_task = sum([model(batch, t, is_eval=True)[0] for t in tasks])
+    assert torch.allclose(loss, loss_per_task, atol=1e-5)
+    assert len(tasks_encoded) == 1 + len(tasks)
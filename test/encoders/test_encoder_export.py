@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for exported encoders."""
+
+import importlib
+import numpy as np
+import pytest
+import torch
+
+from neural_sp.models.torch_utils import np2tensor
+
+
+INPUT_DIM = 80
+
+
+def make_args_rnn(**kwargs):
+    args = dict(
+        input_dim=INPUT_DIM,
+        enc_type='blstm',
+        n_units=16,
+        n_projs=0,
+        last_proj_dim=0,
+        n_layers=2,
+        n_layers_sub1=0,
+        n_layers_sub2=0,
+        dropout_in=0.1,
+        dropout=0.1,
+        subsample="1_2",
+        subsample_type='drop',
+        n_stacks=1,
+        n_splices=1,
+        conv_in_channel=1,
+        conv_channels="32_32",
+        conv_kernel_sizes="(3,3)_(3,3)",
+        conv_strides="(1,1)_(1,1)",
+        conv_poolings="(2,2)_(2,2)",
+        conv_batch_norm=False,
+        conv_layer_norm=False,
+        conv_bottleneck_dim=0,
+        bidir_sum_fwd_bwd=False,
+        task_specific_layer=False,
+        param_init=0.1,
+        chunk_size_left=0,
+        chunk_size_right=0,
+    )
+    args.update(kwargs)
+    return args
+
+
+def make_args_tds(**kwargs):
+    args = dict(
+        input_dim=INPUT_DIM,
+        in_channel=1,
+        channels="10_10_14_14",
+        kernel_sizes="(21,1)_(21,1)_(21,1)_(21,1)",
+        dropout=0.1,
+        last_proj_dim=0,
+        layer_norm_eps=1e-12,
+    )
+    args.update(kwargs)
+    return args
+
+
+def make_args_gated_conv(**kwargs):
+    args = dict(
+        input_dim=INPUT_DIM,
+        in_channel=1,
+        channels="32_32",
+        kernel_sizes="(3,1)_(3,1)",
+        dropout=0.1,
+        last_proj_dim=0,
+        param_init=0.1,
+    )
+    args.update(kwargs)
+    return args
+
+
+def build_encoder(enc_type, args):
+    if enc_type == 'rnn':
+        module = importlib.import_module('neural_sp.models.seq2seq.encoders.rnn')
+        return module.RNNEncoder(**make_args_rnn(**args))
+    elif enc_type == 'tds':
+        module = importlib.import_module('neural_sp.models.seq2seq.encoders.tds')
+        return module.TDSEncoder(**make_args_tds(**args))
+    elif enc_type == 'gated_conv':
+        module = importlib.import_module('neural_sp.models.seq2seq.encoders.gated_conv')
+        return module.GatedConvEncoder(**make_args_gated_conv(**args))
+
+
+@pytest.mark.parametrize(
+    "enc_type, args",
+    [
+        ('rnn', {}),
+        ('rnn', {'enc_type': 'lstm', 'subsample_type': 'concat'}),
+        ('tds', {}),
+        ('gated_conv', {}),
+        # NOTE: encoders with CNN front-ends and Transformer/Conformer encoders are not
+        # covered since their length bookkeeping is not traceable yet
+    ]
+)
+def test_torchscript(enc_type, args, tmp_path):
+    torch.manual_seed(1)
+    module = importlib.import_module('neural_sp.models.seq2seq.export')
+    enc = build_encoder(enc_type, args)
+    enc.eval()
+
+    wrapper = module.EncoderExport(enc, INPUT_DIM)
+
+    batch_size = 2
+    for xmax in [40, 47]:
+        # trace with representative inputs since lengths are specialized
+        xs = np2tensor(np.random.randn(batch_size, xmax, INPUT_DIM).astype(np.float32)).float()
+        path = module.export(wrapper, str(tmp_path / ('encoder%d.pt' % xmax)), fmt='torchscript',
+                             example_inputs=(xs,))
+        traced = torch.jit.load(path)
+        # the mode of the wrapped encoder is kept
+        assert not enc.training
+        assert wrapper.training
+
+        xlens = torch.IntTensor([xmax] * batch_size)
+        with torch.no_grad():
+            eouts_ref = enc(xs, xlens, task='ys')['ys']['xs']
+            eouts = traced(xs)
+        assert eouts.size() == eouts_ref.size()
+        assert torch.allclose(eouts, eouts_ref, atol=1e-5)
+
+    enc.train()
+    module.export(module.EncoderExport(enc, INPUT_DIM), str(tmp_path / 'encoder.pt'),
+                  fmt='torchscript', example_inputs=(xs,))
+    assert enc.training
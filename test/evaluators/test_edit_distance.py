@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for edit distance."""
+
+import importlib
+import numpy as np
+import pytest
+
+
+def reference_wer(ref, hyp):
+    d = np.zeros((len(ref) + 1, len(hyp) + 1), dtype=np.int64)
+    d[0] = np.arange(len(hyp) + 1)
+    d[:, 0] = np.arange(len(ref) + 1)
+    for i in range(1, len(ref) + 1):
+        for j in range(1, len(hyp) + 1):
+            if ref[i - 1] == hyp[j - 1]:
+                d[i][j] = d[i - 1][j - 1]
+            else:
+                d[i][j] = min(d[i - 1][j - 1], d[i][j - 1], d[i - 1][j]) + 1
+
+    x, y = len(ref), len(hyp)
+    error_list = []
+    while x > 0 or y > 0:
+        if x > 0 and y > 0 and d[x][y] == d[x - 1][y - 1] and ref[x - 1] == hyp[y - 1]:
+            error_list.append("C")
+            x, y = x - 1, y - 1
+        elif y > 0 and d[x][y] == d[x][y - 1] + 1:
+            error_list.append("I")
+            y = y - 1
+        elif x > 0 and y > 0 and d[x][y] == d[x - 1][y - 1] + 1:
+            error_list.append("S")
+            x, y = x - 1, y - 1
+        else:
+            error_list.append("D")
+            x = x - 1
+    return (d[-1][-1] * 100, error_list.count("S") * 100,
+            error_list.count("I") * 100, error_list.count("D") * 100)
+
+
+def make_pairs(n_pairs, max_len, vocab, seed=0):
+    rng = np.random.RandomState(seed)
+    refs, hyps = [], []
+    for _ in range(n_pairs):
+        refs.append(['w%d' % v for v in rng.randint(0, vocab, rng.randint(1, max_len))])
+        hyps.append(['w%d' % v for v in rng.randint(0, vocab, rng.randint(0, max_len))])
+    return refs, hyps
+
+
+@pytest.mark.parametrize(
+    "n_pairs, max_len, vocab, max_cells",
+    [
+        (50, 10, 3, 2 ** 24),
+        (50, 30, 10, 2 ** 24),
+        (50, 30, 10, 100),
+    ]
+)
+def test_compute_wers(n_pairs, max_len, vocab, max_cells):
+    module = importlib.import_module('neural_sp.evaluators.edit_distance')
+    refs, hyps = make_pairs(n_pairs, max_len, vocab)
+    results = module.compute_wers(refs, hyps, max_cells=max_cells)
+    for ref, hyp, result in zip(refs, hyps, results):
+        assert tuple(result) == reference_wer(ref, hyp)
+        assert tuple(module.compute_wer(ref, hyp)) == result
+
+
+def test_compute_wer_long():
+    module = importlib.import_module('neural_sp.evaluators.edit_distance')
+    # distance beyond the range of uint16
+    ref = ['a'] * 70000
+    hyp = ['a', 'b']
+    wer, n_sub, n_ins, n_del = module.compute_wer(ref, hyp)
+    assert (wer, n_sub, n_ins, n_del) == (69999 * 100, 100, 0, 69998 * 100)
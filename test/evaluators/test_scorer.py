@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for trn scorer."""
+
+import importlib
+import pytest
+
+
+REFS = ['a b c d', 'e f g', 'h i', 'j k l m n o p q r s t']
+HYPS = ['a x c d', 'e f g h', 'i', 'j k l m n o p q r s t']
+SPEAKERS = ['spk1', 'spk1', 'spk2', 'spk2']
+
+
+def write_trn(path, texts, n_complete=None, partial=False):
+    with open(path, 'w') as f:
+        for i, (text, speaker) in enumerate(zip(texts, SPEAKERS)):
+            if n_complete is not None and i >= n_complete:
+                if partial:
+                    f.write(text)  # being written
+                break
+            f.write(text + ' (' + speaker + '-utt%d)\n' % i)
+
+
+@pytest.mark.parametrize("n_workers, chunk_size", [(1, 1000), (1, 1), (2, 1)])
+def test_score_trn(tmp_path, n_workers, chunk_size):
+    module = importlib.import_module('neural_sp.evaluators.scorer')
+    module_ed = importlib.import_module('neural_sp.evaluators.edit_distance')
+    ref_trn, hyp_trn = str(tmp_path / 'ref.trn'), str(tmp_path / 'hyp.trn')
+    write_trn(ref_trn, REFS)
+    write_trn(hyp_trn, HYPS)
+
+    summary = module.score_trn(ref_trn, hyp_trn, n_workers=n_workers, chunk_size=chunk_size)
+    n_err = sum([module_ed.compute_wer(r.split(' '), h.split(' '))[0] // 100
+                 for r, h in zip(REFS, HYPS)])
+    n_word = sum([len(r.split(' ')) for r in REFS])
+    assert summary['total']['n_utt'] == len(REFS)
+    assert summary['total']['wer'] == pytest.approx(n_err * 100 / n_word)
+    assert set(summary['speakers'].keys()) == set(SPEAKERS)
+    assert sum([v['n_utt'] for v in summary['len_bins'].values()]) == len(REFS)
+    assert summary['n_unmatched'] == 0
+
+
+def test_score_trn_incremental(tmp_path):
+    module = importlib.import_module('neural_sp.evaluators.scorer')
+    ref_trn, hyp_trn = str(tmp_path / 'ref.trn'), str(tmp_path / 'hyp.trn')
+    write_trn(ref_trn, REFS, n_complete=2)
+    write_trn(hyp_trn, HYPS, n_complete=1, partial=True)
+
+    scorer = module.TrnScorer(ref_trn, hyp_trn)
+    assert scorer.update() == 1
+    assert scorer.summary()['n_unmatched'] == 1
+
+    write_trn(ref_trn, REFS)
+    write_trn(hyp_trn, HYPS)
+    assert scorer.update() == len(REFS) - 1
+    summary = scorer.summary()
+    assert summary['total'] == module.score_trn(ref_trn, hyp_trn)['total']
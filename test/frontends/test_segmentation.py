@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for segmentation of long-form recordings."""
+
+import importlib
+import numpy as np
+import pytest
+
+
+def make_is_speech(n_frames, regions):
+    is_speech = np.zeros(n_frames, dtype=bool)
+    for s, e in regions:
+        is_speech[s:e] = True
+    return is_speech
+
+
+@pytest.mark.parametrize(
+    "regions, min_silence, min_speech, max_len, margin, segments",
+    [
+        # no merge
+        ([(10, 50), (100, 150)], 30, 20, 1000, 0, [(10, 50), (100, 150)]),
+        # merge a short pause
+        ([(10, 50), (60, 150)], 30, 20, 1000, 0, [(10, 150)]),
+        # drop a short segment
+        ([(10, 20), (100, 150)], 30, 20, 1000, 0, [(100, 150)]),
+        # margins do not overlap with the previous segment
+        ([(10, 50), (60, 150)], 5, 20, 1000, 8, [(2, 58), (58, 158)]),
+        ([(0, 50), (180, 200)], 5, 20, 1000, 8, [(0, 58), (172, 200)]),
+        # split a long segment into equal lengths
+        ([(0, 200)], 30, 20, 80, 0, [(0, 67), (67, 134), (134, 200)]),
+        # speech until the end
+        ([(150, 200)], 30, 20, 1000, 0, [(150, 200)]),
+    ]
+)
+def test_get_segments(regions, min_silence, min_speech, max_len, margin, segments):
+    module = importlib.import_module('neural_sp.models.seq2seq.frontends.segmentation')
+
+    is_speech = make_is_speech(200, regions)
+    out = module.get_segments(is_speech, min_silence, min_speech, max_len, margin)
+    assert [tuple(seg) for seg in out] == segments
+
+
+def test_get_segments_scores():
+    module = importlib.import_module('neural_sp.models.seq2seq.frontends.segmentation')
+
+    is_speech = make_is_speech(300, [(0, 300)])
+    scores = np.ones(300, dtype=np.float32)
+    scores[90] = 0.
+    scores[170] = 0.
+    out = module.get_segments(is_speech, 30, 20, 100, scores=scores)
+    # split at the lowest scores in the latter half of each window
+    assert out == [(0, 90), (90, 170), (170, 220), (220, 300)]
+
+
+def test_energy_speech_frames():
+    module = importlib.import_module('neural_sp.models.seq2seq.frontends.segmentation')
+
+    rng = np.random.RandomState(1)
+    x = rng.randn(300, 40).astype(np.float32) * 0.1 - 5.
+    x[100:200] += 3.
+    is_speech, energy = module.energy_speech_frames(x)
+    assert energy.shape == (300,)
+    assert is_speech[100:200].all()
+    assert not is_speech[:100].any() and not is_speech[200:].any()
+
+    segments = module.get_segments(is_speech, 30, 20, 1000, margin=10)
+    assert segments == [(90, 210)]
+
+
+def test_ctc_speech_frames():
+    module = importlib.import_module('neural_sp.models.seq2seq.frontends.segmentation')
+
+    ctc_probs = np.array([[0.9, 0.05, 0.05],
+                          [0.2, 0.7, 0.1],
+                          [0.4, 0.3, 0.3],
+                          [0.1, 0.1, 0.8]], dtype=np.float32)
+    is_speech, blank_probs = module.ctc_speech_frames(ctc_probs, blank=0, spike_threshold=0.5)
+    assert is_speech.tolist() == [False, True, False, True]
+    assert np.allclose(blank_probs, [0.9, 0.2, 0.4, 0.1])
@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for GatedConvLM."""
+
+import argparse
+import importlib
+import numpy as np
+import pytest
+import torch
+
+
+VOCAB = 100  # large for adaptive softmax
+
+
+def make_args(**kwargs):
+    args = dict(
+        lm_type='gated_conv_custom',
+        n_units=16,
+        n_projs=0,
+        n_layers=3,
+        kernel_size=4,
+        emb_dim=16,
+        vocab=VOCAB,
+        dropout_in=0.1,
+        dropout_hidden=0.1,
+        lsm_prob=0.0,
+        param_init=0.1,
+        adaptive_softmax=False,
+        tie_embedding=False,
+    )
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+@pytest.mark.parametrize(
+    "args", [
+        ({'n_layers': 1}),
+        ({'n_layers': 3}),
+        ({'kernel_size': 1}),
+        ({'n_projs': 8}),
+        ({'lsm_prob': 0.1}),
+        ({'adaptive_softmax': True}),
+        ({'tie_embedding': True}),
+    ]
+)
+def test_forward(args):
+    args = make_args(**args)
+
+    ylens = [4, 5, 3, 7] * 20
+    ys = [np.random.randint(0, VOCAB, ylen).astype(np.int64) for ylen in ylens]
+    device = "cpu"
+
+    module = importlib.import_module('neural_sp.models.lm.gated_convlm')
+    lm = module.GatedConvLM(args)
+    lm = lm.to(device)
+    loss, state, observation = lm(ys, state=None, n_caches=0)
+    assert loss.item() >= 0
+    assert isinstance(observation, dict)
+
+
+@pytest.mark.parametrize(
+    "args", [
+        ({'kernel_size': 4}),
+        ({'kernel_size': 1}),
+        ({'n_projs': 8}),
+    ]
+)
+def test_predict_incremental(args):
+    args = make_args(**args)
+
+    batch_size = 3
+    ylen = 10
+    device = "cpu"
+
+    module = importlib.import_module('neural_sp.models.lm.gated_convlm')
+    lm = module.GatedConvLM(args)
+    lm = lm.to(device)
+    lm.eval()
+
+    ys = torch.randint(0, VOCAB, (batch_size, ylen), dtype=torch.int64)
+    with torch.no_grad():
+        _, _, log_probs_full = lm.predict(ys)
+
+        # token-by-token with the convolution state buffer
+        lmstate = None
+        for t in range(ylen):
+            _, lmstate, log_probs = lm.predict(ys[:, t:t + 1], lmstate)
+            assert len(lmstate) == len(lm.blocks)
+            assert torch.allclose(log_probs[:, 0], log_probs_full[:, t], atol=1e-4)
+
+        # reorder by beam index
+        perm = torch.LongTensor([2, 0, 1])
+        lmstate = [lmstate_l[perm] for lmstate_l in lmstate]
+        y = torch.randint(0, VOCAB, (batch_size, 1), dtype=torch.int64)
+        _, _, log_probs = lm.predict(y, lmstate)
+        _, _, log_probs_full = lm.predict(torch.cat([ys[perm], y], dim=1))
+        assert torch.allclose(log_probs[:, 0], log_probs_full[:, -1], atol=1e-4)
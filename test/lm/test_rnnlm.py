@@ -7,6 +7,7 @@ import argparse
 import importlib
 import numpy as np
 import pytest
+import torch
 
 
 VOCAB = 100  # large for adaptive softmax
@@ -72,3 +73,36 @@ def test_forward(args):
     # assert loss.size(0) == 1
     assert loss.item() >= 0
     assert isinstance(observation, dict)
+
+
+@pytest.mark.parametrize("n_caches", [1, 5, 100])
+@pytest.mark.parametrize("adaptive_softmax", [False, True])
+def test_cache(n_caches, adaptive_softmax):
+    args = make_args(adaptive_softmax=adaptive_softmax)
+    batch_size, ylen = 3, 30
+
+    module = importlib.import_module('neural_sp.models.lm.rnnlm')
+    torch.manual_seed(1)
+    lm = module.RNNLM(args)
+    # exclude special tokens (<pad> is 3)
+    ys = np.random.RandomState(1).randint(4, VOCAB, (batch_size, ylen)).astype(np.int64)
+
+    # token-by-token
+    lm.reset_cache()
+    state = None
+    losses = []
+    for t in range(ylen - 1):
+        loss, state = lm(ys[:, t:t + 2], state, is_eval=True, n_caches=n_caches)[:2]
+        losses.append(loss.item())
+    loss_ref = np.mean(losses)
+
+    # chunk-by-chunk (BPTT windows overlap by one token)
+    lm.reset_cache()
+    state = None
+    losses = []
+    bptt = 8
+    for offset in range(0, ylen - 1, bptt - 1):
+        ys_chunk = ys[:, offset:offset + bptt]
+        loss, state = lm(ys_chunk, state, is_eval=True, n_caches=n_caches)[:2]
+        losses += [loss.item()] * (ys_chunk.shape[1] - 1)
+    assert np.allclose(np.mean(losses), loss_ref, atol=1e-5)
@@ -83,3 +83,84 @@ def test_forward_incremental(args):
         assert cv.size() == (batch_size, 1, args['enc_dim'])
         assert alpha.size() == (batch_size, xmax)
         assert aws.size() == (batch_size, 1, xmax)
+
+
+def _integrate_loop(alpha, eouts, beta):
+    """Frame-by-frame reference of integrate-and-fire."""
+    bs, xmax = alpha.size()
+    cvs, aws = [], []
+    for b in range(bs):
+        cv_b, aws_b = [], []
+        state = eouts.new_zeros(eouts.size(2))
+        aw = eouts.new_zeros(xmax)
+        accum = 0.
+        for j in range(xmax):
+            a = alpha[b, j].item()
+            while accum + a >= beta:
+                ak1 = beta - accum
+                cv_b.append(state + ak1 * eouts[b, j])
+                aw[j] += ak1
+                aws_b.append(aw)
+                state = eouts.new_zeros(eouts.size(2))
+                aw = eouts.new_zeros(xmax)
+                a -= ak1
+                accum = 0.
+            state = state + a * eouts[b, j]
+            aw[j] += a
+            accum += a
+        cvs.append(cv_b)
+        aws.append(aws_b)
+    return cvs, aws
+
+
+@pytest.mark.parametrize("threshold", [1.0, 0.9])
+def test_forward_parallel_batch(threshold):
+    args = make_args(threshold=threshold)
+
+    batch_size = 4
+    xmax = 40
+    ymax = 5
+    device = "cpu"
+
+    eouts = torch.randn(batch_size, xmax, args['enc_dim'], device=device)
+    elens = torch.IntTensor([i for i in range(xmax, xmax - batch_size, -1)])
+    ylens = torch.IntTensor([i for i in range(ymax, ymax - batch_size, -1)])
+
+    module = importlib.import_module('neural_sp.models.modules.cif')
+    cif = module.CIF(**args)
+    cif = cif.to(device)
+    cif.train()
+
+    cv, alpha, aws = cif(eouts, elens, ylens, mode='parallel')
+    assert cv.size() == (batch_size, ymax, args['enc_dim'])
+    assert aws.size() == (batch_size, ymax, xmax)
+
+    alpha_norm = alpha / alpha.sum(1, keepdim=True) * (ylens.float().unsqueeze(1) * threshold)
+    cvs_ref, aws_ref = _integrate_loop(alpha_norm, eouts, threshold)
+    for b in range(batch_size):
+        for n in range(ylens[b] - 1):
+            assert torch.allclose(cv[b, n], cvs_ref[b][n], atol=1e-4)
+            assert torch.allclose(aws[b, n], aws_ref[b][n], atol=1e-5)
+        # padding
+        assert aws[b, ylens[b]:].sum() == 0
+
+
+def test_forward_incremental_batch():
+    args = make_args()
+
+    batch_size = 4
+    xmax = 40
+    device = "cpu"
+
+    eouts = torch.randn(batch_size, xmax, args['enc_dim'], device=device)
+    elens = torch.IntTensor([i for i in range(xmax, xmax - batch_size, -1)])
+
+    module = importlib.import_module('neural_sp.models.modules.cif')
+    cif = module.CIF(**args)
+    cif = cif.to(device)
+    cif.eval()
+
+    cv, alpha, aws = cif(eouts, elens, mode='incremental')
+    assert cv.size() == (batch_size, 1, args['enc_dim'])
+    assert alpha.size() == (batch_size, xmax)
+    assert aws.size() == (batch_size, 1, xmax)
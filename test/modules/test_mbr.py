@@ -0,0 +1,28 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for MBR loss."""
+
+import importlib
+import torch
+
+
+def test_mbr_backward():
+    module = importlib.import_module('neural_sp.models.criterion')
+    n_best, ymax, vocab = 4, 6, 10
+    logits = torch.randn(n_best, ymax, vocab, requires_grad=True)
+    log_probs = torch.log_softmax(logits, dim=-1)
+    hyps = torch.randint(0, vocab, (n_best, ymax))
+    grad = torch.randn(n_best, 1) * (torch.arange(ymax) < 4).float().unsqueeze(0)
+    exp_risk = torch.rand(1)
+
+    loss = module.MBR.apply(log_probs, hyps, exp_risk, grad)
+    assert torch.allclose(loss, exp_risk)
+    loss.backward()
+    grad_mbr = logits.grad.clone()
+
+    # gradients are attached only to hypothesis tokens
+    logits.grad.zero_()
+    log_probs = torch.log_softmax(logits, dim=-1)
+    (log_probs.gather(2, hyps.unsqueeze(2)).squeeze(2) * grad).sum().backward()
+    assert torch.allclose(grad_mbr, logits.grad, atol=1e-6)
@@ -170,3 +170,70 @@ def test_forward_hard(args):
         if args['chunk_size'] > 1:
             assert beta is not None
             assert beta.size() == (batch_size, args['n_heads_mono'] * args['n_heads_chunk'], 1, klen)
+
+
+def _head_synchronous_boundary_loop(alpha, eps_wait):
+    alpha = alpha.clone()
+    for b in range(alpha.size(0)):
+        if alpha[b].sum() == 0:
+            continue
+        leftmost = alpha[b, :, 0].nonzero()[:, -1].min().item()
+        rightmost = alpha[b, :, 0].nonzero()[:, -1].max().item()
+        for h in range(alpha.size(1)):
+            if alpha[b, h, 0].sum().item() == 0:
+                alpha[b, h, 0, min(rightmost, leftmost + eps_wait)] = 1
+                continue
+            if alpha[b, h, 0].nonzero()[:, -1].min().item() >= leftmost + eps_wait:
+                alpha[b, h, 0, :] = 0
+                alpha[b, h, 0, leftmost + eps_wait] = 1
+    return alpha
+
+
+@pytest.mark.parametrize("eps_wait", [1, 2, 4])
+def test_head_synchronous_boundary(eps_wait):
+    batch_size = 8
+    n_heads_mono = 4
+    klen = 20
+
+    module = importlib.import_module('neural_sp.models.modules.mocha')
+    alpha = torch.zeros(batch_size, n_heads_mono, 1, klen)
+    for b in range(batch_size - 1):  # no boundary for the last utterance
+        for h in range(n_heads_mono):
+            if (b + h) % 3 != 0:
+                alpha[b, h, 0, (b * 3 + h * 2) % klen] = 1
+
+    alpha_sync = module.head_synchronous_boundary(alpha, eps_wait)
+    assert torch.equal(alpha_sync, _head_synchronous_boundary_loop(alpha, eps_wait))
+
+
+@pytest.mark.parametrize(
+    "chunk_size, n_heads_mono, n_heads_chunk, share_chunkwise_attention",
+    [
+        (4, 1, 1, True),
+        (-1, 1, 1, True),
+        (4, 4, 1, True),
+        (4, 4, 4, False),
+        (-1, 4, 4, True),
+    ]
+)
+def test_hard_chunkwise_attention(chunk_size, n_heads_mono, n_heads_chunk, share_chunkwise_attention):
+    batch_size = 4
+    klen = 20
+
+    module = importlib.import_module('neural_sp.models.modules.mocha')
+    alpha = torch.zeros(batch_size, n_heads_mono, 1, klen)
+    for b in range(batch_size - 1):
+        for h in range(n_heads_mono):
+            alpha[b, h, 0, (b * 5 + h) % klen] = 1
+    n_heads_u = n_heads_chunk if share_chunkwise_attention else n_heads_mono * n_heads_chunk
+    u = torch.randn(batch_size, n_heads_u, 1, klen)
+
+    beta = module.hard_chunkwise_attention(alpha, u, None, chunk_size, n_heads_chunk,
+                                           1.0, share_chunkwise_attention)
+    assert beta.size() == (batch_size, n_heads_mono * n_heads_chunk, 1, klen)
+    beta = beta.view(batch_size, n_heads_mono, n_heads_chunk, klen)
+    for b in range(batch_size - 1):
+        for h in range(n_heads_mono):
+            boundary = (b * 5 + h) % klen
+            start = 0 if chunk_size == -1 else max(0, boundary - chunk_size + 1)
+            assert torch.allclose(beta[b, h, :, start:boundary + 1].sum(-1), torch.ones(n_heads_chunk))
@@ -0,0 +1,76 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for positional embeddings."""
+
+import importlib
+import pytest
+import torch
+
+
+def make_args(**kwargs):
+    args = dict(
+        d_model=32,
+        dropout=0.1,
+    )
+    args.update(kwargs)
+    return args
+
+
+def reference_pos_emb(inv_freq, qlen, mlen, clamp_len, zero_center_offset):
+    if zero_center_offset:
+        pos_idxs = torch.arange(mlen - 1, -qlen - 1, -1.0, dtype=torch.float)
+    else:
+        pos_idxs = torch.arange(mlen + qlen - 1, -1, -1.0, dtype=torch.float)
+    if clamp_len > 0:
+        pos_idxs.clamp_(max=clamp_len)
+    sinusoid_inp = torch.einsum("i,j->ij", pos_idxs, inv_freq)
+    return torch.cat([sinusoid_inp.sin(), sinusoid_inp.cos()], dim=-1).unsqueeze(1)
+
+
+@pytest.mark.parametrize(
+    "mlen, clamp_len, zero_center_offset",
+    [
+        (0, -1, False),
+        (0, -1, True),
+        (20, -1, False),
+        (20, -1, True),
+        (20, 10, False),
+        (20, 10, True),
+        (20, 3, True),
+    ]
+)
+def test_xl_pos_emb_cache(mlen, clamp_len, zero_center_offset):
+    args = make_args()
+    module = importlib.import_module('neural_sp.models.modules.positional_embedding')
+    pos_emb = module.XLPositionalEmbedding(**args)
+    pos_emb.eval()
+
+    # incremental steps followed by a longer and a shorter call
+    for qlen in [1, 2, 3, 4, 50, 5]:
+        xs = torch.zeros(2, qlen, args['d_model'])
+        pos_embs = pos_emb(xs, mlen=mlen, clamp_len=clamp_len, zero_center_offset=zero_center_offset)
+        ref = reference_pos_emb(pos_emb.inv_freq, qlen, mlen, clamp_len, zero_center_offset)
+        assert pos_embs.size() == (mlen + qlen, 1, args['d_model'])
+        assert torch.allclose(pos_embs, ref, atol=1e-5)
+
+
+@pytest.mark.parametrize("xl_like", [True, False])
+def test_relative_attention_pos_proj_cache(xl_like):
+    args = make_args()
+    module_embedding = importlib.import_module('neural_sp.models.modules.positional_embedding')
+    module_mha = importlib.import_module('neural_sp.models.modules.relative_multihead_attention')
+    pos_emb = module_embedding.XLPositionalEmbedding(**args)
+    attention = module_mha.RelativeMultiheadAttentionMechanism(
+        kdim=args['d_model'], qdim=args['d_model'], adim=16, odim=args['d_model'],
+        n_heads=4, dropout=0., xl_like=xl_like)
+    pos_emb.eval()
+    attention.eval()
+    linear = attention.w_pos if xl_like else attention.w_value
+
+    with torch.no_grad():
+        for qlen in [3, 4, 5]:
+            xs = torch.zeros(1, qlen, args['d_model'])
+            pos_embs = pos_emb(xs, mlen=8, zero_center_offset=True)
+            out = attention._project_pos_embs(pos_embs, linear)
+            assert torch.allclose(out, linear(pos_embs.clone()), atol=1e-6)
@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for int8 quantization."""
+
+import argparse
+import importlib
+import numpy as np
+import pytest
+import torch
+
+from neural_sp.models.torch_utils import np2tensor
+from neural_sp.models.torch_utils import pad_list
+
+
+VOCAB = 100
+
+
+def make_args_lm(**kwargs):
+    args = dict(
+        lm_type='lstm',
+        n_units=32,
+        n_projs=0,
+        n_layers=2,
+        residual=False,
+        use_glu=False,
+        n_units_null_context=0,
+        bottleneck_dim=16,
+        emb_dim=16,
+        vocab=VOCAB,
+        dropout_in=0.1,
+        dropout_hidden=0.1,
+        lsm_prob=0.0,
+        param_init=0.1,
+        adaptive_softmax=False,
+        tie_embedding=False,
+    )
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+@pytest.mark.parametrize(
+    "lm_type, skip_modules",
+    [
+        ('lstm', []),
+        ('lstm', ['output']),
+        ('lstm', ['rnn.0']),
+        ('gru', []),
+    ]
+)
+def test_quantize_dynamic(lm_type, skip_modules):
+    torch.manual_seed(1)
+    module = importlib.import_module('neural_sp.models.quantization')
+    module_lm = importlib.import_module('neural_sp.models.lm.rnnlm')
+    lm = module_lm.RNNLM(make_args_lm(lm_type=lm_type))
+    lm.eval()
+    ys = np.random.randint(3, VOCAB, (3, 20)).astype(np.int64)
+    with torch.no_grad():
+        loss_ref = lm(ys, None, is_eval=True)[0].item()
+
+    module.quantize_model(lm, skip_modules=skip_modules)
+    dynamic = module._quantized_nn('quantized.dynamic')
+    quantized_types = tuple(getattr(dynamic, n) for n in ['Linear', 'LSTM', 'GRU'] if hasattr(dynamic, n))
+    for name, m in lm.named_modules():
+        if type(m) in [torch.nn.Linear, torch.nn.LSTM]:
+            assert any([name == n or name.startswith(n + '.') for n in skip_modules]), name
+        if any([name == n for n in skip_modules]):
+            assert not isinstance(m, quantized_types)
+
+    with torch.no_grad():
+        loss = lm(ys, None, is_eval=True)[0].item()
+    assert np.allclose(loss, loss_ref, rtol=1e-2)
+
+
+def test_quantize_conv_frontend():
+    torch.manual_seed(1)
+    module = importlib.import_module('neural_sp.models.quantization')
+    module_conv = importlib.import_module('neural_sp.models.seq2seq.encoders.conv')
+    enc = module_conv.ConvEncoder(input_dim=80, in_channel=1, channels="32_32",
+                                  kernel_sizes="(3,3)_(3,3)", strides="(1,1)_(1,1)",
+                                  poolings="(2,2)_(2,2)", dropout=0.1,
+                                  batch_norm=True, layer_norm=False, residual=False,
+                                  bottleneck_dim=0, param_init=0.1)
+    enc.eval()
+
+    batch_size, xmax = 4, 40
+    xs = np.random.randn(batch_size, xmax, 80).astype(np.float32)
+    xlens = torch.IntTensor([len(x) - i * enc.subsampling_factor for i, x in enumerate(xs)])
+    xs = pad_list([np2tensor(x).float() for x in xs], 0.)
+    with torch.no_grad():
+        xs_ref, xlens_ref = enc(xs, xlens)
+
+    def calibrate(model):
+        model(xs, xlens)
+
+    module.quantize_conv_frontend(enc, calibrate)
+    assert len([m for m in enc.modules() if isinstance(m, module.QuantizedConv)]) == 4
+    with torch.no_grad():
+        xs_q, xlens_q = enc(xs, xlens)
+    assert xs_q.size() == xs_ref.size()
+    assert torch.equal(xlens_q, xlens_ref)
+    assert torch.allclose(xs_q, xs_ref, atol=0.1 * xs_ref.abs().max().item())
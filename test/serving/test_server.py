@@ -0,0 +1,157 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for the streaming recognition server."""
+
+import asyncio
+import importlib
+import numpy as np
+import pytest
+import torch
+
+INPUT_DIM = 8
+VOCAB = 10
+
+
+def build_model(input_args):
+    from neural_sp.bin.args_asr import build_parser
+    from neural_sp.bin.args_asr import register_args_decoder
+    from neural_sp.bin.args_asr import register_args_encoder
+    from neural_sp.models.seq2seq.speech2text import Speech2Text
+
+    input_args = ['--enc_n_layers', '2', '--enc_n_units', '16', '--subsample', '1_1',
+                  '--dec_n_units', '16', '--emb_dim', '16', '--attn_dim', '16',
+                  '--ctc_weight', '0.3', '--recog_beam_width', '2',
+                  '--recog_ctc_vad_blank_threshold', '8',
+                  '--recog_ctc_vad_n_accum_frames', '0'] + input_args
+    parser = build_parser()
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_encoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    parser = register_args_decoder(parser, args)
+    args, _ = parser.parse_known_args(input_args)
+    args.input_dim = INPUT_DIM
+    args.vocab = VOCAB
+    args.vocab_sub1 = -1
+    args.vocab_sub2 = -1
+    torch.manual_seed(1)
+    return Speech2Text(args), vars(args)
+
+
+@pytest.fixture
+def idx2token(tmp_path):
+    from neural_sp.datasets.token_converter.character import Idx2char
+
+    dict_path = str(tmp_path / 'dict.txt')
+    with open(dict_path, 'w') as f:
+        for i in range(1, VOCAB):
+            f.write('%s %d\n' % (chr(0x4e00 + i), i))
+    return Idx2char(dict_path)
+
+
+async def recognize(path, x, piece_size):
+    module = importlib.import_module('neural_sp.serving.server')
+    client = await module.StreamingClient.connect(path=path)
+    for t in range(0, len(x), piece_size):
+        await client.send_features(x[t:t + piece_size])
+        await asyncio.sleep(0)  # interleave sessions
+    results = await client.end()
+    client.close()
+    return results
+
+
+def decode_sessions(model, params, idx2token, xs, batch):
+    module = importlib.import_module('neural_sp.serving.server')
+    scheduler = importlib.import_module('neural_sp.serving.scheduler')
+
+    sessions = [module.Session(model, params, idx2token) for _ in xs]
+    for session, x in zip(sessions, xs):
+        session.append('features', x.tobytes())
+    partials = [[] for _ in sessions]
+    while True:
+        ready = [session for session in sessions if session.streaming.chunk_ready(is_final=True)]
+        if len(ready) == 0:
+            break
+        if batch:
+            scheduler.decode_batch(ready)
+        else:
+            for session in ready:
+                scheduler.decode_batch([session])
+        for session, partial in zip(sessions, partials):
+            partial.append(session.new_partial())
+    finals = []
+    for session in sessions:
+        session.finalize()
+        finals.append(session.new_final())
+    return finals, partials
+
+
+@pytest.mark.parametrize(
+    "input_args, max_batch_size, max_wait",
+    [
+        (['--enc_type', 'lstm'], 1, 0.),
+        (['--enc_type', 'lstm'], 16, 0.01),
+        (['--enc_type', 'blstm', '--lc_chunk_size_left', '8', '--lc_chunk_size_right', '8'], 1, 0.),
+        (['--enc_type', 'blstm', '--lc_chunk_size_left', '8', '--lc_chunk_size_right', '8'], 16, 0.01),
+        (['--enc_type', 'lstm', '--recog_ctc_weight', '0.3'], 16, 0.),
+    ]
+)
+def test_concurrent_sessions(input_args, max_batch_size, max_wait, idx2token, tmp_path):
+    assert idx2token.vocab == VOCAB
+    module = importlib.import_module('neural_sp.serving.server')
+    model, params = build_model(input_args)
+    model.eval()
+
+    rng = np.random.RandomState(1)
+    xs = [rng.randn(xlen, INPUT_DIM).astype(np.float32) for xlen in [150, 231, 97]]
+    refs = [model.decode_streaming([x], params, idx2token)[0][0] for x in xs]
+
+    path = str(tmp_path / 'asr.sock')
+    server = module.StreamingServer(model, params, idx2token,
+                                    max_batch_size=max_batch_size, max_wait=max_wait)
+
+    async def run():
+        await server.start(path=path)
+        results = await asyncio.gather(*[recognize(path, x, piece_size)
+                                         for x, piece_size in zip(xs, [7, 16, 33])])
+        await server.close()
+        return results
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    for ref, msgs in zip(refs, results):
+        assert msgs[-1]['type'] == 'final' and msgs[-1]['end_of_utterance']
+        hyp = sum([m['token_ids'] for m in msgs if m['type'] == 'final'], [])
+        assert hyp == [int(i) for i in ref]
+        for m in msgs:
+            if m['type'] == 'final' and len(m['token_ids']) > 0:
+                assert m['text'] == idx2token(m['token_ids'])
+
+
+@pytest.mark.parametrize(
+    "input_args",
+    [
+        ['--enc_type', 'lstm'],
+        ['--enc_type', 'lstm', '--recog_ctc_vad', 'false'],
+        ['--enc_type', 'blstm', '--lc_chunk_size_left', '8', '--lc_chunk_size_right', '8'],
+    ]
+)
+def test_decode_batch(input_args, idx2token):
+    model, params = build_model(input_args)
+    model.eval()
+
+    rng = np.random.RandomState(1)
+    xs = [rng.randn(xlen, INPUT_DIM).astype(np.float32) for xlen in [150, 231, 97, 231]]
+    refs = [model.decode_streaming([x], params, idx2token)[0][0] for x in xs]
+
+    finals_batch, partials_batch = decode_sessions(model, params, idx2token, xs, batch=True)
+    finals_single, partials_single = decode_sessions(model, params, idx2token, xs, batch=False)
+    # chunks encoded in a mini-batch give the same outputs as those encoded per session
+    assert finals_batch == finals_single
+    assert partials_batch == partials_single
+    for final, ref in zip(finals_batch, refs):
+        assert final == [int(i) for i in ref]
@@ -0,0 +1,74 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for asynchronous evaluation during training."""
+
+import importlib
+import pytest
+import time
+import torch
+
+
+def init_fn(offset):
+    return offset
+
+
+def eval_fn(state, job):
+    time.sleep(job['sleep'])
+    if job['epoch'] < 0:
+        raise ValueError(job['epoch'])
+    return state + job['epoch']
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_order(n_workers):
+    module = importlib.import_module('neural_sp.trainers.async_evaluator')
+    evaluator = module.AsyncEvaluator(init_fn, (100,), eval_fn, n_workers=n_workers)
+    # later jobs finish earlier
+    for epoch, sleep in enumerate([0.5, 0.2, 0]):
+        evaluator.submit({'epoch': epoch + 1, 'sleep': sleep})
+    results = []
+    while evaluator.n_pending > 0:
+        results += evaluator.poll()
+        time.sleep(0.05)
+    assert [job['epoch'] for job, _ in results] == [1, 2, 3]
+    assert [metric for _, metric in results] == [101, 102, 103]
+    assert evaluator.close() == []
+
+
+def test_error():
+    module = importlib.import_module('neural_sp.trainers.async_evaluator')
+    evaluator = module.AsyncEvaluator(init_fn, (0,), eval_fn, n_workers=1)
+    evaluator.submit({'epoch': -1, 'sleep': 0})
+    with pytest.raises(RuntimeError):
+        evaluator.poll(block=True)
+
+
+@pytest.mark.parametrize("decay_type", ['metric', 'always'])
+def test_report_metric(decay_type):
+    module = importlib.import_module('neural_sp.trainers.lr_scheduler')
+    model = torch.nn.Linear(2, 2)
+    lr = 1.0
+
+    def build():
+        return module.LRScheduler(torch.optim.SGD(model.parameters(), lr=lr), lr,
+                                  decay_type=decay_type, decay_start_epoch=1, decay_rate=0.5)
+
+    metrics = [10, 8, 9, 7]
+    sync = build()
+    for metric in metrics:
+        sync.epoch(metric)
+
+    # Metrics are reported after the following epochs finish
+    async_ = build()
+    for metric in metrics:
+        async_.epoch(pending=True)
+    with pytest.raises(AssertionError):
+        async_.report_metric(2, metrics[1])
+    for epoch, metric in enumerate(metrics):
+        async_.report_metric(epoch + 1, metric)
+
+    assert async_.n_epochs == sync.n_epochs
+    assert async_.lr == sync.lr
+    assert async_.topk_list == sync.topk_list
+    assert async_.pending_epochs == []
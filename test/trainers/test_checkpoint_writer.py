@@ -0,0 +1,82 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for asynchronous checkpoint writing."""
+
+import collections
+import importlib
+import os
+import pytest
+import torch
+
+
+def build_scheduler(model, async_save):
+    module = importlib.import_module('neural_sp.trainers.lr_scheduler')
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    return module.LRScheduler(optimizer, 1e-3, decay_type='always', decay_start_epoch=1, decay_rate=0.5,
+                              async_save=async_save)
+
+
+class Wrapper(torch.nn.Module):
+    def __init__(self, module):
+        super(Wrapper, self).__init__()
+        self.module = module
+
+
+def test_snapshot():
+    module = importlib.import_module('neural_sp.trainers.checkpoint_writer')
+    model = torch.nn.Linear(4, 4)
+    state = module.snapshot({'model_state_dict': model.state_dict(), 'list': [1, torch.ones(2)]})
+    with torch.no_grad():
+        model.weight.add_(1)
+    assert not torch.equal(state['model_state_dict']['weight'], model.weight)
+    assert state['list'][0] == 1
+
+
+def test_snapshot_optimizer():
+    module = importlib.import_module('neural_sp.trainers.checkpoint_writer')
+    model = torch.nn.Linear(4, 4)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    model(torch.randn(2, 4)).sum().backward()
+    optimizer.step()
+
+    # optimizer.state is a defaultdict keyed by parameters
+    copied = module.snapshot(optimizer)
+    assert isinstance(copied.state, collections.defaultdict)
+    assert copied.state.default_factory is optimizer.state.default_factory
+    params = copied.param_groups[0]['params']
+    assert all([any([p is k for k in copied.state.keys()]) for p in params])
+    assert torch.equal(copied.state[params[0]]['exp_avg'], optimizer.state[model.weight]['exp_avg'])
+    assert copied.state_dict()['state'].keys() == optimizer.state_dict()['state'].keys()
+
+
+@pytest.mark.parametrize("async_save", [False, True])
+def test_save_checkpoint(tmp_path, async_save):
+    model = Wrapper(torch.nn.Linear(4, 4))
+    optimizer = build_scheduler(model.module, async_save)
+    save_path = str(tmp_path)
+
+    weights = []
+    for epoch in range(3):
+        model.module(torch.randn(2, 4)).sum().backward()
+        optimizer.step()
+        optimizer.epoch(10 - epoch)
+        weights.append(model.module.weight.detach().clone())
+        optimizer.save_checkpoint(model, save_path, remove_old=True)
+    optimizer.wait_checkpoints()
+
+    # Only the best checkpoint is kept, and no temporary file is left
+    assert sorted(os.listdir(save_path)) == ['model.epoch-3']
+    checkpoint = torch.load(os.path.join(save_path, 'model.epoch-3'))
+    assert torch.equal(checkpoint['model_state_dict']['weight'], weights[-1])
+    assert checkpoint['optimizer_state_dict']['_epoch'] == 3
+    assert 'writer' not in checkpoint['optimizer_state_dict']
+
+
+def test_error(tmp_path):
+    model = Wrapper(torch.nn.Linear(4, 4))
+    optimizer = build_scheduler(model.module, async_save=True)
+    optimizer.save_checkpoint(model, str(tmp_path / 'not_found'), remove_old=False)
+    with pytest.raises(RuntimeError):
+        optimizer.wait_checkpoints()
+    assert len(os.listdir(str(tmp_path))) == 0
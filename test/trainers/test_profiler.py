@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Test for the profiler."""
+
+import importlib
+import json
+import pytest
+
+
+def test_disabled():
+    module = importlib.import_module('neural_sp.profiler')
+    profiler = module.Profiler()
+    with profiler.timer('a'):
+        pass
+    assert profiler.summary() == {}
+
+
+@pytest.mark.parametrize("trace", [True, False])
+def test_summary(trace, tmp_path):
+    module = importlib.import_module('neural_sp.profiler')
+    profiler = module.Profiler()
+    profiler.enable(trace=trace)
+    for _ in range(3):
+        with profiler.timer('a'):
+            with profiler.timer('b'):
+                pass
+    summary = profiler.summary()
+    assert summary['a'][1] == 3 and summary['b'][1] == 3
+    assert summary['a'][0] >= summary['b'][0]
+
+    profiler.reset()
+    assert profiler.summary() == {}
+
+    path = str(tmp_path / 'trace.json')
+    profiler.export_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == (6 if trace else 0)
+    for e in events:
+        assert e['ph'] == 'X' and e['dur'] >= 0
+    assert profiler.events == []
+
+
+def test_timed():
+    module = importlib.import_module('neural_sp.profiler')
+
+    @module.timed('f')
+    def f(x):
+        return x + 1
+
+    assert f(1) == 2
+    assert 'f' not in module.profiler.summary()
+    module.profiler.enable()
+    try:
+        assert f(1) == 2
+        assert module.profiler.summary()['f'][1] == 1
+    finally:
+        module.profiler.disable()
+        module.profiler.reset()
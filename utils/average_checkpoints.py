@@ -0,0 +1,43 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Average model parameters over checkpoints without loading optimizer states."""
+
+import argparse
+import logging
+import os
+
+from neural_sp.bin.eval_utils import average_state_dicts
+from neural_sp.bin.eval_utils import load_topk_list
+from neural_sp.trainers.checkpoint_writer import atomic_save
+
+parser = argparse.ArgumentParser()
+parser.add_argument('checkpoints', type=str, nargs='+',
+                    help='checkpoints to average (model.epoch-*)')
+parser.add_argument('--weights', type=float, nargs='*', default=None,
+                    help='weights of checkpoints (uniform by default)')
+parser.add_argument('--topk', type=int, default=0,
+                    help='average the top-k checkpoints in the topk_list of the first checkpoint instead')
+parser.add_argument('--out', type=str,
+                    help='path to the averaged checkpoint')
+args = parser.parse_args()
+
+
+def main():
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    checkpoint_paths = args.checkpoints
+    if args.topk > 0:
+        save_path = os.path.dirname(args.checkpoints[0])
+        checkpoint_paths = [os.path.join(save_path, 'model.epoch-' + str(ep))
+                            for ep, _ in load_topk_list(args.checkpoints[0])[:args.topk]]
+    state_dict_avg = average_state_dicts(checkpoint_paths, args.weights)
+    atomic_save({'model_state_dict': state_dict_avg}, args.out)
+    print('%s: average of %d checkpoints' % (args.out, len(checkpoint_paths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright 2020 Kyoto University (Hirofumi Inaguma)
+#  Apache 2.0  (http://www.apache.org/licenses/LICENSE-2.0)
+
+"""Make a memory-mapped token stream for language model training from a dataset tsv file."""
+
+import argparse
+
+from neural_sp.datasets.asr import count_vocab_size
+from neural_sp.datasets.token_stream import write_token_stream
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--tsv', type=str,
+                    help='dataset tsv file')
+parser.add_argument('--dict', type=str,
+                    help='dictionary file')
+parser.add_argument('--out', type=str,
+                    help='path to the output token stream (<prefix>.bin)')
+parser.add_argument('--min_n_tokens', type=int, default=1,
+                    help='exclude utterances shorter than this value')
+args = parser.parse_args()
+
+
+def main():
+
+    n_utts, n_tokens = write_token_stream(args.tsv, args.out,
+                                          vocab=count_vocab_size(args.dict),
+                                          min_n_tokens=args.min_n_tokens)
+    print('%s: %d utterances, %d tokens' % (args.out, n_utts, n_tokens))
+
+
+if __name__ == '__main__':
+    main()